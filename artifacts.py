@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Атомарная запись генерируемых файлов (кварталы JSON/MD, pricing_index.json,
+version-history.json, update_config.json, .elevenlabs_kb_cache.json и т.п.)
+
+Запись через open(..., 'w') на месте: при падении процесса или чтении
+web-монитором во время записи виден обрезанный файл — после этого приходится
+пересобирать и перезаливать всё. Здесь:
+    - содержимое пишется во временный файл рядом с целевым, fsync, затем
+      os.replace — читатель видит либо старую, либо новую версию целиком
+    - fsync каталога (чтобы rename пережил падение питания) можно отложить
+      и сделать один раз на каталог: with artifacts.batch(): ...
+    - если файл уже содержит ровно эти байты (размер + sha256), запись
+      пропускается — mtime не меняется, инкрементальные стадии дальше по
+      конвейеру не видят ложных изменений
+    - права файла сохраняются (новые файлы — 0666 & ~umask, как у open())
+
+MM_FSYNC=0 отключает fsync (бенчмарки, тесты); атомарность rename остаётся.
+
+Использование:
+    import artifacts
+    artifacts.write_json('pricing_index.json', index)            # True — записан
+    artifacts.write_json('.cache.json', cache, indent=None)      # компактно (читает только код)
+    with artifacts.batch():                                       # fsync каталогов в конце
+        for name, text in files.items():
+            artifacts.write_text(f'quarters/{name}.md', text)
+"""
+
+import contextvars
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Optional, Set, Union
+
+import serialization
+
+FSYNC_ENV = 'MM_FSYNC'
+
+PathLike = Union[str, Path]
+
+# umask процесса — чтобы новые файлы получали те же права, что и через open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def fsync_enabled() -> bool:
+    """fsync включён, если MM_FSYNC не выключает его явно"""
+    return os.environ.get(FSYNC_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+class DirSyncBatch:
+    """Каталоги, ожидающие fsync (каждый синхронизируется один раз)"""
+
+    def __init__(self):
+        self.directories: Set[str] = set()
+
+    def add(self, directory: PathLike):
+        self.directories.add(os.path.abspath(directory))
+
+    def flush(self):
+        for directory in sorted(self.directories):
+            fsync_dir(directory)
+        self.directories.clear()
+
+
+_batch: contextvars.ContextVar = contextvars.ContextVar('artifacts_dir_batch', default=None)
+
+
+@contextmanager
+def batch():
+    """Отложить fsync каталогов до выхода из блока (вложенные блоки используют внешний)"""
+    current = _batch.get()
+    if current is not None:
+        yield current
+        return
+    pending = DirSyncBatch()
+    token = _batch.set(pending)
+    try:
+        yield pending
+    finally:
+        _batch.reset(token)
+        pending.flush()
+
+
+def fsync_dir(directory: PathLike):
+    """fsync каталога (на платформах без O_DIRECTORY — молча пропускается)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def sync_dirs(directories: Iterable[PathLike]):
+    """fsync каталогов — сразу или в текущем batch()"""
+    if not fsync_enabled():
+        return
+    pending = _batch.get()
+    for directory in set(directories):
+        if pending is not None:
+            pending.add(directory)
+        else:
+            fsync_dir(directory)
+
+
+def file_sha256(path: PathLike) -> Optional[str]:
+    """sha256 содержимого файла или None, если файла нет"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def is_identical(path: PathLike, data: bytes) -> bool:
+    """Файл уже содержит ровно эти байты (сначала размер, затем sha256)"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+    except OSError:
+        return False
+    return file_sha256(path) == hashlib.sha256(data).hexdigest()
+
+
+def _target_mode(path: Path) -> int:
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def write_bytes(path: PathLike, data: bytes, skip_identical: bool = True,
+                fsync: Optional[bool] = None, sync_dir: bool = True) -> bool:
+    """
+    Атомарно записать байты в файл
+
+    Args:
+        path: Целевой файл (каталог должен существовать)
+        data: Содержимое
+        skip_identical: Не трогать файл, если содержимое не изменилось
+        fsync: fsync файла и каталога (None — по MM_FSYNC)
+        sync_dir: fsync каталога после rename (в batch() — один раз на каталог);
+            False — вызывающий синхронизирует каталог сам (sync_dirs)
+
+    Returns:
+        True, если файл записан; False, если содержимое совпало и запись пропущена
+    """
+    path = Path(path)
+    if skip_identical and is_identical(path, data):
+        return False
+
+    fsync = fsync_enabled() if fsync is None else fsync
+    directory = path.parent
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync and sync_dir:
+        sync_dirs([directory])
+    return True
+
+
+def write_text(path: PathLike, text: str, encoding: str = 'utf-8', **kwargs) -> bool:
+    """Атомарно записать текст (см. write_bytes)"""
+    return write_bytes(path, text.encode(encoding), **kwargs)
+
+
+def write_json(path: PathLike, data: Any, indent: Optional[int] = 2, ensure_ascii: bool = False,
+               sort_keys: bool = False, **kwargs) -> bool:
+    """
+    Атомарно записать JSON через serialization (orjson, если установлен)
+
+    По умолчанию — indent=2, ensure_ascii=False, как по всему проекту;
+    indent=None — компактно, для файлов, которые читает только код (кеши, состояние).
+    """
+    data = serialization.dumps(data, indent=indent, ensure_ascii=ensure_ascii, sort_keys=sort_keys)
+    return write_bytes(path, data, **kwargs)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Фоновые задачи для веб-интерфейса мониторинга
+
+Долгие операции (принудительное обновление, проверка изменений) выполняются
+в пуле потоков, а не внутри запроса Flask:
+    - каждая задача получает ID, статус хранится в памяти
+      (queued → running → succeeded / failed)
+    - задача сообщает о ходе выполнения через job.progress(stage, message, percent)
+    - события можно опрашивать (/api/jobs/<id>) или слушать потоком SSE
+      (/api/jobs/<id>/events) — Condition будит подписчиков без опроса
+    - задачи одного вида не дублируются: повторный запуск, пока задача
+      выполняется, возвращает уже запущенную
+
+Использование:
+    jobs = JobManager(max_workers=2)
+    job = jobs.submit('force_update', lambda job: updater.update_data(force=True, progress=job.progress))
+    jobs.get(job.id).to_dict()
+    for event in jobs.stream(job.id): ...
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Статусы задачи
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class Job:
+    """Фоновая задача: статус, результат и журнал событий"""
+
+    def __init__(self, kind: str, condition: threading.Condition):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = QUEUED
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.stage: Optional[str] = None
+        self.percent: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.events: List[Dict] = []
+        self._condition = condition
+        self._add_event('queued', 'Задача поставлена в очередь')
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def _add_event(self, stage: str, message: str, percent: Optional[int] = None):
+        # Вызывается под self._condition
+        self.events.append({
+            'seq': len(self.events),
+            'ts': datetime.now().isoformat(),
+            'stage': stage,
+            'message': message,
+            'percent': percent
+        })
+
+    def progress(self, stage: str, message: str = '', percent: Optional[int] = None):
+        """Сообщить о ходе выполнения (вызывается из функции задачи)"""
+        with self._condition:
+            self.stage = stage
+            if percent is not None:
+                self.percent = percent
+            self._add_event(stage, message, percent)
+            self._condition.notify_all()
+
+    def _set_status(self, status: str, message: str):
+        with self._condition:
+            self.status = status
+            now = datetime.now().isoformat()
+            if status == RUNNING:
+                self.started_at = now
+            elif status in FINISHED_STATUSES:
+                self.finished_at = now
+                if status == SUCCEEDED:
+                    self.percent = 100
+            self._add_event(status, message, self.percent)
+            self._condition.notify_all()
+
+    def to_dict(self, with_events: bool = False) -> Dict:
+        with self._condition:
+            data = {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'stage': self.stage,
+                'percent': self.percent,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'result': self.result,
+                'error': self.error
+            }
+            if with_events:
+                data['events'] = list(self.events)
+            return data
+
+
+class JobManager:
+    """Пул фоновых задач со статусами в памяти"""
+
+    def __init__(self, max_workers: int = 2, keep: int = 50):
+        """
+        Args:
+            max_workers: Потоков для задач
+            keep: Сколько завершённых задач хранить в памяти
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-job")
+        self.keep = keep
+        self.condition = threading.Condition()
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.listeners: List[Callable[[Job], None]] = []
+
+    def on_finish(self, callback: Callable[[Job], None]):
+        """Вызывать callback(job) после завершения каждой задачи"""
+        self.listeners.append(callback)
+
+    def submit(self, kind: str, func: Callable[[Job], Any], dedupe: bool = True) -> Job:
+        """
+        Запустить задачу в фоне
+
+        Args:
+            kind: Вид задачи ('force_update', 'check_changes', ...)
+            func: func(job) -> результат; исключение переводит задачу в failed
+            dedupe: Если задача этого вида уже в очереди или выполняется — вернуть её
+        """
+        with self.condition:
+            if dedupe:
+                active = self.active(kind)
+                if active is not None:
+                    return active
+            job = Job(kind, self.condition)
+            self.jobs[job.id] = job
+            self._trim()
+        self.executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Any]):
+        job._set_status(RUNNING, 'Задача запущена')
+        start = time.time()
+        try:
+            result = func(job)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.result = {'traceback': traceback.format_exc(limit=5)}
+            job._set_status(FAILED, f"Ошибка: {e}")
+        else:
+            job.result = result
+            if result is False:
+                job.error = 'Задача завершилась неуспешно'
+                job._set_status(FAILED, f"Завершено с ошибкой за {time.time() - start:.1f}с")
+            else:
+                job._set_status(SUCCEEDED, f"Завершено за {time.time() - start:.1f}с")
+
+        for callback in self.listeners:
+            try:
+                callback(job)
+            except Exception:
+                pass
+
+    def _trim(self):
+        # Вызывается под self.condition: удаляем самые старые завершённые задачи
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def active(self, kind: str = None) -> Optional[Job]:
+        """Задача в очереди или выполняющаяся (последняя по времени)"""
+        with self.condition:
+            for job in reversed(self.jobs.values()):
+                if not job.finished and (kind is None or job.kind == kind):
+                    return job
+        return None
+
+    def latest(self, kind: str = None) -> Optional[Job]:
+        with self.condition:
+            for job in reversed(self.jobs.values()):
+                if kind is None or job.kind == kind:
+                    return job
+        return None
+
+    def list(self, limit: int = 20) -> List[Dict]:
+        with self.condition:
+            jobs = list(self.jobs.values())[-limit:]
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def stream(self, job_id: str, since: int = 0, heartbeat: float = 15.0) -> Iterator[Optional[Dict]]:
+        """
+        События задачи начиная с seq=since, пока задача не завершится.
+        None — сигнал keep-alive (событий не было heartbeat секунд).
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        position = max(0, since)
+        while True:
+            with self.condition:
+                if position >= len(job.events) and not job.finished:
+                    self.condition.wait(timeout=heartbeat)
+                new_events = job.events[position:]
+                finished = job.finished
+            if new_events:
+                position += len(new_events)
+                for event in new_events:
+                    yield event
+            elif not finished:
+                yield None
+            if finished and position >= len(job.events):
+                return
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон синхронизации KB против локальной замены ElevenLabs API
+
+Поднимает elevenlabs_fake_server в фоновом потоке, размножает quarters/*.md
+в 10x/100x копий и прогоняет оба пайплайна:
+    - elevenlabs_sync_v2.sync_quarters
+    - ElevenLabsAutoSync.full_sync
+Для каждого масштаба: первичная синхронизация (все документы новые) и
+инкрементальная (изменена доля файлов). Фиксируются время, документов/сек,
+число вызовов API по эндпоинтам и суммарные паузы time.sleep, которые
+запросили клиенты (паузы сжимаются коэффициентом --sleep-scale, чтобы
+прогон 100x укладывался в минуты, а не часы).
+
+Использование:
+    python3 benchmarks/elevenlabs_load.py                       # 1x, 10x, 100x
+    python3 benchmarks/elevenlabs_load.py --scales 10 --latency 0.02
+    python3 benchmarks/elevenlabs_load.py --pipelines sync_v2 --changed-fraction 0.2
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+QUARTERS_DIR = ROOT / "quarters"
+
+sys.path.insert(0, str(ROOT))
+
+from elevenlabs_fake_server import FakeElevenLabsServer  # noqa: E402
+
+PIPELINES = ("sync_v2", "auto_sync")
+FAKE_AGENT_ID = "agent_load_test"
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+class ScaledSleep:
+    """Замена модуля time в клиентах: sleep сжимается в scale раз, остальное — из time"""
+
+    def __init__(self, scale: float):
+        self.scale = scale
+        self.requested = 0.0
+
+    def sleep(self, seconds: float):
+        self.requested += seconds
+        time.sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def prepare_corpus(target: Path, scale: int, source: Path = QUARTERS_DIR) -> List[str]:
+    """Размножить MD-файлы кварталов в target; копии различаются по имени и содержимому"""
+    target.mkdir(parents=True, exist_ok=True)
+    names = []
+    for md in sorted(source.glob("*.md")):
+        text = md.read_text(encoding="utf-8")
+        for i in range(scale):
+            name = md.name if i == 0 else f"{md.stem}-x{i:03d}.md"
+            suffix = "" if i == 0 else f"\n\n<!-- копия {i} -->\n"
+            (target / name).write_text(text + suffix, encoding="utf-8")
+            names.append(name)
+    return names
+
+
+def mutate_corpus(target: Path, names: List[str], fraction: float, seed: int) -> List[str]:
+    """Изменить долю файлов (дописать строку), вернуть список изменённых"""
+    rng = random.Random(seed)
+    count = max(1, int(len(names) * fraction))
+    changed = sorted(rng.sample(names, min(count, len(names))))
+    stamp = datetime.now().isoformat()
+    for name in changed:
+        with open(target / name, "a", encoding="utf-8") as f:
+            f.write(f"\n<!-- обновлено {stamp} -->\n")
+    return changed
+
+
+def import_clients(sleeper: ScaledSleep):
+    """Импортировать клиенты после настройки окружения и подменить у них time"""
+    import elevenlabs_sync_v2
+    import elevenlabs_auto_sync
+    for module in (elevenlabs_sync_v2, elevenlabs_auto_sync):
+        module.time = sleeper
+    return elevenlabs_sync_v2, elevenlabs_auto_sync
+
+
+def run_phase(server: FakeElevenLabsServer, sleeper: ScaledSleep, docs: int, action, verbose: bool) -> Dict:
+    """Выполнить один прогон и снять метрики по разнице счётчиков фейкового API"""
+    before = server.state.stats()
+    sleep_before = sleeper.requested
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with sink:
+        action()
+    seconds = time.perf_counter() - start
+    after = server.state.stats()
+
+    calls = {k: v - before["calls"].get(k, 0) for k, v in after["calls"].items()
+             if v - before["calls"].get(k, 0)}
+    total = sum(calls.values())
+    return {
+        "docs": docs,
+        "seconds": round(seconds, 3),
+        "docs_per_sec": round(docs / seconds, 2) if seconds else None,
+        "api_calls": total,
+        "api_calls_per_doc": round(total / docs, 2) if docs else None,
+        "api_calls_by_endpoint": calls,
+        "bytes_uploaded": after["bytes_uploaded"] - before["bytes_uploaded"],
+        "sleep_requested_seconds": round(sleeper.requested - sleep_before, 1),
+        "kb_documents_after": after["documents"],
+        "agent_documents_after": after["agents"].get(FAKE_AGENT_ID, 0),
+    }
+
+
+def run_pipeline(pipeline: str, scale: int, args) -> Dict:
+    """Первичная + инкрементальная синхронизация одного пайплайна на одном масштабе"""
+    options = dict(latency=args.latency, index_latency=args.index_latency,
+                   failure_rate=args.failure_rate, rate_limit=args.rate_limit, seed=args.seed)
+    work_dir = Path(tempfile.mkdtemp(prefix=f"el_load_{pipeline}_{scale}x_"))
+    files_dir = work_dir / "quarters"
+    names = prepare_corpus(files_dir, scale)
+    sleeper = ScaledSleep(args.sleep_scale)
+    cwd = os.getcwd()
+
+    with FakeElevenLabsServer(**options) as server:
+        os.environ["ELEVENLABS_BASE_URL"] = server.base_url
+        sync_v2, auto_sync = import_clients(sleeper)
+        sync_v2.BASE_URL = server.base_url
+
+        if pipeline == "sync_v2":
+            def first():
+                sync_v2.sync_quarters(quarters_dir=str(files_dir), index_wait=args.index_wait)
+
+            def incremental(changed):
+                sync_v2.sync_quarters(quarters_dir=str(files_dir), changed_files=changed, index_wait=args.index_wait)
+        else:
+            def first():
+                auto_sync.ElevenLabsAutoSync().full_sync(files_dir=str(files_dir))
+
+            def incremental(changed):
+                auto_sync.ElevenLabsAutoSync().full_sync(files_dir=str(files_dir), changed_files=changed)
+
+        # auto_sync пишет лог и кэш KB в текущую директорию
+        os.chdir(work_dir)
+        try:
+            log(f"   ▶️  {pipeline} {scale}x: первичная синхронизация ({len(names)} док.)")
+            initial = run_phase(server, sleeper, len(names), first, args.verbose)
+            changed = mutate_corpus(files_dir, names, args.changed_fraction, args.seed)
+            log(f"   ▶️  {pipeline} {scale}x: инкрементальная ({len(changed)} изм.)")
+            incr = run_phase(server, sleeper, len(changed), lambda: incremental(changed), args.verbose)
+        finally:
+            os.chdir(cwd)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    for phase_name, phase in (("initial", initial), ("incremental", incr)):
+        log(f"      {phase_name:11} {phase['seconds']:8.2f}s | {phase['docs_per_sec'] or 0:7.1f} док/с | "
+            f"{phase['api_calls']:6} вызовов ({phase['api_calls_per_doc'] or 0:.1f}/док) | "
+            f"sleep {phase['sleep_requested_seconds']}s")
+    return {"pipeline": pipeline, "scale": scale, "initial": initial, "incremental": incr}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон синхронизации KB против фейкового API")
+    parser.add_argument("--scales", default="1,10,100", help="Масштабы корпуса через запятую (по умолчанию: 1,10,100)")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="Пайплайны: sync_v2,auto_sync")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа фейкового API (сек)")
+    parser.add_argument("--index-latency", type=float, default=0.0, help="Время RAG-индексации (сек)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Лимит запросов в секунду (0 — без лимита)")
+    parser.add_argument("--sleep-scale", type=float, default=0.01, help="Коэффициент сжатия пауз клиентов")
+    parser.add_argument("--index-wait", type=int, default=120, help="index_wait для sync_v2 (сек)")
+    parser.add_argument("--changed-fraction", type=float, default=0.1, help="Доля файлов для инкрементального прогона")
+    parser.add_argument("--seed", type=int, default=42, help="Seed")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "elevenlabs_load.json"), help="Файл JSON-отчёта")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод клиентов")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    pipelines = [p.strip() for p in args.pipelines.split(",") if p.strip()]
+    unknown = set(pipelines) - set(PIPELINES)
+    if unknown:
+        print(f"❌ Неизвестные пайплайны: {', '.join(sorted(unknown))}")
+        return 1
+
+    # Клиенты читают ключи при импорте — задаём до import_clients
+    os.environ["ELEVENLABS_API_KEY"] = "fake-key"
+    os.environ["ELEVENLABS_AGENT_ID"] = FAKE_AGENT_ID
+
+    log("🧪 Нагрузочный прогон синхронизации KB (fake ElevenLabs API)")
+    runs = []
+    for pipeline in pipelines:
+        for scale in scales:
+            runs.append(run_pipeline(pipeline, scale, args))
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "verbose")},
+        "source_docs": len(list(QUARTERS_DIR.glob("*.md"))),
+        "runs": runs,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"💾 Отчёт: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
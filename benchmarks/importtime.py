@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Время запуска команд mm.py: сводка `python -X importtime` и холостой прогон
+
+Для каждой команды скрипт загружается в отдельном интерпретаторе без
+выполнения блока __main__ (runpy.run_path с другим run_name) под
+-X importtime. Отчёт:
+    - startup  время процесса целиком (лучшее из --repeat) минус `python -c pass`
+    - imports  сумма cumulative по импортам верхнего уровня (без импортов
+               самого интерпретатора: site, encodings, ...)
+    - top      самые тяжёлые импорты верхнего уровня (cumulative)
+
+--noop-run дополнительно замеряет полный запуск `mm.py monitor --check`
+без изменений: синтетический фид отдаётся локальным HTTP-сервером, первый
+прогон заполняет рабочий каталог, замеряются последующие.
+
+Результат пишется в results/importtime_latest.json; --budget SECONDS
+даёт код возврата 1, если запуск какой-либо команды дольше бюджета.
+
+Использование:
+    python3 benchmarks/importtime.py                       # Основные команды
+    python3 benchmarks/importtime.py monitor update --top 15
+    python3 benchmarks/importtime.py --noop-run --budget 1.0
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import mm  # noqa: E402
+from synthetic_feed import BASE_RECORDS, generate_feed  # noqa: E402
+
+DEFAULT_COMMANDS = ["monitor", "sync", "update", "web", "parse", "pricing-index"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)")
+
+# Загрузить скрипт команды без запуска main (модульный уровень выполняется как при старте)
+LOAD_SNIPPET = "import runpy, sys; sys.path.insert(0, {root!r}); runpy.run_path({path!r}, run_name='mm_importtime')"
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({"MM_METRICS_DIR": "", "MM_FSYNC": "0", "PYTHONDONTWRITEBYTECODE": "1"})
+    env.pop("MM_TRACE", None)
+    return env
+
+
+def _timed_run(cmd: List[str], cwd: str, env: Dict[str, str]) -> Tuple[float, subprocess.CompletedProcess]:
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Строки -X importtime → [{module, self_us, cumulative_us, depth}]"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({"module": module, "self_us": int(self_us),
+                            "cumulative_us": int(cumulative_us), "depth": len(indent) // 2})
+    return entries
+
+
+def digest(entries: List[Dict], top: int, exclude: frozenset = frozenset()) -> Dict:
+    """Сумма импортов верхнего уровня и самые тяжёлые из них (exclude — импорты самого интерпретатора)"""
+    entries = [e for e in entries if e["module"] not in exclude]
+    top_level = [e for e in entries if e["depth"] == 0]
+    heaviest = sorted(top_level, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+    return {
+        "imports_seconds": round(sum(e["cumulative_us"] for e in top_level) / 1e6, 4),
+        "modules": len(entries),
+        "top": [{"module": e["module"], "seconds": round(e["cumulative_us"] / 1e6, 4)} for e in heaviest],
+    }
+
+
+def interpreter_imports(work_dir: str) -> frozenset:
+    """Модули, которые `python -c pass` импортирует и без команды (site, encodings, ...)"""
+    _, traced = _timed_run([sys.executable, "-X", "importtime", "-c", "pass"], work_dir, _env())
+    return frozenset(e["module"] for e in parse_importtime(traced.stderr))
+
+
+def measure_command(command: str, work_dir: str, repeat: int, top: int, baseline: float,
+                    exclude: frozenset = frozenset()) -> Dict:
+    path = mm.script_path(command)
+    snippet = LOAD_SNIPPET.format(root=str(ROOT), path=path)
+    env = _env()
+
+    times = []
+    for _ in range(repeat):
+        seconds, result = _timed_run([sys.executable, "-c", snippet], work_dir, env)
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["?"])[-1]
+            return {"command": command, "script": mm.COMMANDS[command][0], "error": error}
+        times.append(seconds)
+
+    _, traced = _timed_run([sys.executable, "-X", "importtime", "-c", snippet], work_dir, env)
+    return {
+        "command": command,
+        "script": mm.COMMANDS[command][0],
+        "startup_seconds": round(max(0.0, min(times) - baseline), 4),
+        "process_seconds": round(min(times), 4),
+        **digest(parse_importtime(traced.stderr), top, exclude),
+        "error": None,
+    }
+
+
+class _FeedHandler(http.server.BaseHTTPRequestHandler):
+    body = b"{}"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure_noop_run(work_dir: str, repeat: int, scale: int, baseline: float) -> Dict:
+    """`mm.py monitor --check` по неизменившемуся фиду (после первичной загрузки)"""
+    _FeedHandler.body = json.dumps(generate_feed(scale), ensure_ascii=False).encode("utf-8")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FeedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/ai/json_ai.php"
+    cmd = [sys.executable, str(ROOT / "mm.py"), "monitor", "--check", "--url", url]
+    env = _env()
+    try:
+        _, first = _timed_run(cmd, work_dir, env)
+        if first.returncode != 0:
+            return {"command": "monitor --check (no changes)", "error": first.stderr.strip()[-300:]}
+        times = []
+        for _ in range(repeat):
+            seconds, result = _timed_run(cmd, work_dir, env)
+            if "Изменений не обнаружено" not in result.stdout:
+                return {"command": "monitor --check (no changes)", "error": "прогон не распознан как холостой"}
+            times.append(seconds)
+    finally:
+        server.shutdown()
+    return {
+        "command": "monitor --check (no changes)",
+        "records": BASE_RECORDS * scale,
+        "startup_seconds": round(max(0.0, min(times) - baseline), 4),
+        "process_seconds": round(min(times), 4),
+        "error": None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Время запуска команд mm.py (-X importtime)")
+    parser.add_argument("commands", nargs="*", help=f"Команды mm.py (по умолчанию: {' '.join(DEFAULT_COMMANDS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Запусков на команду (берётся лучший)")
+    parser.add_argument("--top", type=int, default=8, help="Сколько тяжёлых импортов показывать")
+    parser.add_argument("--noop-run", action="store_true", help="Замерить `monitor --check` без изменений")
+    parser.add_argument("--scale", type=int, default=1, help="Масштаб фида для --noop-run")
+    parser.add_argument("--budget", type=float, help="Бюджет запуска в секундах (превышение — код 1)")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "importtime_latest.json"), help="Файл JSON-отчёта")
+    args = parser.parse_args(argv)
+
+    commands = args.commands or DEFAULT_COMMANDS
+    unknown = [c for c in commands if c not in mm.COMMANDS]
+    if unknown:
+        print(f"❌ Неизвестные команды: {', '.join(unknown)}")
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix="mm_importtime_")
+    try:
+        env = _env()
+        baseline = min(_timed_run([sys.executable, "-c", "pass"], work_dir, env)[0] for _ in range(args.repeat))
+        log(f"⏱️  Интерпретатор (python -c pass): {baseline:.3f}s")
+        exclude = interpreter_imports(work_dir)
+
+        results = []
+        for command in commands:
+            r = measure_command(command, work_dir, args.repeat, args.top, baseline, exclude)
+            results.append(r)
+            if r["error"]:
+                log(f"   {command:14} ❌ {r['error']}")
+                continue
+            top = ", ".join(f"{t['module']} {t['seconds'] * 1000:.0f}ms" for t in r["top"])
+            log(f"   {command:14} +{r['startup_seconds']:.3f}s | импорты {r['imports_seconds']:.3f}s "
+                f"({r['modules']} модулей) | {top}")
+
+        if args.noop_run:
+            r = measure_noop_run(work_dir, args.repeat, args.scale, baseline)
+            results.append(r)
+            if r["error"]:
+                log(f"   {r['command']} ❌ {r['error']}")
+            else:
+                log(f"   {r['command']}: {r['process_seconds']:.3f}s ({r['records']} объектов)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "interpreter_seconds": round(baseline, 4),
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.budget is not None:
+        over = [r for r in results if not r["error"] and r["process_seconds"] > args.budget]
+        for r in over:
+            log(f"⚠️  {r['command']}: {r['process_seconds']:.3f}s > бюджета {args.budget:.3f}s")
+        exit_code = 1 if over else 0
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"💾 Отчёт: {output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Время записи/чтения и размер JSON-артефактов: stdlib json против orjson
+
+Артефакты строятся на синтетическом фиде тем же кодом, что и в проде:
+    - feed_snapshot     снимок фида (knowledge-base.json, cache/previous_data.json, snapshots/)
+    - quarter_file      quarters/*.json (PropertyMonitor.save_quarters_data), все кварталы
+    - pricing_index     pricing_index.json (PricingIndexBuilder.build_index по MD кварталов)
+    - kb_index          .kb_index.json + .kb_index.words.json (KBIndex по MD кварталов)
+    - validation_state  состояние IncrementalValidator (FEED_RULES)
+
+Для каждого артефакта и варианта (бэкенд × indent=2/компактно) замеряются
+dumps и loads (лучший из --repeat) и размер в байтах; перед замером
+проверяется, что loads(dumps(x)) == x и что вывод orjson с indent=2
+совпадает с json.dumps(indent=2, ensure_ascii=False).
+
+Результат пишется в results/json_artifacts_latest.json.
+
+Использование:
+    python3 benchmarks/json_artifacts.py                   # 1x, 10x
+    python3 benchmarks/json_artifacts.py --scales 1,10,100 --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import serialization  # noqa: E402
+from pipeline import load_monitor_module  # noqa: E402
+from synthetic_feed import generate_feed  # noqa: E402
+
+# (бэкенд, indent): stdlib с indent=2 — прежний формат всех файлов
+VARIANTS = (("json", 2), ("json", None), ("orjson", 2), ("orjson", None))
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+@contextlib.contextmanager
+def json_backend(name: str):
+    """Принудительно выбрать бэкенд serialization (MM_JSON_BACKEND)"""
+    previous = os.environ.get(serialization.BACKEND_ENV)
+    os.environ[serialization.BACKEND_ENV] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(serialization.BACKEND_ENV, None)
+        else:
+            os.environ[serialization.BACKEND_ENV] = previous
+
+
+def build_artifacts(scale: int, work_dir: Path, seed: int) -> Tuple[Dict[str, Any], int]:
+    """Артефакты пайплайна на фиде масштаба scale (данные в памяти, как перед записью)"""
+    from build_pricing_index import PricingIndexBuilder
+    from kb_index import INDEX_VERSION, KBIndex
+    import validation
+
+    # Своя копия строки на каждое значение — как после разбора ответа json_ai.php
+    feed = json.loads(json.dumps(generate_feed(scale, seed=seed), ensure_ascii=False))
+
+    os.chdir(work_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        monitor = load_monitor_module().PropertyMonitor()
+        monitor.save_quarters_data(monitor.split_data_by_quarters(feed))
+        monitor.convert_quarters_json_to_md()
+        builder = PricingIndexBuilder()
+        builder.quarters_dir = monitor.data_dir
+        builder.build_index()
+
+        kb = KBIndex([monitor.data_dir], path=None)
+        kb.update(save=False)
+
+        validator = validation.IncrementalValidator(validation.FEED_RULES)
+        validator.run(feed, snapshot="bench")
+
+    quarters = [serialization.load(path) for path in sorted(monitor.quarters_dir.glob("*.json"))]
+    artifacts = {
+        "feed_snapshot": feed,
+        "quarter_file": quarters,
+        "pricing_index": builder.pricing_index,
+        "kb_index": {"version": INDEX_VERSION, "generation": 1, "files": kb.files,
+                     "postings": kb.keyed, "words": kb.words},
+        "validation_state": validator.state,
+    }
+    return artifacts, len(feed)
+
+
+def _best(func: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(name: str, data: Any, repeat: int) -> List[Dict]:
+    """dumps/loads и размер по вариантам; сверка результатов между бэкендами"""
+    reference = serialization.dumps_stdlib(data, indent=2)
+    rows = []
+    for backend, indent in VARIANTS:
+        if backend == "orjson" and serialization.orjson is None:
+            continue
+        with json_backend(backend):
+            raw = serialization.dumps(data, indent=indent)
+            if serialization.loads(raw) != data:
+                raise AssertionError(f"{name}: loads(dumps(x)) != x ({backend}, indent={indent})")
+            if indent == 2 and raw != reference:
+                raise AssertionError(f"{name}: {backend} indent=2 отличается от json.dumps")
+            dump_seconds = _best(lambda: serialization.dumps(data, indent=indent), repeat)
+            load_seconds = _best(lambda: serialization.loads(raw), repeat)
+        rows.append({"artifact": name, "backend": backend, "pretty": indent is not None,
+                     "bytes": len(raw), "dump_ms": round(dump_seconds * 1000, 2),
+                     "load_ms": round(load_seconds * 1000, 2)})
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Время и размер JSON-артефактов: json против orjson")
+    parser.add_argument("--scales", default="1,10", help="Масштабы фида через запятую (по умолчанию: 1,10)")
+    parser.add_argument("--repeat", type=int, default=5, help="Прогонов на замер (берётся лучший)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed синтетического фида")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "json_artifacts_latest.json"), help="Файл отчёта")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    os.environ["MM_FSYNC"] = "0"
+    os.environ["MM_METRICS_DIR"] = ""
+    os.environ.pop("MM_TRACE", None)
+
+    log(f"📏 JSON-артефакты: json против orjson ({'установлен' if serialization.orjson else 'не установлен'})")
+    cwd = os.getcwd()
+    results = []
+    for scale in scales:
+        work_dir = Path(tempfile.mkdtemp(prefix=f"mm_json_{scale}x_"))
+        try:
+            artifacts, records = build_artifacts(scale, work_dir, args.seed)
+            log(f"▶️  {scale}x: {records} объектов")
+            for name, data in artifacts.items():
+                for row in measure(name, data, args.repeat):
+                    results.append({"scale": scale, **row})
+                    log(f"   {name:17} {row['backend']:6} {'indent=2' if row['pretty'] else 'compact ':8} | "
+                        f"{row['bytes'] / 1024:9.1f} КБ | dump {row['dump_ms']:8.2f} мс | load {row['load_ms']:8.2f} мс")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": getattr(serialization.orjson, "__version__", None),
+        "config": {"scales": scales, "repeat": args.repeat, "seed": args.seed},
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"💾 Отчёт: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Офлайн-бенчмарк качества и скорости поиска по базе знаний
+
+Строит локальный гибридный индекс (BM25 + символьные триграммы, без эмбеддингов)
+по MD-файлам из quarters/, elevenlabs_rag/ и minskmir_structured/, прогоняет
+test_queries из elevenlabs_master_config.json и сгенерированный набор запросов
+по данным кварталов. Считает recall@k, MRR, количество чанков, время построения
+индекса и задержку запросов (p50/p99). Результат пишется в JSON-отчёт,
+история запусков — в JSONL, чтобы сравнивать варианты чанкинга и формата
+документов без обращения к ElevenLabs.
+
+Использование:
+    python3 benchmarks/kb_retrieval.py                         # Настройки из master config
+    python3 benchmarks/kb_retrieval.py --chunk-size 1600 --overlap 200
+    python3 benchmarks/kb_retrieval.py --generated 500 --seed 7
+"""
+
+import json
+import math
+import random
+import re
+import sys
+import time
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+MASTER_CONFIG = ROOT / "elevenlabs_rag" / "elevenlabs_master_config.json"
+QUARTERS_JSON_DIR = ROOT / "quarters" / "by-quarters"
+
+# Источники корпуса: (директория, рекурсивно)
+CORPUS_SOURCES = [
+    ("quarters", False),
+    ("elevenlabs_rag", False),
+    ("minskmir_structured", True),
+]
+
+# Служебные файлы и промпты, которые не попадают в KB агента
+EXCLUDED_NAME_PARTS = ("readme", "report")
+EXCLUDED_DIRS = ("prompts",)
+
+K_VALUES = (1, 3, 5, 7)
+RRF_K = 60
+
+TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)?|[a-zа-яё]+", re.IGNORECASE)
+HEADING_RE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+APT_NUMBER_RE = re.compile(r"№+\s*(\d+)")
+QUARTER_NUMBER_RE = re.compile(r"\b(\d{1,2})\b")
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+# ===== КОРПУС И ЧАНКИНГ =====
+
+def collect_corpus(root: Path = ROOT) -> Dict[str, str]:
+    """Собрать MD-документы корпуса: относительный путь → текст"""
+    docs: Dict[str, str] = {}
+    for dir_name, recursive in CORPUS_SOURCES:
+        base = root / dir_name
+        if not base.exists():
+            continue
+        files = base.rglob("*.md") if recursive else base.glob("*.md")
+        for md in sorted(files):
+            if any(part in md.name.lower() for part in EXCLUDED_NAME_PARTS):
+                continue
+            if any(part in EXCLUDED_DIRS for part in md.relative_to(base).parts[:-1]):
+                continue
+            docs[md.relative_to(root).as_posix()] = md.read_text(encoding="utf-8", errors="ignore")
+    return docs
+
+
+def chunk_markdown(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Разбить markdown на чанки: сначала по заголовкам, затем окнами chunk_size с перекрытием"""
+    starts = [m.start() for m in HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+
+    chunks: List[str] = []
+    current = ""
+    for section in sections:
+        if len(current) + len(section) <= chunk_size:
+            current += section
+            continue
+        if current.strip():
+            chunks.append(current)
+        # Длинную секцию режем окнами с перекрытием
+        step = max(1, chunk_size - overlap)
+        if len(section) > chunk_size:
+            for pos in range(0, len(section), step):
+                piece = section[pos:pos + chunk_size]
+                if piece.strip():
+                    chunks.append(piece)
+                if pos + chunk_size >= len(section):
+                    break
+            current = ""
+        else:
+            # Перекрытие: хвост предыдущего чанка переносится в начало следующего
+            tail = current[-overlap:] if overlap and current else ""
+            current = tail + section
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def tokenize(text: str) -> List[str]:
+    """Токенизация с усечением русских словоформ до 6 символов (грубый стемминг)"""
+    tokens = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        if tok[0].isdigit():
+            tokens.append(tok.replace(",", "."))
+        elif len(tok) > 1:
+            tokens.append(tok[:6])
+    return tokens
+
+
+def char_trigrams(text: str) -> Counter:
+    normalized = " ".join(TOKEN_RE.findall(text.lower()))
+    padded = f" {normalized} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# ===== ИНДЕКС =====
+
+class HybridIndex:
+    """BM25 по словам + TF-IDF косинус по символьным триграммам, слияние через RRF"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunk_docs: List[str] = []
+        self.chunk_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.trigram_postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.trigram_idf: Dict[str, float] = {}
+        self.avg_length = 0.0
+
+    def build(self, chunks: List[Tuple[str, str]]):
+        """chunks: список (doc_name, chunk_text)"""
+        trigram_df: Counter = Counter()
+        chunk_trigrams: List[Counter] = []
+
+        for chunk_id, (doc_name, text) in enumerate(chunks):
+            self.chunk_docs.append(doc_name)
+            tokens = tokenize(text)
+            self.chunk_lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((chunk_id, tf))
+            grams = char_trigrams(text)
+            chunk_trigrams.append(grams)
+            trigram_df.update(grams.keys())
+
+        n = len(chunks)
+        self.avg_length = (sum(self.chunk_lengths) / n) if n else 0.0
+        self.trigram_idf = {g: math.log((n + 1) / (df + 1)) + 1.0 for g, df in trigram_df.items()}
+
+        for chunk_id, grams in enumerate(chunk_trigrams):
+            weights = {g: tf * self.trigram_idf[g] for g, tf in grams.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for g, w in weights.items():
+                self.trigram_postings[g].append((chunk_id, w / norm))
+
+    def search_bm25(self, query: str, limit: int) -> List[int]:
+        n = len(self.chunk_docs)
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                length_norm = 1 - self.b + self.b * self.chunk_lengths[chunk_id] / (self.avg_length or 1)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return [c for c, _ in sorted(scores.items(), key=lambda x: -x[1])[:limit]]
+
+    def search_trigram(self, query: str, limit: int) -> List[int]:
+        grams = char_trigrams(query)
+        weights = {g: tf * self.trigram_idf[g] for g, tf in grams.items() if g in self.trigram_idf}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for g, w in weights.items():
+            for chunk_id, cw in self.trigram_postings[g]:
+                scores[chunk_id] += (w / norm) * cw
+        return [c for c, _ in sorted(scores.items(), key=lambda x: -x[1])[:limit]]
+
+    def search(self, query: str, mode: str = "hybrid", limit: int = 50) -> List[str]:
+        """Вернуть ранжированный список документов (без повторов)"""
+        if mode == "bm25":
+            ranked = self.search_bm25(query, limit)
+        elif mode == "trigram":
+            ranked = self.search_trigram(query, limit)
+        else:
+            fused: Dict[int, float] = defaultdict(float)
+            for ranking in (self.search_bm25(query, limit), self.search_trigram(query, limit)):
+                for rank, chunk_id in enumerate(ranking):
+                    fused[chunk_id] += 1.0 / (RRF_K + rank + 1)
+            ranked = [c for c, _ in sorted(fused.items(), key=lambda x: -x[1])]
+
+        docs: List[str] = []
+        for chunk_id in ranked:
+            doc = self.chunk_docs[chunk_id]
+            if doc not in docs:
+                docs.append(doc)
+        return docs
+
+
+# ===== ЗАПРОСЫ =====
+
+def relevant_docs_for_expectation(expected: str, doc_names: List[str]) -> List[str]:
+    """Определить релевантные документы для test_query по тексту поля expected.
+
+    Номера кварталов до первого «НЕ» считаются ожидаемыми; упоминание навигатора
+    означает навигационные файлы elevenlabs_rag.
+    """
+    positive = re.split(r"\bНЕ\b", expected)[0]
+    numbers = set(QUARTER_NUMBER_RE.findall(positive))
+    relevant = []
+    for name in doc_names:
+        stem = Path(name).name
+        prefix = re.match(r"^(\d+)[-_]", stem)
+        if prefix and prefix.group(1) in numbers and not stem.startswith("0"):
+            relevant.append(name)
+        elif "навигатор" in expected.lower() and "navigation" in stem:
+            relevant.append(name)
+    return relevant
+
+
+def load_test_queries(doc_names: List[str]) -> List[Dict]:
+    if not MASTER_CONFIG.exists():
+        return []
+    with open(MASTER_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    queries = []
+    for item in config.get("test_queries", []):
+        relevant = relevant_docs_for_expectation(item.get("expected", ""), doc_names)
+        if relevant:
+            queries.append({"kind": "test_query", "query": item["query"], "relevant": relevant})
+    return queries
+
+
+def generate_queries(docs: Dict[str, str], count: int, seed: int) -> List[Dict]:
+    """Сгенерировать запросы по данным кварталов с эталоном, вычисленным по тексту корпуса"""
+    records = []
+    for json_file in sorted(QUARTERS_JSON_DIR.glob("*.json")):
+        with open(json_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for apt in data.get("apartments", []):
+            records.append(apt)
+    if not records:
+        return []
+
+    rng = random.Random(seed)
+    doc_names = list(docs)
+    queries: List[Dict] = []
+    attempts = 0
+    while len(queries) < count and attempts < count * 20:
+        attempts += 1
+        apt = rng.choice(records)
+        kind = rng.choice(("apartment", "house", "quarter"))
+        house = str(apt.get("house_number", "")).strip()
+        house_name = str(apt.get("house_name", "")).strip()
+
+        if kind == "apartment":
+            m = APT_NUMBER_RE.search(apt.get("apartment", ""))
+            if not m or not house:
+                continue
+            number = m.group(1)
+            query = f"{apt.get('type', 'Квартира')} №{number} в доме {house}"
+            pattern = re.compile(r"№+\s*" + number + r"\b")
+            relevant = [d for d in doc_names if house in docs[d] and pattern.search(docs[d])]
+        elif kind == "house":
+            if not house_name:
+                continue
+            query = f"Какие квартиры есть в доме {house_name}?"
+            relevant = [d for d in doc_names if house_name in docs[d]]
+        else:
+            m = re.search(r"(\d+)\s+(.+)", apt.get("quarter", ""))
+            if not m:
+                continue
+            number, name = m.group(1), m.group(2).strip()
+            query = f"Расскажи про квартал {number} {name}"
+            relevant = [d for d in doc_names if re.match(rf"^{number}[-_]", Path(d).name)]
+
+        if relevant:
+            queries.append({"kind": kind, "query": query, "relevant": relevant})
+    return queries
+
+
+# ===== МЕТРИКИ =====
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def evaluate(index: HybridIndex, queries: List[Dict], mode: str) -> Dict:
+    hits = {k: 0 for k in K_VALUES}
+    recall = {k: 0.0 for k in K_VALUES}
+    reciprocal_ranks = []
+    latencies_ms = []
+    by_kind: Dict[str, List[float]] = defaultdict(list)
+    details = []
+
+    for q in queries:
+        start = time.perf_counter()
+        ranked = index.search(q["query"], mode=mode)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        relevant = set(q["relevant"])
+        first_rank = next((i + 1 for i, d in enumerate(ranked) if d in relevant), None)
+        rr = 1.0 / first_rank if first_rank else 0.0
+        reciprocal_ranks.append(rr)
+        by_kind[q["kind"]].append(rr)
+        for k in K_VALUES:
+            found = len(relevant.intersection(ranked[:k]))
+            hits[k] += 1 if found else 0
+            recall[k] += found / len(relevant)
+        if q["kind"] == "test_query":
+            details.append({"query": q["query"], "relevant": sorted(relevant),
+                            "top": ranked[:max(K_VALUES)], "first_relevant_rank": first_rank})
+
+    n = len(queries) or 1
+    return {
+        "metrics": {
+            **{f"recall@{k}": round(recall[k] / n, 4) for k in K_VALUES},
+            **{f"hit@{k}": round(hits[k] / n, 4) for k in K_VALUES},
+            "mrr": round(sum(reciprocal_ranks) / n, 4),
+            "mrr_by_kind": {kind: round(sum(v) / len(v), 4) for kind, v in sorted(by_kind.items())},
+        },
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p99": round(percentile(latencies_ms, 99), 3),
+            "mean": round(sum(latencies_ms) / n, 3),
+        },
+        "test_queries": details,
+    }
+
+
+def run_benchmark(chunk_size: int, overlap: int, generated: int, seed: int) -> Dict:
+    log("📚 Сбор корпуса...")
+    docs = collect_corpus()
+    chunks: List[Tuple[str, str]] = []
+    chunks_by_dir: Counter = Counter()
+    for name, text in docs.items():
+        for chunk in chunk_markdown(text, chunk_size, overlap):
+            chunks.append((name, chunk))
+            chunks_by_dir[name.split("/", 1)[0]] += 1
+    log(f"   Документов: {len(docs)}, чанков: {len(chunks)}")
+
+    log("🔨 Построение индекса...")
+    start = time.perf_counter()
+    index = HybridIndex()
+    index.build(chunks)
+    build_seconds = time.perf_counter() - start
+    log(f"   Готово за {build_seconds:.2f}с")
+
+    queries = load_test_queries(list(docs)) + generate_queries(docs, generated, seed)
+    log(f"🔍 Запросов: {len(queries)}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {"chunk_size": chunk_size, "chunk_overlap": overlap,
+                   "generated_queries": generated, "seed": seed, "k_values": list(K_VALUES)},
+        "corpus": {
+            "documents": len(docs),
+            "chunks": len(chunks),
+            "chunks_by_dir": dict(sorted(chunks_by_dir.items())),
+            "avg_chunk_chars": round(sum(len(c) for _, c in chunks) / (len(chunks) or 1), 1),
+        },
+        "index": {"build_seconds": round(build_seconds, 4),
+                  "vocabulary": len(index.postings), "trigrams": len(index.trigram_idf)},
+        "queries": dict(Counter(q["kind"] for q in queries)),
+        "modes": {},
+    }
+    for mode in ("bm25", "trigram", "hybrid"):
+        report["modes"][mode] = evaluate(index, queries, mode)
+        m = report["modes"][mode]
+        log(f"   {mode:8} MRR={m['metrics']['mrr']:.3f} recall@7={m['metrics']['recall@7']:.3f} "
+            f"p50={m['latency_ms']['p50']:.2f}мс p99={m['latency_ms']['p99']:.2f}мс")
+    return report
+
+
+def save_report(report: Dict, output: Path, history: Path):
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    summary = {
+        "timestamp": report["timestamp"],
+        "config": report["config"],
+        "chunks": report["corpus"]["chunks"],
+        "build_seconds": report["index"]["build_seconds"],
+        "hybrid": {**report["modes"]["hybrid"]["metrics"], **report["modes"]["hybrid"]["latency_ms"]},
+    }
+    summary["hybrid"].pop("mrr_by_kind", None)
+    with open(history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    log(f"💾 Отчёт: {output}")
+    log(f"📈 История: {history}")
+
+
+def load_default_settings() -> Dict:
+    if MASTER_CONFIG.exists():
+        with open(MASTER_CONFIG, "r", encoding="utf-8") as f:
+            return json.load(f).get("rag_configuration", {}).get("settings", {})
+    return {}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    settings = load_default_settings()
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк поиска по базе знаний")
+    parser.add_argument("--chunk-size", type=int, default=settings.get("chunk_size", 800), help="Размер чанка (символы)")
+    parser.add_argument("--overlap", type=int, default=settings.get("chunk_overlap", 400), help="Перекрытие чанков (символы)")
+    parser.add_argument("--generated", type=int, default=300, help="Количество сгенерированных запросов")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора запросов")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "kb_retrieval_latest.json"), help="Файл JSON-отчёта")
+    parser.add_argument("--history", default=str(RESULTS_DIR / "kb_retrieval_history.jsonl"), help="Файл истории запусков")
+    args = parser.parse_args(argv)
+
+    if args.overlap >= args.chunk_size:
+        print("❌ --overlap должен быть меньше --chunk-size")
+        return 1
+
+    report = run_benchmark(args.chunk_size, args.overlap, args.generated, args.seed)
+    save_report(report, Path(args.output), Path(args.history))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
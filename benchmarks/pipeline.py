@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк CPU-этапов пайплайна на синтетическом фиде 1x/10x/100x
+
+Фид строится synthetic_feed.generate_feed (форма json_ai.php со всеми
+известными аномалиями). Для каждого масштаба замеряются:
+    - parse            BirDataParser.parse_data
+    - split_save       PropertyMonitor.split_data_by_quarters + save_quarters_data (холодный прогон)
+    - split_save_incr  то же поверх сохранённой версии, изменено --changed-fraction объектов
+    - markdown         PropertyMonitor.generate_quarter_markdown по всем кварталам
+    - render           PropertyMonitor.convert_quarters_json_to_md (пул процессов, MM_RENDER_WORKERS)
+    - pricing_index    PricingIndexBuilder.build_index по сгенерированным MD
+    - diff_analyzer    DataDiffAnalyzer.analyze_differences (текущая vs предыдущая версия)
+    - diff_checker     DataUpdateChecker.compare_data
+    - validate         validation.ValidationEngine(FEED_RULES) по новой версии
+    - validate_incr    IncrementalValidator: только записи, изменённые с предыдущей версии
+
+Время — медиана и минимум из --repeat прогонов, память — пик tracemalloc
+в отдельном прогоне (tracemalloc заметно замедляет код и не смешивается с замером времени).
+
+Результат пишется в results/pipeline_latest.json; с --baseline отчёт
+сравнивается с эталоном, регрессии выводятся и дают код возврата 1.
+
+Использование:
+    python3 benchmarks/pipeline.py                                   # 1x, 10x, 100x
+    python3 benchmarks/pipeline.py --scales 1,10 --cases parse,markdown
+    python3 benchmarks/pipeline.py --save-baseline                   # зафиксировать эталон
+    python3 benchmarks/pipeline.py --baseline benchmarks/results/pipeline_baseline.json
+"""
+
+import argparse
+import contextlib
+import gc
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+BASELINE_FILE = RESULTS_DIR / "pipeline_baseline.json"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_feed import BASE_RECORDS, generate_feed, mutate_feed  # noqa: E402
+
+CASES = ("parse", "split_save", "split_save_incr", "markdown", "render", "pricing_index",
+         "diff_analyzer", "diff_checker", "validate", "validate_incr")
+
+# Изменения короче этого времени не считаются регрессией (шум таймера)
+MIN_SECONDS = 0.005
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def load_monitor_module():
+    """sync-with-monitoring.py (дефис в имени — импорт через spec)"""
+    spec = importlib.util.spec_from_file_location("sync_with_monitoring", ROOT / "sync-with-monitoring.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def quarter_documents(monitor) -> List[Dict]:
+    """Структуры кварталов в том виде, в каком их сохраняет save_quarters_data"""
+    documents = []
+    for quarter_file in sorted(monitor.quarters_dir.glob("*.json")):
+        with open(quarter_file, "r", encoding="utf-8") as f:
+            documents.append(json.load(f))
+    return documents
+
+
+class Case:
+    """Один замер: setup() готовит вход (вне замера), run(state) — измеряемый код"""
+
+    def __init__(self, name: str, setup: Callable[[], object], run: Callable[[object], object]):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def measure(case: Case, repeat: int, quiet: bool = True) -> Dict:
+    """Время (median/min по repeat прогонам) и пик памяти (отдельный прогон под tracemalloc)"""
+    sink = (lambda: contextlib.redirect_stdout(io.StringIO())) if quiet else contextlib.nullcontext
+    timings = []
+    for _ in range(max(1, repeat)):
+        state = case.setup()
+        gc.collect()
+        with sink():
+            start = time.perf_counter()
+            case.run(state)
+            timings.append(time.perf_counter() - start)
+
+    state = case.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with sink():
+            case.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_median": round(statistics.median(timings), 4),
+        "seconds_min": round(min(timings), 4),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "runs": len(timings),
+    }
+
+
+def build_cases(scale: int, work_dir: Path, args, monitor_module) -> Tuple[List[Case], int]:
+    """Подготовить фид масштаба scale и замеры по нему"""
+    from bir_data_parser import BirDataParser
+    from build_pricing_index import PricingIndexBuilder
+    from data_diff_analyzer import DataDiffAnalyzer
+    from check_updates import DataUpdateChecker
+    import validation
+
+    feed = generate_feed(scale, seed=args.seed)
+    changed_feed = mutate_feed(feed, fraction=args.changed_fraction, seed=args.seed + 1)
+
+    # PropertyMonitor работает относительно текущей директории (./quarters)
+    os.chdir(work_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        monitor = monitor_module.PropertyMonitor()
+        quarters_data = monitor.split_data_by_quarters(feed)
+        monitor.save_quarters_data(quarters_data)
+        documents = quarter_documents(monitor)
+        monitor.convert_quarters_json_to_md()
+
+    def fresh_monitor():
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = monitor_module.PropertyMonitor()
+        return result
+
+    def setup_parse():
+        parser = BirDataParser()
+        parser.data = feed
+        return parser
+
+    def setup_split_cold():
+        result = fresh_monitor()
+        if result.quarter_hashes_file.exists():
+            result.quarter_hashes_file.unlink()
+        return result
+
+    def setup_split_incremental():
+        result = fresh_monitor()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result.save_quarters_data(result.split_data_by_quarters(feed))
+        return result
+
+    def run_split(data):
+        def run(target):
+            target.save_quarters_data(target.split_data_by_quarters(data))
+        return run
+
+    def setup_pricing():
+        builder = PricingIndexBuilder()
+        builder.quarters_dir = monitor.data_dir
+        return builder
+
+    def setup_analyzer():
+        analyzer = DataDiffAnalyzer()
+        analyzer.current_data = changed_feed
+        analyzer.previous_data = feed
+        return analyzer
+
+    delta = validation.record_delta(feed, changed_feed)
+
+    def setup_incremental_validator():
+        validator = validation.IncrementalValidator(validation.FEED_RULES)
+        validator.run(feed, snapshot="previous")
+        return validator
+
+    def setup_checker():
+        checker = DataUpdateChecker()
+        checker.current_data = changed_feed
+        checker.previous_data = feed
+        return checker
+
+    available = {
+        "parse": Case("parse", setup_parse, lambda parser: parser.parse_data()),
+        "split_save": Case("split_save", setup_split_cold, run_split(feed)),
+        "split_save_incr": Case("split_save_incr", setup_split_incremental, run_split(changed_feed)),
+        "markdown": Case("markdown", lambda: monitor,
+                         lambda target: [target.generate_quarter_markdown(doc) for doc in documents]),
+        "render": Case("render", lambda: monitor, lambda target: target.convert_quarters_json_to_md()),
+        "pricing_index": Case("pricing_index", setup_pricing, lambda builder: builder.build_index()),
+        "diff_analyzer": Case("diff_analyzer", setup_analyzer, lambda analyzer: analyzer.analyze_differences()),
+        "diff_checker": Case("diff_checker", setup_checker, lambda checker: checker.compare_data()),
+        "validate": Case("validate", lambda: validation.ValidationEngine(validation.FEED_RULES),
+                         lambda engine: engine.run(changed_feed)),
+        "validate_incr": Case("validate_incr", setup_incremental_validator,
+                              lambda validator: validator.run(changed_feed, changed=delta,
+                                                              since="previous", snapshot="current")),
+    }
+    return [available[name] for name in args.cases], len(feed)
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Регрессии по времени (медиана) и пику памяти относительно эталона"""
+    reference = {(r["case"], r["scale"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        base = reference.get((result["case"], result["scale"]))
+        if not base:
+            continue
+        for metric in ("seconds_median", "peak_mb"):
+            old, new = base[metric], result[metric]
+            result.setdefault("baseline", {})[metric] = old
+            if not old:
+                continue
+            ratio = new / old
+            result["baseline"][f"{metric}_ratio"] = round(ratio, 3)
+            if metric == "seconds_median" and new - old < MIN_SECONDS:
+                continue
+            if ratio > 1 + tolerance:
+                regressions.append({"case": result["case"], "scale": result["scale"], "metric": metric,
+                                    "baseline": old, "current": new, "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов пайплайна на синтетическом фиде bir.by")
+    parser.add_argument("--scales", default="1,10,100", help="Масштабы через запятую (по умолчанию: 1,10,100)")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Замеры: {','.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Прогонов на замер времени (по умолчанию: 3)")
+    parser.add_argument("--changed-fraction", type=float, default=0.05, help="Доля изменённых объектов во второй версии")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "pipeline_latest.json"), help="Файл JSON-отчёта")
+    parser.add_argument("--baseline", help=f"Сравнить с эталоном (например {BASELINE_FILE.relative_to(ROOT)})")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимый рост времени/памяти (0.2 = +20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Сохранить отчёт как эталон ({BASELINE_FILE.name})")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод измеряемого кода")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    args.cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        print(f"❌ Неизвестные замеры: {', '.join(sorted(unknown))}")
+        return 1
+
+    # Метрики и трассы измеряемых модулей не пишем
+    os.environ["MM_METRICS_DIR"] = ""
+    os.environ.pop("MM_TRACE", None)
+
+    log("📏 Бенчмарк пайплайна на синтетическом фиде")
+    monitor_module = load_monitor_module()
+    cwd = os.getcwd()
+    results = []
+    for scale in scales:
+        work_dir = Path(tempfile.mkdtemp(prefix=f"mm_bench_{scale}x_"))
+        try:
+            cases, records = build_cases(scale, work_dir, args, monitor_module)
+            log(f"▶️  {scale}x: {records} объектов")
+            for case in cases:
+                stats = measure(case, args.repeat, quiet=not args.verbose)
+                results.append({"case": case.name, "scale": scale, "records": records, **stats})
+                log(f"   {case.name:16} {stats['seconds_median']:9.4f}s (min {stats['seconds_min']:.4f}) | "
+                    f"пик {stats['peak_mb']:8.2f} МБ | {records / stats['seconds_median'] if stats['seconds_median'] else 0:,.0f} об./с")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"scales": scales, "cases": args.cases, "repeat": args.repeat,
+                   "changed_fraction": args.changed_fraction, "seed": args.seed, "base_records": BASE_RECORDS},
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            log(f"⚠️  Регрессии относительно {args.baseline} (допуск +{args.tolerance:.0%}):")
+            for r in regressions:
+                log(f"   {r['case']} {r['scale']}x {r['metric']}: {r['baseline']} → {r['current']} (×{r['ratio']})")
+            exit_code = 1
+        else:
+            log(f"✅ Регрессий относительно {args.baseline} нет")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"💾 Отчёт: {output}")
+
+    if args.save_baseline:
+        shutil.copyfile(output, BASELINE_FILE)
+        log(f"📌 Эталон: {BASELINE_FILE}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Синтетический фид в формате bir.by/ai/json_ai.php
+
+Воспроизводит форму реального ответа (словарь id → объект), включая
+неудобные случаи, которые встречаются в живых данных:
+    - текстовые поля в виде unicode-escape последовательностей ("\\u041a...")
+    - объекты без поля Quarter (квартал определяется по Location/NumberHouse)
+    - сломанная этажность: "Этажность дома: 2.4", "2.5", пустая, "16, 17, 19", "23-25"
+    - рассрочка "—", цены строкой с пробелами, машиноместа
+
+Масштаб 1x соответствует размеру текущего каталога (BASE_RECORDS объектов).
+
+Использование:
+    from synthetic_feed import generate_feed, mutate_feed
+    feed = generate_feed(scale=10, seed=42)
+    changed = mutate_feed(feed, fraction=0.05, seed=43)
+
+    python3 benchmarks/synthetic_feed.py --scale 10 --output /tmp/feed_10x.json
+"""
+
+import argparse
+import copy
+import json
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Размер текущего каталога bir.by (квартиры, апартаменты, пентхаусы)
+BASE_RECORDS = 810
+
+# Доли «неудобных» записей — по наблюдениям на реальном фиде
+MISSING_QUARTER_SHARE = 0.035
+ESCAPED_SHARE = 0.05
+PARKING_SHARE = 0.02
+
+# Квартал → дома (номер, название, этажность)
+QUARTERS: Dict[str, List[Tuple[str, str, str]]] = {
+    "Квартал — 7 Средиземноморский": [("7.1", "Барселона", "12"), ("7.3", "Неаполь", "8")],
+    "Квартал — 9 Южная Америка": [("9.2", "Буэнос-Айрес", "15"), ("9.4", "Лима", "15")],
+    "Квартал — 10 Тропические острова": [("10.1", "Мальдивы", "14")],
+    "Квартал — 11 Австралия и Океания": [("11.2", "Сидней", "25"), ("11.5", "Окленд", "23-25")],
+    "Квартал — 12 Западная Европа": [("12.5", "Берлин", "25"), ("12.7", "Вена", "2.4")],
+    "Квартал — 16 Родная страна": [("16.3", "Гродно", "16, 17, 19"), ("16.6", "Брест", "16,17")],
+    "Квартал — 18 Чемпионов": [("18.4", "Сидней Люкс 18.4", "21"), ("18.7", "Рио-де-Жанейро 18.7", "2.5")],
+    "Квартал — 19 Южная Европа": [("19.1", "Лиссабон", "12")],
+    "Квартал — 20 Мировых танцев": [("20.2", "Танго", "10"), ("20.5", "Сальса", "12")],
+    "Квартал — 21 Западный": [("21.6", "Лондон", "8"), ("21.8", "Дублин", "8")],
+    "Квартал — 22 Центральная Европа": [("22.1", "Прага", "8"), ("22.3", "Будапешт", "15")],
+    "Квартал — 23 Евразия": [("23.2", "Стамбул", "19")],
+    "Квартал — 25 Азия": [("25.1", "Токио", "14"), ("25.4", "Сеул", "16")],
+    "Квартал — 26 Африка": [("26.1", "Каир", "20")],
+    "Квартал — 27 Happy Planet": [("27.1", "Happy 1", "8"), ("27.4", "Happy 4", "")],
+    "Квартал — 29 Северная Европа": [("29.2", "Осло", "12")],
+    "Квартал — 30 Северная Америка": [("30.1", "Чикаго", "15")],
+}
+
+# Дома, для которых Quarter в фиде отсутствует (определяются по Location/NumberHouse)
+UNLABELED_HOUSES: List[Tuple[str, str, str]] = [
+    ("Эмиратс Волна 8с", "Диадема", ""),
+    ("Жемчужина 2", "Жемчужина", ""),
+    ("Марина 1", "Марина", "22"),
+    ("21.6", "Лондон", "8"),
+    ("Сидней Люкс 18.4", "Сидней Люкс", "21"),
+]
+
+TYPES = [("Квартира", 0.62), ("Бизнес-апартаменты", 0.33), ("Пентхаус", 0.05)]
+STATUSES = [("Статус: В продаже", 0.55), ("Статус: Сдано", 0.25), ("Статус: Бронь", 0.12), ("Статус: Резерв", 0.08)]
+STREETS = ["улица Игоря Лученка", "проспект Мира", "улица Брилевская", "улица Жореса Алфёрова"]
+
+ESCAPABLE_FIELDS = ("Apartment", "Status", "Address", "NameHouse", "Location", "Quarter")
+
+
+def escape_unicode(text: str) -> str:
+    """Текст в виде \\uXXXX-последовательностей, как в части ответов json_ai.php"""
+    return "".join(f"\\u{ord(ch):04x}" for ch in text)
+
+
+def _weighted(rng: random.Random, options: List[Tuple[str, float]]) -> str:
+    return rng.choices([o for o, _ in options], weights=[w for _, w in options])[0]
+
+
+def _price_field(rng: random.Random, value: int):
+    # Большинство цен — числа, часть — строки с разделителем разрядов
+    if rng.random() < 0.03:
+        return f"{value:,}".replace(",", " ")
+    return value
+
+
+def make_record(rng: random.Random, apartment_no: int) -> Dict:
+    """Один объект фида"""
+    apt_type = _weighted(rng, TYPES)
+    if rng.random() < PARKING_SHARE:
+        apt_type = "Машиноместо"
+
+    if rng.random() < MISSING_QUARTER_SHARE:
+        quarter = None
+        number_house, house_name, floors = rng.choice(UNLABELED_HOUSES)
+    else:
+        quarter = rng.choice(list(QUARTERS))
+        number_house, house_name, floors = rng.choice(QUARTERS[quarter])
+
+    floor_max = int(floors.split(",")[0].split("-")[0].split(".")[0] or 22)
+    floor = rng.randint(1, max(2, floor_max))
+    rooms = rng.randint(1, 4) if apt_type != "Машиноместо" else 0
+    square = round(rng.uniform(14 if rooms == 0 else 28, 140), 1)
+    price_metr = rng.randrange(1300, 3200, 10)
+    price_full = int(square * price_metr)
+    installment = rng.random() < 0.3
+
+    record = {
+        "Apartment": f"{'Машиноместо' if rooms == 0 else 'Квартира'} №{apartment_no}",
+        "type": apt_type,
+        "Quarter": quarter,
+        "Status": _weighted(rng, STATUSES),
+        "Address": f"{rng.choice(STREETS)}, дом {rng.randint(1, 60)}",
+        "Location": f"Местоположение: Минск Мир, Дом {number_house}",
+        "NumberHouse": number_house,
+        "NameHouse": house_name,
+        "Floor": f"Этаж: {floor}",
+        "FloorTotal": f"Этажность дома: {floors}",
+        "UsrNumberRooms": rooms,
+        "Square": f"Площадь: {square}",
+        "Installment_price_metr": int(price_metr * 1.08) if installment else "—",
+        "Installment_price_full": int(price_full * 1.08) if installment else "—",
+        "Price_metr": _price_field(rng, price_metr),
+        "Price_full": _price_field(rng, price_full),
+    }
+    if quarter is None:
+        del record["Quarter"]
+
+    if rng.random() < ESCAPED_SHARE:
+        for field in ESCAPABLE_FIELDS:
+            if field in record:
+                record[field] = escape_unicode(record[field])
+    return record
+
+
+def generate_feed(scale: int = 1, seed: int = 42, base_records: int = BASE_RECORDS) -> Dict[str, Dict]:
+    """Фид из base_records * scale объектов; ключи — строковые id, как в json_ai.php"""
+    rng = random.Random(seed)
+    total = base_records * scale
+    feed = {}
+    for i in range(total):
+        feed[str(i)] = make_record(rng, apartment_no=i + 1)
+    return feed
+
+
+def mutate_feed(feed: Dict[str, Dict], fraction: float = 0.05, seed: int = 43) -> Dict[str, Dict]:
+    """
+    Следующая «версия» фида: у доли объектов меняются цена и статус,
+    часть объектов удаляется и добавляются новые
+    """
+    rng = random.Random(seed)
+    result = copy.deepcopy(feed)
+    ids = list(result)
+    count = max(1, int(len(ids) * fraction))
+
+    for item_id in rng.sample(ids, min(count, len(ids))):
+        item = result[item_id]
+        if isinstance(item.get("Price_full"), int):
+            item["Price_full"] = int(item["Price_full"] * rng.uniform(0.95, 1.08))
+        item["Status"] = _weighted(rng, STATUSES)
+
+    for item_id in rng.sample(ids, min(max(1, count // 5), len(ids))):
+        del result[item_id]
+
+    next_id = max(int(i) for i in ids) + 1
+    for offset in range(max(1, count // 5)):
+        result[str(next_id + offset)] = make_record(rng, apartment_no=next_id + offset + 1)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Синтетический фид bir.by для бенчмарков")
+    parser.add_argument("--scale", type=int, default=1, help=f"Масштаб (1x = {BASE_RECORDS} объектов)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed")
+    parser.add_argument("--output", help="Файл JSON (по умолчанию — stdout)")
+    args = parser.parse_args(argv)
+
+    feed = generate_feed(args.scale, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(feed, f, ensure_ascii=False)
+        print(f"💾 {args.output}: {len(feed)} объектов", file=sys.stderr)
+    else:
+        json.dump(feed, sys.stdout, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,14 @@ from collections import defaultdict
 from typing import Dict, List, Any
 import os
 
+import artifacts
+import md_templates
+import metrics
+import parsing
+import serialization
+from records import ParsedApartment
+from render_pool import RenderTask, render_quarters
+
 class BirDataParser:
     def __init__(self, json_url: str = "https://bir.by/ai/json_ai.php"):
         self.json_url = json_url
@@ -24,7 +32,8 @@ class BirDataParser:
         try:
             response = requests.get(self.json_url, timeout=30)
             response.raise_for_status()
-            self.data = response.json()
+            self.data = serialization.loads(response.content)
+            metrics.record_feed(response.content, len(self.data))
             return True
         except Exception as e:
             print(f"Ошибка при загрузке данных: {e}")
@@ -115,39 +124,20 @@ class BirDataParser:
         if not floor_text:
             return 0
         
-        decoded = self.decode_unicode(floor_text)
-        # Ищем цифры в тексте этажа
-        match = re.search(r'(\d+)', decoded)
-        if match:
-            return int(match.group(1))
-        return 0
+        # Первое число в тексте этажа (разбор кешируется в parsing)
+        return parsing.first_int(self.decode_unicode(floor_text))
     
     def extract_square(self, square_text: str) -> float:
         """Извлекает площадь из текста"""
         if not square_text:
             return 0.0
         
-        decoded = self.decode_unicode(square_text)
-        # Ищем число с плавающей точкой
-        match = re.search(r'(\d+(?:\.\d+)?)', decoded)
-        if match:
-            return float(match.group(1))
-        return 0.0
+        # Первое число с плавающей точкой (разбор кешируется в parsing)
+        return parsing.first_decimal(self.decode_unicode(square_text))
     
     def safe_float(self, value) -> float:
         """Безопасно конвертирует значение в float"""
-        if value is None:
-            return 0.0
-        if isinstance(value, (int, float)):
-            return float(value)
-        if isinstance(value, str):
-            # Убираем все нечисловые символы кроме точки и минуса
-            cleaned = re.sub(r'[^\d.-]', '', value)
-            try:
-                return float(cleaned) if cleaned else 0.0
-            except ValueError:
-                return 0.0
-        return 0.0
+        return parsing.to_float(value)
     
     def parse_data(self):
         """Парсит и структурирует данные"""
@@ -168,48 +158,47 @@ class BirDataParser:
             if quarter == "Неизвестный квартал":
                 quarter = self.determine_quarter_by_address(address, house_name, house_number)
             
-            # Создаем структурированный объект
-            structured_item = {
-                'id': item_id,
-                'apartment': self.decode_unicode(item.get('Apartment', '')),
-                'type': self.decode_unicode(item.get('type', '')),
-                'quarter': quarter,
-                'house_number': house_number,
-                'house_name': house_name,
-                'floor': floor,
-                'floor_total': self.extract_floor_number(item.get('FloorTotal', '')),
-                'square': square,
-                'status': self.decode_unicode(item.get('Status', '')),
-                'address': address,
-                'location': self.decode_unicode(item.get('Location', '')),
-                'price_metr': self.safe_float(item.get('Price_metr', 0)),
-                'price_full': self.safe_float(item.get('Price_full', 0)),
-                'installment_price_metr': self.safe_float(item.get('Installment_price_metr', 0)),
-                'installment_price_full': self.safe_float(item.get('Installment_price_full', 0))
-            }
+            # Создаем структурированный объект (слотовая запись, to_dict() — прежний словарь)
+            structured_item = ParsedApartment(
+                id=item_id,
+                apartment=self.decode_unicode(item.get('Apartment', '')),
+                type=self.decode_unicode(item.get('type', '')),
+                quarter=quarter,
+                house_number=house_number,
+                house_name=house_name,
+                floor=floor,
+                floor_total=self.extract_floor_number(item.get('FloorTotal', '')),
+                square=square,
+                status=self.decode_unicode(item.get('Status', '')),
+                address=address,
+                location=self.decode_unicode(item.get('Location', '')),
+                price_metr=self.safe_float(item.get('Price_metr', 0)),
+                price_full=self.safe_float(item.get('Price_full', 0)),
+                installment_price_metr=self.safe_float(item.get('Installment_price_metr', 0)),
+                installment_price_full=self.safe_float(item.get('Installment_price_full', 0))
+            )
             
             # Группируем по кварталам и домам
             self.quarters[quarter][house_number].append(structured_item)
     
     def generate_quarter_markdown(self, quarter_name: str, houses: Dict) -> str:
         """Генерирует Markdown для квартала"""
-        markdown = f"# 🏘️ Квартал — {quarter_name}\n\n"
-        
         # Общая информация
         total_objects = sum(len(apartments) for apartments in houses.values())
         unique_types = set()
         for house_apartments in houses.values():
             for apt in house_apartments:
-                unique_types.add(apt['type'])
-        
-        markdown += "## 📍 Общая информация\n"
-        markdown += f"**Квартал:** {quarter_name}\n"
-        markdown += f"**Город:** Минск\n"
-        markdown += f"**Район:** Мир\n"
-        markdown += f"**Количество домов:** {len(houses)}\n"
-        markdown += f"**Количество объектов:** {total_objects}\n"
-        markdown += f"**Типы недвижимости:** {', '.join(unique_types)}\n\n"
-        markdown += "---\n\n"
+                unique_types.add(apt.type)
+        
+        parts = [
+            md_templates.QUARTER_TITLE.render(quarter=quarter_name), "\n",
+            md_templates.GENERAL_INFO.render(),
+            md_templates.GENERAL_INFO_LINES.render(quarter=quarter_name),
+            md_templates.HOUSES_COUNT.render(count=len(houses)),
+            md_templates.OBJECTS_COUNT.render(count=total_objects),
+            md_templates.TYPES_LINE.render(types=', '.join(unique_types)), "\n",
+            "---\n\n"
+        ]
         
         # Статистика по кварталу
         all_prices = []
@@ -218,135 +207,83 @@ class BirDataParser:
         
         for house_number, apartments in houses.items():
             for apt in apartments:
-                if apt['price_metr'] > 0:
-                    all_prices.append(apt['price_metr'])
-                if apt['square'] > 0:
-                    all_squares.append(apt['square'])
-                if apt['price_full'] > 0:
-                    all_costs.append(apt['price_full'])
+                if apt.price_metr > 0:
+                    all_prices.append(apt.price_metr)
+                if apt.square > 0:
+                    all_squares.append(apt.square)
+                if apt.price_full > 0:
+                    all_costs.append(apt.price_full)
         
         # Генерируем информацию по каждому дому
         for house_number, apartments in houses.items():
-            markdown += self.generate_house_markdown(house_number, apartments)
+            parts.append(self.generate_house_markdown(house_number, apartments))
         
         # Аналитика квартала
         if all_prices or all_squares or all_costs:
-            markdown += self.generate_quarter_analytics(all_prices, all_squares, all_costs)
+            parts.append(self.generate_quarter_analytics(all_prices, all_squares, all_costs))
         
-        return markdown
+        return ''.join(parts)
     
-    def generate_house_markdown(self, house_number: str, apartments: List[Dict]) -> str:
+    def generate_house_markdown(self, house_number: str, apartments: List[ParsedApartment]) -> str:
         """Генерирует Markdown для дома"""
         if not apartments:
             return ""
         
-        house_name = apartments[0].get('house_name', '')
-        markdown = f"## 🏠 Дом {house_number}\n\n"
+        house_name = apartments[0].house_name
+        parts = [md_templates.HOUSE_TITLE.render(house=house_number)]
         
         if house_name:
-            markdown += f"**Название дома:** {house_name}\n\n"
+            parts.append(md_templates.HOUSE_NAME.render(house_name=house_name))
         
         # Статистика дома
-        prices = [apt['price_metr'] for apt in apartments if apt['price_metr'] > 0]
-        squares = [apt['square'] for apt in apartments if apt['square'] > 0]
-        costs = [apt['price_full'] for apt in apartments if apt['price_full'] > 0]
-        
-        markdown += "### 📊 Статистика дома\n"
-        markdown += f"**Количество апартаментов:** {len(apartments)}\n"
-        if squares:
-            markdown += f"**Диапазон площадей:** {min(squares):.1f} - {max(squares):.1f} м²\n"
-        if prices:
-            markdown += f"**Средняя цена за м²:** {sum(prices)/len(prices):.0f} евро\n"
-        if costs:
-            markdown += f"**Средняя стоимость:** {sum(costs)/len(costs):.0f} евро\n"
-        markdown += "\n---\n\n"
+        parts.append(md_templates.render_parsed_house_stats(apartments))
         
         # Группируем по этажам
         floors = defaultdict(list)
         for apt in apartments:
-            floors[apt['floor']].append(apt)
+            floors[apt.floor].append(apt)
         
         # Генерируем информацию по этажам
         for floor_num in sorted(floors.keys()):
-            markdown += f"## 🏢 Этаж {floor_num}\n\n"
+            parts.append(md_templates.FLOOR_TITLE.render(floor=floor_num))
             for apt in floors[floor_num]:
-                markdown += self.generate_apartment_markdown(apt)
-            markdown += "\n"
+                parts.append(self.generate_apartment_markdown(apt))
+            parts.append("\n")
         
-        return markdown
+        return ''.join(parts)
     
-    def generate_apartment_markdown(self, apartment: Dict) -> str:
+    def generate_apartment_markdown(self, apartment: ParsedApartment) -> str:
         """Генерирует Markdown для апартамента"""
-        markdown = f"### 🏠 {apartment['type']} №{apartment['apartment'].split()[-1] if apartment['apartment'] else 'N/A'}\n"
-        markdown += f"**Квартал:** {apartment['quarter']}\n"
-        markdown += f"**Дом:** {apartment['house_number']}\n"
-        if apartment['house_name']:
-            markdown += f"**Название дома:** {apartment['house_name']}\n"
-        markdown += f"**Этаж:** {apartment['floor']}\n"
-        if apartment['floor_total'] > 0:
-            markdown += f"**Общая этажность:** {apartment['floor_total']}\n"
-        if apartment['square'] > 0:
-            markdown += f"**Площадь:** {apartment['square']} м²\n"
-        if apartment['price_metr'] > 0:
-            markdown += f"**Цена за м²:** {apartment['price_metr']} евро\n"
-        if apartment['price_full'] > 0:
-            markdown += f"**Общая стоимость:** {apartment['price_full']:,} евро\n"
-        if apartment['installment_price_metr'] > 0:
-            markdown += f"**Цена в рассрочку за м²:** {apartment['installment_price_metr']} евро\n"
-        if apartment['installment_price_full'] > 0:
-            markdown += f"**Общая стоимость в рассрочку:** {apartment['installment_price_full']:,} евро\n"
-        if apartment['status']:
-            markdown += f"**Статус:** {apartment['status']}\n"
-        if apartment['address']:
-            markdown += f"**Адрес:** {apartment['address']}\n"
-        if apartment['location']:
-            markdown += f"**Местоположение:** {apartment['location']}\n"
-        markdown += "\n---\n\n"
-        
-        return markdown
+        return md_templates.render_parsed_apartment(apartment)
     
     def generate_quarter_analytics(self, prices: List[float], squares: List[float], costs: List[float]) -> str:
         """Генерирует аналитику квартала"""
-        markdown = "## 📈 Аналитика квартала\n\n"
-        
-        if prices:
-            markdown += "### 💰 Ценовой диапазон\n"
-            markdown += f"- **Минимальная цена за м²:** {min(prices):.0f} евро\n"
-            markdown += f"- **Максимальная цена за м²:** {max(prices):.0f} евро\n"
-            markdown += f"- **Средняя цена за м²:** {sum(prices)/len(prices):.0f} евро\n\n"
-        
-        if squares:
-            markdown += "### 📐 Площади\n"
-            markdown += f"- **Минимальная площадь:** {min(squares):.1f} м²\n"
-            markdown += f"- **Максимальная площадь:** {max(squares):.1f} м²\n"
-            markdown += f"- **Средняя площадь:** {sum(squares)/len(squares):.1f} м²\n\n"
-        
-        if costs:
-            markdown += "### 💵 Стоимость\n"
-            markdown += f"- **Минимальная стоимость:** {min(costs):,.0f} евро\n"
-            markdown += f"- **Максимальная стоимость:** {max(costs):,.0f} евро\n"
-            markdown += f"- **Средняя стоимость:** {sum(costs)/len(costs):,.0f} евро\n\n"
-        
-        markdown += "---\n\n"
-        return markdown
+        return md_templates.render_quarter_analytics(prices, squares, costs)
     
     def save_quarter_files(self, output_dir: str = "quarters"):
         """Сохраняет файлы для каждого квартала"""
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
+        tasks = []
         for quarter_name, houses in self.quarters.items():
             # Создаем безопасное имя файла с транслитерацией
             safe_name = self.create_safe_filename(quarter_name)
             filename = f"{safe_name}.md"
             filepath = os.path.join(output_dir, filename)
-            
-            markdown_content = self.generate_quarter_markdown(quarter_name, houses)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
-            
-            print(f"Создан файл: {filepath}")
+            tasks.append(RenderTask(quarter_name, filepath, (quarter_name, dict(houses)),
+                                    weight=sum(len(apartments) for apartments in houses.values())))
+
+        # Кварталы рендерятся параллельно в пуле процессов
+        for result in render_quarters(tasks, self._render_quarter):
+            if result['error']:
+                print(f"Ошибка при создании {result['path']}: {result['error']}")
+            else:
+                print(f"Создан файл: {result['path']}")
+
+    def _render_quarter(self, payload) -> str:
+        quarter_name, houses = payload
+        return self.generate_quarter_markdown(quarter_name, houses)
     
     def create_safe_filename(self, text: str) -> str:
         """Создает безопасное имя файла с транслитерацией кириллицы"""
@@ -409,8 +346,7 @@ class BirDataParser:
         index_content += f"- **Всего объектов:** {total_objects}\n"
         
         index_path = os.path.join(output_dir, "README.md")
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write(index_content)
+        artifacts.write_text(index_path, index_content)
         
         print(f"Создан индексный файл: {index_path}")
 
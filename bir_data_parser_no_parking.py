@@ -13,6 +13,9 @@ from collections import defaultdict
 from typing import Dict, List, Any
 import os
 
+import parsing
+from records import ParsedApartment
+
 class BirDataParserNoParking:
     def __init__(self, json_url: str = "https://bir.by/ai/json_ai.php"):
         self.json_url = json_url
@@ -145,39 +148,20 @@ class BirDataParserNoParking:
         if not floor_text:
             return 0
         
-        decoded = self.decode_unicode(floor_text)
-        # Ищем цифры в тексте этажа
-        match = re.search(r'(\d+)', decoded)
-        if match:
-            return int(match.group(1))
-        return 0
+        # Первое число в тексте этажа (разбор кешируется в parsing)
+        return parsing.first_int(self.decode_unicode(floor_text))
     
     def extract_square(self, square_text: str) -> float:
         """Извлекает площадь из текста"""
         if not square_text:
             return 0.0
         
-        decoded = self.decode_unicode(square_text)
-        # Ищем число с плавающей точкой
-        match = re.search(r'(\d+(?:\.\d+)?)', decoded)
-        if match:
-            return float(match.group(1))
-        return 0.0
+        # Первое число с плавающей точкой (разбор кешируется в parsing)
+        return parsing.first_decimal(self.decode_unicode(square_text))
     
     def safe_float(self, value) -> float:
         """Безопасно конвертирует значение в float"""
-        if value is None:
-            return 0.0
-        if isinstance(value, (int, float)):
-            return float(value)
-        if isinstance(value, str):
-            # Убираем все нечисловые символы кроме точки и минуса
-            cleaned = re.sub(r'[^\d.-]', '', value)
-            try:
-                return float(cleaned) if cleaned else 0.0
-            except ValueError:
-                return 0.0
-        return 0.0
+        return parsing.to_float(value)
     
     def parse_data(self):
         """Парсит и структурирует данные, исключая машиноместа"""
@@ -208,25 +192,25 @@ class BirDataParserNoParking:
             if quarter == "Неизвестный квартал":
                 quarter = self.determine_quarter_by_address(address, house_name, house_number)
             
-            # Создаем структурированный объект
-            structured_item = {
-                'id': item_id,
-                'apartment': self.decode_unicode(item.get('Apartment', '')),
-                'type': self.decode_unicode(item.get('type', '')),
-                'quarter': quarter,
-                'house_number': house_number,
-                'house_name': house_name,
-                'floor': floor,
-                'floor_total': self.extract_floor_number(item.get('FloorTotal', '')),
-                'square': square,
-                'status': self.decode_unicode(item.get('Status', '')),
-                'address': address,
-                'location': self.decode_unicode(item.get('Location', '')),
-                'price_metr': self.safe_float(item.get('Price_metr', 0)),
-                'price_full': self.safe_float(item.get('Price_full', 0)),
-                'installment_price_metr': self.safe_float(item.get('Installment_price_metr', 0)),
-                'installment_price_full': self.safe_float(item.get('Installment_price_full', 0))
-            }
+            # Создаем структурированный объект (слотовая запись, to_dict() — прежний словарь)
+            structured_item = ParsedApartment(
+                id=item_id,
+                apartment=self.decode_unicode(item.get('Apartment', '')),
+                type=self.decode_unicode(item.get('type', '')),
+                quarter=quarter,
+                house_number=house_number,
+                house_name=house_name,
+                floor=floor,
+                floor_total=self.extract_floor_number(item.get('FloorTotal', '')),
+                square=square,
+                status=self.decode_unicode(item.get('Status', '')),
+                address=address,
+                location=self.decode_unicode(item.get('Location', '')),
+                price_metr=self.safe_float(item.get('Price_metr', 0)),
+                price_full=self.safe_float(item.get('Price_full', 0)),
+                installment_price_metr=self.safe_float(item.get('Installment_price_metr', 0)),
+                installment_price_full=self.safe_float(item.get('Installment_price_full', 0))
+            )
             
             # Группируем по кварталам и домам
             self.quarters[quarter][house_number].append(structured_item)
@@ -243,7 +227,7 @@ class BirDataParserNoParking:
         unique_types = set()
         for house_apartments in houses.values():
             for apt in house_apartments:
-                unique_types.add(apt['type'])
+                unique_types.add(apt.type)
         
         markdown += "## 📍 Общая информация\n"
         markdown += f"**Квартал:** {quarter_name}\n"
@@ -261,12 +245,12 @@ class BirDataParserNoParking:
         
         for house_number, apartments in houses.items():
             for apt in apartments:
-                if apt['price_metr'] > 0:
-                    all_prices.append(apt['price_metr'])
-                if apt['square'] > 0:
-                    all_squares.append(apt['square'])
-                if apt['price_full'] > 0:
-                    all_costs.append(apt['price_full'])
+                if apt.price_metr > 0:
+                    all_prices.append(apt.price_metr)
+                if apt.square > 0:
+                    all_squares.append(apt.square)
+                if apt.price_full > 0:
+                    all_costs.append(apt.price_full)
         
         # Генерируем информацию по каждому дому
         for house_number, apartments in houses.items():
@@ -278,21 +262,21 @@ class BirDataParserNoParking:
         
         return markdown
     
-    def generate_house_markdown(self, house_number: str, apartments: List[Dict]) -> str:
+    def generate_house_markdown(self, house_number: str, apartments: List[ParsedApartment]) -> str:
         """Генерирует Markdown для дома"""
         if not apartments:
             return ""
         
-        house_name = apartments[0].get('house_name', '')
+        house_name = apartments[0].house_name
         markdown = f"## 🏠 Дом {house_number}\n\n"
         
         if house_name:
             markdown += f"**Название дома:** {house_name}\n\n"
         
         # Статистика дома
-        prices = [apt['price_metr'] for apt in apartments if apt['price_metr'] > 0]
-        squares = [apt['square'] for apt in apartments if apt['square'] > 0]
-        costs = [apt['price_full'] for apt in apartments if apt['price_full'] > 0]
+        prices = [apt.price_metr for apt in apartments if apt.price_metr > 0]
+        squares = [apt.square for apt in apartments if apt.square > 0]
+        costs = [apt.price_full for apt in apartments if apt.price_full > 0]
         
         markdown += "### 📊 Статистика дома\n"
         markdown += f"**Количество апартаментов:** {len(apartments)}\n"
@@ -307,7 +291,7 @@ class BirDataParserNoParking:
         # Группируем по этажам
         floors = defaultdict(list)
         for apt in apartments:
-            floors[apt['floor']].append(apt)
+            floors[apt.floor].append(apt)
         
         # Генерируем информацию по этажам
         for floor_num in sorted(floors.keys()):
@@ -318,32 +302,32 @@ class BirDataParserNoParking:
         
         return markdown
     
-    def generate_apartment_markdown(self, apartment: Dict) -> str:
+    def generate_apartment_markdown(self, apartment: ParsedApartment) -> str:
         """Генерирует Markdown для апартамента"""
-        markdown = f"### 🏠 {apartment['type']} №{apartment['apartment'].split()[-1] if apartment['apartment'] else 'N/A'}\n"
-        markdown += f"**Квартал:** {apartment['quarter']}\n"
-        markdown += f"**Дом:** {apartment['house_number']}\n"
-        if apartment['house_name']:
-            markdown += f"**Название дома:** {apartment['house_name']}\n"
-        markdown += f"**Этаж:** {apartment['floor']}\n"
-        if apartment['floor_total'] > 0:
-            markdown += f"**Общая этажность:** {apartment['floor_total']}\n"
-        if apartment['square'] > 0:
-            markdown += f"**Площадь:** {apartment['square']} м²\n"
-        if apartment['price_metr'] > 0:
-            markdown += f"**Цена за м²:** {apartment['price_metr']} евро\n"
-        if apartment['price_full'] > 0:
-            markdown += f"**Общая стоимость:** {apartment['price_full']:,} евро\n"
-        if apartment['installment_price_metr'] > 0:
-            markdown += f"**Цена в рассрочку за м²:** {apartment['installment_price_metr']} евро\n"
-        if apartment['installment_price_full'] > 0:
-            markdown += f"**Общая стоимость в рассрочку:** {apartment['installment_price_full']:,} евро\n"
-        if apartment['status']:
-            markdown += f"**Статус:** {apartment['status']}\n"
-        if apartment['address']:
-            markdown += f"**Адрес:** {apartment['address']}\n"
-        if apartment['location']:
-            markdown += f"**Местоположение:** {apartment['location']}\n"
+        markdown = f"### 🏠 {apartment.type} №{apartment.apartment.split()[-1] if apartment.apartment else 'N/A'}\n"
+        markdown += f"**Квартал:** {apartment.quarter}\n"
+        markdown += f"**Дом:** {apartment.house_number}\n"
+        if apartment.house_name:
+            markdown += f"**Название дома:** {apartment.house_name}\n"
+        markdown += f"**Этаж:** {apartment.floor}\n"
+        if apartment.floor_total > 0:
+            markdown += f"**Общая этажность:** {apartment.floor_total}\n"
+        if apartment.square > 0:
+            markdown += f"**Площадь:** {apartment.square} м²\n"
+        if apartment.price_metr > 0:
+            markdown += f"**Цена за м²:** {apartment.price_metr} евро\n"
+        if apartment.price_full > 0:
+            markdown += f"**Общая стоимость:** {apartment.price_full:,} евро\n"
+        if apartment.installment_price_metr > 0:
+            markdown += f"**Цена в рассрочку за м²:** {apartment.installment_price_metr} евро\n"
+        if apartment.installment_price_full > 0:
+            markdown += f"**Общая стоимость в рассрочку:** {apartment.installment_price_full:,} евро\n"
+        if apartment.status:
+            markdown += f"**Статус:** {apartment.status}\n"
+        if apartment.address:
+            markdown += f"**Адрес:** {apartment.address}\n"
+        if apartment.location:
+            markdown += f"**Местоположение:** {apartment.location}\n"
         markdown += "\n---\n\n"
         
         return markdown
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Инкрементальная сборка RAG-артефактов: генератор запускается, только если изменились его входы
+
+Генераторы (build_pricing_index.py, create_rag_index.py, update_price_navigation.py,
+update_search_index.py, generate_apartments_by_price_range.py)
+запускались по отдельности и каждый раз пересобирали всё. Здесь каждый описан целью
+(Target): входы — glob-шаблоны от корня проекта (данные и код генератора), выходы —
+генерируемые файлы, recipe — функция сборки.
+    - порядок — по графу: цель, выход которой попадает во входы другой, собирается
+      раньше; after= — явный порядок для файлов, которые правятся на месте
+    - отпечаток цели — sha256 путей и содержимого входов (плюс номера сборок целей из after);
+      файл с теми же размером и mtime не перечитывается (как в kb_index.py)
+    - цель пропускается, если отпечаток совпал с последней успешной сборкой и все
+      выходы на месте; состояние — .build_state.json
+    - генераторы по фиду читают последнюю версию из базы знаний монитора
+      (quarters/knowledge-base.json или .snap), а не скачивают фид заново
+
+Использование:
+    python3 build_graph.py                     # Устаревшие цели (после обновления данных)
+    python3 build_graph.py rag-index           # Цель и то, от чего она зависит
+    python3 build_graph.py --status            # Что устарело и почему (без сборки)
+    python3 build_graph.py --force             # Пересобрать всё
+    python3 build_graph.py --list              # Цели, входы, выходы
+    python3 mm.py build
+"""
+
+import argparse
+import contextlib
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import artifacts
+import metrics
+import serialization
+import update_search_index
+
+ROOT = Path(__file__).resolve().parent
+STATE_FILE = ROOT / ".build_state.json"
+STATE_VERSION = 1
+PIPELINE = 'build'
+
+# База знаний монитора: документ {'version', 'source', 'updated_at', 'data': фид}
+FEED_FILES = ('quarters/knowledge-base.snap', 'quarters/knowledge-base.json')
+
+
+def _is_pattern(pattern: str) -> bool:
+    return any(char in pattern for char in '*?[')
+
+
+def _matches(path: str, patterns: Iterable[str]) -> bool:
+    return any(PurePosixPath(path).match(pattern) for pattern in patterns)
+
+
+@contextlib.contextmanager
+def working_directory(path: Path):
+    """Генераторы пишут по относительным путям (quarters/, elevenlabs_rag/) — запуск из корня"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class Target:
+    """Цель сборки: входы (glob от корня), выходы и функция сборки"""
+
+    def __init__(self, name: str, recipe: Callable[[], Any], inputs: Iterable[str],
+                 outputs: Iterable[str], exclude: Iterable[str] = (), after: Iterable[str] = (),
+                 description: str = ''):
+        self.name = name
+        # False — собрать не из чего (нет данных), состояние не обновляется
+        self.recipe = recipe
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.exclude = tuple(exclude)
+        self.after = tuple(after)
+        self.description = description
+
+    def accepts(self, path: str) -> bool:
+        """Путь (от корня) попадает во входы цели"""
+        return _matches(path, self.inputs) and not _matches(path, self.exclude)
+
+    def input_files(self, root: Path) -> List[str]:
+        """Входные файлы; отсутствующий явный путь тоже входит (отпечаток «нет файла»)"""
+        files = set()
+        for pattern in self.inputs:
+            if _is_pattern(pattern):
+                files.update(path.relative_to(root).as_posix() for path in root.glob(pattern) if path.is_file())
+            else:
+                files.add(pattern)
+        return sorted(path for path in files if not _matches(path, self.exclude))
+
+
+class BuildGraph:
+    """Граф целей и состояние последних сборок"""
+
+    def __init__(self, targets: Iterable[Target], root: Path = ROOT, state_file: Optional[Path] = STATE_FILE):
+        self.targets: Dict[str, Target] = {target.name: target for target in targets}
+        self.root = Path(root)
+        self.state_file = state_file
+        # files: путь → {size, mtime_ns, sha256}
+        # targets: имя → {fingerprint, inputs, generation, built_at, seconds}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.built: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        if self.state_file is None or not Path(self.state_file).exists():
+            return
+        try:
+            state = serialization.load(self.state_file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Состояние сборки не прочитано ({e}) — все цели устарели")
+            return
+        if state.get('version') == STATE_VERSION:
+            self.files = state.get('files', {})
+            self.built = state.get('targets', {})
+
+    def save(self) -> bool:
+        if self.state_file is None:
+            return False
+        state = {'version': STATE_VERSION, 'files': self.files, 'targets': self.built}
+        return artifacts.write_json(self.state_file, state, indent=None)
+
+    def dependencies(self, target: Target) -> List[str]:
+        """Цели, которые должны собраться раньше: after= и те, чьи выходы — входы target"""
+        names = list(target.after)
+        for other in self.targets.values():
+            if other is target or other.name in names:
+                continue
+            if any(target.accepts(output) for output in other.outputs):
+                names.append(other.name)
+        return names
+
+    def order(self, names: Optional[Iterable[str]] = None) -> List[Target]:
+        """Цели в порядке сборки; names — только они и их зависимости"""
+        result: List[Target] = []
+        marks: Dict[str, str] = {}
+
+        def visit(name: str):
+            if name not in self.targets:
+                raise KeyError(f"Неизвестная цель: {name}")
+            if marks.get(name) == 'done':
+                return
+            if marks.get(name) == 'visiting':
+                raise ValueError(f"Цикл в графе сборки на цели {name}")
+            marks[name] = 'visiting'
+            for dependency in self.dependencies(self.targets[name]):
+                visit(dependency)
+            marks[name] = 'done'
+            result.append(self.targets[name])
+
+        for name in (names or self.targets):
+            visit(name)
+        return result
+
+    def file_digest(self, path: str) -> Optional[str]:
+        """sha256 файла (от корня) или None; по совпадению размера и mtime — из состояния"""
+        try:
+            stat = (self.root / path).stat()
+        except FileNotFoundError:
+            self.files.pop(path, None)
+            return None
+        meta = self.files.get(path)
+        if meta and meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return meta['sha256']
+        sha256 = artifacts.file_sha256(self.root / path)
+        self.files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        return sha256
+
+    def input_digests(self, target: Target) -> Dict[str, Optional[str]]:
+        return {path: self.file_digest(path) for path in target.input_files(self.root)}
+
+    def fingerprint(self, target: Target, inputs: Dict[str, Optional[str]]) -> str:
+        digest = hashlib.sha256()
+        for path, sha256 in inputs.items():
+            digest.update(f"{path}\0{sha256 or '-'}\n".encode('utf-8'))
+        # Номер сборки, а не отпечаток: пересборка с теми же входами (--force, нет выхода) тоже в счёт
+        for name in target.after:
+            generation = self.built.get(name, {}).get('generation')
+            digest.update(f"after:{name}\0{generation or '-'}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def stale_reason(self, target: Target, inputs: Dict[str, Optional[str]], fingerprint: str) -> Optional[str]:
+        """Почему цель надо пересобрать (None — актуальна)"""
+        record = self.built.get(target.name)
+        if record is None:
+            return 'ещё не собиралась'
+        missing = [path for path in target.outputs if not (self.root / path).exists()]
+        if missing:
+            return f"нет выхода: {', '.join(missing)}"
+        if record.get('fingerprint') == fingerprint:
+            return None
+        previous = record.get('inputs', {})
+        changed = [path for path, sha256 in inputs.items() if previous.get(path) != sha256]
+        removed = [path for path in previous if path not in inputs]
+        if changed or removed:
+            paths = changed + removed
+            more = f" и ещё {len(paths) - 3}" if len(paths) > 3 else ''
+            return f"изменились входы: {', '.join(paths[:3])}{more}"
+        return f"пересобрана цель {', '.join(target.after)}"
+
+    def build(self, names: Optional[Iterable[str]] = None, force: bool = False,
+              dry_run: bool = False) -> Dict[str, List[str]]:
+        """
+        Собрать устаревшие цели
+
+        Returns:
+            {'built': [...], 'fresh': [...], 'skipped': [...], 'failed': [...]}
+        """
+        summary: Dict[str, List[str]] = {'built': [], 'fresh': [], 'skipped': [], 'failed': []}
+        # dry_run: цели, которые были бы пересобраны (их выходы ещё старые)
+        pending: List[str] = []
+        try:
+            for target in self.order(names):
+                dependencies = self.dependencies(target)
+                failed = [name for name in dependencies if name in summary['failed']]
+                if failed:
+                    print(f"⏭️  {target.name}: не собрана зависимость {', '.join(failed)}")
+                    summary['failed'].append(target.name)
+                    continue
+
+                inputs = self.input_digests(target)
+                fingerprint = self.fingerprint(target, inputs)
+                upstream = [name for name in dependencies if name in pending]
+                if force:
+                    reason = 'принудительно'
+                elif upstream:
+                    reason = f"пересобирается {', '.join(upstream)}"
+                else:
+                    reason = self.stale_reason(target, inputs, fingerprint)
+                if reason is None:
+                    print(f"✅ {target.name}: актуальна")
+                    summary['fresh'].append(target.name)
+                    continue
+
+                print(f"🔨 {target.name}: {reason}")
+                if dry_run:
+                    pending.append(target.name)
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    with metrics.stage(PIPELINE, target.name), working_directory(self.root):
+                        result = target.recipe()
+                except (Exception, SystemExit) as e:
+                    print(f"❌ {target.name}: {e}")
+                    summary['failed'].append(target.name)
+                    continue
+                if result is False:
+                    print(f"⚠️ {target.name}: не собрана — нет входных данных")
+                    summary['skipped'].append(target.name)
+                    continue
+
+                # Входы после сборки: цель могла обновить файлы, которые сама же читает
+                inputs = self.input_digests(target)
+                generation = max((record.get('generation', 0) for record in self.built.values()), default=0) + 1
+                self.built[target.name] = {
+                    'fingerprint': self.fingerprint(target, inputs),
+                    'inputs': inputs,
+                    'generation': generation,
+                    'built_at': datetime.now().isoformat(timespec='seconds'),
+                    'seconds': round(time.perf_counter() - start, 3),
+                }
+                summary['built'].append(target.name)
+        finally:
+            if not dry_run:
+                self.save()
+        if dry_run:
+            summary['built'] = pending
+        return summary
+
+
+# ===== ЦЕЛИ =====
+
+def load_feed() -> Optional[Dict[str, Any]]:
+    """Фид последней версии (id → объект) из базы знаний монитора"""
+    candidates = [ROOT / name for name in FEED_FILES if (ROOT / name).exists()]
+    if not candidates:
+        return None
+    import snapshot
+    document = snapshot.load(max(candidates, key=lambda path: path.stat().st_mtime_ns))
+    data = document.get('data') if isinstance(document, dict) else None
+    return data if isinstance(data, dict) else None
+
+
+def run_price_ranges() -> bool:
+    feed = load_feed()
+    if feed is None:
+        return False
+    import generate_apartments_by_price_range
+    generate_apartments_by_price_range.generate(feed)
+    return True
+
+
+def run_search_index() -> bool:
+    update_search_index.main()
+    return True
+
+
+def run_pricing_index() -> bool:
+    from build_pricing_index import PricingIndexBuilder
+    builder = PricingIndexBuilder()
+    builder.build_index()
+    builder.save_index()
+    return True
+
+
+def run_rag_index() -> bool:
+    from create_rag_index import RAGIndexBuilder
+    RAGIndexBuilder().build_all()
+    return True
+
+
+def run_main(module, argv: List[str]) -> bool:
+    """main(argv) генератора; ненулевой код — ошибка сборки (в failed), а не отсутствие входов"""
+    code = module.main(argv)
+    if code:
+        raise RuntimeError(f"{module.__name__}.main завершился с кодом {code}")
+    return True
+
+
+def run_price_navigation() -> bool:
+    import update_price_navigation
+    if not (ROOT / 'pricing_index.json').exists():
+        return False
+    # Список изменившихся документов — для загрузки только их (elevenlabs_auto_sync.py --changed-files)
+    return run_main(update_price_navigation, ['--changed-files', str(update_price_navigation.CHANGED_FILES)])
+
+
+def run_kb_shards() -> bool:
+    import kb_shards
+    if not kb_shards.read_sources():
+        return False
+    return run_main(kb_shards, [])
+
+
+RAG_OUTPUTS = ('elevenlabs_rag/00-rag-navigation-index.md', 'elevenlabs_rag/01-budget-apartments.md',
+               'elevenlabs_rag/02-validation-rules.md', 'elevenlabs_rag/03-empathy-enhancer.md',
+               'elevenlabs_rag/elevenlabs_master_config.json')
+
+TARGETS = (
+    # create_emirats_file.py (quarters/02-emirats.md) в сборку не входит: квартал 02 уже пишет
+    # монитор в quarters/02-Emirats.md, вторая копия попала бы в индексы, шарды и KB агента
+    Target('price-ranges', run_price_ranges,
+           inputs=FEED_FILES + ('generate_apartments_by_price_range.py', 'parsing.py'),
+           outputs=('apartments_by_price_ranges.json',),
+           description='Подборка квартир по диапазонам цены (generate_apartments_by_price_range.py)'),
+    Target('search-index', run_search_index,
+           inputs=('quarters/*.md', 'update_search_index.py'),
+           exclude=tuple(f"quarters/{name}" for name in update_search_index.SKIP_FILES),
+           outputs=('quarters/search_index.md',),
+           description='Поисковый индекс квартир (update_search_index.py)'),
+    Target('pricing-index', run_pricing_index,
+           inputs=('quarters/*.md', 'build_pricing_index.py', 'parsing.py'),
+           # build_index пропускает служебные файлы 0*
+           exclude=('quarters/0*',),
+           outputs=('pricing_index.json',),
+           description='Индекс цен (build_pricing_index.py)'),
+    Target('rag-index', run_rag_index,
+           inputs=('pricing_index.json', 'create_rag_index.py'),
+           outputs=RAG_OUTPUTS,
+           description='Файлы RAG (create_rag_index.py)'),
+    # 01-budget-apartments.md пишет rag-index, авто-блоки в нём — price-nav
+    Target('price-nav', run_price_navigation,
+           inputs=('pricing_index.json', 'update_price_navigation.py'),
+           outputs=('elevenlabs_rag/00-price-navigation.md', 'elevenlabs_rag/01-budget-apartments.md',
+                    'elevenlabs_rag/10-budget-apartments.md'),
+           after=('rag-index',),
+           description='Авто-блоки навигации по ценам (update_price_navigation.py)'),
+    Target('kb-shards', run_kb_shards,
+           # Бюджет документов — лимит агента минус постоянные документы и RAG-файлы
+           inputs=('quarters/*.md', 'kb_shards.py', 'elevenlabs_rag/*.md', 'elevenlabs_agent_kb.py',
+                   'elevenlabs_sync_v2.py'),
+           exclude=('quarters/search_index.md',),
+           outputs=('quarters/shards/.shards.json',),
+           description='Шарды кварталов для KB (kb_shards.py)'),
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Пересборка устаревших RAG-артефактов')
+    parser.add_argument('targets', nargs='*', help='Цели (по умолчанию — все)')
+    parser.add_argument('--force', action='store_true', help='Пересобрать независимо от отпечатков')
+    parser.add_argument('--status', action='store_true', help='Показать устаревшие цели, не собирая')
+    parser.add_argument('--list', action='store_true', help='Цели, их входы и выходы')
+    args = parser.parse_args(argv)
+
+    graph = BuildGraph(TARGETS)
+    if args.list:
+        for target in graph.order():
+            dependencies = graph.dependencies(target)
+            print(f"{target.name:14} {target.description}")
+            print(f"{'':14} входы: {', '.join(target.inputs)}")
+            if target.exclude:
+                print(f"{'':14} кроме: {', '.join(target.exclude)}")
+            print(f"{'':14} выходы: {', '.join(target.outputs)}")
+            if dependencies:
+                print(f"{'':14} после: {', '.join(dependencies)}")
+        return 0
+
+    try:
+        graph.order(args.targets)
+    except (KeyError, ValueError) as e:
+        print(f"❌ {e.args[0]}")
+        return 2
+
+    start = time.perf_counter()
+    summary = graph.build(args.targets, force=args.force, dry_run=args.status)
+    elapsed = time.perf_counter() - start
+    if args.status:
+        print(f"\n📋 Устарело: {len(summary['built'])}, актуально: {len(summary['fresh'])}")
+        return 0
+
+    print(f"\n📦 Собрано: {len(summary['built'])}, актуально: {len(summary['fresh'])}"
+          f"{', без данных: ' + str(len(summary['skipped'])) if summary['skipped'] else ''}"
+          f"{', ошибок: ' + str(len(summary['failed'])) if summary['failed'] else ''} ({elapsed:.2f} с)")
+    metrics.finish_run(PIPELINE, success=not summary['failed'])
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,12 +3,14 @@
 Построение индекса цен для быстрого поиска квартир по бюджету
 """
 
-import json
 import re
 import os
 from pathlib import Path
 from typing import Dict, List, Any
 
+import artifacts
+import parsing
+
 class PricingIndexBuilder:
     def __init__(self):
         self.quarters_dir = Path("quarters")
@@ -37,17 +39,8 @@ class PricingIndexBuilder:
         }
         
     def extract_price_from_line(self, line: str) -> float:
-        """Извлекает цену из строки"""
-        # Паттерн для поиска цен в формате XXX,XXX евро или XXX евро
-        price_pattern = r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s*евро'
-        match = re.search(price_pattern, line)
-        if match:
-            price_str = match.group(1).replace(',', '')
-            try:
-                return float(price_str)
-            except:
-                pass
-        return None
+        """Извлекает цену из строки (XXX,XXX евро или XXX евро)"""
+        return parsing.price_eur(line)
     
     def parse_apartment_info(self, content: str, quarter_name: str) -> List[Dict]:
         """Парсит информацию о квартирах из файла квартала.
@@ -236,9 +229,10 @@ class PricingIndexBuilder:
     
     def save_index(self, output_file: str = "pricing_index.json"):
         """Сохраняет индекс в JSON файл"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.pricing_index, f, ensure_ascii=False, indent=2)
-        print(f"Индекс сохранен в {output_file}")
+        if artifacts.write_json(output_file, self.pricing_index):
+            print(f"Индекс сохранен в {output_file}")
+        else:
+            print(f"Индекс не изменился: {output_file}")
     
     def print_summary(self):
         """Выводит сводку по индексу"""
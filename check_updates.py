@@ -4,12 +4,14 @@
 Скрипт для проверки обновлений в данных недвижимости bir.by
 """
 
-import json
 import requests
 import os
 from datetime import datetime
 from typing import Dict, List, Set, Tuple
 
+import artifacts
+import serialization
+
 class DataUpdateChecker:
     def __init__(self, json_url: str = "https://bir.by/ai/json_ai.php"):
         self.json_url = json_url
@@ -28,7 +30,7 @@ class DataUpdateChecker:
             print("📥 Загрузка текущих данных с bir.by...")
             response = requests.get(self.json_url, timeout=30)
             response.raise_for_status()
-            self.current_data = response.json()
+            self.current_data = serialization.loads(response.content)
             print(f"✅ Загружено {len(self.current_data)} объектов")
             return True
         except Exception as e:
@@ -53,8 +55,7 @@ class DataUpdateChecker:
         snapshot_path = os.path.join(self.snapshot_dir, latest_snapshot)
         
         try:
-            with open(snapshot_path, 'r', encoding='utf-8') as f:
-                self.previous_data = json.load(f)
+            self.previous_data = serialization.load(snapshot_path)
             print(f"📂 Загружен предыдущий снимок: {latest_snapshot}")
             print(f"   Объектов в снимке: {len(self.previous_data)}")
             return True
@@ -75,8 +76,8 @@ class DataUpdateChecker:
         filepath = os.path.join(self.snapshot_dir, filename)
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.current_data, f, ensure_ascii=False, indent=2)
+            # Снимок читает только код — компактно
+            artifacts.write_json(filepath, self.current_data, indent=None)
             print(f"💾 Снимок сохранен: {filename}")
         except Exception as e:
             print(f"❌ Ошибка при сохранении снимка: {e}")
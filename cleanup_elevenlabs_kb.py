@@ -15,17 +15,20 @@ import sys
 import json
 import time
 import argparse
-import requests
 from datetime import datetime
 from collections import defaultdict
 from dotenv import load_dotenv
 
+from elevenlabs_agent_kb import AgentKnowledgeBaseManager
+from elevenlabs_bulk_delete import BulkDeleter
+from elevenlabs_kb_listing import KnowledgeBaseLister
+
 load_dotenv()
 
 # Конфигурация
 API_KEY = os.environ.get('ELEVENLABS_API_KEY')
 AGENT_ID = os.environ.get('ELEVENLABS_AGENT_ID')
-BASE_URL = "https://api.elevenlabs.io/v1"
+BASE_URL = os.environ.get("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
 
 def log(msg):
     """Вывод с временной меткой"""
@@ -34,49 +37,15 @@ def log(msg):
     sys.stdout.flush()
 
 def get_all_kb_documents():
-    """Получить все документы из Knowledge Base"""
-    all_docs = []
-    page = 0
-    max_pages = 200  # До 20,000 документов
-    
+    """Получить все документы из Knowledge Base (страницы запрашиваются заранее, без пауз)"""
     log("📥 Получение списка документов из KB...")
     
-    while page < max_pages:
-        url = f"{BASE_URL}/convai/knowledge-base?page_size=100&page={page}"
-        
-        try:
-            response = requests.get(
-                url, 
-                headers={"xi-api-key": API_KEY}, 
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                log(f"❌ HTTP {response.status_code} на странице {page}")
-                break
-            
-            data = response.json()
-            docs = data.get('documents', data.get('knowledge_bases', []))
-            
-            if not docs:
-                log(f"✅ Все документы получены (страница {page})")
-                break
-            
-            all_docs.extend(docs)
-            
-            if page % 10 == 0:
-                log(f"   📄 Страница {page}: всего {len(all_docs)} документов")
-            
-            has_more = data.get('has_more', False)
-            if not has_more:
-                break
-            
-            page += 1
-            time.sleep(0.3)  # Rate limiting
-            
-        except Exception as e:
-            log(f"❌ Ошибка на странице {page}: {e}")
-            break
+    lister = KnowledgeBaseLister(API_KEY, base_url=BASE_URL, max_pages=200, log_func=log)  # До 20,000 документов
+    try:
+        all_docs = lister.list_all()
+    except Exception as e:
+        log(f"❌ Ошибка получения списка: {e}")
+        return []
     
     log(f"📊 Всего документов в KB: {len(all_docs)}")
     return all_docs
@@ -127,80 +96,17 @@ def analyze_documents(all_docs):
     
     return to_keep, to_delete, grouped
 
-def delete_document(doc_id):
-    """Удалить один документ"""
-    url = f"{BASE_URL}/convai/knowledge-base/{doc_id}"
-    
-    try:
-        response = requests.delete(
-            url,
-            headers={"xi-api-key": API_KEY},
-            timeout=30
-        )
-        if response.status_code == 400:
-            # Документ привязан к агенту
-            return False, "dependent"
-        return response.status_code in [200, 204], "ok"
-    except Exception as e:
-        log(f"❌ Ошибка удаления {doc_id}: {e}")
-        return False, "error"
-
 def update_agent_kb(keep_ids: list) -> bool:
-    """Обновить агента - установить только указанные ID документов"""
+    """Обновить агента - установить только указанные ID документов (один PATCH)"""
     if not AGENT_ID:
         log("❌ ELEVENLABS_AGENT_ID не установлен!")
         return False
     
-    agent_url = f"{BASE_URL}/convai/agents/{AGENT_ID}"
-    
     log(f"🤖 Обновление агента {AGENT_ID}...")
     log(f"   Устанавливаем {len(keep_ids)} документов")
     
-    # Получаем текущую конфигурацию
-    try:
-        resp = requests.get(agent_url, headers={"xi-api-key": API_KEY}, timeout=60)
-        if resp.status_code != 200:
-            log(f"❌ Не удалось получить агента: {resp.status_code}")
-            return False
-        
-        agent_data = resp.json()
-        current_kb = agent_data.get('conversation_config', {}).get('knowledge_base', {})
-        current_ids = current_kb.get('ids', [])
-        log(f"   Текущих документов в агенте: {len(current_ids)}")
-        
-    except Exception as e:
-        log(f"❌ Ошибка получения агента: {e}")
-        return False
-    
-    # Обновляем агента
-    update_data = {
-        'conversation_config': {
-            'knowledge_base': {
-                'type': 'knowledge_base',
-                'ids': keep_ids[:50]  # Лимит 50
-            }
-        }
-    }
-    
-    try:
-        resp = requests.patch(
-            agent_url,
-            headers={"xi-api-key": API_KEY, "Content-Type": "application/json"},
-            json=update_data,
-            timeout=120
-        )
-        
-        if resp.status_code == 200:
-            log(f"✅ Агент обновлен! Теперь {len(keep_ids[:50])} документов")
-            return True
-        else:
-            log(f"❌ Ошибка обновления агента: {resp.status_code}")
-            log(f"   Ответ: {resp.text[:300]}")
-            return False
-            
-    except Exception as e:
-        log(f"❌ Ошибка обновления агента: {e}")
-        return False
+    manager = AgentKnowledgeBaseManager(api_key=API_KEY, agent_id=AGENT_ID, base_url=BASE_URL, log_func=log)
+    return manager.apply(target=keep_ids, refresh=True)
 
 def main():
     parser = argparse.ArgumentParser(description='Очистка ElevenLabs KB от дубликатов')
@@ -208,6 +114,9 @@ def main():
     parser.add_argument('--execute', action='store_true', help='Выполнить удаление')
     parser.add_argument('--yes', '-y', action='store_true', help='Автоматическое подтверждение (без input)')
     parser.add_argument('--batch-size', type=int, default=50, help='Размер батча для удаления')
+    parser.add_argument('--workers', type=int, default=4, help='Потоков удаления (по умолчанию: 4)')
+    parser.add_argument('--rate', type=float, default=5.0, help='DELETE-запросов в секунду (по умолчанию: 5)')
+    parser.add_argument('--no-force', action='store_true', help='Не удалять привязанные документы принудительно')
     args = parser.parse_args()
     
     if not args.dry_run and not args.execute:
@@ -312,44 +221,23 @@ def main():
         log(f"🗑️  ШАГ 2: Удаление {len(to_delete)} документов")
         log("=" * 60)
         
-        deleted = 0
-        failed = 0
-        dependent = 0
-        
-        start_time = time.time()
-        
-        for i, doc in enumerate(to_delete, 1):
-            success, status = delete_document(doc['id'])
-            
-            if success:
-                deleted += 1
-            elif status == "dependent":
-                dependent += 1
-            else:
-                failed += 1
-            
-            # Прогресс каждые 100 документов
-            if i % 100 == 0:
-                elapsed = time.time() - start_time
-                rate = i / elapsed if elapsed > 0 else 0
-                remaining = (len(to_delete) - i) / rate if rate > 0 else 0
-                log(f"   Прогресс: {i}/{len(to_delete)} ({deleted} ✅, {dependent} 🔗, {failed} ❌) | {rate:.1f} док/сек | ~{remaining/60:.0f} мин")
-                time.sleep(0.5)
-            else:
-                time.sleep(0.1)
+        manager = AgentKnowledgeBaseManager(api_key=API_KEY, agent_id=AGENT_ID, base_url=BASE_URL, log_func=log)
+        deleter = BulkDeleter(
+            API_KEY, base_url=BASE_URL, workers=args.workers, rate=args.rate,
+            force=not args.no_force, agent_kb=manager, log_func=log
+        )
+        report = deleter.run(to_delete)
         
         log("")
         log("=" * 60)
         log("✅ ГОТОВО!")
-        log(f"   Удалено: {deleted}")
-        log(f"   Всё ещё привязаны: {dependent}")
-        log(f"   Ошибок: {failed}")
+        deleter.print_report(report)
         log(f"   Осталось документов: ~{len(to_keep)}")
         
-        if dependent > 0:
+        if report['dependent'] > 0 or report['failed'] > 0:
             log("")
-            log(f"⚠️  {dependent} документов всё ещё привязаны к агенту")
-            log("   Запустите скрипт ещё раз для повторной попытки")
+            log(f"⚠️  Не удалено: {report['dependent'] + report['failed']} документов")
+            log("   Запустите скрипт ещё раз — уже удалённые будут пропущены по журналу")
 
 if __name__ == "__main__":
     main()
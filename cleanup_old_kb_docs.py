@@ -5,64 +5,51 @@
 Использование:
     python3 cleanup_old_kb_docs.py --dry-run    # Показать что будет удалено
     python3 cleanup_old_kb_docs.py --confirm    # Выполнить удаление
+    python3 cleanup_old_kb_docs.py --confirm --force  # Удалять и привязанные к агенту (?force=true)
+
+Документы, которые ещё привязаны к агенту, без --force не удаляются (API отвечает 400)
 """
 
 import os
 import json
-import requests
 import re
 from datetime import datetime
 from typing import List, Dict
 from dotenv import load_dotenv
 from collections import defaultdict
 
+from elevenlabs_bulk_delete import BulkDeleter
+from elevenlabs_kb_listing import KnowledgeBaseLister
+
 load_dotenv()
 
 
 class KnowledgeBaseCleanup:
     """Утилита для чистки старых версий документов"""
 
-    def __init__(self):
+    def __init__(self, workers: int = 4, rate: float = 5.0, force: bool = False):
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
+        self.workers = workers
+        self.rate = rate
+        # analyze_versions не смотрит на агента: force=true удалил бы документы, на которые он ссылается
+        self.force = force
 
         if not self.api_key:
             raise ValueError("❌ ELEVENLABS_API_KEY не найден в .env файле")
 
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = os.getenv('ELEVENLABS_BASE_URL', "https://api.elevenlabs.io/v1")
         self.headers = {"xi-api-key": self.api_key}
 
     def get_all_documents(self) -> List[Dict]:
         """Получить все документы из Knowledge Base"""
-        all_docs = []
-        page = 0
-
         print("📚 Получение списка документов...")
 
-        while True:
-            url = f"{self.base_url}/convai/knowledge-base?page_size=100&page={page}"
-
-            try:
-                response = requests.get(url, headers=self.headers, timeout=30)
-
-                if response.status_code != 200:
-                    break
-
-                data = response.json()
-                docs = data.get('documents', data.get('knowledge_bases', []))
-
-                if not docs:
-                    break
-
-                all_docs.extend(docs)
-
-                if not data.get('has_more', False):
-                    break
-
-                page += 1
-
-            except Exception as e:
-                print(f"❌ Ошибка: {e}")
-                break
+        lister = KnowledgeBaseLister(self.api_key, base_url=self.base_url, log_func=lambda msg: None)
+        try:
+            all_docs = lister.list_all()
+        except Exception as e:
+            print(f"❌ Ошибка: {e}")
+            all_docs = []
 
         print(f"   Найдено документов: {len(all_docs)}\n")
         return all_docs
@@ -182,37 +169,15 @@ class KnowledgeBaseCleanup:
         print("=" * 70)
 
     def delete_documents(self, to_delete: List[Dict]) -> int:
-        """Удалить документы"""
-        deleted_count = 0
-
+        """Удалить документы (параллельно, с журналом для продолжения после прерывания)"""
         print(f"\n🗑️  Удаление {len(to_delete)} документов...")
 
-        for i, doc in enumerate(to_delete, 1):
-            doc_id = doc.get('id')
-            name = doc.get('name', 'Unknown')
-
-            print(f"  {i}/{len(to_delete)} - {name[:50]:50}", end=" ")
-
-            url = f"{self.base_url}/convai/knowledge-base/{doc_id}"
-
-            try:
-                response = requests.delete(url, headers=self.headers, timeout=30)
-
-                if response.status_code in [200, 204]:
-                    deleted_count += 1
-                    print("✅")
-                else:
-                    print(f"❌ (код {response.status_code})")
-
-            except Exception as e:
-                print(f"❌ ({str(e)[:30]})")
-
-            # Пауза между удалениями
-            if i < len(to_delete):
-                import time
-                time.sleep(0.5)
+        deleter = BulkDeleter(self.api_key, base_url=self.base_url, workers=self.workers, rate=self.rate,
+                              force=self.force)
+        report = deleter.run(to_delete)
+        deleter.print_report(report)
 
-        return deleted_count
+        return report['deleted'] + report['not_found']
 
     def run(self, dry_run: bool = True):
         """
@@ -284,11 +249,15 @@ def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--dry-run', action='store_true', help='Только анализ, без удаления')
     group.add_argument('--confirm', action='store_true', help='Выполнить удаление с подтверждением')
+    parser.add_argument('--workers', type=int, default=4, help='Потоков удаления (по умолчанию: 4)')
+    parser.add_argument('--rate', type=float, default=5.0, help='DELETE-запросов в секунду (по умолчанию: 5)')
+    parser.add_argument('--force', action='store_true',
+                        help='Удалять и документы, привязанные к агенту (DELETE ?force=true)')
 
     args = parser.parse_args()
 
     try:
-        cleanup = KnowledgeBaseCleanup()
+        cleanup = KnowledgeBaseCleanup(workers=args.workers, rate=args.rate, force=args.force)
         cleanup.run(dry_run=args.dry_run)
         return 0
     except Exception as e:
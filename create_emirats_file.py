@@ -12,6 +12,8 @@ from collections import defaultdict
 from typing import Dict, List
 
 from bir_data_parser import BirDataParser
+import md_templates
+from records import ParsedApartment
 
 
 def extract_emirats_label(location_text: str) -> str:
@@ -26,9 +28,9 @@ def extract_emirats_label(location_text: str) -> str:
     return "Эмиратс"
 
 
-def build_emirats_houses(parser: BirDataParser) -> Dict[str, List[dict]]:
+def build_emirats_houses(parser: BirDataParser) -> Dict[str, List[ParsedApartment]]:
     """Формирует словарь домов Эмиратс -> список квартир (структурированных)."""
-    emirats_houses: Dict[str, List[dict]] = defaultdict(list)
+    emirats_houses: Dict[str, List[ParsedApartment]] = defaultdict(list)
 
     # Берём только квартал 9 Южная Америка и фильтруем квартиры по 'Эмиратс Волна'
     quarter_name = "9 Южная Америка"
@@ -37,22 +39,19 @@ def build_emirats_houses(parser: BirDataParser) -> Dict[str, List[dict]]:
 
     for house_number, apartments in parser.quarters[quarter_name].items():
         for apt in apartments:
-            location = apt.get("location", "") or ""
-            house_name = apt.get("house_name", "") or ""
-            address = apt.get("address", "") or ""
+            location = apt.location or ""
+            house_name = apt.house_name or ""
+            address = apt.address or ""
 
             if ("Эмиратс Волна" in location) or ("Эмиратс Волна" in house_name) or ("Эмиратс Волна" in address):
-                # Клонируем запись и выставляем удобное имя дома как ключ
-                apt_copy = dict(apt)
                 label = extract_emirats_label(location) or "Эмиратс"
-                # Для красоты заголовков дома используем полный ярлык, а не цифру
-                apt_copy["house_number"] = label
-                emirats_houses[label].append(apt_copy)
+                # Копия записи: для красоты заголовков дома используем полный ярлык, а не цифру
+                emirats_houses[label].append(apt.replace(house_number=label))
 
     return emirats_houses
 
 
-def generate_emirats_markdown(parser: BirDataParser, emirats_houses: Dict[str, List[dict]]) -> str:
+def generate_emirats_markdown(parser: BirDataParser, emirats_houses: Dict[str, List[ParsedApartment]]) -> str:
     """Генерирует markdown контент для квартала '02 Эмиратс'."""
     quarter_display = "02 Эмиратс"
 
@@ -61,20 +60,19 @@ def generate_emirats_markdown(parser: BirDataParser, emirats_houses: Dict[str, L
     unique_types = set()
     for apts in emirats_houses.values():
         for apt in apts:
-            if apt.get("type"):
-                unique_types.add(apt["type"])
-
-    md = []
-    md.append(f"# 🏘️ Квартал — {quarter_display}\n")
-    md.append("## 📍 Общая информация\n")
-    md.append(f"**Квартал:** {quarter_display}\n")
-    md.append("**Город:** Минск\n")
-    md.append("**Район:** Мир\n")
-    md.append(f"**Количество домов:** {len(emirats_houses)}\n")
-    md.append(f"**Количество объектов:** {total_objects}\n")
+            if apt.type:
+                unique_types.add(apt.type)
+
+    md = [
+        md_templates.QUARTER_TITLE.render(quarter=quarter_display),
+        md_templates.GENERAL_INFO.render(),
+        md_templates.GENERAL_INFO_LINES.render(quarter=quarter_display),
+        md_templates.HOUSES_COUNT.render(count=len(emirats_houses)),
+        md_templates.OBJECTS_COUNT.render(count=total_objects),
+    ]
     if unique_types:
-        md.append(f"**Типы недвижимости:** {', '.join(sorted(unique_types))}\n")
-    md.append("\n---\n\n")
+        md.append(md_templates.TYPES_LINE.render(types=", ".join(sorted(unique_types))))
+    md.append(md_templates.SECTION_BREAK)
 
     # Блоки по домам
     # Стабильный порядок: сначала 7с, потом 8с, затем прочее (если появится)
@@ -85,30 +83,18 @@ def generate_emirats_markdown(parser: BirDataParser, emirats_houses: Dict[str, L
 
     for house_label in sorted(emirats_houses.keys(), key=emirats_sort_key):
         apts = emirats_houses[house_label]
-        md.append(f"## 🏠 Дом {house_label}\n\n")
+        md.append(md_templates.HOUSE_TITLE.render(house=house_label))
 
         # Лёгкая статистика по дому
-        prices = [apt["price_metr"] for apt in apts if apt.get("price_metr", 0) > 0]
-        squares = [apt["square"] for apt in apts if apt.get("square", 0) > 0]
-        costs = [apt["price_full"] for apt in apts if apt.get("price_full", 0) > 0]
-
-        md.append("### 📊 Статистика дома\n")
-        md.append(f"**Количество апартаментов:** {len(apts)}\n")
-        if squares:
-            md.append(f"**Диапазон площадей:** {min(squares):.1f} - {max(squares):.1f} м²\n")
-        if prices:
-            md.append(f"**Средняя цена за м²:** {sum(prices)/len(prices):.0f} евро\n")
-        if costs:
-            md.append(f"**Средняя стоимость:** {sum(costs)/len(costs):.0f} евро\n")
-        md.append("\n---\n\n")
+        md.append(md_templates.render_parsed_house_stats(apts))
 
         # Группируем по этажам
-        floors: Dict[int, List[dict]] = defaultdict(list)
+        floors: Dict[int, List[ParsedApartment]] = defaultdict(list)
         for apt in apts:
-            floors[apt.get("floor", 0)].append(apt)
+            floors[apt.floor].append(apt)
 
         for floor_num in sorted(floors.keys()):
-            md.append(f"## 🏢 Этаж {floor_num}\n\n")
+            md.append(md_templates.FLOOR_TITLE.render(floor=floor_num))
             for apt in floors[floor_num]:
                 md.append(parser.generate_apartment_markdown(apt))
             md.append("\n")
@@ -117,12 +103,12 @@ def generate_emirats_markdown(parser: BirDataParser, emirats_houses: Dict[str, L
     all_prices, all_squares, all_costs = [], [], []
     for apts in emirats_houses.values():
         for apt in apts:
-            if apt.get("price_metr", 0) > 0:
-                all_prices.append(apt["price_metr"])
-            if apt.get("square", 0) > 0:
-                all_squares.append(apt["square"])
-            if apt.get("price_full", 0) > 0:
-                all_costs.append(apt["price_full"])
+            if apt.price_metr > 0:
+                all_prices.append(apt.price_metr)
+            if apt.square > 0:
+                all_squares.append(apt.square)
+            if apt.price_full > 0:
+                all_costs.append(apt.price_full)
 
     if all_prices or all_squares or all_costs:
         md.append(parser.generate_quarter_analytics(all_prices, all_squares, all_costs))
@@ -9,6 +9,8 @@ import requests
 import re
 from collections import defaultdict
 
+import parsing
+
 def decode_unicode(text):
     """Декодирует Unicode последовательности"""
     if not text:
@@ -26,11 +28,7 @@ def extract_square(square_text):
     """Извлекает площадь из текста"""
     if not square_text:
         return 0.0
-    decoded = decode_unicode(str(square_text))
-    match = re.search(r'(\d+(?:\.\d+)?)', decoded)
-    if match:
-        return float(match.group(1))
-    return 0.0
+    return parsing.first_decimal(decode_unicode(str(square_text)))
 
 def main():
     print("📥 Загрузка данных для поиска пропущенных объектов...")
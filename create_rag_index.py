@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Dict, List, Any
 import os
 
+import serialization
+
 class RAGIndexBuilder:
     def __init__(self):
         self.quarters_dir = Path("quarters")
@@ -116,8 +118,7 @@ class RAGIndexBuilder:
             print("⚠️ pricing_index.json не найден. Создайте его с помощью build_pricing_index.py")
             return
             
-        with open(pricing_index_path, 'r', encoding='utf-8') as f:
-            pricing_data = json.load(f)
+        pricing_data = serialization.load(pricing_index_path)
         
         # Создаем файл для бюджетной категории
         budget_content = """# 💙 БЮДЖЕТНЫЕ КВАРТИРЫ (до 90,000€)
@@ -18,7 +18,7 @@ echo "[$(date '+%Y-%m-%d %H:%M:%S')] Запуск обновления чере
 source "$PROJECT_DIR/venv/bin/activate"
 
 # Обновление данных с bir.by + автоматическая загрузка в ElevenLabs
-python3 sync-with-monitoring.py --check --upload-to-elevenlabs >> "$LOG_FILE" 2>&1
+python3 mm.py monitor --check --upload-to-elevenlabs >> "$LOG_FILE" 2>&1
 
 # Проверяем статус выполнения
 if [ $? -eq 0 ]; then
@@ -27,4 +27,7 @@ else
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] ❌ Ошибка при обновлении" >> "$LOG_FILE"
 fi
 
+# Пересборка устаревших RAG-артефактов (индекс цен, навигация, подборки)
+python3 mm.py build >> "$LOG_FILE" 2>&1
+
 echo "" >> "$LOG_FILE"
\ No newline at end of file
@@ -9,6 +9,9 @@ import os
 from typing import Dict, List, Any, Tuple
 import difflib
 
+import artifacts
+import serialization
+
 class DataDiffAnalyzer:
     def __init__(self):
         self.url = "https://bir.by/ai/json_ai.php"
@@ -36,7 +39,7 @@ class DataDiffAnalyzer:
             response = requests.get(self.url, timeout=30)
             response.raise_for_status()
             
-            self.current_data = response.json()
+            self.current_data = serialization.loads(response.content)
             print(f"✅ Загружено {len(self.current_data)} объектов")
             return True
             
@@ -49,8 +52,7 @@ class DataDiffAnalyzer:
         try:
             cache_file = os.path.join(self.cache_dir, "previous_data.json")
             if os.path.exists(cache_file):
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    self.previous_data = json.load(f)
+                self.previous_data = serialization.load(cache_file)
                 print(f"✅ Загружены предыдущие данные: {len(self.previous_data)} объектов")
                 return True
             else:
@@ -66,8 +68,8 @@ class DataDiffAnalyzer:
             os.makedirs(self.cache_dir, exist_ok=True)
             cache_file = os.path.join(self.cache_dir, "previous_data.json")
             
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.current_data, f, ensure_ascii=False, indent=2)
+            # Кеш читает только код — компактно
+            artifacts.write_json(cache_file, self.current_data, indent=None)
             
             print(f"💾 Текущие данные сохранены для следующего сравнения")
             
@@ -7,25 +7,29 @@
 import os
 import json
 import hashlib
-import requests
 from datetime import datetime, timedelta
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, Optional, Tuple
 import logging
-from bir_data_parser import BirDataParser
+import artifacts
+import metrics
+import serialization
+from log_service import LOG_FILE, make_rotating_handler
 
-# Настройка логирования
+# Настройка логирования (data_updater.log ротируется, старые сегменты сжимаются в .gz)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('data_updater.log'),
+        make_rotating_handler(LOG_FILE),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+PIPELINE = 'data_updater'
+
 
 class DataUpdater:
     """Система автоматического обновления данных"""
@@ -33,7 +37,7 @@ class DataUpdater:
     def __init__(self, config_file: str = "update_config.json"):
         self.config_file = config_file
         self.config = self._load_config()
-        self.parser = BirDataParser()
+        self._parser = None
         self.data_url = "https://bir.by/ai/json_ai.php"
         self.cache_dir = Path("cache")
         self.cache_dir.mkdir(exist_ok=True)
@@ -43,6 +47,14 @@ class DataUpdater:
         self.last_update_file = self.cache_dir / "last_update.json"
         self.stats_file = self.cache_dir / "update_stats.json"
     
+    @property
+    def parser(self):
+        """BirDataParser создаётся при первом обновлении (web_monitor и --status его не грузят)"""
+        if self._parser is None:
+            from bir_data_parser import BirDataParser
+            self._parser = BirDataParser()
+        return self._parser
+
     def _load_config(self) -> Dict[str, Any]:
         """Загружает конфигурацию обновлений"""
         default_config = {
@@ -77,15 +89,13 @@ class DataUpdater:
                 return default_config
         else:
             # Создаем файл конфигурации по умолчанию
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=2, ensure_ascii=False)
+            artifacts.write_json(self.config_file, default_config)
             logger.info(f"Создан файл конфигурации: {self.config_file}")
             return default_config
     
     def _save_config(self):
         """Сохраняет конфигурацию"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        artifacts.write_json(self.config_file, self.config)
     
     def _get_data_hash(self, data: Dict[str, Any]) -> str:
         """Вычисляет хеш данных для детекции изменений"""
@@ -105,7 +115,7 @@ class DataUpdater:
     def _save_hash(self, hash_value: str):
         """Сохраняет хеш данных"""
         try:
-            self.last_hash_file.write_text(hash_value)
+            artifacts.write_text(self.last_hash_file, hash_value)
         except Exception as e:
             logger.error(f"Ошибка сохранения хеша: {e}")
     
@@ -122,26 +132,28 @@ class DataUpdater:
     def _save_update_info(self, info: Dict[str, Any]):
         """Сохраняет информацию об обновлении"""
         try:
-            with open(self.last_update_file, 'w', encoding='utf-8') as f:
-                json.dump(info, f, indent=2, ensure_ascii=False)
+            artifacts.write_json(self.last_update_file, info)
         except Exception as e:
             logger.error(f"Ошибка сохранения информации об обновлении: {e}")
     
     def _save_stats(self, stats: Dict[str, Any]):
         """Сохраняет статистику обновлений"""
         try:
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(stats, f, indent=2, ensure_ascii=False)
+            artifacts.write_json(self.stats_file, stats)
         except Exception as e:
             logger.error(f"Ошибка сохранения статистики: {e}")
     
     def fetch_data(self) -> Optional[Dict[str, Any]]:
         """Загружает данные с сервера"""
+        import requests
+        metrics.instrument_requests()
+
         try:
             logger.info("Загрузка данных с сервера...")
             response = requests.get(self.data_url, timeout=30)
             response.raise_for_status()
-            data = response.json()
+            data = serialization.loads(response.content)
+            metrics.record_feed(response.content, len(data))
             logger.info(f"Успешно загружено {len(data)} объектов")
             return data
         except Exception as e:
@@ -185,13 +197,27 @@ class DataUpdater:
         
         return datetime.now() - last_update_time > force_update_interval
     
-    def update_data(self, force: bool = False) -> bool:
-        """Обновляет данные"""
+    def update_data(self, force: bool = False,
+                    progress: Optional[Callable[[str, str, Optional[int]], None]] = None) -> bool:
+        """
+        Обновляет данные
+
+        Args:
+            force: Принудительное обновление (отмечается в last_update.json)
+            progress: progress(stage, message, percent) — ход выполнения для веб-интерфейса
+        """
+        def report(stage: str, message: str, percent: Optional[int] = None):
+            if progress:
+                progress(stage, message, percent)
+
         try:
             logger.info("🏘️ Начало обновления данных BIR.BY")
-            
+
             # Загружаем и парсим данные
-            if not self.parser.fetch_data():
+            report('fetch', 'Загрузка данных с сервера', 5)
+            with metrics.stage(PIPELINE, 'fetch'):
+                fetched = self.parser.fetch_data()
+            if not fetched:
                 logger.error("Не удалось загрузить данные")
                 return False
             
@@ -202,9 +228,12 @@ class DataUpdater:
             ])
             
             # Парсим данные
-            self.parser.parse_data()
+            report('parse', f'Разбор {len(self.parser.data)} объектов', 40)
+            with metrics.stage(PIPELINE, 'parse'):
+                self.parser.parse_data()
             
             # Сохраняем новый хеш
+            report('save', f'Сохранение: {len(self.parser.quarters)} кварталов', 80)
             current_hash = self._get_data_hash(self.parser.data)
             self._save_hash(current_hash)
             
@@ -235,6 +264,7 @@ class DataUpdater:
             logger.info(f"✅ Обновление завершено успешно! Объектов: {len(self.parser.data)}, кварталов: {len(self.parser.quarters)}")
             
             # Отправляем уведомления
+            report('notify', 'Отправка уведомлений', 95)
             self._send_notifications(update_info)
             
             return True
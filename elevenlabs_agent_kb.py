@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Управление списком документов Knowledge Base агента ElevenLabs
+
+Один PATCH на синхронизацию вместо обновления по документу или отправки
+всей конфигурации агента:
+    - последняя известная конфигурация KB агента (ID документов + версия)
+      кэшируется в .elevenlabs_agent_cache.json; по кэшу считается дифф, и
+      пустой дифф — ноль запросов
+    - перед PATCH агент всегда читается заново (KB меняют и другие скрипты,
+      например elevenlabs_sync_v2.py); если список изменился — дифф пересчитывается
+    - PATCH несёт только conversation_config.knowledge_base
+    - результат проверяется GET агента (при таймауте повторная отправка —
+      только если изменения действительно не применились)
+
+Использование:
+    from elevenlabs_agent_kb import AgentKnowledgeBaseManager
+
+    manager = AgentKnowledgeBaseManager()
+    manager.apply(add=new_ids, remove=old_ids)   # Инкрементально
+    manager.apply(target=keep_ids, refresh=True) # Установить ровно этот список
+
+    python3 elevenlabs_agent_kb.py --show
+    python3 elevenlabs_agent_kb.py --add ID1 ID2 --remove ID3
+"""
+
+import os
+import sys
+import time
+import argparse
+import requests
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+import artifacts
+import serialization
+
+load_dotenv()
+
+CACHE_FILE = ".elevenlabs_agent_cache.json"
+
+# Лимит ElevenLabs — максимум 50 документов в KB агента
+AGENT_KB_LIMIT = 50
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+def extract_kb_ids(agent_data: Dict) -> List[str]:
+    """ID документов из conversation_config.knowledge_base (может быть {'ids': [...]} или просто [...])"""
+    kb_config = (agent_data or {}).get('conversation_config', {}).get('knowledge_base', {})
+    if isinstance(kb_config, dict):
+        return list(kb_config.get('ids', []) or [])
+    if isinstance(kb_config, list):
+        return [x for x in kb_config if isinstance(x, str)]
+    return []
+
+
+def extract_version(agent_data: Dict) -> Optional[str]:
+    """Версия конфигурации агента: version_id, если API его отдаёт, иначе время последнего изменения"""
+    version = (agent_data or {}).get('version_id')
+    if version is None:
+        version = (agent_data or {}).get('metadata', {}).get('updated_at_unix_secs')
+    return str(version) if version is not None else None
+
+
+def diff_ids(current: List[str], desired: List[str]) -> Tuple[List[str], List[str]]:
+    """Минимальный дифф списков: (добавить, убрать) с сохранением порядка"""
+    current_set = set(current)
+    desired_set = set(desired)
+    added = [doc_id for doc_id in desired if doc_id not in current_set]
+    removed = [doc_id for doc_id in current if doc_id not in desired_set]
+    return added, removed
+
+
+class AgentKnowledgeBaseManager:
+    """Кэш конфигурации KB агента и применение диффа одним PATCH"""
+
+    def __init__(self, api_key: str = None, agent_id: str = None, base_url: str = None,
+                 cache_file: str = CACHE_FILE, cache_ttl_minutes: int = 60,
+                 log_func: Callable[[str], None] = None):
+        self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY')
+        self.agent_id = agent_id or os.getenv('ELEVENLABS_AGENT_ID')
+
+        if not self.api_key:
+            raise ValueError("❌ ELEVENLABS_API_KEY не найден в .env файле")
+        if not self.agent_id:
+            raise ValueError("❌ ELEVENLABS_AGENT_ID не найден в .env файле")
+
+        self.base_url = base_url or os.getenv('ELEVENLABS_BASE_URL', "https://api.elevenlabs.io/v1")
+        self.agent_url = f"{self.base_url}/convai/agents/{self.agent_id}"
+        self.headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        self.cache_file = cache_file
+        self.cache_ttl_minutes = cache_ttl_minutes
+        self.log = log_func or log
+        self.requests_made = 0
+        self.cache = self.load_cache()
+
+    # ===== КЭШ =====
+
+    def load_cache(self) -> Dict:
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                cache = serialization.load(self.cache_file)
+                if cache.get('agent_id') == self.agent_id:
+                    return cache
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def save_cache(self, ids: List[str], version: Optional[str]):
+        self.cache = {
+            'agent_id': self.agent_id,
+            'ids': list(ids),
+            'version': version,
+            'timestamp': datetime.now().isoformat()
+        }
+        if not self.cache_file:
+            return
+        try:
+            artifacts.write_json(self.cache_file, self.cache, indent=None)
+        except OSError as e:
+            self.log(f"   ⚠️  Не удалось сохранить кэш агента: {e}")
+
+    def cache_is_fresh(self) -> bool:
+        if not self.cache.get('timestamp'):
+            return False
+        try:
+            age = datetime.now() - datetime.fromisoformat(self.cache['timestamp'])
+        except ValueError:
+            return False
+        return age.total_seconds() < self.cache_ttl_minutes * 60
+
+    def invalidate(self):
+        self.cache = {}
+
+    # ===== ЧТЕНИЕ =====
+
+    def fetch(self) -> Optional[List[str]]:
+        """GET агента, обновить кэш. None при ошибке"""
+        try:
+            self.requests_made += 1
+            response = requests.get(self.agent_url, headers=self.headers, timeout=60)
+        except requests.exceptions.RequestException as e:
+            self.log(f"   ❌ Ошибка получения агента: {type(e).__name__} - {str(e)[:200]}")
+            return None
+
+        if response.status_code != 200:
+            self.log(f"   ❌ Не удалось получить агента: HTTP {response.status_code}")
+            self.log(f"   📝 Ответ: {response.text[:300]}")
+            return None
+
+        agent_data = response.json()
+        ids = extract_kb_ids(agent_data)
+        self.save_cache(ids, extract_version(agent_data))
+        return ids
+
+    def current_ids(self, refresh: bool = False) -> Optional[List[str]]:
+        """Текущие ID документов агента: из кэша, если он свежий, иначе из API"""
+        if not refresh and self.cache_is_fresh():
+            return list(self.cache.get('ids', []))
+        return self.fetch()
+
+    # ===== ЗАПИСЬ =====
+
+    def plan(self, current: List[str], add: Iterable[str] = (), remove: Iterable[str] = (),
+             target: Optional[Iterable[str]] = None, limit: int = AGENT_KB_LIMIT) -> List[str]:
+        """Итоговый список ID: target целиком или current − remove + add (без дублей, с лимитом)"""
+        if target is not None:
+            desired = list(dict.fromkeys(target))
+        else:
+            remove_set = set(remove or ())
+            desired = list(dict.fromkeys([i for i in current if i not in remove_set] + list(add or ())))
+
+        if limit and len(desired) > limit:
+            self.log(f"   ⚠️  Превышен лимит! {len(desired)} документов, взяты первые {limit}")
+            desired = desired[:limit]
+        return desired
+
+    def apply(self, add: Iterable[str] = (), remove: Iterable[str] = (), target: Optional[Iterable[str]] = None,
+              refresh: bool = False, limit: int = AGENT_KB_LIMIT, dry_run: bool = False, retries: int = 3) -> bool:
+        """
+        Применить изменения KB агента одним PATCH
+
+        Args:
+            add: ID для добавления
+            remove: ID для удаления из агента
+            target: Если задан — установить ровно этот список (add/remove игнорируются)
+            refresh: Не доверять кэшу, прочитать агента перед диффом
+            limit: Максимум документов в агенте
+            dry_run: Только показать дифф
+            retries: Число попыток PATCH
+        """
+        from_cache = not refresh and self.cache_is_fresh()
+        current = self.current_ids(refresh=refresh)
+        if current is None:
+            return False
+
+        desired = self.plan(current, add=add, remove=remove, target=target, limit=limit)
+        added, removed = diff_ids(current, desired)
+
+        self.log(f"   📊 KB агента: было {len(current)}, стало {len(desired)} "
+                 f"(+{len(added)} / -{len(removed)})")
+
+        if not added and not removed and current == desired:
+            self.log("   ✅ Изменений нет, PATCH не нужен")
+            return True
+
+        if dry_run:
+            self.log("   🔍 DRY RUN: PATCH не отправлен")
+            return True
+
+        if from_cache:
+            # PATCH заменяет список целиком: по устаревшему кэшу он откатил бы чужие изменения
+            fresh = self.fetch()
+            if fresh is None:
+                return False
+            if fresh != current:
+                current = fresh
+                desired = self.plan(current, add=add, remove=remove, target=target, limit=limit)
+                added, removed = diff_ids(current, desired)
+                self.log(f"   🔄 KB агента изменилась после кэширования: было {len(current)}, "
+                         f"стало {len(desired)} (+{len(added)} / -{len(removed)})")
+                if not added and not removed and current == desired:
+                    self.log("   ✅ Изменений нет, PATCH не нужен")
+                    return True
+
+        update_data = {
+            'conversation_config': {
+                'knowledge_base': {
+                    'type': 'knowledge_base',
+                    'ids': desired
+                }
+            }
+        }
+
+        for attempt in range(1, retries + 1):
+            start_time = time.time()
+            try:
+                self.requests_made += 1
+                response = requests.patch(self.agent_url, headers=self.headers, json=update_data, timeout=(15, 180))
+            except requests.exceptions.ReadTimeout:
+                # PATCH мог примениться — сначала проверяем, потом решаем, слать ли повторно
+                self.log(f"   ⏳ Таймаут ответа PATCH ({time.time() - start_time:.1f}с), проверяем агента...")
+                if self.verify(desired):
+                    return True
+            except requests.exceptions.RequestException as e:
+                self.log(f"   ❌ Ошибка сети: {type(e).__name__} - {str(e)[:200]}")
+            else:
+                elapsed = time.time() - start_time
+                if response.status_code == 200:
+                    self.log(f"   📡 PATCH за {elapsed:.1f}с, HTTP 200")
+                    return self.verify(desired)
+                self.log(f"   ❌ HTTP {response.status_code}: {response.text[:300]}")
+                if response.status_code < 500 and response.status_code != 429:
+                    self.invalidate()
+                    return False
+
+            if attempt < retries:
+                wait_time = attempt * 5
+                self.log(f"   ⏳ Ожидание {wait_time}с перед попыткой {attempt + 1}/{retries}...")
+                time.sleep(wait_time)
+
+        self.log("   ❌ Все попытки исчерпаны")
+        self.invalidate()
+        return False
+
+    def verify(self, desired: List[str]) -> bool:
+        """Проверить одним GET, что в агенте ровно desired (заодно обновляет кэш)"""
+        applied = self.fetch()
+        if applied is None:
+            return False
+
+        if set(applied) == set(desired):
+            self.log(f"   ✅ KB агента обновлена: {len(applied)} документов")
+            return True
+
+        missing = set(desired) - set(applied)
+        extra = set(applied) - set(desired)
+        self.log(f"   ❌ KB агента не совпадает: не хватает {len(missing)}, лишних {len(extra)}")
+        self.invalidate()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обновление KB агента ElevenLabs одним PATCH')
+    parser.add_argument('--show', action='store_true', help='Показать текущие ID документов агента')
+    parser.add_argument('--add', nargs='*', default=[], help='ID для добавления')
+    parser.add_argument('--remove', nargs='*', default=[], help='ID для удаления из агента')
+    parser.add_argument('--set', nargs='*', dest='target', default=None, help='Установить ровно этот список ID')
+    parser.add_argument('--refresh', action='store_true', help='Игнорировать кэш агента')
+    parser.add_argument('--dry-run', action='store_true', help='Только показать дифф')
+    args = parser.parse_args()
+
+    try:
+        manager = AgentKnowledgeBaseManager()
+    except ValueError as e:
+        print(e)
+        return 1
+
+    if args.show:
+        ids = manager.current_ids(refresh=args.refresh)
+        if ids is None:
+            return 1
+        log(f"📚 Документов в агенте: {len(ids)} (версия: {manager.cache.get('version')})")
+        for doc_id in ids:
+            print(f"   {doc_id}")
+        return 0
+
+    if args.target is None and not args.add and not args.remove:
+        parser.print_help()
+        return 1
+
+    ok = manager.apply(add=args.add, remove=args.remove, target=args.target,
+                       refresh=args.refresh, dry_run=args.dry_run)
+    log(f"📡 Запросов к API: {manager.requests_made}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
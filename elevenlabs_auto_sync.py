@@ -21,7 +21,18 @@ from dotenv import load_dotenv
 from collections import defaultdict
 import sys
 
+from elevenlabs_agent_kb import AgentKnowledgeBaseManager
+from elevenlabs_bulk_delete import BulkDeleter
+from elevenlabs_upload_registry import UploadRegistry, content_hash
+from elevenlabs_kb_listing import KBManifest, KnowledgeBaseLister
+from elevenlabs_sync_v2 import consume_list
+import metrics
+import tracing
+
 load_dotenv()
+metrics.instrument_requests()
+
+PIPELINE = 'auto_sync'
 
 
 def log(msg):
@@ -40,12 +51,28 @@ class ElevenLabsAutoSync:
         if not self.agent_id:
             raise ValueError("❌ ELEVENLABS_AGENT_ID не найден в .env файле")
 
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = os.getenv('ELEVENLABS_BASE_URL', "https://api.elevenlabs.io/v1")
         self.headers = {
             "xi-api-key": self.api_key,
             "Content-Type": "application/json"
         }
 
+        # Кэш KB агента: дифф и один PATCH вместо GET + полной перезаписи
+        self.agent_kb = AgentKnowledgeBaseManager(
+            api_key=self.api_key, agent_id=self.agent_id, base_url=self.base_url, log_func=log
+        )
+
+        # Список документов KB: упреждающая загрузка страниц и инкрементальный кэш
+        self.kb_lister = KnowledgeBaseLister(self.api_key, base_url=self.base_url, log_func=log)
+        self.kb_manifest = KBManifest(log_func=log)
+
+        # Реестр загрузок по содержимому (sha256 → doc_id)
+        self.registry = UploadRegistry()
+        # Предыдущие версии файлов, заменённые повторно использованными документами
+        self.superseded: List[Dict] = []
+        # Файлы, которые не удалось загрузить в текущем прогоне
+        self.failed_uploads: List[str] = []
+
         # Логирование операций
         self.log_file = "elevenlabs_sync_log.json"
         self.load_sync_log()
@@ -71,6 +98,10 @@ class ElevenLabsAutoSync:
         """
         Получить KB документы с кэшированием для избежания повторных API вызовов
 
+        Кэш моложе ttl_minutes используется как есть. Иначе кэш обновляется
+        инкрементально: запрашиваются только страницы с документами новее
+        водяного знака (см. elevenlabs_kb_listing.KBManifest).
+
         Args:
             ttl_minutes: Время жизни кэша в минутах
             use_cache_only: Если True, не делать запрос к API, только использовать кэш
@@ -78,22 +109,15 @@ class ElevenLabsAutoSync:
         Returns:
             Список документов из KB
         """
-        cache_file = Path('.elevenlabs_kb_cache.json')
-
         # Проверяем валидность кэша
-        if cache_file.exists():
-            mtime = cache_file.stat().st_mtime
-            age_minutes = (time.time() - mtime) / 60
+        if self.kb_manifest.exists:
+            age_minutes = self.kb_manifest.age_minutes()
 
-            if age_minutes < ttl_minutes:
+            if age_minutes < ttl_minutes and self.kb_manifest.documents:
                 log(f"  📦 Использование кэша KB (возраст: {age_minutes:.1f} мин)")
-                try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                        cached_docs = json.load(f)
-                        log(f"  ✅ Загружено из кэша: {len(cached_docs)} документов")
-                        return cached_docs
-                except Exception as e:
-                    log(f"  ⚠️  Ошибка чтения кэша: {e}, загружаем свежие данные")
+                cached_docs = self.kb_manifest.list()
+                log(f"  ✅ Загружено из кэша: {len(cached_docs)} документов")
+                return cached_docs
 
         # Если use_cache_only=True и кэша нет - возвращаем пустой список
         if use_cache_only:
@@ -101,97 +125,32 @@ class ElevenLabsAutoSync:
             log(f"  💡 Продолжаем без удаления старых версий (только загрузка новых)")
             return []
 
-        # Получаем свежие данные
-        log(f"  🔄 Загрузка свежих данных KB...")
-        
-        # Сохраняем старый кэш на случай ошибки
-        old_cache_docs = []
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    old_cache_docs = json.load(f)
-                    log(f"  📦 Сохранен старый кэш для fallback ({len(old_cache_docs)} документов)")
-            except:
-                pass
-        
+        # Обновляем кэш из API (старый кэш остаётся на случай ошибки)
+        log(f"  🔄 Обновление кэша KB...")
         try:
-        docs = self.get_all_kb_documents()
-
-        # Кэшируем
-            log(f"  💾 Сохранение кэша ({len(docs)} документов)...")
-            try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(docs, f, ensure_ascii=False, indent=2)
-                log(f"  ✅ Кэш сохранен")
-            except Exception as e:
-                log(f"  ⚠️  Ошибка сохранения кэша: {e}")
-
-        return docs
+            return self.kb_manifest.refresh(self.kb_lister)
         except Exception as e:
             log(f"  ❌ Ошибка получения документов: {type(e).__name__} - {str(e)[:200]}")
-            
+
             # Если есть старый кэш - используем его как fallback
-            if old_cache_docs:
-                log(f"  🔄 Fallback: используем старый кэш ({len(old_cache_docs)} документов)")
+            if self.kb_manifest.documents:
+                log(f"  🔄 Fallback: используем старый кэш ({len(self.kb_manifest.documents)} документов)")
                 log(f"  ⚠️  Внимание: список документов может быть неполным, старые версии могут не удалиться")
-                return old_cache_docs
-            
+                return self.kb_manifest.list()
+
             log(f"  💡 Старого кэша нет, возвращаем пустой список")
             return []
 
     # ===== ПОЛУЧЕНИЕ СПИСКА ДОКУМЕНТОВ =====
 
     def get_all_kb_documents(self) -> List[Dict]:
-        """Получить все документы из Knowledge Base с пагинацией"""
-        all_docs = []
-        page = 0
-        max_pages = 100  # Защита от бесконечного цикла
-
+        """Получить все документы из Knowledge Base с пагинацией (страницы запрашиваются заранее)"""
         log(f"   📥 Начало загрузки документов из KB (таймаут: 60с)")
-
-        while page < max_pages:
-            url = f"{self.base_url}/convai/knowledge-base?page_size=100&page={page}"
-
-            try:
-                log(f"   📄 Запрос страницы {page}...")
-                response = requests.get(url, headers={"xi-api-key": self.api_key}, timeout=60)
-
-                if response.status_code != 200:
-                    log(f"   ❌ HTTP {response.status_code} на странице {page}")
-                    if page == 0:
-                        log(f"   📝 Ответ сервера: {response.text[:500]}")
-                    break
-
-                data = response.json()
-                docs = data.get('documents', data.get('knowledge_bases', []))
-
-                if not docs:
-                    log(f"   ℹ️  Страница {page}: документов нет, завершение")
-                    break
-
-                all_docs.extend(docs)
-                log(f"   ✅ Страница {page}: получено {len(docs)} документов (всего: {len(all_docs)})")
-
-                has_more = data.get('has_more', False)
-                if not has_more:
-                    log(f"   ✅ Все страницы загружены (has_more=False)")
-                    break
-
-                page += 1
-                time.sleep(0.5)  # Пауза между запросами
-
-            except requests.exceptions.Timeout:
-                log(f"   ❌ Таймаут запроса на странице {page} (>60 сек)")
-                break
-            except requests.exceptions.RequestException as e:
-                log(f"   ❌ Ошибка сети на странице {page}: {type(e).__name__} - {str(e)[:200]}")
-                break
-            except Exception as e:
-                log(f"   ❌ Неожиданная ошибка на странице {page}: {type(e).__name__} - {str(e)[:200]}")
-                break
-
-        log(f"   📊 Итого загружено: {len(all_docs)} документов из {page + 1} страниц")
-        return all_docs
+        try:
+            return self.kb_lister.list_all()
+        except Exception as e:
+            log(f"   ❌ Ошибка загрузки списка документов: {type(e).__name__} - {str(e)[:200]}")
+            return []
 
     # ===== ОПРЕДЕЛЕНИЕ ДОКУМЕНТОВ ДЛЯ УДАЛЕНИЯ =====
 
@@ -279,10 +238,10 @@ class ElevenLabsAutoSync:
                                     found_in_log = True
                                     if changed_files:
                                         log(f"      ✅ Дата из локального лога: {doc_name[:40]} -> {upload_date}")
-                            break
                                 except Exception as e:
                                     if changed_files:
                                         log(f"      ⚠️  Ошибка парсинга даты из лога: {e}")
+                            break
                     
                     if not found_in_log and changed_files:
                         log(f"      ❌ Не найдена дата для: {doc_name[:40]} (ID: {doc_id[:20]}...)")
@@ -380,17 +339,43 @@ class ElevenLabsAutoSync:
         print(f"\n📤 Загрузка {len(files_to_upload)} файлов...")
 
         # Загружаем файлы
+        reused_count = 0
         for i, file_info in enumerate(files_to_upload, 1):
             print(f"  {i}/{len(files_to_upload)} - {file_info['name']}.md", end=" ")
 
-            doc_id = self._upload_single_document(
-                file_info['path'],
-                file_info['name']
-            )
+            with tracing.span('auto_sync.document', document=file_info['name']) as doc_span:
+                # Такой же текст уже есть в KB (другое имя или прерванный прогон) — используем его
+                with open(file_info['path'], 'r', encoding='utf-8') as f:
+                    text_hash = content_hash(f.read())
+                entry = self.registry.find(text_hash, exists=self._document_exists)
+
+                if entry:
+                    doc_id = entry['doc_id']
+                    reused_count += 1
+                    print(f"♻️  (уже в KB: {doc_id[:15]}...)", end=" ")
+                else:
+                    doc_id = self._upload_single_document(
+                        file_info['path'],
+                        file_info['name']
+                    )
+                    if doc_id:
+                        self.registry.register(text_hash, doc_id, file_info['name'])
+                        self.registry.save()
+                if doc_span is not None:
+                    doc_span.set_attribute('reused', bool(entry))
+                    doc_span.set_attribute('doc_id', doc_id or '')
 
             if doc_id:
                 uploaded_ids.append(doc_id)
 
+                previous_id = self.sync_log['uploads'].get(file_info['name'], {}).get('id')
+                if entry and previous_id and previous_id != doc_id:
+                    self.superseded.append({
+                        'id': previous_id,
+                        'name': file_info['name'],
+                        'reason': 'заменён документом с тем же содержимым'
+                    })
+
                 # Сохраняем в лог
                 self.sync_log['uploads'][file_info['name']] = {
                     'id': doc_id,
@@ -401,12 +386,26 @@ class ElevenLabsAutoSync:
                 self.save_sync_log()
                 print(f"✅")
             else:
+                self.failed_uploads.append(file_info['name'])
                 print(f"❌")
 
-            time.sleep(0.5)  # Пауза между загрузками
+            if not entry:
+                time.sleep(0.5)  # Пауза между загрузками
+
+        if reused_count:
+            print(f"♻️  Повторно использовано документов: {reused_count}")
 
         return uploaded_ids
 
+    def _document_exists(self, doc_id: str) -> bool:
+        """Документ ещё есть в KB (для повторного использования из реестра)"""
+        url = f"{self.base_url}/convai/knowledge-base/{doc_id}"
+        try:
+            response = requests.get(url, headers=self.headers, timeout=30)
+            return response.status_code == 200
+        except Exception:
+            return False
+
     def _upload_single_document(self, file_path: str, doc_name: str) -> Optional[str]:
         """Загрузить один документ"""
         url = f"{self.base_url}/convai/knowledge-base"
@@ -435,6 +434,7 @@ class ElevenLabsAutoSync:
             response = requests.post(url, headers=headers_upload, files=files, data=data, timeout=60)
 
             if response.status_code in [200, 201]:
+                metrics.UPLOAD_BYTES.inc(len(content_bytes), pipeline=PIPELINE)
                 result = response.json()
                 doc_id = result.get('knowledge_base_id', result.get('id'))
                 return doc_id
@@ -465,6 +465,7 @@ class ElevenLabsAutoSync:
         print(f"\n⏳ Ожидание индексации {len(doc_ids)} документов (макс {max_wait}с)...")
 
         checked_once = set()
+        ready_at = {}
 
         while time.time() - start_time < max_wait and len(ready_docs) < len(doc_ids):
             for doc_id in doc_ids:
@@ -475,6 +476,7 @@ class ElevenLabsAutoSync:
 
                 if status in ['succeeded', 'indexed', 'completed']:
                     ready_docs.append(doc_id)
+                    ready_at[doc_id] = time.time() - start_time
                     print(f"   ✅ Готов: {doc_id[:20]}...")
                 elif status == 'failed':
                     if doc_id not in checked_once:
@@ -488,6 +490,10 @@ class ElevenLabsAutoSync:
             if len(ready_docs) < len(doc_ids):
                 time.sleep(5)  # Проверяем каждые 5 секунд
 
+        # Неготовые документы учитываются с полным временем ожидания
+        for doc_id in doc_ids:
+            metrics.RAG_WAIT_SECONDS.observe(ready_at.get(doc_id, time.time() - start_time), pipeline=PIPELINE)
+
         print(f"📊 Готово к добавлению: {len(ready_docs)}/{len(doc_ids)}")
         return ready_docs
 
@@ -528,46 +534,34 @@ class ElevenLabsAutoSync:
             print("ℹ️  Нет документов для удаления")
             return 0
 
-        deleted_count = 0
-
         print(f"\n🗑️  Удаление {len(to_delete)} старых документов...")
 
-        for i, doc_info in enumerate(to_delete, 1):
-            doc_id = doc_info['id']
-            doc_name = doc_info['name']
-            reason = doc_info.get('reason', 'unknown')
-
-            print(f"  {i}/{len(to_delete)} - {doc_name[:40]}", end=" ")
-
-            if self._delete_document(doc_id):
-                deleted_count += 1
+        # Параллельно, с отвязкой от агента и force=true для оставшихся привязанными
+        deleter = BulkDeleter(
+            self.api_key, base_url=self.base_url, agent_kb=self.agent_kb, log_func=log
+        )
+        report = deleter.run(to_delete)
+        deleter.print_report(report)
 
+        deleted_ids = set(report['deleted_ids'])
+        deletion_date = datetime.now().isoformat()
+        for doc_info in to_delete:
+            if doc_info['id'] in deleted_ids:
                 # Логируем удаление
                 self.sync_log['deletions'].append({
-                    'id': doc_id,
-                    'name': doc_name,
-                    'deletion_date': datetime.now().isoformat(),
-                    'reason': reason
+                    'id': doc_info['id'],
+                    'name': doc_info['name'],
+                    'deletion_date': deletion_date,
+                    'reason': doc_info.get('reason', 'unknown')
                 })
+        self.save_sync_log()
 
-                self.save_sync_log()
-                print(f"✅")
-            else:
-                print(f"❌")
-
-            time.sleep(0.5)  # Пауза между удалениями
-
-        return deleted_count
+        # Удалённые документы убираем из реестра загрузок и кэша списка KB
+        self.registry.forget(deleted_ids)
+        self.registry.save()
+        self.kb_manifest.remove(deleted_ids)
 
-    def _delete_document(self, doc_id: str) -> bool:
-        """Удалить документ по ID"""
-        url = f"{self.base_url}/convai/knowledge-base/{doc_id}"
-
-        try:
-            response = requests.delete(url, headers=self.headers, timeout=30)
-            return response.status_code in [200, 204]
-        except Exception:
-            return False
+        return len(deleted_ids)
 
     # ===== ОБНОВЛЕНИЕ АГЕНТА =====
 
@@ -577,170 +571,25 @@ class ElevenLabsAutoSync:
 
         КРИТИЧНО: Объединяем существующие ID с новыми, удаляя старые версии!
         Без этого инкрементальное обновление удалит все документы кроме обновленных.
+        Объединение и дифф делает AgentKnowledgeBaseManager: дифф считается по кэшу агента,
+        перед PATCH агент читается заново, в API уходит один PATCH только с
+        conversation_config.knowledge_base.
 
         Args:
             ready_doc_ids: Список ID новых/обновленных документов
             ids_to_remove: Список ID старых документов для удаления из агента
         """
-        agent_url = f"{self.base_url}/convai/agents/{self.agent_id}"
-
         log(f"\n🤖 Обновление агента...")
         log(f"   📋 Новых документов: {len(ready_doc_ids)}")
         log(f"   🗑️  Документов на удаление: {len(ids_to_remove) if ids_to_remove else 0}")
 
-        # Получаем текущую конфигурацию агента
-        log(f"   📥 Получение текущей конфигурации агента (таймаут: 60с)...")
-        try:
-            response = requests.get(agent_url, headers=self.headers, timeout=60)
-            log(f"   📡 HTTP {response.status_code}")
-
-            if response.status_code != 200:
-                log(f"   ❌ Не удалось получить конфигурацию агента: {response.status_code}")
-                log(f"   📝 Ответ: {response.text[:300]}")
-                return False
-
-            agent_data = response.json()
-            log(f"   ✅ Конфигурация получена")
-        except requests.exceptions.Timeout:
-            log(f"   ❌ Таймаут получения конфигурации агента (>60 сек)")
-            return False
-        except Exception as e:
-            log(f"   ❌ Ошибка получения конфигурации: {type(e).__name__} - {str(e)[:200]}")
-            return False
-
-        # Получаем текущие ID документов в агенте
-        current_kb = agent_data.get('conversation_config', {}).get('knowledge_base', {})
-        existing_ids = current_kb.get('ids', [])
-        log(f"   📚 Текущих документов в агенте: {len(existing_ids)}")
-
-        # === КРИТИЧЕСКАЯ ЛОГИКА: Объединение ID ===
-        # 1. Берем существующие ID агента
-        # 2. Удаляем из них старые версии (которые заменяем)
-        # 3. Добавляем новые ID
-        
-        ids_to_remove_set = set(ids_to_remove) if ids_to_remove else set()
-        
-        # Фильтруем существующие ID — убираем те, что заменяются
-        filtered_existing_ids = [
-            doc_id for doc_id in existing_ids 
-            if doc_id not in ids_to_remove_set
-        ]
-        log(f"   🔄 После удаления старых версий: {len(filtered_existing_ids)} документов")
-        
-        # Объединяем: существующие (без удаленных) + новые
-        # Используем dict.fromkeys для сохранения порядка и уникальности
-        combined_ids = list(dict.fromkeys(filtered_existing_ids + ready_doc_ids))
-
-        # Лимит ElevenLabs — максимум 50 документов в KB агента
-        agent_kb_ids = combined_ids[:50]
-        
-        if len(combined_ids) > 50:
-            log(f"   ⚠️  Превышен лимит! {len(combined_ids)} документов, взяты первые 50")
-
-        update_data = {
-            'conversation_config': {
-                'knowledge_base': {
-                    'type': 'knowledge_base',
-                    'ids': agent_kb_ids
-                }
-            }
-        }
-
-        log(f"   📊 Обновление KB агента:")
-        log(f"      Было: {len(existing_ids)} документов")
-        log(f"      Удалено старых: {len(ids_to_remove_set)}")
-        log(f"      Добавлено новых: {len(ready_doc_ids)}")
-        log(f"      Стало: {len(agent_kb_ids)} документов")
-        
         if ready_doc_ids:
             log(f"   📋 Первые 5 новых ID: {ready_doc_ids[:5]}")
-        log(f"   📤 Отправка PATCH запроса (таймаут: 300с)...")
-        log(f"   🔗 URL: {agent_url}")
 
-        # Пытаемся обновить с retry
-        for attempt in range(3):
-            try:
-                log(f"   🔄 Попытка {attempt + 1}/3...")
-                start_time = time.time()
-                
-                # Добавляем логирование перед отправкой
-                log(f"   📡 Отправка PATCH запроса (данные: {len(agent_kb_ids)} документов)...")
-                
-                # Используем requests с явным таймаутом на подключение и чтение
-                # Уменьшаем таймаут подключения для быстрого определения проблем
-                response = requests.patch(
-                    agent_url, 
-                    headers=self.headers, 
-                    json=update_data, 
-                    timeout=(15, 180)  # 15 сек на подключение, 180 сек (3 мин) на ответ
-                )
-
-                elapsed = time.time() - start_time
-                log(f"   📡 Ответ получен за {elapsed:.1f}с, HTTP {response.status_code}")
-
-                if response.status_code == 200:
-                    log(f"   ✅ Агент успешно обновлен!")
-                    return True
-                else:
-                    log(f"   ❌ HTTP {response.status_code}: {response.text[:300]}")
-                    if attempt < 2:
-                        wait_time = (attempt + 1) * 15  # 15, 30 секунд
-                        log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                        time.sleep(wait_time)
-                    else:
-                        log(f"   ❌ Все попытки исчерпаны")
-                        return False
-
-            except requests.exceptions.ConnectTimeout:
-                elapsed = time.time() - start_time if 'start_time' in locals() else 0
-                log(f"   ❌ Таймаут подключения к API (>30 сек)")
-                if attempt < 2:
-                    wait_time = (attempt + 1) * 15
-                    log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                    time.sleep(wait_time)
-                else:
-                    log(f"   ❌ Все попытки исчерпаны (таймауты подключения)")
-                    return False
-            except requests.exceptions.ReadTimeout:
-                elapsed = time.time() - start_time if 'start_time' in locals() else 0
-                log(f"   ❌ Таймаут чтения ответа (прошло {elapsed:.1f}с из 300с)")
-                if attempt < 2:
-                    wait_time = (attempt + 1) * 15
-                    log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                    time.sleep(wait_time)
-                else:
-                    log(f"   ❌ Все попытки исчерпаны (таймауты чтения)")
-                    return False
-            except requests.exceptions.Timeout:
-                elapsed = time.time() - start_time if 'start_time' in locals() else 0
-                log(f"   ❌ Общий таймаут PATCH запроса (прошло {elapsed:.1f}с)")
-                if attempt < 2:
-                    wait_time = (attempt + 1) * 15
-                    log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                    time.sleep(wait_time)
-                else:
-                    log(f"   ❌ Все попытки исчерпаны (таймауты)")
-                    return False
-            except requests.exceptions.RequestException as e:
-                log(f"   ❌ Ошибка сети: {type(e).__name__} - {str(e)[:200]}")
-                if attempt < 2:
-                    wait_time = (attempt + 1) * 15
-                    log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                    time.sleep(wait_time)
-                else:
-                    log(f"   ❌ Все попытки исчерпаны")
-                    return False
-            except Exception as e:
-                log(f"   ❌ Неожиданная ошибка: {type(e).__name__} - {str(e)[:200]}")
-                if attempt < 2:
-                    wait_time = (attempt + 1) * 15
-                    log(f"   ⏳ Ожидание {wait_time}с перед повторной попыткой...")
-                    time.sleep(wait_time)
-                else:
-                    log(f"   ❌ Все попытки исчерпаны")
-                    return False
-
-        return False
+        start_time = time.time()
+        success = self.agent_kb.apply(add=ready_doc_ids, remove=ids_to_remove or [])
+        log(f"   ⏱️  Обновление агента: {time.time() - start_time:.1f}с, запросов к API: {self.agent_kb.requests_made}")
+        return success
 
     # ===== ГЛАВНАЯ ФУНКЦИЯ СИНХРОНИЗАЦИИ =====
 
@@ -753,10 +602,14 @@ class ElevenLabsAutoSync:
             dry_run: Если True, только показывает что будет сделано
             no_delete: Если True, не удаляет старые документы
             changed_files: Список конкретных файлов для обработки (опционально)
+
+        Returns:
+            True, если все файлы загружены, проиндексированы и агент обновлён
         """
         log("=" * 70)
         log("🚀 АВТОМАТИЧЕСКАЯ СИНХРОНИЗАЦИЯ ELEVENLABS KNOWLEDGE BASE")
         log("=" * 70)
+        run_started = datetime.now().isoformat()
         
         # Логируем параметры запуска
         log(f"📋 Параметры:")
@@ -771,21 +624,22 @@ class ElevenLabsAutoSync:
         # Шаг 1: Получаем все документы (нужно для поиска старых версий)
         log("\n📚 Шаг 1: Получение списка документов из Knowledge Base...")
         
-        # В инкрементальном режиме пытаемся обновить кэш (TTL: 1-2 часа), но с fallback на старый
-        # Это позволяет находить актуальные старые версии для удаления
-        if changed_files:
-            log("   ⚡ Инкрементальный режим: обновляем кэш если старше 1 часа (fallback на старый кэш до 24ч)")
-            # Сначала пытаемся использовать свежий кэш (до 1 часа)
-            all_docs = self.get_all_kb_documents_cached(ttl_minutes=60, use_cache_only=False)
+        with metrics.stage(PIPELINE, 'list'):
+            # В инкрементальном режиме пытаемся обновить кэш (TTL: 1-2 часа), но с fallback на старый
+            # Это позволяет находить актуальные старые версии для удаления
+            if changed_files:
+                log("   ⚡ Инкрементальный режим: обновляем кэш если старше 1 часа (fallback на старый кэш до 24ч)")
+                # Сначала пытаемся использовать свежий кэш (до 1 часа)
+                all_docs = self.get_all_kb_documents_cached(ttl_minutes=60, use_cache_only=False)
             
-            # Если кэш был пустой или устарел, но старый кэш есть - используем его как fallback
-            if len(all_docs) == 0:
-                log("   📦 Попытка использовать старый кэш (до 24 часов)...")
-                all_docs = self.get_all_kb_documents_cached(ttl_minutes=60 * 24, use_cache_only=True)
-        else:
-            # Полная синхронизация: обновляем кэш
-            log("   🔄 Полная синхронизация: загружаем свежие данные из API")
-            all_docs = self.get_all_kb_documents_cached(ttl_minutes=60, use_cache_only=False)
+                # Если кэш был пустой или устарел, но старый кэш есть - используем его как fallback
+                if len(all_docs) == 0:
+                    log("   📦 Попытка использовать старый кэш (до 24 часов)...")
+                    all_docs = self.get_all_kb_documents_cached(ttl_minutes=60 * 24, use_cache_only=True)
+            else:
+                # Полная синхронизация: обновляем кэш
+                log("   🔄 Полная синхронизация: загружаем свежие данные из API")
+                all_docs = self.get_all_kb_documents_cached(ttl_minutes=60, use_cache_only=False)
         
         log(f"   Найдено документов в KB: {len(all_docs)}")
         
@@ -803,8 +657,21 @@ class ElevenLabsAutoSync:
             log("\n🔍 Шаг 2: Поиск старых версий обновленных документов...")
         else:
             log("\n🔍 Шаг 2: Поиск документов для удаления...")
-        
-            to_delete = self.identify_documents_to_delete(all_docs, changed_files=changed_files)
+
+        to_delete = self.identify_documents_to_delete(all_docs, changed_files=changed_files)
+
+        # Инкрементальный кэш не знает об удалённых извне документах: план удаления по нему
+        # мог бы выбрать «старой» версией действующий документ — перед удалением полный обход
+        if to_delete and not dry_run and not (self.kb_manifest.full_scan_at or '') >= run_started:
+            log("   🔄 Полный обход KB перед удалением (кэш мог устареть)...")
+            try:
+                with metrics.stage(PIPELINE, 'list'):
+                    all_docs = self.kb_manifest.refresh(self.kb_lister, full=True)
+                to_delete = self.identify_documents_to_delete(all_docs, changed_files=changed_files)
+            except Exception as e:
+                log(f"   ❌ Полный обход не удался: {type(e).__name__} - {str(e)[:200]}")
+                log("   💡 Старые версии не удаляются (только загрузка новых)")
+                to_delete = []
         log(f"   Документов для удаления: {len(to_delete)}")
 
         if to_delete:
@@ -816,11 +683,12 @@ class ElevenLabsAutoSync:
 
         if dry_run:
             print("\n✅ DRY RUN завершен (изменения не применены)")
-            return
+            return False
 
         # Шаг 3: Загружаем новые/обновленные документы
         print("\n📤 Шаг 3: Загрузка новых и обновленных документов...")
-        uploaded_ids = self.upload_new_documents(files_dir, changed_files=changed_files)
+        with metrics.stage(PIPELINE, 'upload'):
+            uploaded_ids = self.upload_new_documents(files_dir, changed_files=changed_files)
         print(f"   Загружено документов: {len(uploaded_ids)}")
 
         # Шаг 4: Ждем индексации
@@ -831,7 +699,10 @@ class ElevenLabsAutoSync:
             # ~60 секунд на файл, минимум 120, максимум 10 минут
             max_wait_seconds = max(120, min(60 * len(uploaded_ids), 600))
             log(f"   ⏱️  Максимальное время ожидания: {max_wait_seconds} сек ({len(uploaded_ids)} файлов)")
-            ready_ids = self.wait_for_indexing(uploaded_ids, max_wait=max_wait_seconds)
+            with metrics.stage(PIPELINE, 'index_wait'):
+                ready_ids = self.wait_for_indexing(list(dict.fromkeys(uploaded_ids)), max_wait=max_wait_seconds)
+            self.registry.mark_indexed(ready_ids)
+            self.registry.save()
 
             if len(ready_ids) == 0 and len(uploaded_ids) > 0:
                 print("⚠️  Ни один документ не проиндексирован, пропускаем обновление агента")
@@ -841,13 +712,21 @@ class ElevenLabsAutoSync:
         else:
             new_docs_ready = True  # Нет новых документов, можно удалять старые
 
+        # Документы, используемые сейчас (в т.ч. повторно из реестра), не удаляем;
+        # предыдущие версии файлов, заменённые повторным использованием, — удаляем
+        in_use = set(uploaded_ids) | {info.get('id') for info in self.sync_log['uploads'].values()}
+        planned = {doc['id'] for doc in to_delete}
+        to_delete = [doc for doc in to_delete if doc['id'] not in in_use]
+        to_delete += [doc for doc in self.superseded if doc['id'] not in in_use and doc['id'] not in planned]
+
         # Шаг 5: Обновляем агента
         # Передаем список ID старых документов для удаления из агента
         ids_to_remove = [doc['id'] for doc in to_delete] if to_delete else []
         
         if ready_ids or ids_to_remove:
             print("\n🤖 Шаг 5: Обновление агента...")
-            agent_updated = self.update_agent_kb(ready_ids, ids_to_remove=ids_to_remove)
+            with metrics.stage(PIPELINE, 'agent_patch'):
+                agent_updated = self.update_agent_kb(ready_ids, ids_to_remove=ids_to_remove)
             new_docs_ready = agent_updated
         else:
             print("\n🤖 Шаг 5: Обновление агента не требуется (нет изменений)")
@@ -856,7 +735,8 @@ class ElevenLabsAutoSync:
         deleted_count = 0
         if not no_delete:
             print("\n🗑️  Шаг 6: Удаление старых документов...")
-            deleted_count = self.safe_delete_old_documents(to_delete, new_docs_ready)
+            with metrics.stage(PIPELINE, 'delete'):
+                deleted_count = self.safe_delete_old_documents(to_delete, new_docs_ready)
         else:
             print("\n🗑️  Шаг 6: Удаление отключено (--no-delete)")
 
@@ -869,11 +749,20 @@ class ElevenLabsAutoSync:
         print(f"   📚 Всего документов в KB: ~{len(all_docs) + len(uploaded_ids) - deleted_count}")
         print("=" * 70)
 
+        metrics.DOCS_CHANGED.set(len(uploaded_ids), pipeline=PIPELINE, action='uploaded')
+        metrics.DOCS_CHANGED.set(len(ready_ids), pipeline=PIPELINE, action='indexed')
+        metrics.DOCS_CHANGED.set(deleted_count, pipeline=PIPELINE, action='deleted')
+
         # Обновляем лог
         self.sync_log['last_sync'] = datetime.now().isoformat()
         self.save_sync_log()
 
-        print("\n✨ Синхронизация завершена!")
+        synced = new_docs_ready and not self.failed_uploads and set(ready_ids) == set(uploaded_ids)
+        if synced:
+            print("\n✨ Синхронизация завершена!")
+        else:
+            print("\n⚠️  Синхронизация завершена не полностью")
+        return synced
 
 
 def main():
@@ -909,17 +798,26 @@ def main():
 
     try:
         sync = ElevenLabsAutoSync()
-        sync.full_sync(
-            files_dir=args.dir,
-            dry_run=args.dry_run,
-            no_delete=args.no_delete,
-            changed_files=changed_files
-        )
+        with metrics.stage(PIPELINE, 'total'):
+            synced = sync.full_sync(
+                files_dir=args.dir,
+                dry_run=args.dry_run,
+                no_delete=args.no_delete,
+                changed_files=changed_files
+            )
+        # Список копится генераторами между запусками: очищаем только загруженное
+        if changed_files:
+            if synced:
+                consume_list(args.changed_files, changed_files)
+            elif not args.dry_run:
+                print(f"⚠️  Список {args.changed_files} сохранён для следующего запуска")
+        metrics.finish_run(PIPELINE, write=not args.dry_run)
         return 0
     except Exception as e:
         print(f"\n❌ Критическая ошибка: {e}")
         import traceback
         traceback.print_exc()
+        metrics.finish_run(PIPELINE, success=False)
         return 1
 
 
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Массовое удаление документов из ElevenLabs Knowledge Base
+
+- Пул потоков ограниченного размера и общий лимит запросов в секунду
+- 429/5xx/сетевые ошибки — повтор с паузой; 404 — документ уже удалён
+- Эскалация для документов, привязанных к агенту (HTTP 400):
+    1. отвязка от агента одним PATCH (AgentKnowledgeBaseManager) и повтор
+    2. если всё ещё привязан (например, к другому агенту) — DELETE ?force=true
+- Журнал .elevenlabs_delete_journal.jsonl: прерванная чистка продолжается
+  с того места, где остановилась (удалённые ID повторно не запрашиваются);
+  после завершённого прогона его записи из журнала убираются
+- Итоговый отчёт: удалено / не найдено / привязано / ошибок, время, док/сек
+
+Использование:
+    from elevenlabs_bulk_delete import BulkDeleter
+
+    deleter = BulkDeleter(api_key, base_url, agent_kb=manager)
+    report = deleter.run([{'id': ..., 'name': ...}, ...])
+    deleter.print_report(report)
+
+    python3 elevenlabs_bulk_delete.py ID1 ID2 ...
+    python3 elevenlabs_bulk_delete.py --from-file ids.txt --workers 8 --rate 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+import artifacts
+
+load_dotenv()
+
+JOURNAL_FILE = ".elevenlabs_delete_journal.jsonl"
+
+# Статусы, после которых документ больше не нужно удалять
+DONE_STATUSES = ('deleted', 'not_found')
+
+# Записи прерванных и так и не продолженных чисток старше этого срока удаляются при сжатии
+JOURNAL_MAX_AGE_DAYS = 7
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+class RateLimiter:
+    """Ограничение частоты запросов (общий на все потоки)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DeleteJournal:
+    """Журнал удалений (JSONL, по строке на попытку)"""
+
+    def __init__(self, path: Optional[str] = JOURNAL_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('status') in DONE_STATUSES:
+                        self.done.add(entry.get('id'))
+
+    def record(self, doc_id: str, name: str, status: str, detail: str = ''):
+        if status in DONE_STATUSES:
+            self.done.add(doc_id)
+        if not self.path:
+            return
+        entry = {
+            'id': doc_id,
+            'name': name,
+            'status': status,
+            'detail': detail,
+            'ts': datetime.now().isoformat()
+        }
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def compact(self, finished: Iterable[str], max_age_days: float = JOURNAL_MAX_AGE_DAYS):
+        """
+        Сжать журнал после завершённого прогона: убрать записи его документов
+        (продолжать нечего) и записи старше max_age_days, по остальным — последняя запись
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        finished = set(finished)
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        latest: Dict[str, Dict] = {}
+        with self.lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    doc_id = entry.get('id')
+                    if doc_id in finished or entry.get('ts', '') < cutoff:
+                        continue
+                    latest.pop(doc_id, None)
+                    latest[doc_id] = entry
+            if latest:
+                artifacts.write_text(self.path, ''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                                                        for entry in latest.values()))
+            else:
+                os.remove(self.path)
+
+
+class BulkDeleter:
+    """Параллельное удаление документов KB с эскалацией и журналом"""
+
+    def __init__(self, api_key: str, base_url: str = None, workers: int = 4, rate: float = 5.0,
+                 force: bool = True, agent_kb=None, journal_path: Optional[str] = JOURNAL_FILE,
+                 retries: int = 3, progress_every: int = 50, log_func: Callable[[str], None] = None):
+        """
+        Args:
+            api_key: ELEVENLABS_API_KEY
+            base_url: Базовый URL API
+            workers: Размер пула потоков
+            rate: Максимум DELETE-запросов в секунду (0 — без лимита)
+            force: Разрешить DELETE ?force=true для документов, оставшихся привязанными
+            agent_kb: AgentKnowledgeBaseManager для отвязки от агента (опционально)
+            journal_path: Файл журнала (None — без журнала)
+            retries: Попыток на 429/5xx/сетевые ошибки
+            progress_every: Как часто выводить прогресс (документов)
+        """
+        self.base_url = base_url or os.getenv('ELEVENLABS_BASE_URL', "https://api.elevenlabs.io/v1")
+        self.workers = max(1, workers)
+        self.force = force
+        self.agent_kb = agent_kb
+        self.retries = retries
+        self.progress_every = progress_every
+        self.log = log_func or log
+        self.limiter = RateLimiter(rate)
+        self.journal = DeleteJournal(journal_path)
+        self.session = requests.Session()
+        self.session.headers.update({"xi-api-key": api_key})
+        self.requests_made = 0
+        self._counter_lock = threading.Lock()
+
+    # ===== ОДИН ДОКУМЕНТ =====
+
+    def delete_one(self, doc_id: str, force: bool = False) -> str:
+        """
+        Удалить документ
+
+        Returns:
+            'deleted' | 'not_found' | 'dependent' (привязан к агенту) | 'failed'
+        """
+        url = f"{self.base_url}/convai/knowledge-base/{doc_id}"
+        if force:
+            url += "?force=true"
+
+        for attempt in range(1, self.retries + 1):
+            self.limiter.wait()
+            with self._counter_lock:
+                self.requests_made += 1
+            try:
+                response = self.session.delete(url, timeout=30)
+            except requests.exceptions.RequestException:
+                status_code = None
+            else:
+                status_code = response.status_code
+                if status_code in (200, 204):
+                    return 'deleted'
+                if status_code == 404:
+                    return 'not_found'
+                if status_code == 400:
+                    return 'dependent'
+                if status_code != 429 and status_code < 500:
+                    return 'failed'
+
+            if attempt < self.retries:
+                time.sleep(attempt * 2)
+
+        return 'failed'
+
+    # ===== ПАКЕТ =====
+
+    def _run_pool(self, docs: List[Dict], force: bool, stats: Dict, start: float) -> List[Dict]:
+        """Удалить пакет в пуле потоков, вернуть документы со статусом 'dependent'"""
+        dependent = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kb-delete") as pool:
+            futures = {pool.submit(self.delete_one, doc['id'], force): doc for doc in docs}
+            for future in as_completed(futures):
+                doc = futures[future]
+                status = future.result()
+                if status == 'dependent':
+                    dependent.append(doc)
+                    continue
+
+                stats[status] += 1
+                stats['processed'] += 1
+                self.journal.record(doc['id'], doc.get('name', ''), status, 'force' if force else '')
+
+                if self.progress_every and stats['processed'] % self.progress_every == 0:
+                    elapsed = time.time() - start
+                    rate = stats['processed'] / elapsed if elapsed > 0 else 0
+                    self.log(f"   Прогресс: {stats['processed']}/{stats['total']} "
+                             f"({stats['deleted']} ✅, {stats['failed']} ❌) | {rate:.1f} док/сек")
+        return dependent
+
+    def run(self, docs: List[Dict]) -> Dict:
+        """
+        Удалить документы
+
+        Args:
+            docs: [{'id': ..., 'name': ...}, ...]
+
+        Returns:
+            Отчёт: total, skipped, deleted, not_found, dependent, failed, forced, unlinked,
+            seconds, docs_per_sec, requests, deleted_ids
+        """
+        start = time.time()
+        unique = list({doc['id']: doc for doc in docs if doc.get('id')}.values())
+        pending = [doc for doc in unique if doc['id'] not in self.journal.done]
+
+        stats = {
+            'total': len(unique),
+            'skipped': len(unique) - len(pending),
+            'processed': 0,
+            'deleted': 0,
+            'not_found': 0,
+            'dependent': 0,
+            'failed': 0,
+            'forced': 0,
+            'unlinked': 0
+        }
+        if stats['skipped']:
+            self.log(f"   📒 По журналу уже удалено: {stats['skipped']}, осталось: {len(pending)}")
+        stats['total'] = len(pending)
+
+        requests_before = self.requests_made
+        dependent = self._run_pool(pending, False, stats, start) if pending else []
+
+        # Эскалация 1: отвязка от агента одним PATCH и повтор
+        if dependent and self.agent_kb is not None:
+            self.log(f"   🔗 Привязано к агенту: {len(dependent)}, отвязываем...")
+            if self.agent_kb.apply(remove=[doc['id'] for doc in dependent], refresh=True):
+                still_dependent = self._run_pool(dependent, False, stats, start)
+                stats['unlinked'] = len(dependent) - len(still_dependent)
+                dependent = still_dependent
+
+        # Эскалация 2: принудительное удаление
+        if dependent and self.force:
+            self.log(f"   💪 Принудительное удаление (force=true): {len(dependent)}")
+            before = stats['deleted']
+            dependent = self._run_pool(dependent, True, stats, start)
+            stats['forced'] = stats['deleted'] - before
+
+        for doc in dependent:
+            stats['dependent'] += 1
+            stats['processed'] += 1
+            self.journal.record(doc['id'], doc.get('name', ''), 'dependent')
+
+        seconds = time.time() - start
+        stats.update({
+            'seconds': round(seconds, 2),
+            'docs_per_sec': round(stats['processed'] / seconds, 2) if seconds > 0 else None,
+            'requests': self.requests_made - requests_before,
+            # Включая удалённые прежним (прерванным) прогоном по журналу — их тоже нет в KB
+            'deleted_ids': sorted(self.journal.done & {doc['id'] for doc in unique})
+        })
+        # Прогон завершён — для продолжения его записи больше не нужны
+        self.journal.compact(doc['id'] for doc in unique)
+        return stats
+
+    def print_report(self, report: Dict):
+        self.log("=" * 60)
+        self.log("📊 ОТЧЁТ ОБ УДАЛЕНИИ:")
+        self.log(f"   ✅ Удалено: {report['deleted']} (из них принудительно: {report['forced']})")
+        self.log(f"   👻 Уже отсутствовали: {report['not_found']}")
+        if report['skipped']:
+            self.log(f"   📒 Пропущено по журналу: {report['skipped']}")
+        if report['unlinked']:
+            self.log(f"   🔗 Отвязано от агента: {report['unlinked']}")
+        self.log(f"   🔗 Всё ещё привязаны: {report['dependent']}")
+        self.log(f"   ❌ Ошибок: {report['failed']}")
+        self.log(f"   ⏱️  {report['seconds']}с | {report['docs_per_sec'] or 0} док/сек | запросов: {report['requests']}")
+        self.log("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовое удаление документов ElevenLabs KB')
+    parser.add_argument('ids', nargs='*', help='ID документов')
+    parser.add_argument('--from-file', help='Файл со списком ID (по одному в строке)')
+    parser.add_argument('--workers', type=int, default=4, help='Потоков (по умолчанию: 4)')
+    parser.add_argument('--rate', type=float, default=5.0, help='Запросов в секунду (по умолчанию: 5)')
+    parser.add_argument('--no-force', action='store_true', help='Не удалять привязанные документы принудительно')
+    parser.add_argument('--no-unlink', action='store_true', help='Не отвязывать документы от агента')
+    parser.add_argument('--journal', default=JOURNAL_FILE, help=f'Журнал (по умолчанию: {JOURNAL_FILE})')
+    args = parser.parse_args()
+
+    ids = list(args.ids)
+    if args.from_file:
+        with open(args.from_file, 'r', encoding='utf-8') as f:
+            ids.extend(line.strip() for line in f if line.strip())
+    if not ids:
+        parser.print_help()
+        return 1
+
+    api_key = os.getenv('ELEVENLABS_API_KEY')
+    if not api_key:
+        print("❌ ELEVENLABS_API_KEY не найден в .env файле")
+        return 1
+
+    agent_kb = None
+    if not args.no_unlink and os.getenv('ELEVENLABS_AGENT_ID'):
+        from elevenlabs_agent_kb import AgentKnowledgeBaseManager
+        agent_kb = AgentKnowledgeBaseManager(log_func=log)
+
+    deleter = BulkDeleter(api_key, workers=args.workers, rate=args.rate, force=not args.no_force,
+                          agent_kb=agent_kb, journal_path=args.journal)
+    log(f"🗑️  Удаление {len(ids)} документов ({args.workers} потоков, {args.rate} запр/сек)")
+    report = deleter.run([{'id': doc_id, 'name': ''} for doc_id in ids])
+    deleter.print_report(report)
+    return 0 if report['failed'] == 0 and report['dependent'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Локальная замена ElevenLabs API для тестов пайплайна и нагрузочных прогонов
+
+Хранит состояние в памяти и повторяет ту часть API, которой пользуются
+скрипты синхронизации:
+    - knowledge-base: список (page/page_size), создание (file и text), GET, DELETE (?force=true)
+    - knowledge-base/{id}/content
+    - knowledge-base/{id}/rag-index (POST/GET) с настраиваемой задержкой и ошибками индексации
+    - agents/{id}: GET и PATCH (глубокое слияние conversation_config)
+
+Поддерживает искусственную задержку ответа, случайные 500-е и лимит запросов (429).
+Служебные эндпоинты: GET /_fake/stats, POST /_fake/reset, POST /_fake/config.
+
+Использование:
+    python3 elevenlabs_fake_server.py --port 8765
+    python3 elevenlabs_fake_server.py --port 8765 --latency 0.05 --index-latency 3 --rate-limit 20
+    ELEVENLABS_BASE_URL=http://127.0.0.1:8765/v1 python3 elevenlabs_sync_v2.py
+
+Из кода (например, в нагрузочном драйвере):
+    with FakeElevenLabsServer(latency=0.01) as server:
+        os.environ['ELEVENLABS_BASE_URL'] = server.base_url
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import argparse
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/v1"
+
+# Шаблоны маршрутов → имя эндпоинта для статистики вызовов
+ROUTES = [
+    (re.compile(r"^/convai/knowledge-base$"), "/convai/knowledge-base"),
+    (re.compile(r"^/convai/knowledge-base/text$"), "/convai/knowledge-base/text"),
+    (re.compile(r"^/convai/knowledge-base/(?P<doc_id>[^/]+)/content$"), "/convai/knowledge-base/{id}/content"),
+    (re.compile(r"^/convai/knowledge-base/(?P<doc_id>[^/]+)/rag-index$"), "/convai/knowledge-base/{id}/rag-index"),
+    (re.compile(r"^/convai/knowledge-base/(?P<doc_id>[^/]+)$"), "/convai/knowledge-base/{id}"),
+    (re.compile(r"^/convai/agents/(?P<agent_id>[^/]+)$"), "/convai/agents/{id}"),
+]
+
+
+def deep_merge(target: Dict, patch: Dict) -> Dict:
+    """Слить patch в target (как PATCH агента в ElevenLabs: вложенные словари сливаются, остальное заменяется)"""
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+class FakeElevenLabsState:
+    """Состояние фейкового API: документы, индексы, агенты и счётчики вызовов"""
+
+    def __init__(self, latency: float = 0.0, index_latency: float = 0.0, failure_rate: float = 0.0,
+                 index_failure_rate: float = 0.0, rate_limit: int = 0, seed: Optional[int] = None):
+        self.lock = threading.RLock()
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.index_latency = index_latency
+        self.failure_rate = failure_rate
+        self.index_failure_rate = index_failure_rate
+        self.rate_limit = rate_limit
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.documents: Dict[str, Dict] = {}
+            self.contents: Dict[str, str] = {}
+            self.indexes: Dict[str, Dict] = {}
+            self.agents: Dict[str, Dict] = {}
+            self.calls: Counter = Counter()
+            self.statuses: Counter = Counter()
+            self.bytes_uploaded = 0
+            self.recent_requests: deque = deque()
+            self._next_id = 0
+
+    def configure(self, **options):
+        with self.lock:
+            for key in ("latency", "index_latency", "failure_rate", "index_failure_rate", "rate_limit"):
+                if key in options and options[key] is not None:
+                    setattr(self, key, type(getattr(self, key))(options[key]))
+
+    def new_id(self) -> str:
+        with self.lock:
+            self._next_id += 1
+            return f"fake{self._next_id:016d}"
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "calls": dict(sorted(self.calls.items())),
+                "total_calls": sum(self.calls.values()),
+                "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+                "documents": len(self.documents),
+                "bytes_uploaded": self.bytes_uploaded,
+                "agents": {agent_id: len(self.agent_doc_ids(agent_id)) for agent_id in self.agents},
+            }
+
+    def check_rate_limit(self) -> bool:
+        """True если запрос укладывается в лимит (скользящее окно 1 секунда)"""
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            while self.recent_requests and now - self.recent_requests[0] > 1.0:
+                self.recent_requests.popleft()
+            if len(self.recent_requests) >= self.rate_limit:
+                return False
+            self.recent_requests.append(now)
+            return True
+
+    # ===== ДОКУМЕНТЫ =====
+
+    def create_document(self, name: str, text: str, doc_type: str) -> Dict:
+        doc_id = self.new_id()
+        now = int(time.time())
+        size = len(text.encode("utf-8"))
+        doc = {
+            "id": doc_id,
+            "name": name,
+            "type": doc_type,
+            "metadata": {
+                "created_at_unix_secs": now,
+                "last_updated_at_unix_secs": now,
+                "size_bytes": size,
+            },
+            "supported_usages": ["prompt", "auto"],
+            "access_info": {"is_creator": True, "creator_name": "fake", "role": "admin"},
+        }
+        with self.lock:
+            self.documents[doc_id] = doc
+            self.contents[doc_id] = text
+            self.bytes_uploaded += size
+        return doc
+
+    def agent(self, agent_id: str) -> Dict:
+        with self.lock:
+            if agent_id not in self.agents:
+                now = int(time.time())
+                self.agents[agent_id] = {
+                    "agent_id": agent_id,
+                    "name": "Fake agent",
+                    "conversation_config": {
+                        "agent": {"prompt": {"prompt": "", "knowledge_base": []}},
+                        "knowledge_base": {"type": "knowledge_base", "ids": []},
+                    },
+                    "metadata": {"created_at_unix_secs": now, "updated_at_unix_secs": now},
+                    "version_id": 1,
+                }
+            return self.agents[agent_id]
+
+    def agent_doc_ids(self, agent_id: str) -> set:
+        """ID документов, привязанных к агенту (оба варианта структуры KB)"""
+        config = self.agents.get(agent_id, {}).get("conversation_config", {})
+        ids = set()
+        prompt_kb = config.get("agent", {}).get("prompt", {}).get("knowledge_base", [])
+        for item in prompt_kb or []:
+            if isinstance(item, dict) and item.get("id"):
+                ids.add(item["id"])
+        top_kb = config.get("knowledge_base", {})
+        if isinstance(top_kb, dict):
+            ids.update(top_kb.get("ids", []) or [])
+        elif isinstance(top_kb, list):
+            ids.update(x for x in top_kb if isinstance(x, str))
+        return ids
+
+    def dependent_agents(self, doc_id: str):
+        return [agent_id for agent_id in self.agents if doc_id in self.agent_doc_ids(agent_id)]
+
+    def index_status(self, doc_id: str) -> Dict:
+        index = self.indexes.get(doc_id)
+        if not index:
+            return {"indexes": []}
+        elapsed = time.monotonic() - index["started"]
+        if index["fails"] and elapsed >= self.index_latency:
+            status, progress = "failed", 100.0
+        elif elapsed >= self.index_latency:
+            status, progress = "succeeded", 100.0
+        else:
+            status = "processing"
+            progress = round(100.0 * elapsed / self.index_latency, 1) if self.index_latency else 0.0
+        return {"indexes": [{"id": f"idx_{doc_id}", "model": index["model"], "status": status,
+                             "progress_percentage": progress}]}
+
+
+class FakeElevenLabsHandler(BaseHTTPRequestHandler):
+    """HTTP-обработчик: маршрутизация запросов в FakeElevenLabsState"""
+
+    server_version = "FakeElevenLabs/1.0"
+    protocol_version = "HTTP/1.1"
+    quiet = True
+    _body: Optional[bytes] = None
+
+    @property
+    def state(self) -> FakeElevenLabsState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    # ===== ОТВЕТЫ =====
+
+    def send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.state.lock:
+            self.state.statuses[status] += 1
+
+    def send_text(self, status: int, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.state.lock:
+            self.state.statuses[status] += 1
+
+    def send_empty(self, status: int = 204) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        with self.state.lock:
+            self.state.statuses[status] += 1
+
+    def read_body(self) -> bytes:
+        """Тело запроса; читается один раз (повторный вызов — то же тело)"""
+        if self._body is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self._body = self.rfile.read(length) if length else b""
+        return self._body
+
+    def read_json(self) -> Dict:
+        body = self.read_body()
+        if not body:
+            return {}
+        try:
+            return json.loads(body.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            return {}
+
+    def read_multipart(self) -> Tuple[Dict[str, str], Optional[Tuple[str, bytes]]]:
+        """Разобрать multipart/form-data: (поля, (имя файла, содержимое))"""
+        body = self.read_body()
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=email_policy).parsebytes(header + body)
+        fields: Dict[str, str] = {}
+        file_part = None
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True) or b""
+            if filename:
+                file_part = (filename, payload)
+            elif name:
+                fields[name] = payload.decode("utf-8", errors="replace")
+        return fields, file_part
+
+    # ===== МАРШРУТИЗАЦИЯ =====
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method: str):
+        # Обработчик один на keep-alive соединение: непрочитанное тело разобралось бы как следующий запрос
+        self._body = None
+        try:
+            self.route(method)
+        finally:
+            self.read_body()
+
+    def route(self, method: str):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        if parsed.path.startswith("/_fake/"):
+            return self.handle_admin(method, parsed.path)
+
+        if not parsed.path.startswith(API_PREFIX):
+            self.read_body()
+            return self.send_json(404, {"detail": "not_found"})
+        path = parsed.path[len(API_PREFIX):]
+
+        for pattern, endpoint in ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            self.read_body()
+            return self.send_json(404, {"detail": "not_found"})
+
+        with self.state.lock:
+            self.state.calls[f"{method} {endpoint}"] += 1
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if not self.state.check_rate_limit():
+            self.read_body()
+            return self.send_json(429, {"detail": {"status": "too_many_concurrent_requests"}})
+        if self.state.failure_rate and self.state.random.random() < self.state.failure_rate:
+            self.read_body()
+            return self.send_json(500, {"detail": "injected_failure"})
+
+        handler = getattr(self, "handle_" + re.sub(r"[^a-z]+", "_", f"{method} {endpoint}".lower()).strip("_"), None)
+        if handler is None:
+            self.read_body()
+            return self.send_json(405, {"detail": "method_not_allowed"})
+        return handler(query=query, **match.groupdict())
+
+    # ===== KNOWLEDGE BASE =====
+
+    def handle_get_convai_knowledge_base(self, query):
+        page_size = int(query.get("page_size", 30))
+        page = int(query.get("page", 0))
+        cursor = query.get("cursor")
+        if cursor:
+            page = int(cursor)
+        with self.state.lock:
+            docs = sorted(self.state.documents.values(),
+                          key=lambda d: (d["metadata"]["created_at_unix_secs"], d["id"]), reverse=True)
+            chunk = docs[page * page_size:(page + 1) * page_size]
+            result = []
+            for doc in chunk:
+                item = dict(doc)
+                item["dependent_agents"] = [{"id": a, "type": "available"} for a in self.state.dependent_agents(doc["id"])]
+                result.append(item)
+        has_more = (page + 1) * page_size < len(docs)
+        self.send_json(200, {"documents": result, "has_more": has_more,
+                             "next_cursor": str(page + 1) if has_more else None})
+
+    def handle_post_convai_knowledge_base(self, query):
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            fields, file_part = self.read_multipart()
+            if not file_part:
+                return self.send_json(422, {"detail": "file is required"})
+            filename, payload = file_part
+            text = payload.decode("utf-8-sig", errors="replace")
+            name = fields.get("name") or filename
+        else:
+            data = self.read_json()
+            text, name = data.get("text", ""), data.get("name", "")
+        doc = self.state.create_document(name, text, "file")
+        self.send_json(200, {"id": doc["id"], "name": doc["name"]})
+
+    def handle_post_convai_knowledge_base_text(self, query):
+        data = self.read_json()
+        if not data.get("text"):
+            return self.send_json(422, {"detail": "text is required"})
+        doc = self.state.create_document(data.get("name") or "Untitled", data["text"], "text")
+        self.send_json(200, {"id": doc["id"], "name": doc["name"]})
+
+    def handle_get_convai_knowledge_base_id(self, query, doc_id):
+        with self.state.lock:
+            doc = self.state.documents.get(doc_id)
+            if not doc:
+                return self.send_json(404, {"detail": "document_not_found"})
+            payload = dict(doc)
+            if doc["type"] == "text":
+                payload["extracted_inner_html"] = self.state.contents[doc_id]
+        self.send_json(200, payload)
+
+    def handle_delete_convai_knowledge_base_id(self, query, doc_id):
+        force = str(query.get("force", "")).lower() == "true"
+        with self.state.lock:
+            if doc_id not in self.state.documents:
+                return self.send_json(404, {"detail": "document_not_found"})
+            dependents = self.state.dependent_agents(doc_id)
+            if dependents and not force:
+                return self.send_json(400, {"detail": {"status": "document_has_dependent_agents",
+                                                       "dependent_agents": dependents}})
+            for agent_id in dependents:
+                config = self.state.agents[agent_id]["conversation_config"]
+                prompt = config.get("agent", {}).get("prompt", {})
+                prompt["knowledge_base"] = [d for d in prompt.get("knowledge_base", []) if d.get("id") != doc_id]
+                if isinstance(config.get("knowledge_base"), dict):
+                    config["knowledge_base"]["ids"] = [i for i in config["knowledge_base"].get("ids", []) if i != doc_id]
+            self.state.documents.pop(doc_id, None)
+            self.state.contents.pop(doc_id, None)
+            self.state.indexes.pop(doc_id, None)
+        self.send_empty(204)
+
+    def handle_get_convai_knowledge_base_id_content(self, query, doc_id):
+        with self.state.lock:
+            text = self.state.contents.get(doc_id)
+        if text is None:
+            return self.send_json(404, {"detail": "document_not_found"})
+        self.send_text(200, text)
+
+    def handle_post_convai_knowledge_base_id_rag_index(self, query, doc_id):
+        data = self.read_json()
+        with self.state.lock:
+            if doc_id not in self.state.documents:
+                return self.send_json(404, {"detail": "document_not_found"})
+            if doc_id not in self.state.indexes:
+                fails = bool(self.state.index_failure_rate) and self.state.random.random() < self.state.index_failure_rate
+                self.state.indexes[doc_id] = {"started": time.monotonic(), "fails": fails,
+                                              "model": data.get("model", "e5_mistral_7b_instruct")}
+            status = self.state.index_status(doc_id)["indexes"][0]
+        self.send_json(200, status)
+
+    def handle_get_convai_knowledge_base_id_rag_index(self, query, doc_id):
+        with self.state.lock:
+            if doc_id not in self.state.documents:
+                return self.send_json(404, {"detail": "document_not_found"})
+            status = self.state.index_status(doc_id)
+        self.send_json(200, status)
+
+    # ===== АГЕНТЫ =====
+
+    def handle_get_convai_agents_id(self, query, agent_id):
+        with self.state.lock:
+            payload = json.loads(json.dumps(self.state.agent(agent_id)))
+        self.send_json(200, payload)
+
+    def handle_patch_convai_agents_id(self, query, agent_id):
+        data = self.read_json()
+        with self.state.lock:
+            agent = self.state.agent(agent_id)
+            patch = {k: v for k, v in data.items() if k not in ("agent_id", "metadata", "version_id")}
+            deep_merge(agent, patch)
+            agent["metadata"]["updated_at_unix_secs"] = int(time.time())
+            agent["version_id"] += 1
+            payload = json.loads(json.dumps(agent))
+        self.send_json(200, payload)
+
+    # ===== СЛУЖЕБНЫЕ =====
+
+    def handle_admin(self, method: str, path: str):
+        if method == "GET" and path == "/_fake/stats":
+            return self.send_json(200, self.state.stats())
+        if method == "POST" and path == "/_fake/reset":
+            self.read_body()
+            self.state.reset()
+            return self.send_json(200, {"status": "reset"})
+        if method == "POST" and path == "/_fake/config":
+            self.state.configure(**self.read_json())
+            return self.send_json(200, {"status": "configured"})
+        self.read_body()
+        return self.send_json(404, {"detail": "not_found"})
+
+
+class FakeElevenLabsServer:
+    """Фейковый сервер в фоновом потоке (port=0 — свободный порт)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, quiet: bool = True, **options):
+        self.state = FakeElevenLabsState(**options)
+        handler = type("Handler", (FakeElevenLabsHandler,), {"quiet": quiet})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "FakeElevenLabsServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-elevenlabs", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена ElevenLabs API (состояние в памяти)")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес (по умолчанию: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Порт (по умолчанию: 8765)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка каждого ответа (сек)")
+    parser.add_argument("--index-latency", type=float, default=0.0, help="Время RAG-индексации документа (сек)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля запросов с ответом 500 (0..1)")
+    parser.add_argument("--index-failure-rate", type=float, default=0.0, help="Доля документов с failed индексацией (0..1)")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Максимум запросов в секунду (0 — без лимита)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed для инъекции ошибок")
+    parser.add_argument("--verbose", action="store_true", help="Логировать каждый запрос")
+    args = parser.parse_args()
+
+    server = FakeElevenLabsServer(
+        host=args.host, port=args.port, quiet=not args.verbose,
+        latency=args.latency, index_latency=args.index_latency, failure_rate=args.failure_rate,
+        index_failure_rate=args.index_failure_rate, rate_limit=args.rate_limit, seed=args.seed,
+    )
+    print(f"🧪 Fake ElevenLabs API: {server.base_url}")
+    print(f"   export ELEVENLABS_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Остановлен")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Быстрое получение списка документов ElevenLabs Knowledge Base
+
+- KnowledgeBaseLister: постраничный обход без пауз, следующие страницы
+  запрашиваются заранее (пока обрабатывается текущая)
+- KBManifest: кэш .elevenlabs_kb_cache.json (id → документ + водяной знак
+  created_at). Инкрементальное обновление идёт от новых документов к старым
+  и останавливается на первой странице, целиком состоящей из документов
+  старше водяного знака, которые уже есть в кэше. Новые документы сливаются
+  в кэш, остальное не перезаписывается. Удалённые извне документы
+  отлавливает периодический полный обход (full_scan_hours); перед удалением
+  документов по кэшу вызывающий код делает полный обход (refresh(full=True)).
+
+Использование:
+    lister = KnowledgeBaseLister(api_key, base_url)
+    docs = lister.list_all()
+
+    manifest = KBManifest()
+    docs = manifest.refresh(lister)     # Инкрементально (или полный обход, если пора)
+
+    python3 elevenlabs_kb_listing.py              # Инкрементальное обновление кэша
+    python3 elevenlabs_kb_listing.py --full       # Полный обход
+"""
+
+import os
+import sys
+import time
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+import artifacts
+import serialization
+
+load_dotenv()
+
+CACHE_FILE = ".elevenlabs_kb_cache.json"
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+def created_at(doc: Dict) -> int:
+    return (doc.get('metadata') or {}).get('created_at_unix_secs') or 0
+
+
+class KnowledgeBaseLister:
+    """Постраничный обход KB с упреждающей загрузкой страниц"""
+
+    def __init__(self, api_key: str, base_url: str = None, page_size: int = 100, prefetch: int = 3,
+                 max_pages: int = 200, timeout: int = 60, log_func: Callable[[str], None] = None):
+        self.api_key = api_key
+        self.base_url = base_url or os.getenv('ELEVENLABS_BASE_URL', "https://api.elevenlabs.io/v1")
+        self.page_size = page_size
+        self.prefetch = max(1, prefetch)
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.log = log_func or log
+        self.session = requests.Session()
+        self.session.headers.update({"xi-api-key": api_key})
+        self.requests_made = 0
+
+    def fetch_page(self, page: int) -> Tuple[List[Dict], bool]:
+        """Одна страница: (документы, has_more). Исключение при HTTP-ошибке"""
+        url = f"{self.base_url}/convai/knowledge-base?page_size={self.page_size}&page={page}"
+        self.requests_made += 1
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"HTTP {response.status_code} на странице {page}: {response.text[:300]}", response=response
+            )
+        data = response.json()
+        docs = data.get('documents', data.get('knowledge_bases', []))
+        return docs, bool(data.get('has_more', False))
+
+    def iter_pages(self) -> Iterator[List[Dict]]:
+        """
+        Страницы по порядку; до prefetch следующих страниц запрашиваются параллельно.
+        Генератор можно остановить раньше — лишние запросы отменяются.
+        """
+        with ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix="kb-page") as pool:
+            pending = {}
+            next_page = 0
+            page = 0
+            try:
+                while page < self.max_pages:
+                    while next_page < min(page + self.prefetch, self.max_pages):
+                        pending[next_page] = pool.submit(self.fetch_page, next_page)
+                        next_page += 1
+
+                    docs, has_more = pending.pop(page).result()
+                    if not docs:
+                        return
+                    yield docs
+                    if not has_more:
+                        return
+                    page += 1
+            finally:
+                for future in pending.values():
+                    future.cancel()
+
+    def list_all(self) -> List[Dict]:
+        """Все документы KB"""
+        start = time.time()
+        all_docs: List[Dict] = []
+        for page, docs in enumerate(self.iter_pages()):
+            all_docs.extend(docs)
+            if page % 10 == 0:
+                self.log(f"   📄 Страница {page}: всего {len(all_docs)} документов")
+        self.log(f"   ✅ Получено {len(all_docs)} документов за {time.time() - start:.1f}с "
+                 f"({self.requests_made} запросов)")
+        return all_docs
+
+
+class KBManifest:
+    """Кэш списка документов KB с водяным знаком для инкрементального обновления"""
+
+    def __init__(self, path: str = CACHE_FILE, full_scan_hours: float = 24, log_func: Callable[[str], None] = None):
+        self.path = Path(path)
+        self.full_scan_hours = full_scan_hours
+        self.log = log_func or log
+        self.documents: Dict[str, Dict] = {}
+        self.watermark = 0
+        self.full_scan_at: Optional[str] = None
+        self.load()
+
+    # ===== ФАЙЛ КЭША =====
+
+    def load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            data = serialization.load(self.path)
+        except (OSError, ValueError) as e:
+            self.log(f"  ⚠️  Ошибка чтения кэша: {e}")
+            return False
+
+        if isinstance(data, list):
+            # Старый формат: просто список документов, водяного знака нет
+            self.documents = {doc['id']: doc for doc in data if doc.get('id')}
+            self.watermark = 0
+            self.full_scan_at = None
+        else:
+            self.documents = data.get('documents', {})
+            self.watermark = data.get('watermark', 0)
+            self.full_scan_at = data.get('full_scan_at')
+        return True
+
+    def save(self):
+        data = {
+            'watermark': self.watermark,
+            'full_scan_at': self.full_scan_at,
+            'updated_at': datetime.now().isoformat(),
+            'documents': self.documents
+        }
+        artifacts.write_json(self.path, data, indent=None)
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def age_minutes(self) -> float:
+        return (time.time() - self.path.stat().st_mtime) / 60 if self.path.exists() else float('inf')
+
+    def list(self) -> List[Dict]:
+        """Документы от новых к старым"""
+        return sorted(self.documents.values(), key=created_at, reverse=True)
+
+    # ===== ИЗМЕНЕНИЯ =====
+
+    def remove(self, doc_ids):
+        """Убрать удалённые документы (вызывается после успешного DELETE)"""
+        changed = False
+        for doc_id in doc_ids:
+            if self.documents.pop(doc_id, None) is not None:
+                changed = True
+        if changed:
+            self.save()
+
+    def needs_full_scan(self) -> bool:
+        if not self.documents or not self.watermark or not self.full_scan_at:
+            return True
+        try:
+            age = datetime.now() - datetime.fromisoformat(self.full_scan_at)
+        except ValueError:
+            return True
+        return age.total_seconds() > self.full_scan_hours * 3600
+
+    def refresh(self, lister: KnowledgeBaseLister, full: bool = False) -> List[Dict]:
+        """
+        Обновить кэш из API и вернуть все документы
+
+        Args:
+            lister: KnowledgeBaseLister
+            full: Принудительный полный обход (иначе — инкрементальный, если возможно)
+        """
+        start = time.time()
+        full = full or self.needs_full_scan()
+        requests_before = lister.requests_made
+
+        if full:
+            self.log("  🔄 Полный обход KB...")
+            docs = lister.list_all()
+            self.documents = {doc['id']: doc for doc in docs if doc.get('id')}
+            self.full_scan_at = datetime.now().isoformat()
+            added = len(self.documents)
+        else:
+            added, _, ordered = self._merge_new_pages(lister)
+            if not ordered:
+                # API вернул документы не от новых к старым — остановка по водяному знаку небезопасна
+                self.log("  ⚠️  Порядок документов не по дате создания, выполняется полный обход")
+                return self.refresh(lister, full=True)
+
+        if self.documents:
+            self.watermark = max(self.watermark, max(created_at(d) for d in self.documents.values()))
+        self.save()
+
+        mode = "полный" if full else "инкрементальный"
+        self.log(f"  💾 Кэш KB обновлён ({mode}): {len(self.documents)} документов, новых {added}, "
+                 f"запросов {lister.requests_made - requests_before}, {time.time() - start:.1f}с")
+        return self.list()
+
+    def _merge_new_pages(self, lister: KnowledgeBaseLister) -> Tuple[int, int, bool]:
+        """Слить новые документы, остановившись на первой полностью известной странице старше водяного знака"""
+        added = 0
+        pages = 0
+        previous = None
+        for docs in lister.iter_pages():
+            pages += 1
+            stale_page = True
+            for doc in docs:
+                doc_time = created_at(doc)
+                if previous is not None and doc_time > previous:
+                    return added, pages, False
+                previous = doc_time
+
+                doc_id = doc.get('id')
+                if not doc_id:
+                    continue
+                if doc_id not in self.documents:
+                    added += 1
+                if doc_time > self.watermark or doc_id not in self.documents:
+                    stale_page = False
+                self.documents[doc_id] = doc
+
+            if stale_page:
+                break
+        return added, pages, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обновление кэша списка документов KB')
+    parser.add_argument('--full', action='store_true', help='Полный обход вместо инкрементального')
+    parser.add_argument('--cache', default=CACHE_FILE, help=f'Файл кэша (по умолчанию: {CACHE_FILE})')
+    parser.add_argument('--prefetch', type=int, default=3, help='Сколько страниц запрашивать заранее')
+    args = parser.parse_args()
+
+    api_key = os.getenv('ELEVENLABS_API_KEY')
+    if not api_key:
+        print("❌ ELEVENLABS_API_KEY не найден в .env файле")
+        return 1
+
+    lister = KnowledgeBaseLister(api_key, prefetch=args.prefetch)
+    manifest = KBManifest(args.cache)
+    try:
+        docs = manifest.refresh(lister, full=args.full)
+    except requests.exceptions.RequestException as e:
+        log(f"❌ Ошибка получения документов: {e}")
+        return 1
+    log(f"📚 Документов в KB: {len(docs)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ ElevenLabs Sync v2 - Правильная синхронизация с аген
 2. Загружает только изменённые файлы (stateless: по metadata.size_bytes, опционально по хешу через /content)
 3. Заменяет старые версии на новые (не добавляет)
 4. Удаляет старые версии из KB после отвязки от агента
+5. Убирает из агента документы, исчезнувшие локально (--retired-files, шарды kb_shards.py)
 """
 
 import os
@@ -20,6 +21,13 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from elevenlabs_agent_kb import AGENT_KB_LIMIT
+from elevenlabs_bulk_delete import BulkDeleter
+from elevenlabs_upload_registry import UploadRegistry, content_hash
+import artifacts
+import metrics
+import tracing
+
 # Загружаем .env если есть
 try:
     from dotenv import load_dotenv
@@ -30,7 +38,7 @@ except ImportError:
 # Конфигурация
 API_KEY = os.environ.get('ELEVENLABS_API_KEY')
 AGENT_ID = os.environ.get('ELEVENLABS_AGENT_ID')
-BASE_URL = "https://api.elevenlabs.io/v1"
+BASE_URL = os.environ.get("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
 RAG_EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "multilingual_e5_large_instruct")
 
 # Постоянные документы (не обновляем)
@@ -42,6 +50,9 @@ PERMANENT_DOCS = {
 
 STATE_FILE = Path('./quarters_state.json')
 
+PIPELINE = 'sync_v2'
+metrics.instrument_requests()
+
 
 def log(msg: str):
     """Вывод с timestamp"""
@@ -124,6 +135,7 @@ def create_text_document(text: str, name: str) -> Optional[str]:
             timeout=(30, 180),
         )
         if resp.status_code in [200, 201]:
+            metrics.UPLOAD_BYTES.inc(utf8_size_bytes(text), pipeline=PIPELINE)
             data = resp.json()
             return data.get("id") or data.get("knowledge_base_id")
         return None
@@ -246,20 +258,27 @@ def wait_for_indexing(doc_id: str, max_wait: int = 120) -> bool:
         
         # succeeded - успешно проиндексирован (ElevenLabs API)
         if status in ['succeeded']:
+            metrics.RAG_WAIT_SECONDS.observe(time.time() - start, pipeline=PIPELINE)
             return True
         elif status in ['failed', 'rag_limit_exceeded', 'document_too_small']:
             log(f"      ❌ Ошибка индексации: {status}")
+            metrics.RAG_WAIT_SECONDS.observe(time.time() - start, pipeline=PIPELINE)
             return False
         
         # Ждём и проверяем снова
         time.sleep(5)
     
     log(f"      ⚠️  Таймаут ожидания индексации")
+    metrics.RAG_WAIT_SECONDS.observe(time.time() - start, pipeline=PIPELINE)
     return False
 
 
 def update_agent_kb(new_kb: List[Dict]) -> bool:
     """Обновить KB агента (ПРАВИЛЬНЫЙ ПУТЬ!)"""
+    if len(new_kb) > AGENT_KB_LIMIT:
+        log(f"   ❌ {len(new_kb)} документов — больше лимита агента ({AGENT_KB_LIMIT}), PATCH не отправлен")
+        return False
+
     url = f"{BASE_URL}/convai/agents/{AGENT_ID}"
     
     update_data = {
@@ -304,17 +323,12 @@ def update_agent_kb(new_kb: List[Dict]) -> bool:
 
 
 def delete_document(doc_id: str) -> bool:
-    """Удалить документ из KB"""
-    url = f"{BASE_URL}/convai/knowledge-base/{doc_id}"
-    try:
-        resp = requests.delete(url, headers=get_headers(), timeout=30)
-        if resp.status_code in [200, 204]:
-            return True
-        # fallback: force delete
-        resp2 = requests.delete(f"{url}?force=true", headers=get_headers(), timeout=30)
-        return resp2.status_code in [200, 204]
-    except Exception:
-        return False
+    """Удалить документ из KB (force=true, только если документ привязан к агенту)"""
+    deleter = BulkDeleter(API_KEY, base_url=BASE_URL, rate=0, journal_path=None, log_func=log)
+    status = deleter.delete_one(doc_id)
+    if status == 'dependent':
+        status = deleter.delete_one(doc_id, force=True)
+    return status in ('deleted', 'not_found')
 
 
 def init_state_from_agent(agent_docs: dict, quarters_path: Path) -> dict:
@@ -383,19 +397,24 @@ def should_update_doc_stateless(local_text: str, existing_doc_id: Optional[str],
 def sync_quarters(
     quarters_dir: str = 'quarters',
     changed_files: List[str] = None,
+    retired: List[str] = None,
     dry_run: bool = False,
     strict_hash: bool = False,
     index_wait: int = 120,
-):
+) -> bool:
     """
     Главная функция синхронизации
     
     Args:
         quarters_dir: Директория с MD файлами
         changed_files: Список изменённых файлов (опционально)
+        retired: Имена документов, которых больше нет локально — убрать из агента и KB
         dry_run: Только показать что будет сделано
         strict_hash: При равном size_bytes сверять контент через /content
         index_wait: Максимальное ожидание индексации (сек)
+
+    Returns:
+        True, если все изменения применены (или применять нечего)
     """
     log("=" * 60)
     log("🚀 ElevenLabs Sync v2")
@@ -403,26 +422,31 @@ def sync_quarters(
     
     if not API_KEY or not AGENT_ID:
         log("❌ Установите ELEVENLABS_API_KEY и ELEVENLABS_AGENT_ID")
-        return
+        return False
     
     quarters_path = Path(quarters_dir)
-    
+    registry = UploadRegistry()
+    stages = metrics.StageTimer(PIPELINE)
+
     # Шаг 1: Получаем текущие документы агента
     log("\n📥 Шаг 1: Получение документов агента...")
+    stages.start('list')
     agent_kb = get_agent_kb()
     log(f"   Документов в агенте: {len(agent_kb)}")
     
     # Создаём словарь name → doc для агента
     agent_docs = {doc['name']: doc for doc in agent_kb}
+    retired_names = {name for name in (retired or []) if name in agent_docs and name not in PERMANENT_DOCS}
     
     # Шаг 2: Определяем какие файлы изменились
     log("\n🔍 Шаг 2: Проверка изменений...")
+    stages.start('diff')
     
     files_to_update = []
     files_to_update_names = set()  # Защита от дубликатов
     
     # Если передан список файлов, используем его
-    if changed_files:
+    if changed_files is not None:
         # Убираем дубликаты из changed_files
         unique_files = list(dict.fromkeys(changed_files))
         md_files = [quarters_path / f for f in unique_files if f.endswith('.md')]
@@ -438,6 +462,12 @@ def sync_quarters(
         
         local_text = read_text_file(str(md_file))
         existing_doc_id = agent_docs.get(name, {}).get('id')
+        text_hash = content_hash(local_text)
+
+        # Реестр загрузок: документ агента загружен именно с этим текстом — API не нужен
+        if existing_doc_id and registry.hash_of(existing_doc_id) == text_hash:
+            log(f"   ✅ {name} (без изменений)")
+            continue
 
         # Stateless сравнение с KB
         if should_update_doc_stateless(local_text, existing_doc_id, strict_hash=strict_hash) and name not in files_to_update_names:
@@ -446,6 +476,7 @@ def sync_quarters(
                 'name': name,
                 'path': str(md_file),
                 'hash': calculate_hash_text(local_text),
+                'content_hash': text_hash,
                 'old_doc_id': existing_doc_id
             })
             if existing_doc_id:
@@ -454,25 +485,50 @@ def sync_quarters(
                 log(f"   ➕ {name} (новый документ)")
         else:
             log(f"   ✅ {name} (без изменений)")
+
+    for name in sorted(retired_names):
+        log(f"   🗑️  {name} (удалён локально)")
     
-    if not files_to_update:
+    if not files_to_update and not retired_names:
         log("\n✅ Нет изменений для синхронизации")
-        return
+        return True
     
-    log(f"\n📊 К обновлению: {len(files_to_update)} файлов")
+    log(f"\n📊 К обновлению: {len(files_to_update)} файлов, к удалению: {len(retired_names)}")
+
+    # Агент не примет больше AGENT_KB_LIMIT документов — не загружаем то, что не сможем подключить
+    kept_names = set(agent_docs) - retired_names
+    agent_total = len(kept_names | files_to_update_names)
+    if agent_total > AGENT_KB_LIMIT:
+        log(f"\n❌ После синхронизации в агенте было бы {agent_total} документов, лимит — {AGENT_KB_LIMIT}")
+        log("   💡 Укрупните раскладку (kb_shards.py --budget) или уберите документы из агента")
+        return False
     
     if dry_run:
         log("\n⚠️  DRY RUN - изменения не применены")
-        return
+        return False
     
     # Шаг 3: Загружаем новые версии
     log("\n📤 Шаг 3: Загрузка новых версий...")
+    stages.start('upload')
     
     uploaded = []
     for file_info in files_to_update:
         log(f"   📤 {file_info['name']}...", )
         
-        new_doc_id = upload_document(file_info['path'], file_info['name'])
+        with tracing.span('sync_v2.upload_document', document=file_info['name']):
+            # Такой же текст уже есть в KB (другое имя или прерванный прогон) — используем его
+            entry = registry.find(file_info['content_hash'], exists=lambda d: get_kb_document_info(d) is not None)
+            if entry:
+                new_doc_id = entry['doc_id']
+                file_info['reused'] = True
+                file_info['indexed'] = entry.get('indexed', False)
+                log(f"      ♻️  Уже в KB: {new_doc_id[:20]}...")
+            else:
+                new_doc_id = upload_document(file_info['path'], file_info['name'])
+                if new_doc_id:
+                    registry.register(file_info['content_hash'], new_doc_id, file_info['name'])
+                    registry.save()
+
         if new_doc_id:
             file_info['new_doc_id'] = new_doc_id
             uploaded.append(file_info)
@@ -480,12 +536,13 @@ def sync_quarters(
         else:
             log(f"   ❌ {file_info['name']} - ошибка загрузки")
     
-    if not uploaded:
+    if files_to_update and not uploaded:
         log("❌ Ничего не загружено")
-        return
+        return False
     
     # Шаг 4: Ожидание индексации документов
     log("\n⏳ Шаг 4: Ожидание индексации...")
+    stages.start('index_wait')
     
     indexed = []
     for file_info in uploaded:
@@ -494,9 +551,19 @@ def sync_quarters(
         
         log(f"   🔍 {name}...", )
         
+        if file_info.get('indexed'):
+            indexed.append(file_info)
+            log(f"   ✅ {name} проиндексирован (ранее)")
+            continue
+
         # Ждём индексации (по умолчанию 120 секунд)
-        if wait_for_indexing(doc_id, max_wait=index_wait):
+        with tracing.span('sync_v2.index_document', document=name, doc_id=doc_id) as doc_span:
+            ready = wait_for_indexing(doc_id, max_wait=index_wait)
+            if doc_span is not None:
+                doc_span.set_attribute('indexed', ready)
+        if ready:
             indexed.append(file_info)
+            registry.mark_indexed([doc_id])
             log(f"   ✅ {name} проиндексирован")
         else:
             # Даже если не дождались - добавляем, индексация продолжится в фоне
@@ -515,6 +582,11 @@ def sync_quarters(
     
     for doc in agent_kb:
         name = doc['name']
+
+        if name in retired_names:
+            old_doc_ids.append(doc['id'])
+            log(f"   🗑️  {name}: убран из агента")
+            continue
         
         # Пропускаем дубликаты (оставляем только первый)
         if name in seen_names:
@@ -557,27 +629,72 @@ def sync_quarters(
     log(f"   📊 Итого в агенте: {len(new_agent_kb)} документов")
     
     # Обновляем агента
+    registry.save()
+    stages.start('agent_patch')
     if not update_agent_kb(new_agent_kb):
-        return
+        return False
+    stages.stop()
     
+    # Документы, которые остаются в агенте (в т.ч. повторно использованные), не удаляем
+    in_use = {d.get('id') for d in new_agent_kb}
+    old_doc_ids = [doc_id for doc_id in dict.fromkeys(old_doc_ids) if doc_id not in in_use]
+
     # Шаг 6: Удаляем старые версии из KB
     if old_doc_ids:
         log("\n🗑️  Шаг 6: Удаление старых версий...")
+        stages.start('delete')
         time.sleep(2)  # Даём время на отвязку
         
+        # Документы уже отвязаны PATCH'ем агента выше; оставшиеся привязанными удаляются с force=true
+        deleter = BulkDeleter(API_KEY, base_url=BASE_URL, log_func=log)
+        report = deleter.run([{'id': old_id, 'name': old_id} for old_id in old_doc_ids])
+        registry.forget(report['deleted_ids'])
         for old_id in old_doc_ids:
-            if delete_document(old_id):
+            if old_id in report['deleted_ids']:
                 log(f"   ✅ Удалён: {old_id[:20]}...")
             else:
                 log(f"   ⚠️  Не удалён: {old_id[:20]}...")
-    
+        deleter.print_report(report)
+        stages.stop()
+
+    registry.save()
+
+    metrics.DOCS_CHANGED.set(len(uploaded), pipeline=PIPELINE, action='uploaded')
+    metrics.DOCS_CHANGED.set(sum(1 for f in uploaded if f.get('reused')), pipeline=PIPELINE, action='reused')
+    metrics.DOCS_CHANGED.set(len(indexed), pipeline=PIPELINE, action='indexed')
+    metrics.DOCS_CHANGED.set(len(old_doc_ids), pipeline=PIPELINE, action='deleted')
+
     # Итоги
     log("\n" + "=" * 60)
     log("📊 ИТОГИ:")
     log(f"   📤 Загружено: {len(uploaded)}")
+    log(f"   ♻️  Повторно использовано: {sum(1 for f in uploaded if f.get('reused'))}")
     log(f"   ✅ Проиндексировано: {len(indexed)}")
     log(f"   🗑️  Удалено старых: {len(old_doc_ids)}")
     log("=" * 60)
+    return len(uploaded) == len(files_to_update)
+
+
+def read_list(path: Optional[str]) -> Optional[List[str]]:
+    """Строки файла-списка; нет файла — пустой список (применять нечего), путь не задан — None"""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def consume_list(path: Optional[str], applied: List[str]):
+    """Убрать из файла-списка применённые строки; дописанные после чтения остаются"""
+    if not path or not applied or not os.path.exists(path):
+        return
+    applied_set = set(applied)
+    rest = [name for name in read_list(path) if name not in applied_set]
+    if rest:
+        artifacts.write_text(path, "\n".join(rest))
+    else:
+        os.remove(path)
 
 
 def main():
@@ -585,23 +702,33 @@ def main():
     parser.add_argument('--dir', default='quarters', help='Директория с MD файлами')
     parser.add_argument('--dry-run', action='store_true', help='Только показать изменения')
     parser.add_argument('--changed-files', type=str, help='Файл со списком изменённых файлов')
+    parser.add_argument('--retired-files', type=str, help='Файл со списком документов, удалённых локально')
     parser.add_argument('--strict-hash', action='store_true', help='При равном size_bytes сверять контент через /content')
     parser.add_argument('--index-wait', type=int, default=int(os.environ.get("RAG_INDEXING_TIMEOUT", "120")), help='Ожидание индексации (сек)')
     
     args = parser.parse_args()
     
-    changed_files = None
-    if args.changed_files:
-        with open(args.changed_files, 'r') as f:
-            changed_files = [line.strip() for line in f if line.strip()]
-    
-    sync_quarters(
-        quarters_dir=args.dir,
-        changed_files=changed_files,
-        dry_run=args.dry_run,
-        strict_hash=args.strict_hash,
-        index_wait=args.index_wait,
-    )
+    # Списки (kb_shards.py копит их между запусками) очищаются только после успешной синхронизации
+    changed_files = read_list(args.changed_files)
+    retired = read_list(args.retired_files)
+        
+    success = False
+    try:
+        with metrics.stage(PIPELINE, 'total'):
+            applied = sync_quarters(
+                quarters_dir=args.dir,
+                changed_files=changed_files,
+                retired=retired,
+                dry_run=args.dry_run,
+                strict_hash=args.strict_hash,
+                index_wait=args.index_wait,
+            )
+        if applied and not args.dry_run:
+            consume_list(args.changed_files, changed_files)
+            consume_list(args.retired_files, retired)
+        success = True
+    finally:
+        metrics.finish_run(PIPELINE, success=success, write=not args.dry_run)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Реестр загрузок в ElevenLabs Knowledge Base по содержимому
+
+sha256 нормализованного текста → doc_id. Перед загрузкой документа скрипты
+синхронизации проверяют реестр: если такой же текст уже загружен (под другим
+именем или в прерванном прогоне) и документ ещё существует в KB, используется
+его ID — без повторной загрузки, ожидания индексации и последующей чистки дублей.
+
+Нормализация: без BOM, переводы строк \\n, без хвостовых пробелов в строках
+и пустых строк в конце файла.
+
+Использование:
+    registry = UploadRegistry()
+    text_hash = content_hash(text)
+    entry = registry.find(text_hash, exists=document_exists)
+    if entry:
+        doc_id = entry['doc_id']
+    else:
+        doc_id = upload(...)
+        registry.register(text_hash, doc_id, name)
+    registry.save()
+
+    python3 elevenlabs_upload_registry.py --stats
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+import artifacts
+import serialization
+
+REGISTRY_FILE = ".elevenlabs_upload_registry.json"
+
+
+def normalize_text(text: str) -> str:
+    """Нормализовать текст перед хешированием"""
+    text = text.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(line.rstrip() for line in text.split('\n')).rstrip('\n')
+
+
+def content_hash(text: str) -> str:
+    """sha256 нормализованного текста"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class UploadRegistry:
+    """Реестр hash → doc_id с сохранением в JSON"""
+
+    def __init__(self, path: str = REGISTRY_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.by_doc_id: Dict[str, str] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            data = serialization.load(self.path)
+        except (OSError, ValueError):
+            return
+        self.entries = data.get('entries', {})
+        self.by_doc_id = {entry['doc_id']: text_hash for text_hash, entry in self.entries.items()}
+
+    def save(self):
+        if not self.dirty or not self.path:
+            return
+        data = {
+            'updated_at': datetime.now().isoformat(),
+            'entries': self.entries
+        }
+        artifacts.write_json(self.path, data, indent=None)
+        self.dirty = False
+
+    def find(self, text_hash: str, exists: Callable[[str], bool] = None) -> Optional[Dict]:
+        """
+        Найти загруженный документ с таким содержимым
+
+        Args:
+            text_hash: content_hash() текста
+            exists: Проверка, что документ ещё есть в KB (устаревшая запись удаляется)
+        """
+        entry = self.entries.get(text_hash)
+        if not entry:
+            return None
+        if exists is not None and not exists(entry['doc_id']):
+            self.forget([entry['doc_id']])
+            return None
+        return entry
+
+    def hash_of(self, doc_id: str) -> Optional[str]:
+        return self.by_doc_id.get(doc_id)
+
+    def register(self, text_hash: str, doc_id: str, name: str, indexed: bool = False):
+        previous = self.entries.get(text_hash)
+        if previous and previous['doc_id'] == doc_id:
+            previous['indexed'] = previous.get('indexed') or indexed
+            self.dirty = True
+            return
+        if previous:
+            self.by_doc_id.pop(previous['doc_id'], None)
+        self.entries[text_hash] = {
+            'doc_id': doc_id,
+            'name': name,
+            'indexed': indexed,
+            'uploaded_at': datetime.now().isoformat()
+        }
+        self.by_doc_id[doc_id] = text_hash
+        self.dirty = True
+
+    def mark_indexed(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            text_hash = self.by_doc_id.get(doc_id)
+            if text_hash and not self.entries[text_hash].get('indexed'):
+                self.entries[text_hash]['indexed'] = True
+                self.dirty = True
+
+    def forget(self, doc_ids: Iterable[str]):
+        """Убрать удалённые из KB документы"""
+        for doc_id in doc_ids:
+            text_hash = self.by_doc_id.pop(doc_id, None)
+            if text_hash:
+                self.entries.pop(text_hash, None)
+                self.dirty = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Реестр загрузок KB по содержимому')
+    parser.add_argument('--registry', default=REGISTRY_FILE, help=f'Файл реестра (по умолчанию: {REGISTRY_FILE})')
+    parser.add_argument('--stats', action='store_true', help='Показать статистику')
+    parser.add_argument('--hash', metavar='FILE', help='Показать хеш файла и найденный doc_id')
+    args = parser.parse_args()
+
+    registry = UploadRegistry(args.registry)
+
+    if args.hash:
+        with open(args.hash, 'r', encoding='utf-8') as f:
+            text_hash = content_hash(f.read())
+        entry = registry.find(text_hash)
+        print(f"🔑 {text_hash}")
+        print(f"   {'✅ ' + entry['doc_id'] + ' (' + entry['name'] + ')' if entry else 'ℹ️  не загружался'}")
+        return 0
+
+    indexed = sum(1 for e in registry.entries.values() if e.get('indexed'))
+    names = len({e['name'] for e in registry.entries.values()})
+    print(f"📚 Записей: {len(registry.entries)} (проиндексировано: {indexed}, уникальных имён: {names})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,8 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+import parsing
+
 
 API_URL = "https://bir.by/ai/json_ai.php"
 OUTPUT_PATH = "apartments_by_price_ranges.json"
@@ -49,17 +51,7 @@ PRICE_RANGES: List[PriceRange] = [
 
 
 def safe_float(value: Any) -> float:
-    if value is None:
-        return 0.0
-    if isinstance(value, (int, float)):
-        return float(value)
-    try:
-        s = str(value)
-        # keep digits and dot only
-        cleaned = "".join(ch for ch in s if (ch.isdigit() or ch in ".-"))
-        return float(cleaned) if cleaned else 0.0
-    except Exception:
-        return 0.0
+    return parsing.to_float(value)
 
 
 def decode_unicode(value: Optional[str]) -> str:
@@ -206,13 +198,8 @@ def fetch_api() -> Dict[str, Any]:
     return resp.json()
 
 
-def main() -> int:
-    try:
-        raw_data = fetch_api()
-    except Exception as e:
-        print(f"Ошибка загрузки данных: {e}")
-        return 1
-
+def generate(raw_data: Dict[str, Any], output_path: str = OUTPUT_PATH) -> int:
+    """Записать подборку по диапазонам цены из фида (id → объект); число квартир с ценой"""
     apartments: List[Dict[str, Any]] = []
     for item_id, raw in raw_data.items():
         normalized = normalize_apartment(str(item_id), raw)
@@ -226,10 +213,21 @@ def main() -> int:
 
     result = build_ranges(apartments)
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8") as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
 
-    print(f"Готово: записано {len(apartments)} квартир в '{OUTPUT_PATH}'")
+    print(f"Готово: записано {len(apartments)} квартир в '{output_path}'")
+    return len(apartments)
+
+
+def main() -> int:
+    try:
+        raw_data = fetch_api()
+    except Exception as e:
+        print(f"Ошибка загрузки данных: {e}")
+        return 1
+
+    generate(raw_data)
     return 0
 
 
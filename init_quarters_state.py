@@ -17,7 +17,7 @@ load_dotenv()
 
 API_KEY = os.environ.get('ELEVENLABS_API_KEY')
 AGENT_ID = os.environ.get('ELEVENLABS_AGENT_ID')
-BASE_URL = "https://api.elevenlabs.io/v1"
+BASE_URL = os.environ.get("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
 
 # Список постоянных документов (не обновляем)
 PERMANENT_DOCS = [
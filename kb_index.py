@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Инвертированный индекс MD-файлов базы знаний (quarters/, elevenlabs_rag/)
+
+Проверка ссылок (validate_references.py), сверка с фидом
+(validate_synchronization.py) и поиск «где упоминается квартира №X» раньше
+заново читали и сканировали регулярками все MD-файлы на каждом запуске.
+Здесь файлы индексируются один раз:
+    - термин → {файл: [смещения в тексте]}; термины — слова (нижний регистр,
+      усечение до 6 символов, как в benchmarks/kb_retrieval.py) и числа
+    - первоклассные ключи: apt:<номер> (любое упоминание №123),
+      unit:<номер> (заголовок ### 🏠 Квартира №123), house:<номер> (Дом 12.11)
+    - индекс хранится в .kb_index.json (файлы и ключи apt/unit/house) и
+      .kb_index.words.json (слова — читаются только для поиска по словам и
+      при переиндексации) и обновляется инкрементально: файл с теми же
+      размером и mtime не читается, с тем же sha256 — не переиндексируется;
+      удалённые файлы выпадают из индекса
+
+Использование:
+    index = KBIndex()
+    index.update()                               # Только изменившиеся файлы
+    index.mentions('apt:123')                    # {файл: [смещения]}
+    index.search('двухкомнатная хельсинки')      # [(файл, оценка), ...]
+
+    python3 kb_index.py "двухкомнатная хельсинки"   # Поиск по базе знаний
+    python3 kb_index.py --apartment 123             # Где упоминается квартира №123
+    python3 kb_index.py --house 12.11               # Где упоминается дом 12.11
+    python3 kb_index.py --stats                     # Размер индекса
+"""
+
+import argparse
+import hashlib
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import artifacts
+import serialization
+
+ROOT = Path(__file__).resolve().parent
+QUARTERS_DIR = ROOT / "quarters"
+RAG_DIR = ROOT / "elevenlabs_rag"
+INDEX_FILE = ROOT / ".kb_index.json"
+
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)?|[a-zа-яё]+", re.IGNORECASE)
+APARTMENT_RE = re.compile(r"№+\s*(\d+)")
+UNIT_RE = re.compile(r"### 🏠 (?:Квартира|Пентхаус|Бизнес-апартаменты) №[№]?(\d+)")
+HOUSE_RE = re.compile(r"\bдом(?:\*\*)?[:\s*]*(\d+(?:\.\d+)?)|Волна\s*(\d+с)", re.IGNORECASE)
+
+# Ключ → регулярка (номер — первая непустая группа)
+KEYED_TERMS = (('apt', APARTMENT_RE), ('unit', UNIT_RE), ('house', HOUSE_RE))
+
+PathLike = Union[str, Path]
+
+
+def stem(token: str) -> Optional[str]:
+    """Термин для слова или числа (None — слишком короткое слово)"""
+    if token[0].isdigit():
+        return token.replace(",", ".")
+    if len(token) > 1:
+        return token[:6].lower()
+    return None
+
+
+def extract_terms(text: str) -> Dict[str, List[int]]:
+    """Термины текста со смещениями (символы от начала текста)"""
+    terms: Dict[str, List[int]] = defaultdict(list)
+    for match in TOKEN_RE.finditer(text):
+        term = stem(match.group(0))
+        if term:
+            terms[term].append(match.start())
+    for kind, pattern in KEYED_TERMS:
+        for match in pattern.finditer(text):
+            number = next(group for group in match.groups() if group)
+            terms[f"{kind}:{number}"].append(match.start())
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """Термины запроса: «№123» → apt:123, «дом 12.11» → house:12.11, слова — как в индексе"""
+    terms = [f"apt:{number}" for number in APARTMENT_RE.findall(query)]
+    terms += [f"house:{a or b}" for a, b in HOUSE_RE.findall(query)]
+    stripped = HOUSE_RE.sub(" ", APARTMENT_RE.sub(" ", query))
+    terms += [term for term in map(stem, TOKEN_RE.findall(stripped)) if term]
+    return terms
+
+
+class KBIndex:
+    """Инвертированный индекс MD-файлов с инкрементальным обновлением"""
+
+    def __init__(self, sources: Iterable[PathLike] = (QUARTERS_DIR, RAG_DIR),
+                 path: Optional[PathLike] = INDEX_FILE):
+        self.sources = [Path(source) for source in sources]
+        self.path = Path(path) if path else None
+        # файл → {source, sha256, size, mtime_ns, length}
+        self.files: Dict[str, Dict] = {}
+        # термин → {файл: [смещения]}: ключи apt:/unit:/house: и (лениво) слова
+        self.keyed: Dict[str, Dict[str, List[int]]] = {}
+        self._words: Optional[Dict[str, Dict[str, List[int]]]] = None
+        # Номер сохранения — связывает два файла индекса
+        self.generation = 0
+        self._loaded = False
+
+    @property
+    def words_path(self) -> Optional[Path]:
+        return self.path.with_name(f"{self.path.stem}.words{self.path.suffix}") if self.path else None
+
+    @staticmethod
+    def file_key(path: Path) -> str:
+        try:
+            return path.resolve().relative_to(ROOT).as_posix()
+        except ValueError:
+            return str(path.resolve())
+
+    def load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = serialization.load(self.path)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION:
+            self.files = data.get('files', {})
+            self.keyed = data.get('postings', {})
+            self.generation = data.get('generation', 0)
+
+    @property
+    def words(self) -> Dict[str, Dict[str, List[int]]]:
+        """Постинги слов (файл читается при первом обращении)"""
+        if self._words is None:
+            self.load()
+            self._words = {}
+            data = None
+            if self.words_path and self.words_path.exists():
+                try:
+                    data = serialization.load(self.words_path)
+                except (OSError, ValueError):
+                    data = None
+            if data and data.get('version') == INDEX_VERSION and data.get('generation') == self.generation:
+                self._words = data.get('postings', {})
+            elif self.files:
+                # Файл слов от другого сохранения — переиндексировать всё
+                self.update(rebuild=True)
+        return self._words
+
+    def save(self) -> bool:
+        if not self.path:
+            return False
+        self.generation += 1
+        if self._words is not None:
+            artifacts.write_json(self.words_path, {'version': INDEX_VERSION, 'generation': self.generation,
+                                                   'postings': self._words}, indent=None)
+        return artifacts.write_json(self.path, {'version': INDEX_VERSION, 'generation': self.generation,
+                                                'files': self.files, 'postings': self.keyed}, indent=None)
+
+    def _table(self, term: str) -> Dict[str, Dict[str, List[int]]]:
+        return self.keyed if ':' in term else self.words
+
+    def _remove(self, key: str):
+        del self.files[key]
+        for table in (self.keyed, self.words):
+            for term in [term for term, files in table.items() if key in files]:
+                files = table[term]
+                del files[key]
+                if not files:
+                    del table[term]
+
+    def _add(self, key: str, source: Path, data: bytes, sha256: str, stat):
+        terms = extract_terms(data.decode('utf-8', errors='ignore'))
+        for term, offsets in terms.items():
+            self._table(term).setdefault(term, {})[key] = offsets
+        self.files[key] = {'source': self.file_key(source), 'sha256': sha256, 'size': stat.st_size,
+                           'mtime_ns': stat.st_mtime_ns, 'length': sum(map(len, terms.values()))}
+
+    def update(self, save: bool = True, rebuild: bool = False) -> Dict[str, int]:
+        """
+        Синхронизировать индекс с файлами источников (rebuild — переиндексировать всё)
+
+        Returns:
+            {'indexed': переиндексировано, 'removed': удалено, 'unchanged': без изменений}
+        """
+        if rebuild:
+            self.files, self.keyed, self._words, self._loaded = {}, {}, {}, True
+        self.load()
+        counts = Counter(indexed=0, removed=0, unchanged=0)
+        dirty = rebuild
+        found = []
+        for source in self.sources:
+            if source.exists():
+                found.extend((source, path, self.file_key(path), path.stat()) for path in sorted(source.glob('*.md')))
+        seen = {key for _, _, key, _ in found}
+
+        def same_stat(key, stat):
+            meta = self.files.get(key)
+            return meta is not None and meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns
+
+        if any(key not in seen for key in self.files) or not all(same_stat(key, stat) for _, _, key, stat in found):
+            # Переиндексация меняет и постинги слов — загрузить их до изменений
+            # (при рассогласовании файлов индекса он строится заново)
+            _ = self.words
+
+        for source, path, key, stat in found:
+            meta = self.files.get(key)
+            if same_stat(key, stat):
+                counts['unchanged'] += 1
+                continue
+            data = path.read_bytes()
+            sha256 = hashlib.sha256(data).hexdigest()
+            dirty = True
+            if meta and meta['sha256'] == sha256:
+                meta['mtime_ns'] = stat.st_mtime_ns
+                counts['unchanged'] += 1
+                continue
+            if meta:
+                self._remove(key)
+            self._add(key, source, data, sha256, stat)
+            counts['indexed'] += 1
+
+        for key in [key for key in self.files if key not in seen]:
+            self._remove(key)
+            counts['removed'] += 1
+            dirty = True
+
+        if dirty and save:
+            self.save()
+        return dict(counts)
+
+    # ===== ЗАПРОСЫ =====
+
+    def source_files(self, source: PathLike) -> List[str]:
+        """Файлы одного источника в порядке имён"""
+        self.load()
+        source_key = self.file_key(Path(source))
+        return sorted((key for key, meta in self.files.items() if meta['source'] == source_key),
+                      key=lambda key: key.rsplit('/', 1)[-1])
+
+    def mentions(self, term: str) -> Dict[str, List[int]]:
+        """{файл: [смещения]} для термина (apt:123, house:12.11 или слова)"""
+        self.load()
+        return self._table(term).get(term, {})
+
+    def keys(self, kind: str, source: Optional[PathLike] = None) -> Set[str]:
+        """Все номера ключа kind (apt, unit, house), опционально только в файлах источника"""
+        self.load()
+        prefix = f"{kind}:"
+        allowed = set(self.source_files(source)) if source is not None else None
+        return {term[len(prefix):] for term, files in self.keyed.items()
+                if term.startswith(prefix) and (allowed is None or not allowed.isdisjoint(files))}
+
+    def keys_by_file(self, kind: str) -> Dict[str, List[str]]:
+        """Файл → номера ключа kind в порядке появления в тексте (с повторами)"""
+        self.load()
+        prefix = f"{kind}:"
+        found: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        for term, files in self.keyed.items():
+            if term.startswith(prefix):
+                number = term[len(prefix):]
+                for key, offsets in files.items():
+                    found[key].extend((offset, number) for offset in offsets)
+        return {key: [number for _, number in sorted(entries)] for key, entries in found.items()}
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Файлы по запросу: BM25 по терминам (k1=1.5, b=0.75)"""
+        self.load()
+        terms = query_terms(query)
+        if not terms or not self.files:
+            return []
+        total = len(self.files)
+        average = sum(meta['length'] for meta in self.files.values()) / total or 1
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(terms):
+            files = self.mentions(term)
+            if not files:
+                continue
+            idf = math.log(1 + (total - len(files) + 0.5) / (len(files) + 0.5))
+            for key, offsets in files.items():
+                tf = len(offsets)
+                norm = 1.5 * (0.25 + 0.75 * self.files[key]['length'] / average)
+                scores[key] += idf * tf * 2.5 / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def snippet(self, key: str, offset: int, width: int = 80) -> str:
+        """Фрагмент текста вокруг смещения (файл читается только для вывода)"""
+        path = ROOT / key if not Path(key).is_absolute() else Path(key)
+        text = path.read_text(encoding='utf-8', errors='ignore')
+        start = max(0, offset - width // 2)
+        return ' '.join(text[start:start + width].split())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Поиск по инвертированному индексу MD базы знаний')
+    parser.add_argument('query', nargs='*', help='Поисковый запрос')
+    parser.add_argument('--apartment', help='Где упоминается квартира с этим номером')
+    parser.add_argument('--house', help='Где упоминается дом с этим номером (12.11, 7с)')
+    parser.add_argument('--limit', type=int, default=10, help='Сколько результатов показывать')
+    parser.add_argument('--index', default=str(INDEX_FILE), help=f'Файл индекса (по умолчанию: {INDEX_FILE.name})')
+    parser.add_argument('--rebuild', action='store_true', help='Построить индекс заново')
+    parser.add_argument('--stats', action='store_true', help='Показать размер индекса')
+    args = parser.parse_args(argv)
+
+    index = KBIndex(path=args.index)
+    counts = index.update(rebuild=args.rebuild)
+    if counts['indexed'] or counts['removed']:
+        print(f"🔄 Индекс обновлён: файлов переиндексировано {counts['indexed']}, удалено {counts['removed']}")
+
+    if args.stats:
+        tables = (index.keyed, index.words)
+        postings = sum(len(offsets) for table in tables for files in table.values() for offsets in files.values())
+        print(f"📚 Файлов: {len(index.files)}, терминов: {sum(map(len, tables))}, вхождений: {postings}")
+        for kind, _ in KEYED_TERMS:
+            print(f"   {kind}: {len(index.keys(kind))}")
+
+    term = None
+    if args.apartment:
+        term = f"apt:{args.apartment.lstrip('№')}"
+    elif args.house:
+        term = f"house:{args.house}"
+    if term:
+        files = index.mentions(term)
+        if not files:
+            print(f"❌ {term}: упоминаний нет")
+            return 1
+        print(f"📍 {term}: {sum(map(len, files.values()))} упоминаний в {len(files)} файлах")
+        for key in sorted(files):
+            offsets = files[key]
+            print(f"   {key} ({len(offsets)}): {index.snippet(key, offsets[0])}")
+        return 0
+
+    if args.query:
+        query = ' '.join(args.query)
+        results = index.search(query, limit=args.limit)
+        if not results:
+            print(f"❌ Ничего не найдено: {query}")
+            return 1
+        terms = query_terms(query)
+        for key, score in results:
+            first = min((index.mentions(term)[key][0] for term in terms if key in index.mentions(term)), default=0)
+            print(f"{score:7.2f}  {key}")
+            print(f"         {index.snippet(key, first)}")
+    elif not args.stats:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
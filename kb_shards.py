@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Раскладка кварталов базы знаний по шардам: большие — по домам и частям, мелкие — вместе
+
+MD-файлы кварталов отличаются по размеру на два порядка (от пары квартир до сотен).
+Документ KB ElevenLabs перезагружается и переиндексируется целиком, поэтому смена
+статуса одной квартиры в большом квартале гоняла 100+ КБ. Здесь из quarters/*.md
+(файлы «# 🏘️ Квартал …») строится раскладка в quarters/shards/:
+    - квартал не больше MAX_SHARD_BYTES — один документ с прежним именем и текстом
+    - больший квартал — документ-оглавление с прежним именем (общая информация,
+      статистика, список частей) и шарды по домам: <квартал>--<дом>
+    - дом больше лимита — части <квартал>--<дом>--<№ первой квартиры>; границы
+      частей привязаны к самим квартирам (crc32 ключа), а не к накопленному
+      размеру: добавление или продажа квартиры меняет одну часть, а не все
+      следующие за ней
+    - кварталы меньше MIN_SHARD_BYTES склеиваются: Kvartaly-10+23+28
+    - имена шардов стабильны, пока не меняется состав; шард пишется только при
+      изменении текста (artifacts), рядом — списки изменённых (.changed_files.txt)
+      и исчезнувших (.retired_files.txt) документов для elevenlabs_sync_v2.py;
+      списки копятся между запусками, пока синхронизация их не применит
+    - документов не больше бюджета: лимит агента (AGENT_KB_LIMIT) минус
+      постоянные документы и RAG-файлы; не укладывается — лимиты шарда растут
+      (×1.25), пока раскладка не влезет, а если не влезает совсем — ошибка
+
+Использование:
+    python3 kb_shards.py                          # quarters/*.md → quarters/shards/
+    python3 kb_shards.py --plan                   # Раскладка без записи
+    python3 kb_shards.py --benchmark              # Объём перезагрузки при смене статуса
+    python3 elevenlabs_sync_v2.py --dir quarters/shards \\
+        --changed-files quarters/shards/.changed_files.txt \\
+        --retired-files quarters/shards/.retired_files.txt
+"""
+
+import argparse
+import random
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import artifacts
+import serialization
+
+ROOT = Path(__file__).resolve().parent
+QUARTERS_DIR = ROOT / "quarters"
+RAG_DIR = ROOT / "elevenlabs_rag"
+SHARDS_DIR = QUARTERS_DIR / "shards"
+MANIFEST_NAME = ".shards.json"
+CHANGED_NAME = ".changed_files.txt"
+RETIRED_NAME = ".retired_files.txt"
+MANIFEST_VERSION = 1
+
+MAX_SHARD_BYTES = 16 * 1024
+MIN_SHARD_BYTES = 4 * 1024
+# Средний блок квартиры в MD (монитор и BirDataParser) — для частоты границ частей
+UNIT_BYTES_ESTIMATE = 600
+
+QUARTER_TITLE = "# 🏘️ Квартал"
+HOUSE_HEADING = "## 🏠 Дом "
+UNIT_HEADING = "### 🏠 "
+FLOOR_HEADING = "## 🏢 "
+APARTMENT_RE = re.compile(r"№+\s*(\d+)")
+HOUSE_FIELD_RE = re.compile(r"^\*\*Дом:\*\*[ \t]*(.+?)[ \t]*$", re.MULTILINE)
+NUMBER_PREFIX_RE = re.compile(r"^(\d+)")
+
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def slug(text: str) -> str:
+    """Часть имени документа: транслит, [A-Za-z0-9.] и дефисы"""
+    result = []
+    for char in text.strip():
+        lower = char.lower()
+        translit = lower.translate(_TRANSLIT)
+        if translit != lower:
+            result.append(translit.capitalize() if char != lower else translit)
+        elif char.isascii() and (char.isalnum() or char == '.'):
+            result.append(char)
+        else:
+            result.append('-')
+    return re.sub(r"-+", "-", ''.join(result)).strip('-') or 'x'
+
+
+def _bytes(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+class Unit:
+    """Блок квартиры: заголовок ### 🏠 … до следующего блока (с заголовком этажа перед ним)"""
+
+    __slots__ = ('house', 'number', 'key', 'text')
+
+    def __init__(self, house: str, number: str, key: str, text: str):
+        self.house = house
+        self.number = number
+        self.key = key
+        self.text = text
+
+
+class QuarterDoc:
+    """MD квартала, разобранный на вводную часть, заголовки домов, квартиры и хвост"""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.size = _bytes(text)
+        self.title = text.split('\n', 1)[0]
+        self.preamble = ''
+        self.trailer = ''
+        self.house_heads: Dict[str, str] = {}
+        self.units: List[Unit] = []
+        self._parse()
+
+    def _parse(self):
+        preamble: List[str] = []
+        trailer: List[str] = []
+        heads: Dict[str, List[str]] = {}
+        units: List[Tuple[str, List[str]]] = []
+        pending: List[str] = []
+        house = ''
+        target = preamble
+        for line in self.text.splitlines(keepends=True):
+            if line.startswith(HOUSE_HEADING):
+                house = line[len(HOUSE_HEADING):].strip()
+                target = heads.setdefault(house, [])
+            elif line.startswith(UNIT_HEADING):
+                # Заголовок этажа (BirDataParser) уходит в шард вместе с первой квартирой этажа
+                target = pending + []
+                pending = []
+                units.append((house, target))
+            elif line.startswith(FLOOR_HEADING):
+                pending.append(line)
+                target = pending
+                continue
+            elif line.startswith('## ') and (units or heads):
+                # Разделы после квартир (аналитика квартала) — в оглавление
+                target = trailer
+            target.append(line)
+        trailer.extend(pending)
+
+        self.preamble = ''.join(preamble)
+        self.trailer = ''.join(trailer)
+        self.house_heads = {name: ''.join(lines) for name, lines in heads.items()}
+        seen: Dict[str, int] = {}
+        for house, lines in units:
+            text = ''.join(lines)
+            heading = next(line for line in lines if line.startswith(UNIT_HEADING))
+            if not house:
+                # Формат монитора: дом — поле квартиры
+                match = HOUSE_FIELD_RE.search(text)
+                house = match.group(1) if match else ''
+            match = APARTMENT_RE.search(heading)
+            number = match.group(1) if match else ''
+            key = f"{house}|{number or heading.strip()}"
+            seen[key] = seen.get(key, 0) + 1
+            if seen[key] > 1:
+                key = f"{key}|{seen[key]}"
+            self.units.append(Unit(house, number, key, text))
+
+    def houses(self) -> Dict[str, List[Unit]]:
+        """Квартиры по домам в порядке документа"""
+        groups: Dict[str, List[Unit]] = {}
+        for unit in self.units:
+            groups.setdefault(unit.house, []).append(unit)
+        return groups
+
+
+def is_quarter_doc(text: str) -> bool:
+    return text.startswith(QUARTER_TITLE)
+
+
+def chunk_units(units: List[Unit], budget: int) -> List[List[Unit]]:
+    """
+    Разбить квартиры дома на части не больше budget байт
+
+    Граница — после квартиры, у которой crc32(ключ) делится на модуль, когда часть
+    уже набрала четверть бюджета (в среднем часть — половина бюджета), либо когда
+    часть упёрлась в бюджет. Границы зависят от самих квартир: после изменённой
+    квартиры разбиение возвращается к прежнему на ближайшей границе.
+    """
+    if sum(_bytes(unit.text) for unit in units) <= budget:
+        return [units]
+    min_bytes = budget // 4
+    modulus = max(2, budget // (4 * UNIT_BYTES_ESTIMATE))
+    chunks: List[List[Unit]] = []
+    current: List[Unit] = []
+    size = 0
+    for unit in units:
+        unit_bytes = _bytes(unit.text)
+        if current and size + unit_bytes > budget:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(unit)
+        size += unit_bytes
+        if size >= min_bytes and zlib.crc32(unit.key.encode('utf-8')) % modulus == 0:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _unique(name: str, taken: Dict[str, str]) -> str:
+    candidate, suffix = name, 2
+    while candidate in taken:
+        candidate = f"{name}-{suffix}"
+        suffix += 1
+    return candidate
+
+
+def shard_quarter(doc: QuarterDoc, max_bytes: int = MAX_SHARD_BYTES) -> Dict[str, str]:
+    """Шарды одного квартала: имя → текст (квартал в пределах лимита — как есть)"""
+    if doc.size <= max_bytes or not doc.units:
+        return {doc.name: doc.text}
+
+    shards: Dict[str, str] = {}
+    parts: List[Tuple[str, List[str]]] = []
+    title = doc.title + "\n\n"
+    for house, units in doc.houses().items():
+        heading = f"{HOUSE_HEADING}{house}\n\n" if house else ''
+        head = doc.house_heads.get(house, heading)
+        base = f"{doc.name}--{slug(house) if house else 'bez-doma'}"
+        chunks = chunk_units(units, max(UNIT_BYTES_ESTIMATE, max_bytes - _bytes(title) - _bytes(head)))
+        names = []
+        for index, chunk in enumerate(chunks):
+            name = base if len(chunks) == 1 else f"{base}--{chunk[0].number or index + 1}"
+            name = _unique(name, shards)
+            # Статистика дома — в первой части, в остальных только заголовок
+            shards[name] = title + (head if index == 0 else heading) + ''.join(unit.text for unit in chunk)
+            names.append(name)
+        parts.append((house, names))
+
+    toc = ["## 🗂️ Документы квартала\n\n"]
+    for house, names in parts:
+        label = f"Дом {house}" if house else "Без дома"
+        toc.append(f"- {label}: {', '.join(names)}\n")
+    index_text = doc.preamble.rstrip('\n') + "\n\n" + ''.join(toc)
+    if doc.trailer:
+        index_text += "\n" + doc.trailer
+    return {doc.name: index_text, **shards}
+
+
+def merge_small(docs: List[QuarterDoc], max_bytes: int = MAX_SHARD_BYTES) -> Dict[str, str]:
+    """Склеить мелкие кварталы (по порядку имён) в документы до max_bytes"""
+    groups: List[List[QuarterDoc]] = []
+    size = 0
+    for doc in sorted(docs, key=lambda d: d.name):
+        if not groups or size + doc.size > max_bytes:
+            groups.append([])
+            size = 0
+        groups[-1].append(doc)
+        size += doc.size
+    merged: Dict[str, str] = {}
+    for group in groups:
+        if len(group) == 1:
+            merged[group[0].name] = group[0].text
+            continue
+        labels = []
+        for doc in group:
+            match = NUMBER_PREFIX_RE.match(doc.name)
+            labels.append(match.group(1) if match else slug(doc.name))
+        name = _unique(f"Kvartaly-{'+'.join(labels)}", merged)
+        merged[name] = "\n\n---\n\n".join(doc.text.rstrip('\n') for doc in group) + "\n"
+    return merged
+
+
+def default_budget() -> int:
+    """Документов под кварталы: лимит агента минус постоянные документы и RAG-файлы (elevenlabs_rag/*.md)"""
+    from elevenlabs_agent_kb import AGENT_KB_LIMIT
+    from elevenlabs_sync_v2 import PERMANENT_DOCS
+    reserved = set(PERMANENT_DOCS) | {path.stem for path in RAG_DIR.glob("*.md")}
+    return AGENT_KB_LIMIT - len(reserved)
+
+
+def _quarter_docs(sources: Dict[str, str]) -> List[QuarterDoc]:
+    return [QuarterDoc(name, text) for name, text in sorted(sources.items()) if is_quarter_doc(text)]
+
+
+def _layout(docs: List[QuarterDoc], max_bytes: int, min_bytes: int) -> Dict[str, str]:
+    layout: Dict[str, str] = {}
+    for doc in docs:
+        if doc.size >= min_bytes:
+            layout.update(shard_quarter(doc, max_bytes))
+    layout.update(merge_small([doc for doc in docs if doc.size < min_bytes], max_bytes))
+    return dict(sorted(layout.items()))
+
+
+def _fit(docs: List[QuarterDoc], budget: int, max_bytes: int, min_bytes: int) -> Tuple[Dict[str, str], int, int]:
+    # Крупнее шарды — меньше частей домов, больше порог склейки — больше кварталов в одном документе;
+    # когда оба лимита перерастут все кварталы вместе, раскладка — один документ
+    total = sum(doc.size for doc in docs)
+    layout = _layout(docs, max_bytes, min_bytes)
+    while len(layout) > budget and (max_bytes < total or min_bytes <= total):
+        max_bytes += max_bytes // 4 + 1
+        min_bytes += min_bytes // 4 + 1
+        layout = _layout(docs, max_bytes, min_bytes)
+    return layout, max_bytes, min_bytes
+
+
+def fit_limits(sources: Dict[str, str], budget: int, max_bytes: int = MAX_SHARD_BYTES,
+               min_bytes: int = MIN_SHARD_BYTES) -> Tuple[int, int]:
+    """Лимиты шарда (max_bytes, min_bytes), при которых раскладка укладывается в budget документов (если это возможно)"""
+    _, max_bytes, min_bytes = _fit(_quarter_docs(sources), budget, max_bytes, min_bytes)
+    return max_bytes, min_bytes
+
+
+def plan_layout(sources: Dict[str, str], max_bytes: int = MAX_SHARD_BYTES,
+                min_bytes: int = MIN_SHARD_BYTES, budget: Optional[int] = None) -> Dict[str, str]:
+    """
+    Раскладка: имя документа → текст; sources — имя MD-файла (без .md) → текст, только кварталы
+
+    С budget лимиты шарда растут, пока документов не станет не больше budget; результат
+    может оказаться больше budget, только если не укладывается даже один документ.
+    """
+    docs = _quarter_docs(sources)
+    if budget is None:
+        return _layout(docs, max_bytes, min_bytes)
+    return _fit(docs, budget, max_bytes, min_bytes)[0]
+
+
+def read_sources(source_dir: Path = QUARTERS_DIR) -> Dict[str, str]:
+    """MD-файлы кварталов каталога: имя без .md → текст"""
+    sources = {}
+    for path in sorted(Path(source_dir).glob("*.md")):
+        text = path.read_text(encoding='utf-8')
+        if is_quarter_doc(text):
+            sources[path.stem] = text
+    return sources
+
+
+def read_list(path: Path) -> List[str]:
+    """Строки файла-списка (нет файла — пустой список)"""
+    try:
+        return [line.strip() for line in Path(path).read_text(encoding='utf-8').splitlines() if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def write_layout(layout: Dict[str, str], output_dir: Path = SHARDS_DIR) -> Dict[str, List[str]]:
+    """
+    Записать шарды; удалить исчезнувшие (из прошлого манифеста)
+
+    Изменённые и исчезнувшие имена добавляются к спискам, ещё не применённым
+    elevenlabs_sync_v2.py (он убирает из них применённое), — синхронизация реже
+    сборки не теряет удалённые шарды.
+
+    Returns:
+        {'changed': [имя.md, ...], 'retired': [имя, ...]} — этого запуска;
+        'pending_changed', 'pending_retired' — списки к синхронизации
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    try:
+        previous = serialization.load(manifest_path).get('shards', {})
+    except (OSError, ValueError):
+        previous = {}
+
+    changed = []
+    with artifacts.batch():
+        for name, text in layout.items():
+            if artifacts.write_text(output_dir / f"{name}.md", text):
+                changed.append(f"{name}.md")
+    retired = [name for name in previous if name not in layout]
+    for name in retired:
+        (output_dir / f"{name}.md").unlink(missing_ok=True)
+
+    artifacts.write_json(manifest_path, {
+        'version': MANIFEST_VERSION,
+        'shards': {name: {'bytes': _bytes(text)} for name, text in layout.items()},
+    })
+    # Вернувшийся шард — снова обычный изменённый документ, исчезнувший — не загружается
+    pending_changed = [name for name in dict.fromkeys(read_list(output_dir / CHANGED_NAME) + changed)
+                       if name[:-len('.md')] in layout]
+    pending_retired = [name for name in dict.fromkeys(read_list(output_dir / RETIRED_NAME) + retired)
+                       if name not in layout]
+    for file_name, names in ((CHANGED_NAME, pending_changed), (RETIRED_NAME, pending_retired)):
+        path = output_dir / file_name
+        if names:
+            artifacts.write_text(path, "\n".join(names))
+        else:
+            path.unlink(missing_ok=True)
+    return {'changed': changed, 'retired': retired,
+            'pending_changed': pending_changed, 'pending_retired': pending_retired}
+
+
+def benchmark(sources: Dict[str, str], samples: int = 200, seed: int = 42,
+              max_bytes: int = MAX_SHARD_BYTES, min_bytes: int = MIN_SHARD_BYTES,
+              budget: Optional[int] = None) -> Dict:
+    """Сколько байт уходит на перезагрузку при смене статуса одной квартиры: файлы кварталов против шардов"""
+    rnd = random.Random(seed)
+    docs = {name: QuarterDoc(name, text) for name, text in sources.items() if is_quarter_doc(text)}
+    units = [(name, unit) for name, doc in docs.items() for unit in doc.units if '**Статус:**' in unit.text]
+    if not units:
+        return {'samples': 0}
+    if budget is not None:
+        # Лимиты подбираются один раз: смена статуса не должна менять саму раскладку
+        max_bytes, min_bytes = fit_limits(sources, budget, max_bytes, min_bytes)
+    base = plan_layout(sources, max_bytes, min_bytes)
+    quarter_bytes = shard_bytes = shard_docs = 0
+    picked = [rnd.choice(units) for _ in range(samples)]
+    for name, unit in picked:
+        flipped = re.sub(r"(\*\*Статус:\*\*[^\n]*)", r"\1 (изменён)", unit.text, count=1)
+        changed_sources = dict(sources)
+        changed_sources[name] = sources[name].replace(unit.text, flipped, 1)
+        layout = plan_layout(changed_sources, max_bytes, min_bytes)
+        delta = [key for key, text in layout.items() if base.get(key) != text]
+        quarter_bytes += _bytes(changed_sources[name])
+        shard_bytes += sum(_bytes(layout[key]) for key in delta)
+        shard_docs += len(delta)
+    sizes = sorted(_bytes(text) for text in base.values())
+    return {
+        'samples': samples,
+        'quarters': len(docs),
+        'quarter_max_bytes': max(doc.size for doc in docs.values()),
+        'shards': len(base),
+        'shard_limit_bytes': max_bytes,
+        'shard_max_bytes': sizes[-1],
+        'shard_median_bytes': sizes[len(sizes) // 2],
+        'quarter_upload_bytes': round(quarter_bytes / samples),
+        'shard_upload_bytes': round(shard_bytes / samples),
+        'shard_docs_per_change': round(shard_docs / samples, 2),
+    }
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Раскладка кварталов по шардам для базы знаний')
+    parser.add_argument('--source', default=str(QUARTERS_DIR), help='Каталог MD кварталов (по умолчанию: quarters)')
+    parser.add_argument('--output', default=str(SHARDS_DIR), help='Каталог шардов (по умолчанию: quarters/shards)')
+    parser.add_argument('--max-kb', type=int, default=MAX_SHARD_BYTES // 1024, help='Предельный размер шарда, КБ')
+    parser.add_argument('--min-kb', type=int, default=MIN_SHARD_BYTES // 1024, help='Кварталы меньше — склеиваются, КБ')
+    parser.add_argument('--budget', type=int,
+                        help='Документов под кварталы (по умолчанию: лимит агента минус постоянные и RAG-документы)')
+    parser.add_argument('--plan', action='store_true', help='Показать раскладку, не записывая')
+    parser.add_argument('--benchmark', action='store_true', help='Объём перезагрузки при смене статуса квартиры')
+    parser.add_argument('--samples', type=int, default=200, help='--benchmark: число случайных смен статуса')
+    args = parser.parse_args(argv)
+
+    max_bytes, min_bytes = args.max_kb * 1024, args.min_kb * 1024
+    sources = read_sources(Path(args.source))
+    if not sources:
+        print(f"⚠️ В {args.source} нет MD-файлов кварталов")
+        return 1
+    budget = default_budget() if args.budget is None else args.budget
+
+    if args.benchmark:
+        r = benchmark(sources, args.samples, max_bytes=max_bytes, min_bytes=min_bytes, budget=budget)
+        if not r['samples']:
+            print("⚠️ Нет квартир со статусом")
+            return 1
+        print(f"📏 {r['quarters']} кварталов (до {r['quarter_max_bytes'] / 1024:.1f} КБ) → {r['shards']} шардов "
+              f"(лимит {r['shard_limit_bytes'] / 1024:.1f} КБ, до {r['shard_max_bytes'] / 1024:.1f} КБ, "
+              f"медиана {r['shard_median_bytes'] / 1024:.1f} КБ)")
+        print(f"   смена статуса одной квартиры ({r['samples']} случайных): файл квартала "
+              f"{r['quarter_upload_bytes'] / 1024:.1f} КБ | шарды {r['shard_upload_bytes'] / 1024:.1f} КБ "
+              f"({r['shard_docs_per_change']} док.)")
+        return 0
+
+    layout, fitted_max, fitted_min = _fit(_quarter_docs(sources), budget, max_bytes, min_bytes)
+    if fitted_max != max_bytes:
+        print(f"📏 {budget} документов не хватает для шардов до {max_bytes / 1024:.0f} КБ: "
+              f"лимит шарда {fitted_max / 1024:.1f} КБ, склейка до {fitted_min / 1024:.1f} КБ")
+    if args.plan:
+        for name, text in layout.items():
+            print(f"{_bytes(text) / 1024:8.1f} КБ  {name}")
+        print(f"\n📋 {len(sources)} кварталов → {len(layout)} документов (бюджет {budget})")
+    if len(layout) > budget:
+        print(f"❌ Раскладка ({len(layout)} документов) не укладывается в бюджет {budget} документов агента")
+        return 1
+    if args.plan:
+        return 0
+
+    result = write_layout(layout, Path(args.output))
+    print(f"✅ {len(sources)} кварталов → {len(layout)} документов в {args.output}: "
+          f"изменено {len(result['changed'])}, удалено {len(result['retired'])}; к синхронизации: "
+          f"{len(result['pending_changed'])} изменённых, {len(result['pending_retired'])} удалённых")
+    for name in result['changed']:
+        print(f"   📝 {name}")
+    for name in result['retired']:
+        print(f"   🗑️  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
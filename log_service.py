@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Чтение и ротация лога data_updater.log без чтения файла целиком
+
+- LogReader.tail(n): последние n строк — чтение блоками с конца файла
+  (стоимость зависит от n, а не от размера лога)
+- LogReader.read_since(offset): новые строки начиная с байтового смещения;
+  клиент хранит возвращённый offset и при следующем опросе получает только
+  дописанное. Ротация определяется по смене inode / уменьшению файла
+- LogIndex: разреженный индекс «номер строки → смещение» (каждая stride-я
+  строка), дополняется только по новым байтам; даёт число строк и переход
+  к строке N без полного чтения
+- LogReader.follow(offset): генератор новых строк для потока SSE
+- make_rotating_handler(): RotatingFileHandler, сжимающий старые сегменты
+  в .gz (data_updater.log.1.gz, ...)
+
+Использование:
+    reader = LogReader('data_updater.log')
+    chunk = reader.tail(50)                 # {'lines': [...], 'offset': ..., 'file_id': ...}
+    chunk = reader.read_since(chunk['offset'], chunk['file_id'])
+
+    python3 log_service.py --tail 100
+    python3 log_service.py --follow
+"""
+
+import os
+import sys
+import gzip
+import time
+import shutil
+import argparse
+import threading
+import logging.handlers
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LOG_FILE = "data_updater.log"
+
+# Ротация: 5 МБ на сегмент, 5 сжатых сегментов
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Размер блока при чтении с конца и максимум байт за один read_since
+BLOCK_SIZE = 64 * 1024
+MAX_CHUNK_BYTES = 256 * 1024
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def make_rotating_handler(path: str = LOG_FILE, max_bytes: int = LOG_MAX_BYTES,
+                          backup_count: int = LOG_BACKUP_COUNT) -> logging.handlers.RotatingFileHandler:
+    """Файловый обработчик логов с ротацией и gzip-сжатием старых сегментов"""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding='utf-8')
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def file_id(stat: os.stat_result) -> str:
+    """Идентификатор файла: меняется при ротации"""
+    return f"{stat.st_dev}-{stat.st_ino}"
+
+
+def _decode(lines: List[bytes]) -> List[str]:
+    return [line.decode('utf-8', errors='replace') for line in lines]
+
+
+class LogIndex:
+    """Разреженный индекс строк: смещение каждой stride-й строки"""
+
+    def __init__(self, stride: int = 1000):
+        self.stride = stride
+        self.reset()
+
+    def reset(self, fid: Optional[str] = None):
+        self.file_id = fid
+        self.checkpoints: List[int] = [0]  # checkpoints[k] — смещение строки k * stride
+        self.lines = 0
+        self.indexed_to = 0
+
+    def update(self, path: Path, stat: os.stat_result):
+        """Дочитать новые байты (после ротации — заново)"""
+        fid = file_id(stat)
+        if fid != self.file_id or stat.st_size < self.indexed_to:
+            self.reset(fid)
+        if stat.st_size == self.indexed_to:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(self.indexed_to)
+            position = self.indexed_to
+            last_line_end = self.indexed_to
+            while True:
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    break
+                start = 0
+                while True:
+                    newline = block.find(b'\n', start)
+                    if newline < 0:
+                        break
+                    self.lines += 1
+                    if self.lines % self.stride == 0:
+                        self.checkpoints.append(position + newline + 1)
+                    start = newline + 1
+                if start:
+                    last_line_end = position + start
+                position += len(block)
+            # Незавершённая последняя строка будет проиндексирована при следующем обновлении
+            self.indexed_to = last_line_end
+
+    def offset_of(self, line: int) -> Tuple[int, int]:
+        """Ближайшая контрольная точка не дальше строки line: смещение и сколько строк пропустить"""
+        line = max(0, min(line, self.lines))
+        return self.checkpoints[line // self.stride], line % self.stride
+
+
+class LogReader:
+    """Чтение лога по смещениям и с конца"""
+
+    def __init__(self, path: str = LOG_FILE, index_stride: int = 1000):
+        self.path = Path(path)
+        self.index = LogIndex(index_stride)
+        self.lock = threading.Lock()
+
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.path)
+        except OSError:
+            return None
+
+    def _empty(self, stat: Optional[os.stat_result] = None, rotated: bool = False) -> Dict:
+        return {
+            'lines': [],
+            'offset': stat.st_size if stat else 0,
+            'size': stat.st_size if stat else 0,
+            'file_id': file_id(stat) if stat else None,
+            'rotated': rotated
+        }
+
+    def tail(self, n: int = 100) -> Dict:
+        """Последние n строк: блоки читаются с конца, пока не набрано n переводов строки"""
+        stat = self._stat()
+        if stat is None or n <= 0:
+            return self._empty(stat)
+
+        with open(self.path, 'rb') as f:
+            end = stat.st_size
+            # Незавершённую последнюю строку не отдаём — она придёт в следующем read_since
+            f.seek(max(0, end - 1))
+            if end and f.read(1) != b'\n':
+                block_start = max(0, end - BLOCK_SIZE)
+                while True:
+                    f.seek(block_start)
+                    block = f.read(end - block_start)
+                    newline = block.rfind(b'\n')
+                    if newline >= 0:
+                        end = block_start + newline + 1
+                        break
+                    if block_start == 0:
+                        end = 0
+                        break
+                    block_start = max(0, block_start - BLOCK_SIZE)
+
+            data = b''
+            position = end
+            while position > 0 and data.count(b'\n') <= n:
+                read_size = min(BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+
+        lines = data.split(b'\n')[:-1] if data else []
+        result = self._empty(stat)
+        result.update({'lines': _decode(lines[-n:]), 'offset': end})
+        return result
+
+    def read_since(self, offset: int, file_id_hint: Optional[str] = None,
+                   max_bytes: int = MAX_CHUNK_BYTES) -> Dict:
+        """
+        Строки, дописанные после offset (не более max_bytes за вызов).
+        Если файл ротирован — чтение с начала нового файла, rotated=True.
+        """
+        stat = self._stat()
+        if stat is None:
+            return self._empty(None, rotated=offset > 0)
+
+        rotated = (file_id_hint is not None and file_id_hint != file_id(stat)) or offset > stat.st_size
+        if rotated or offset < 0:
+            offset = 0
+        if offset == stat.st_size:
+            return self._empty(stat, rotated)
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+
+        newline = data.rfind(b'\n')
+        if newline < 0:
+            # Незавершённая строка (или строка длиннее max_bytes — отдаём как есть)
+            if len(data) < max_bytes:
+                data = b''
+            lines = [data] if data else []
+            consumed = len(data)
+        else:
+            lines = data[:newline].split(b'\n')
+            consumed = newline + 1
+
+        result = self._empty(stat, rotated)
+        result.update({'lines': _decode(lines), 'offset': offset + consumed})
+        return result
+
+    def read_lines(self, start_line: int, count: int = 100) -> Dict:
+        """Строки начиная с номера start_line (через индекс)"""
+        stat = self._stat()
+        if stat is None:
+            return self._empty(None)
+        with self.lock:
+            self.index.update(self.path, stat)
+            offset, skip = self.index.offset_of(start_line)
+            total = self.index.lines
+
+        lines: List[bytes] = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                offset += len(raw)
+                if skip:
+                    skip -= 1
+                    continue
+                lines.append(raw[:-1])
+                if len(lines) >= count:
+                    break
+
+        result = self._empty(stat)
+        result.update({'lines': _decode(lines), 'offset': offset, 'total_lines': total})
+        return result
+
+    def line_count(self) -> int:
+        stat = self._stat()
+        if stat is None:
+            return 0
+        with self.lock:
+            self.index.update(self.path, stat)
+            return self.index.lines
+
+    def follow(self, offset: int, file_id_hint: Optional[str] = None, poll_interval: float = 1.0,
+               heartbeat: float = 15.0) -> Iterator[Optional[Dict]]:
+        """Новые порции лога по мере записи; None — keep-alive, если ничего не пришло heartbeat секунд"""
+        last_sent = time.time()
+        while True:
+            chunk = self.read_since(offset, file_id_hint)
+            offset = chunk['offset']
+            file_id_hint = chunk['file_id']
+            if chunk['lines'] or chunk['rotated']:
+                last_sent = time.time()
+                yield chunk
+            elif time.time() - last_sent >= heartbeat:
+                last_sent = time.time()
+                yield None
+            time.sleep(poll_interval)
+
+    def segments(self) -> List[Dict]:
+        """Текущий файл и сжатые сегменты ротации"""
+        result = []
+        for path in sorted(self.path.parent.glob(self.path.name + '*')):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            result.append({'name': path.name, 'size': stat.st_size, 'modified': stat.st_mtime})
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Чтение лога data_updater.log')
+    parser.add_argument('--file', default=LOG_FILE, help=f'Файл лога (по умолчанию: {LOG_FILE})')
+    parser.add_argument('--tail', type=int, default=50, help='Сколько последних строк показать')
+    parser.add_argument('--follow', '-f', action='store_true', help='Следить за новыми строками')
+    parser.add_argument('--count', action='store_true', help='Показать число строк и сегменты')
+    args = parser.parse_args()
+
+    reader = LogReader(args.file)
+
+    if args.count:
+        print(f"📋 Строк: {reader.line_count()}")
+        for segment in reader.segments():
+            print(f"   {segment['name']}: {segment['size']} байт")
+        return 0
+
+    chunk = reader.tail(args.tail)
+    for line in chunk['lines']:
+        print(line)
+
+    if args.follow:
+        try:
+            for chunk in reader.follow(chunk['offset'], chunk['file_id']):
+                if chunk:
+                    for line in chunk['lines']:
+                        print(line, flush=True)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
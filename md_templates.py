@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Скомпилированные шаблоны Markdown для документов кварталов
+
+Все генераторы MD (sync-with-monitoring, bir_data_parser, create_emirats_file,
+quarters/auto_update.py, quarters/update_quarters_robust.py) собирают
+документы из одних и тех же фрагментов. Здесь эти фрагменты описаны один раз:
+    - Template('**Дом:** {house}\\n') разбирается при импорте и компилируется
+      в функцию с одним f-string — без разбора формата и конкатенаций на каждый вызов
+    - поля со спецификацией формата ({area:.1f}, {price:,}) идут через
+      format_number — результат кешируется по (тип, значение, спецификация)
+    - документ собирается в список частей и склеивается один раз ''.join
+
+Вывод побайтно совпадает с прежними генераторами на += и f-строках.
+
+Использование:
+    parts = [QUARTER_TITLE.render(quarter=name)]
+    parts.append(AREA_RANGE.render(min_area=30.5, max_area=88.0))
+    text = ''.join(parts)
+
+    python3 md_templates.py --benchmark        # рендеринг на 1000 квартир
+"""
+
+import argparse
+import string
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+# Размер кеша форматирования чисел: цены и площади повторяются внутри квартала и между прогонами
+FORMAT_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE, typed=True)
+def _cached_format(value, spec: str) -> str:
+    return format(value, spec)
+
+
+def format_number(value, spec: str = '') -> str:
+    """format(value, spec) с кешем по значению (typed: 1 и 1.0 кешируются раздельно)"""
+    try:
+        return _cached_format(value, spec)
+    except TypeError:
+        # Нехешируемое значение — без кеша
+        return format(value, spec)
+
+
+def money(value) -> str:
+    """Число с разделителем разрядов (как f'{value:,}'), не число — как есть"""
+    if isinstance(value, (int, float)):
+        return format_number(value, ',')
+    return f"{value}"
+
+
+class Template:
+    """Шаблон с полями {name} / {name:spec}, скомпилированный в функцию render(**values)"""
+
+    def __init__(self, source: str, name: str = 'template'):
+        self.source = source
+        self.name = name
+        self.fields: List[str] = []
+        self.render: Callable[..., str] = self._compile()
+
+    def _compile(self) -> Callable[..., str]:
+        body = []
+        namespace: Dict[str, object] = {'_fmt': format_number}
+        for literal, field, spec, conversion in string.Formatter().parse(self.source):
+            body.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion:
+                raise ValueError(f"Шаблон {self.name}: неподдерживаемое поле {{{field}}}")
+            if field not in self.fields:
+                self.fields.append(field)
+            if spec:
+                spec_name = f"_s{len(namespace)}"
+                namespace[spec_name] = spec
+                body.append(f"{{_fmt({field}, {spec_name})}}")
+            else:
+                body.append(f"{{{field}}}")
+
+        args = ', '.join(self.fields)
+        signature = f"*, {args}" if args else ""
+        code = f"def render({signature}):\n    return f{''.join(body)!r}\n"
+        exec(compile(code, f"<template {self.name}>", 'exec'), namespace)
+        return namespace['render']
+
+    def __repr__(self):
+        return f"Template({self.name!r}, fields={self.fields})"
+
+
+# ===== ОБЩИЕ ФРАГМЕНТЫ =====
+
+QUARTER_TITLE = Template("# 🏘️ Квартал — {quarter}\n", 'quarter_title')
+GENERAL_INFO = Template("## 📍 Общая информация\n", 'general_info')
+GENERAL_INFO_LINES = Template(
+    "**Квартал:** {quarter}\n"
+    "**Город:** Минск\n"
+    "**Район:** Мир\n",
+    'general_info_lines'
+)
+HOUSES_COUNT = Template("**Количество домов:** {count}\n", 'houses_count')
+OBJECTS_COUNT = Template("**Количество объектов:** {count}\n", 'objects_count')
+TYPES_LINE = Template("**Типы недвижимости:** {types}\n", 'types_line')
+
+HOUSE_TITLE = Template("## 🏠 Дом {house}\n\n", 'house_title')
+HOUSE_NAME = Template("**Название дома:** {house_name}\n\n", 'house_name')
+HOUSE_STATS = Template(
+    "### 📊 Статистика дома\n"
+    "**Количество апартаментов:** {count}\n",
+    'house_stats'
+)
+AREA_RANGE = Template("**Диапазон площадей:** {min_area:.1f} - {max_area:.1f} м²\n", 'area_range')
+AVG_PRICE_M2 = Template("**Средняя цена за м²:** {price} евро\n", 'avg_price_m2')
+AVG_COST = Template("**Средняя стоимость:** {cost} евро\n", 'avg_cost')
+FLOOR_TITLE = Template("## 🏢 Этаж {floor}\n\n", 'floor_title')
+
+# ===== КВАРТИРА ИЗ СЫРОГО ФИДА (quarters/auto_update.py, update_quarters_robust.py) =====
+
+FEED_APARTMENT = Template(
+    "### 🏠 {apartment}\n"
+    "**Квартал:** {quarter}\n"
+    "**Дом:** {house_number}\n"
+    "**Название дома:** {house_name}\n"
+    "**{floor}**\n"
+    "**{floor_total}**\n"
+    "**Количество комнат:** {rooms}\n"
+    "**{square}**\n"
+    "{price_lines}"
+    "**{status}**\n"
+    "**Адрес:** {address}\n"
+    "**{location}**\n",
+    'feed_apartment'
+)
+FEED_PRICE_M2 = Template("**Цена за м²:** {price} евро\n", 'feed_price_m2')
+FEED_PRICE_FULL = Template("**Общая стоимость:** {price} евро\n", 'feed_price_full')
+
+
+# Горячий путь: функции рендеринга без поиска атрибута на каждую квартиру
+_render_feed_apartment = FEED_APARTMENT.render
+_render_price_m2 = FEED_PRICE_M2.render
+_render_price_full = FEED_PRICE_FULL.render
+
+
+def render_feed_apartment(apartment: Dict, quarter_name: str) -> str:
+    """Секция квартиры по записи json_ai.php"""
+    price_lines = ''
+    price_metr = apartment.get('Price_metr')
+    if price_metr and price_metr != '—':
+        price_lines = _render_price_m2(price=money(price_metr))
+    price_full = apartment.get('Price_full')
+    if price_full and price_full != '—':
+        price_lines += _render_price_full(price=money(price_full))
+
+    get = apartment.get
+    return _render_feed_apartment(
+        apartment=get('Apartment', 'Квартира'),
+        quarter=quarter_name,
+        house_number=get('NumberHouse', 'Н/Д'),
+        house_name=get('NameHouse', 'Н/Д'),
+        floor=get('Floor', 'Этаж: Н/Д'),
+        floor_total=get('FloorTotal', 'Этажность дома: Н/Д'),
+        rooms=get('UsrNumberRooms', 'Н/Д'),
+        square=get('Square', 'Площадь: Н/Д'),
+        price_lines=price_lines,
+        status=get('Status', 'Статус: Н/Д'),
+        address=get('Address', 'Н/Д'),
+        location=get('Location', 'Местоположение: Н/Д')
+    )
+
+
+def render_feed_quarter(quarter_name: str, houses: Dict, objects: int, types: List[str],
+                        section: Callable[[Dict], str], separator: str, header_extra: str = '') -> str:
+    """
+    Документ квартала по записям фида, сгруппированным houses[дом][этаж] → [записи]
+
+    Args:
+        section: Секция квартиры (generate_apartment_section скрипта)
+        separator: Разделитель блоков
+        header_extra: Дополнительные строки после «Типы недвижимости»
+    """
+    parts = [
+        QUARTER_TITLE.render(quarter=quarter_name), '\n',
+        GENERAL_INFO.render(),
+        GENERAL_INFO_LINES.render(quarter=quarter_name),
+        HOUSES_COUNT.render(count=len(houses)),
+        OBJECTS_COUNT.render(count=objects),
+        TYPES_LINE.render(types=', '.join(types)),
+        header_extra,
+        separator
+    ]
+
+    for house_num in sorted(houses.keys()):
+        house_data = houses[house_num]
+        house_apartments = [apt for floor_apts in house_data.values() for apt in floor_apts]
+        if not house_apartments:
+            continue
+
+        parts.append(HOUSE_TITLE.render(house=house_num))
+        parts.append(HOUSE_NAME.render(house_name=house_apartments[0].get('NameHouse', 'Н/Д')))
+        parts.append(HOUSE_STATS.render(count=len(house_apartments)))
+
+        # Диапазон площадей
+        areas = []
+        for apt in house_apartments:
+            area = apt.get('Square', '').replace('Площадь: ', '').replace(' м²', '')
+            try:
+                areas.append(float(area))
+            except ValueError:
+                pass
+        if areas:
+            parts.append(AREA_RANGE.render(min_area=min(areas), max_area=max(areas)))
+
+        # Средние цены
+        prices_metr = []
+        prices_full = []
+        for apt in house_apartments:
+            price_m = apt.get('Price_metr')
+            price_f = apt.get('Price_full')
+            if price_m and price_m != '—' and isinstance(price_m, (int, float)):
+                prices_metr.append(price_m)
+            if price_f and price_f != '—' and isinstance(price_f, (int, float)):
+                prices_full.append(price_f)
+        if prices_metr:
+            parts.append(AVG_PRICE_M2.render(price=int(sum(prices_metr) / len(prices_metr))))
+        if prices_full:
+            parts.append(AVG_COST.render(cost=int(sum(prices_full) / len(prices_full))))
+
+        parts.append(separator)
+
+        # Этажи, внутри — по количеству комнат
+        for floor_num in sorted(house_data.keys()):
+            if floor_num == 0:
+                continue
+            parts.append(FLOOR_TITLE.render(floor=floor_num))
+            floor_apartments = sorted(house_data[floor_num],
+                                      key=lambda x: (x.get('UsrNumberRooms', 0), x.get('Apartment', '')))
+            for apt in floor_apartments:
+                parts.append(section(apt))
+                parts.append(separator)
+
+    return ''.join(parts)
+
+
+# ===== КВАРТАЛ ИЗ by-quarters/*.json (sync-with-monitoring.py) =====
+
+MONITOR_QUARTER_HEAD = Template(
+    "# 🏘️ Квартал — {quarter}\n\n"
+    "## 📍 Общая информация\n\n"
+    "**Квартал:** {quarter}\n"
+    "**Город:** Минск\n"
+    "**Район:** Мир\n"
+    "**Количество объектов:** {count}\n"
+    "**Тип недвижимости:** Квартира\n\n"
+    "## 📊 Статистика\n\n"
+    "**Диапазон площадей:** {min_area:.1f} - {max_area:.1f} м²\n"
+    "**Средняя цена за м²:** {avg_price_m2} евро\n"
+    "**Общая стоимость:** {min_total:,} - {max_total:,} евро\n\n",
+    'monitor_quarter_head'
+)
+MONITOR_APARTMENT = Template(
+    "### 🏠 Квартира {apartment}\n\n"
+    "**Квартал:** {quarter}\n"
+    "**Дом:** {house}\n"
+    "**Название дома:** {house_name}\n"
+    "**Этаж:** {floor}\n"
+    "**Этажность дома:** {total_floors}\n"
+    "**Количество комнат:** {rooms}\n"
+    "**Площадь:** {area} м²\n"
+    "**Цена за м²:** {price_m2} евро\n"
+    "{total_line}"
+    "**Статус:** {status}\n"
+    "**Адрес:** {address}\n"
+    "**Местоположение:** {location}\n"
+    "\n\n---\n\n",
+    'monitor_apartment'
+)
+MONITOR_TOTAL_PRICE = Template("**Общая стоимость:** {price} евро\n", 'monitor_total_price')
+MONITOR_TOTAL_TEXT = Template("**Общая стоимость:** {price}\n", 'monitor_total_text')
+
+# ===== КВАРТАЛ ИЗ BirDataParser (bir_data_parser.py, create_emirats_file.py) =====
+
+PARSED_APARTMENT_HEAD = Template(
+    "### 🏠 {type} №{number}\n"
+    "**Квартал:** {quarter}\n"
+    "**Дом:** {house_number}\n",
+    'parsed_apartment_head'
+)
+PARSED_HOUSE_NAME = Template("**Название дома:** {house_name}\n", 'parsed_house_name')
+PARSED_FLOOR = Template("**Этаж:** {floor}\n", 'parsed_floor')
+PARSED_FLOOR_TOTAL = Template("**Общая этажность:** {floor_total}\n", 'parsed_floor_total')
+PARSED_SQUARE = Template("**Площадь:** {square} м²\n", 'parsed_square')
+PARSED_PRICE_M2 = Template("**Цена за м²:** {price} евро\n", 'parsed_price_m2')
+PARSED_PRICE_FULL = Template("**Общая стоимость:** {price:,} евро\n", 'parsed_price_full')
+PARSED_INSTALLMENT_M2 = Template("**Цена в рассрочку за м²:** {price} евро\n", 'parsed_installment_m2')
+PARSED_INSTALLMENT_FULL = Template("**Общая стоимость в рассрочку:** {price:,} евро\n", 'parsed_installment_full')
+PARSED_STATUS = Template("**Статус:** {status}\n", 'parsed_status')
+PARSED_ADDRESS = Template("**Адрес:** {address}\n", 'parsed_address')
+PARSED_LOCATION = Template("**Местоположение:** {location}\n", 'parsed_location')
+PARSED_AVG_PRICE_M2 = Template("**Средняя цена за м²:** {price:.0f} евро\n", 'parsed_avg_price_m2')
+PARSED_AVG_COST = Template("**Средняя стоимость:** {cost:.0f} евро\n", 'parsed_avg_cost')
+
+ANALYTICS_PRICES = Template(
+    "### 💰 Ценовой диапазон\n"
+    "- **Минимальная цена за м²:** {min:.0f} евро\n"
+    "- **Максимальная цена за м²:** {max:.0f} евро\n"
+    "- **Средняя цена за м²:** {avg:.0f} евро\n\n",
+    'analytics_prices'
+)
+ANALYTICS_SQUARES = Template(
+    "### 📐 Площади\n"
+    "- **Минимальная площадь:** {min:.1f} м²\n"
+    "- **Максимальная площадь:** {max:.1f} м²\n"
+    "- **Средняя площадь:** {avg:.1f} м²\n\n",
+    'analytics_squares'
+)
+ANALYTICS_COSTS = Template(
+    "### 💵 Стоимость\n"
+    "- **Минимальная стоимость:** {min:,.0f} евро\n"
+    "- **Максимальная стоимость:** {max:,.0f} евро\n"
+    "- **Средняя стоимость:** {avg:,.0f} евро\n\n",
+    'analytics_costs'
+)
+
+SECTION_BREAK = "\n---\n\n"
+
+
+def render_parsed_apartment(apartment) -> str:
+    """Секция апартамента по структурированной записи BirDataParser (records.ParsedApartment)"""
+    parts = [PARSED_APARTMENT_HEAD.render(
+        type=apartment.type,
+        number=apartment.apartment.split()[-1] if apartment.apartment else 'N/A',
+        quarter=apartment.quarter,
+        house_number=apartment.house_number
+    )]
+    if apartment.house_name:
+        parts.append(PARSED_HOUSE_NAME.render(house_name=apartment.house_name))
+    parts.append(PARSED_FLOOR.render(floor=apartment.floor))
+    if apartment.floor_total > 0:
+        parts.append(PARSED_FLOOR_TOTAL.render(floor_total=apartment.floor_total))
+    if apartment.square > 0:
+        parts.append(PARSED_SQUARE.render(square=apartment.square))
+    if apartment.price_metr > 0:
+        parts.append(PARSED_PRICE_M2.render(price=apartment.price_metr))
+    if apartment.price_full > 0:
+        parts.append(PARSED_PRICE_FULL.render(price=apartment.price_full))
+    if apartment.installment_price_metr > 0:
+        parts.append(PARSED_INSTALLMENT_M2.render(price=apartment.installment_price_metr))
+    if apartment.installment_price_full > 0:
+        parts.append(PARSED_INSTALLMENT_FULL.render(price=apartment.installment_price_full))
+    if apartment.status:
+        parts.append(PARSED_STATUS.render(status=apartment.status))
+    if apartment.address:
+        parts.append(PARSED_ADDRESS.render(address=apartment.address))
+    if apartment.location:
+        parts.append(PARSED_LOCATION.render(location=apartment.location))
+    parts.append(SECTION_BREAK)
+    return ''.join(parts)
+
+
+def render_parsed_house_stats(apartments: List) -> str:
+    """Блок «Статистика дома» для записей BirDataParser (records.ParsedApartment)"""
+    prices = [apt.price_metr for apt in apartments if apt.price_metr > 0]
+    squares = [apt.square for apt in apartments if apt.square > 0]
+    costs = [apt.price_full for apt in apartments if apt.price_full > 0]
+
+    parts = [HOUSE_STATS.render(count=len(apartments))]
+    if squares:
+        parts.append(AREA_RANGE.render(min_area=min(squares), max_area=max(squares)))
+    if prices:
+        parts.append(PARSED_AVG_PRICE_M2.render(price=sum(prices) / len(prices)))
+    if costs:
+        parts.append(PARSED_AVG_COST.render(cost=sum(costs) / len(costs)))
+    parts.append(SECTION_BREAK)
+    return ''.join(parts)
+
+
+def render_quarter_analytics(prices: List[float], squares: List[float], costs: List[float]) -> str:
+    """Раздел «Аналитика квартала»"""
+    parts = ["## 📈 Аналитика квартала\n\n"]
+    if prices:
+        parts.append(ANALYTICS_PRICES.render(min=min(prices), max=max(prices), avg=sum(prices) / len(prices)))
+    if squares:
+        parts.append(ANALYTICS_SQUARES.render(min=min(squares), max=max(squares), avg=sum(squares) / len(squares)))
+    if costs:
+        parts.append(ANALYTICS_COSTS.render(min=min(costs), max=max(costs), avg=sum(costs) / len(costs)))
+    parts.append("---\n\n")
+    return ''.join(parts)
+
+
+# ===== МИКРОБЕНЧМАРК =====
+
+def _benchmark_apartments(count: int) -> List[Dict]:
+    apartments = []
+    for i in range(count):
+        square = round(30 + (i * 7.3) % 90, 1)
+        price_metr = 1400 + (i * 37) % 1500
+        apartments.append({
+            'Apartment': f"Квартира №{i + 1}",
+            'type': 'Квартира',
+            'Quarter': 'Квартал — 12 Западная Европа',
+            'Status': 'Статус: Строится',
+            'Address': f"улица Игоря Лученка, дом {i % 40}",
+            'Location': f"Местоположение: Минск Мир, Дом 12.{i % 7}",
+            'NumberHouse': f"12.{i % 7}",
+            'NameHouse': 'Берлин',
+            'Floor': f"Этаж: {1 + i % 25}",
+            'FloorTotal': 'Этажность дома: 25',
+            'UsrNumberRooms': 1 + i % 4,
+            'Square': f"Площадь: {square}",
+            'Price_metr': price_metr,
+            'Price_full': int(square * price_metr),
+        })
+    return apartments
+
+
+def _concat_apartment(apartment: Dict, quarter_name: str) -> str:
+    # Прежняя реализация (+= и f-строки) — точка отсчёта для сравнения
+    section = f"### 🏠 {apartment.get('Apartment', 'Квартира')}\n"
+    section += f"**Квартал:** {quarter_name}\n"
+    section += f"**Дом:** {apartment.get('NumberHouse', 'Н/Д')}\n"
+    section += f"**Название дома:** {apartment.get('NameHouse', 'Н/Д')}\n"
+    section += f"**{apartment.get('Floor', 'Этаж: Н/Д')}**\n"
+    section += f"**{apartment.get('FloorTotal', 'Этажность дома: Н/Д')}**\n"
+    section += f"**Количество комнат:** {apartment.get('UsrNumberRooms', 'Н/Д')}\n"
+    section += f"**{apartment.get('Square', 'Площадь: Н/Д')}**\n"
+    price_metr = apartment.get('Price_metr')
+    if price_metr and price_metr != '—':
+        section += f"**Цена за м²:** {price_metr:,} евро\n" if isinstance(price_metr, (int, float)) else f"**Цена за м²:** {price_metr} евро\n"
+    price_full = apartment.get('Price_full')
+    if price_full and price_full != '—':
+        section += f"**Общая стоимость:** {price_full:,} евро\n" if isinstance(price_full, (int, float)) else f"**Общая стоимость:** {price_full} евро\n"
+    section += f"**{apartment.get('Status', 'Статус: Н/Д')}**\n"
+    section += f"**Адрес:** {apartment.get('Address', 'Н/Д')}\n"
+    section += f"**{apartment.get('Location', 'Местоположение: Н/Д')}**\n"
+    return section
+
+
+def benchmark(apartments: int = 1000, repeat: int = 20) -> Dict:
+    """Квартир в секунду: шаблоны против += на apartments записях (лучший из repeat прогонов)"""
+    records = _benchmark_apartments(apartments)
+    quarter = '12 Западная Европа'
+
+    def concat():
+        content = ''
+        for apt in records:
+            content += _concat_apartment(apt, quarter)
+            content += "\n\n\n---\n\n"
+        return content
+
+    def templated():
+        parts = []
+        for apt in records:
+            parts.append(render_feed_apartment(apt, quarter))
+            parts.append("\n\n\n---\n\n")
+        return ''.join(parts)
+
+    if concat() != templated():
+        raise AssertionError("Вывод шаблонов отличается от прежней реализации")
+
+    results = {}
+    for name, func in (('concat', concat), ('template', templated)):
+        best = min(_timed(func) for _ in range(repeat))
+        results[name] = {'seconds_per_1000': round(best * 1000 / apartments, 5),
+                         'apartments_per_sec': round(apartments / best)}
+    results['speedup'] = round(results['concat']['seconds_per_1000'] / results['template']['seconds_per_1000'], 2)
+    return results
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Скомпилированные шаблоны Markdown')
+    parser.add_argument('--benchmark', action='store_true', help='Замерить рендеринг секций квартир')
+    parser.add_argument('--apartments', type=int, default=1000, help='Квартир в прогоне (по умолчанию: 1000)')
+    parser.add_argument('--repeat', type=int, default=20, help='Прогонов (берётся лучший)')
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        for template in (value for value in globals().values() if isinstance(value, Template)):
+            print(f"{template.name:26} {', '.join(template.fields)}")
+        return 0
+
+    results = benchmark(args.apartments, args.repeat)
+    print(f"📏 Рендеринг {args.apartments} квартир (лучший из {args.repeat}):")
+    for name in ('concat', 'template'):
+        r = results[name]
+        print(f"   {name:9} {r['seconds_per_1000'] * 1000:7.2f} мс / 1000 квартир | {r['apartments_per_sec']:,} квартир/с")
+    print(f"   ускорение: ×{results['speedup']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
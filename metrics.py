@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Метрики конвейера синхронизации в формате Prometheus (text exposition 0.0.4)
+
+Без внешних зависимостей: Counter / Gauge / Histogram с метками, общий реестр.
+
+- Веб-интерфейс отдаёт /metrics: собственные метрики процесса плюс
+  текстовые файлы, записанные запусками из cron (метка source=<файл>)
+- Запуски из cron пишут metrics/<pipeline>.prom (атомарно) — их же можно
+  отдавать через textfile collector node_exporter
+- instrument_requests(): гистограмма длительности всех HTTP-запросов
+  библиотеки requests по host / endpoint / method / status (ID в пути
+  заменяются на {id}, чтобы не плодить ряды)
+- этапы (stage / StageTimer) и HTTP-запросы также пишутся спанами
+  трассировки, если она включена (см. tracing.py, MM_TRACE)
+
+Метрики:
+    mm_stage_duration_seconds{pipeline,stage}     — fetch, parse, split, render,
+                                                    list, upload, index_wait,
+                                                    agent_patch, delete, total
+    mm_http_request_duration_seconds{host,endpoint,method,status}
+    mm_upload_bytes_total{pipeline}
+    mm_docs_changed{pipeline,action}              — за последний запуск
+    mm_feed_size_bytes, mm_feed_records           — фид bir.by
+    mm_rag_index_wait_seconds{pipeline}
+    mm_last_run_timestamp_seconds{pipeline,status}
+
+Использование:
+    import metrics
+    metrics.instrument_requests()
+    with metrics.stage('auto_sync', 'upload'):
+        ...
+    metrics.write_textfile('auto_sync')
+
+    python3 metrics.py                  # Показать метрики из metrics/*.prom
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import tracing
+
+# Каталог текстовых файлов метрик для запусков из cron ("" — не записывать)
+METRICS_DIR = os.environ.get('MM_METRICS_DIR', 'metrics')
+
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+_ID_SEGMENT = re.compile(r'^(?=.*\d)[A-Za-z0-9_-]{16,}$|^\d+$')
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Базовый класс: имя, описание, метки, значения по набору меток"""
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            items = sorted(self.values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items) -> List[str]:
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика уже зарегистрирована: {metric.name}")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            if metric.values:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram('mm_stage_duration_seconds', 'Длительность этапа конвейера',
+                          ('pipeline', 'stage'), STAGE_BUCKETS)
+HTTP_SECONDS = Histogram('mm_http_request_duration_seconds', 'Длительность HTTP-запроса',
+                         ('host', 'endpoint', 'method', 'status'), HTTP_BUCKETS)
+UPLOAD_BYTES = Counter('mm_upload_bytes_total', 'Байт загружено в ElevenLabs KB', ('pipeline',))
+DOCS_CHANGED = Gauge('mm_docs_changed', 'Документов изменено за последний запуск', ('pipeline', 'action'))
+FEED_BYTES = Gauge('mm_feed_size_bytes', 'Размер фида bir.by (байт)')
+FEED_RECORDS = Gauge('mm_feed_records', 'Записей в фиде bir.by')
+RAG_WAIT_SECONDS = Histogram('mm_rag_index_wait_seconds', 'Ожидание RAG-индексации документа',
+                             ('pipeline',), STAGE_BUCKETS)
+VALIDATION_ISSUES = Gauge('mm_validation_issues', 'Проблем валидации в последнем запуске',
+                          ('pipeline', 'rule', 'severity'))
+LAST_RUN = Gauge('mm_last_run_timestamp_seconds', 'Время окончания последнего запуска',
+                 ('pipeline', 'status'))
+
+
+@contextmanager
+def stage(pipeline: str, name: str, **attributes):
+    """Замерить этап конвейера (и открыть спан трассировки)"""
+    timers_before = set(_open_timers)
+    with tracing.span(f"{pipeline}.{name}", pipeline=pipeline, stage=name, **attributes):
+        try:
+            with STAGE_SECONDS.time(pipeline=pipeline, stage=name):
+                yield
+        finally:
+            # Этапы StageTimer, открытые внутри и не закрытые (ранний return), закрываются здесь
+            for timer in list(_open_timers - timers_before):
+                timer.stop()
+
+
+class StageTimer:
+    """
+    Последовательные этапы без вложенных with: start() закрывает предыдущий этап.
+    Незакрытый этап закрывается в finish_run() (например, после раннего return).
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.current: Optional[str] = None
+        self.started = 0.0
+        self._span = None
+
+    def start(self, name: str):
+        self.stop()
+        self.current = name
+        self.started = time.perf_counter()
+        self._span = tracing.span(f"{self.pipeline}.{name}", pipeline=self.pipeline, stage=name)
+        self._span.__enter__()
+        _open_timers.add(self)
+
+    def stop(self):
+        if self.current is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - self.started, pipeline=self.pipeline, stage=self.current)
+            self.current = None
+            self._span.__exit__(None, None, None)
+            self._span = None
+        _open_timers.discard(self)
+
+
+_open_timers = set()
+
+
+def record_feed(content: bytes, records: Optional[int] = None):
+    FEED_BYTES.set(len(content))
+    if records is not None:
+        FEED_RECORDS.set(records)
+
+
+def normalize_endpoint(url: str) -> Tuple[str, str]:
+    """(host, путь) с ID в пути, заменёнными на {id}; query отбрасывается"""
+    parts = urlsplit(url)
+    segments = ['{id}' if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/')]
+    return parts.netloc, '/'.join(segments) or '/'
+
+
+_instrumented = False
+
+
+def instrument_requests():
+    """Замерять все HTTP-запросы requests (requests.get/post/... идут через Session.request)"""
+    global _instrumented
+    if _instrumented:
+        return
+    tracing.instrument_requests()
+    try:
+        import requests
+    except ImportError:
+        return
+
+    original = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        host, endpoint = normalize_endpoint(str(url))
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = original(self, method, url, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            HTTP_SECONDS.observe(time.perf_counter() - start, host=host, endpoint=endpoint,
+                                 method=str(method).upper(), status=status)
+
+    requests.Session.request = request
+    _instrumented = True
+
+
+def finish_run(pipeline: str, success: bool = True, write: bool = True) -> Optional[Path]:
+    """Отметить конец запуска и записать текстовый файл метрик"""
+    for timer in list(_open_timers):
+        timer.stop()
+    LAST_RUN.set(time.time(), pipeline=pipeline, status='success' if success else 'failure')
+    return write_textfile(pipeline) if write else None
+
+
+def write_textfile(pipeline: str, directory: str = None) -> Optional[Path]:
+    """Записать метрики процесса в <directory>/<pipeline>.prom (атомарно)"""
+    directory = METRICS_DIR if directory is None else directory
+    if not directory:
+        return None
+    path = Path(directory) / f"{pipeline}.prom"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(REGISTRY.render())
+        os.replace(tmp_path, path)
+    except OSError:
+        return None
+    return path
+
+
+def _family(name: str, types: Dict[str, str]) -> str:
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and types.get(name[:-len(suffix)]) == 'histogram':
+            return name[:-len(suffix)]
+    return name
+
+
+def _add_label(sample: str, name: str, value: str) -> str:
+    label = f'{name}="{_escape(value)}"'
+    if '{' in sample.split(' ', 1)[0]:
+        # Значения меток могут содержать пробелы — ищем закрывающую скобку с конца
+        end = sample.rindex('}')
+        return f"{sample[:end]},{label}{sample[end:]}"
+    metric, _, rest = sample.partition(' ')
+    return f"{metric}{{{label}}} {rest}"
+
+
+def merge_expositions(sources: Iterable[Tuple[Optional[str], str]]) -> str:
+    """
+    Объединить несколько текстов в одну выдачу: HELP/TYPE по одному разу на семейство,
+    сэмплы из именованных источников получают метку source
+    """
+    helps: Dict[str, str] = {}
+    types: Dict[str, str] = {}
+    samples: Dict[str, List[str]] = {}
+    for source, text in sources:
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith('# HELP ') or line.startswith('# TYPE '):
+                _, kind, name, *rest = line.split(' ', 3)
+                (helps if kind == 'HELP' else types).setdefault(name, rest[0] if rest else '')
+                samples.setdefault(name, [])
+                continue
+            if line.startswith('#'):
+                continue
+            name = re.split(r'[{ ]', line, 1)[0]
+            family = _family(name, types)
+            samples.setdefault(family, []).append(_add_label(line, 'source', source) if source else line)
+
+    lines = []
+    for family, family_samples in samples.items():
+        if family in helps:
+            lines.append(f"# HELP {family} {helps[family]}")
+        if family in types:
+            lines.append(f"# TYPE {family} {types[family]}")
+        lines.extend(family_samples)
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def collect(directory: str = None, include_registry: bool = True) -> str:
+    """Метрики процесса + все <directory>/*.prom (для /metrics)"""
+    directory = METRICS_DIR if directory is None else directory
+    sources: List[Tuple[Optional[str], str]] = []
+    if include_registry:
+        sources.append((None, REGISTRY.render()))
+    if directory and os.path.isdir(directory):
+        for path in sorted(Path(directory).glob('*.prom')):
+            try:
+                text = path.read_text(encoding='utf-8')
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            sources.append((path.stem, text))
+            sources.append((path.stem, "# HELP mm_textfile_mtime_seconds Время записи файла метрик\n"
+                                       "# TYPE mm_textfile_mtime_seconds gauge\n"
+                                       f"mm_textfile_mtime_seconds {_format_value(round(mtime, 3))}\n"))
+    return merge_expositions(sources)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else METRICS_DIR
+    text = collect(directory, include_registry=False)
+    if not text:
+        print(f"ℹ️  Нет файлов метрик в {directory or '(отключено)'}")
+        return 1
+    sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
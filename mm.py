@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Единая точка входа: python3 mm.py <команда> [аргументы команды]
+
+Команда — это существующий скрипт проекта; он загружается только при вызове
+(runpy, как при запуске python3 <скрипт>), поэтому `mm.py` сам ничего тяжёлого
+не импортирует: cron-запуск без изменений платит только за свой скрипт.
+
+Использование:
+    python3 mm.py                                   # Список команд
+    python3 mm.py monitor --check --upload-to-elevenlabs
+    python3 mm.py sync --dry-run
+    python3 mm.py importtime monitor                # Время импорта команды
+"""
+
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# команда → (скрипт относительно корня, описание)
+COMMANDS = {
+    'monitor': ('sync-with-monitoring.py', 'Проверка bir.by и обновление кварталов (cron)'),
+    'sync': ('elevenlabs_sync_v2.py', 'Синхронизация MD-файлов кварталов с ElevenLabs'),
+    'auto-sync': ('elevenlabs_auto_sync.py', 'Автосинхронизация документов агента'),
+    'update': ('data_updater.py', 'Обновление данных (DataUpdater)'),
+    'web': ('web_monitor.py', 'Веб-интерфейс мониторинга'),
+    'parse': ('bir_data_parser.py', 'Разбор фида и генерация файлов кварталов'),
+    'check': ('check_updates.py', 'Проверка обновлений фида'),
+    'pricing-index': ('build_pricing_index.py', 'Построение pricing_index.json'),
+    'price-nav': ('update_price_navigation.py', 'Авто-блоки навигации по ценам'),
+    'rag-index': ('create_rag_index.py', 'Индекс для RAG'),
+    'build': ('build_graph.py', 'Пересборка устаревших RAG-артефактов (по отпечаткам входов)'),
+    'validate-refs': ('validate_references.py', 'Проверка ссылок на квартиры'),
+    'kb-search': ('kb_index.py', 'Поиск по индексу MD базы знаний (№ квартиры, дом, слова)'),
+    'validate': ('validation.py', 'Валидация фида за один проход (правила)'),
+    'shards': ('kb_shards.py', 'Раскладка кварталов по шардам для KB (большие — по домам, мелкие — вместе)'),
+    'snapshot': ('snapshot.py', 'Бинарный снимок базы знаний: info, export в JSON'),
+    'kb-list': ('elevenlabs_kb_listing.py', 'Кэш списка документов Knowledge Base'),
+    'kb-delete': ('elevenlabs_bulk_delete.py', 'Массовое удаление документов KB'),
+    'agent-kb': ('elevenlabs_agent_kb.py', 'Документы KB агента'),
+    'registry': ('elevenlabs_upload_registry.py', 'Реестр загрузок по содержимому'),
+    'logs': ('log_service.py', 'Чтение и ротация лога'),
+    'metrics': ('metrics.py', 'Метрики конвейера'),
+    'trace': ('tracing.py', 'Просмотр трейсов'),
+    'templates': ('md_templates.py', 'Шаблоны Markdown'),
+    'parsing': ('parsing.py', 'Разбор чисел из строк фида (кеш, --benchmark)'),
+    'bench': ('benchmarks/pipeline.py', 'Бенчмарк CPU-этапов пайплайна'),
+    'importtime': ('benchmarks/importtime.py', 'Время импорта команд (-X importtime)'),
+}
+
+
+def usage() -> str:
+    lines = ['Использование: python3 mm.py <команда> [аргументы]', '', 'Команды:']
+    for name, (script, description) in COMMANDS.items():
+        lines.append(f"  {name:15} {description} ({script})")
+    return '\n'.join(lines)
+
+
+def script_path(command: str) -> str:
+    return os.path.join(ROOT, COMMANDS[command][0])
+
+
+def run(command: str, argv: list) -> int:
+    """Выполнить скрипт команды как __main__ с аргументами argv"""
+    path = script_path(command)
+    sys.argv = [path] + list(argv)
+    # Как при прямом запуске: каталог скрипта — первым в sys.path
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print(usage())
+        return 0
+
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"❌ Неизвестная команда: {command}\n", file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+    return run(command, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Разбор чисел из строк фида bir.by и MD-файлов кварталов
+
+Одни и те же строки («Этаж: 5», «Площадь: 45.5», «Этажность дома: 24»,
+«123,456 евро») повторяются в фиде тысячи раз, а разбирались заново
+регулярками в каждом генераторе. Здесь:
+    - шаблоны скомпилированы при импорте
+    - числа (int/float) возвращаются без разбора
+    - результат разбора строки кешируется (lru_cache по строке)
+
+Каждая функция повторяет поведение прежнего помощника, которого заменяет:
+    first_number  PropertyMonitor.extract_number (sync-with-monitoring.py)
+    first_int     BirDataParser.extract_floor_number (после decode_unicode)
+    first_decimal BirDataParser.extract_square (после decode_unicode)
+    to_float      BirDataParser.safe_float, generate_apartments_by_price_range.safe_float
+    price_eur     PricingIndexBuilder.extract_price_from_line
+
+Использование:
+    import parsing
+    parsing.first_int('Этажность дома: 24')      # 24
+    parsing.price_eur('**Общая стоимость:** 123,456 евро')   # 123456.0
+
+    python3 parsing.py --benchmark --scale 10    # Против прежних помощников на синтетическом фиде
+"""
+
+import argparse
+import re
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+# Размер кеша разбора: подписи этажей/площадей и цены-строки повторяются по всему фиду
+PARSE_CACHE_SIZE = 16384
+
+_NUMBER_RUN = re.compile(r'[\d.,]+')
+_INTEGER = re.compile(r'\d+')
+_DECIMAL = re.compile(r'\d+(?:\.\d+)?')
+_NOT_NUMERIC = re.compile(r'[^\d.-]')
+_PRICE_EUR = re.compile(r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s*евро')
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _first_number(text: str) -> Union[float, int]:
+    match = _NUMBER_RUN.search(text)
+    if match:
+        try:
+            return float(match.group(0).replace(',', '.'))
+        except ValueError:
+            return 0
+    return 0
+
+
+def first_number(value: Any) -> Union[float, int]:
+    """Первое число в строке (запятая — десятичный разделитель); не число — 0"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _first_number(value)
+    return 0
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def first_int(text: str) -> int:
+    """Первое целое в строке («Этаж: 5» → 5), иначе 0"""
+    match = _INTEGER.search(text)
+    return int(match.group(0)) if match else 0
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def first_decimal(text: str) -> float:
+    """Первое число с точкой в строке («Площадь: 45.5» → 45.5), иначе 0.0"""
+    match = _DECIMAL.search(text)
+    return float(match.group(0)) if match else 0.0
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _cleaned_float(text: str) -> float:
+    cleaned = _NOT_NUMERIC.sub('', text)
+    try:
+        return float(cleaned) if cleaned else 0.0
+    except ValueError:
+        return 0.0
+
+
+def to_float(value: Any) -> float:
+    """float из числа или строки без посторонних символов («1 234 €» → 1234.0); иначе 0.0"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _cleaned_float(value)
+    return 0.0
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _price_eur(line: str) -> Optional[float]:
+    match = _PRICE_EUR.search(line)
+    return float(match.group(1).replace(',', '')) if match else None
+
+
+def price_eur(line: str) -> Optional[float]:
+    """Цена вида «123,456 евро» / «95000 евро» из строки, иначе None"""
+    if 'евро' not in line:
+        return None
+    return _price_eur(line)
+
+
+def cache_info() -> Dict[str, Any]:
+    """Статистика кешей разбора (попадания/промахи)"""
+    return {func.__name__.lstrip('_'): func.cache_info()._asdict()
+            for func in (_first_number, first_int, first_decimal, _cleaned_float, _price_eur)}
+
+
+def cache_clear():
+    for func in (_first_number, first_int, first_decimal, _cleaned_float, _price_eur):
+        func.cache_clear()
+
+
+# ===== БЕНЧМАРК =====
+# Прежние помощники (как были в генераторах) — эталон для сверки и замера
+
+def _legacy_extract_number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        numbers = re.findall(r'[\d.,]+', value)
+        if numbers:
+            num_str = numbers[0].replace(',', '.')
+            try:
+                return float(num_str)
+            except ValueError:
+                return 0
+    return 0
+
+
+def _legacy_extract_floor_number(text):
+    match = re.search(r'(\d+)', text)
+    if match:
+        return int(match.group(1))
+    return 0
+
+
+def _legacy_extract_square(text):
+    match = re.search(r'(\d+(?:\.\d+)?)', text)
+    if match:
+        return float(match.group(1))
+    return 0.0
+
+
+def _legacy_safe_float(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = re.sub(r'[^\d.-]', '', value)
+        try:
+            return float(cleaned) if cleaned else 0.0
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def _legacy_extract_price_from_line(line):
+    match = re.search(r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s*евро', line)
+    if match:
+        try:
+            return float(match.group(1).replace(',', ''))
+        except ValueError:
+            pass
+    return None
+
+
+def _benchmark_inputs(scale: int) -> Dict[str, List]:
+    """Значения полей синтетического фида (после декодирования) и строки цен MD"""
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent / 'benchmarks'))
+    from synthetic_feed import generate_feed
+    from validation import decode_unicode
+
+    feed = generate_feed(scale)
+    records = list(feed.values())
+    prices = [record.get(field) for record in records
+              for field in ('Price_metr', 'Price_full', 'Installment_price_metr', 'Installment_price_full')]
+    return {
+        'floor': [decode_unicode(record.get(field)) for record in records for field in ('Floor', 'FloorTotal')],
+        'square': [decode_unicode(record.get('Square')) for record in records],
+        'price': prices,
+        'lines': [f"**Общая стоимость:** {value:,} евро" if isinstance(value, int) else f"**Цена за м²:** {value}"
+                  for value in prices],
+    }
+
+
+def benchmark(scale: int = 1, repeat: int = 5) -> Dict:
+    """Вызовов в секунду: прежние помощники против parsing (кеш прогрет первым прогоном)"""
+    inputs = _benchmark_inputs(scale)
+    cases = {
+        'extract_number': (_legacy_extract_number, first_number, inputs['price'] + inputs['square']),
+        'floor_number': (_legacy_extract_floor_number, first_int, inputs['floor']),
+        'square': (_legacy_extract_square, first_decimal, inputs['square']),
+        'safe_float': (_legacy_safe_float, to_float, inputs['price']),
+        'price_from_line': (_legacy_extract_price_from_line, price_eur, inputs['lines']),
+    }
+
+    results = {}
+    for name, (legacy, current, values) in cases.items():
+        expected = [legacy(value) for value in values]
+        actual = [current(value) for value in values]
+        if expected != actual or [type(v) for v in expected] != [type(v) for v in actual]:
+            raise AssertionError(f"{name}: результат отличается от прежнего помощника")
+        timings = {}
+        for label, func in (('legacy', legacy), ('parsing', current)):
+            best = min(_timed(func, values) for _ in range(repeat))
+            timings[label] = round(len(values) / best)
+        results[name] = {'calls': len(values), 'legacy_per_sec': timings['legacy'],
+                         'parsing_per_sec': timings['parsing'],
+                         'speedup': round(timings['parsing'] / timings['legacy'], 2)}
+    return results
+
+
+def _timed(func, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Разбор чисел из строк фида и MD')
+    parser.add_argument('--benchmark', action='store_true', help='Замерить против прежних помощников')
+    parser.add_argument('--scale', type=int, default=1, help='Масштаб синтетического фида (по умолчанию: 1)')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов (берётся лучший)')
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        for name, info in cache_info().items():
+            print(f"{name:14} {info}")
+        return 0
+
+    results = benchmark(args.scale, args.repeat)
+    print(f"📏 Разбор значений синтетического фида ×{args.scale} (лучший из {args.repeat}, результаты совпадают):")
+    for name, r in results.items():
+        print(f"   {name:16} {r['calls']:7,} вызовов | прежний {r['legacy_per_sec']:>11,}/с | "
+              f"parsing {r['parsing_per_sec']:>11,}/с | ×{r['speedup']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
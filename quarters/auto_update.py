@@ -19,6 +19,10 @@ from collections import defaultdict
 import urllib.request
 import argparse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import artifacts
+import md_templates
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -58,8 +62,7 @@ def load_last_hash():
 def save_hash(hash_value):
     """Сохранение хэша"""
     hash_file = '/Users/admin/MM-RAG/quarters/.last_update_hash'
-    with open(hash_file, 'w') as f:
-        f.write(hash_value)
+    artifacts.write_text(hash_file, hash_value)
 
 def parse_existing_apartments(file_path):
     """Парсинг существующих квартир из MD файла"""
@@ -84,30 +87,7 @@ def generate_apartment_section(apartment):
     else:
         quarter_name = ''
     
-    apt_name = apartment.get('Apartment', 'Квартира')
-    
-    section = f"### 🏠 {apt_name}\n"
-    section += f"**Квартал:** {quarter_name}\n"
-    section += f"**Дом:** {apartment.get('NumberHouse', 'Н/Д')}\n"
-    section += f"**Название дома:** {apartment.get('NameHouse', 'Н/Д')}\n"
-    section += f"**{apartment.get('Floor', 'Этаж: Н/Д')}**\n"
-    section += f"**{apartment.get('FloorTotal', 'Этажность дома: Н/Д')}**\n"
-    section += f"**Количество комнат:** {apartment.get('UsrNumberRooms', 'Н/Д')}\n"
-    section += f"**{apartment.get('Square', 'Площадь: Н/Д')}**\n"
-    
-    price_metr = apartment.get('Price_metr')
-    if price_metr and price_metr != '—':
-        section += f"**Цена за м²:** {price_metr:,} евро\n" if isinstance(price_metr, (int, float)) else f"**Цена за м²:** {price_metr} евро\n"
-    
-    price_full = apartment.get('Price_full')
-    if price_full and price_full != '—':
-        section += f"**Общая стоимость:** {price_full:,} евро\n" if isinstance(price_full, (int, float)) else f"**Общая стоимость:** {price_full} евро\n"
-    
-    section += f"**{apartment.get('Status', 'Статус: Н/Д')}**\n"
-    section += f"**Адрес:** {apartment.get('Address', 'Н/Д')}\n"
-    section += f"**{apartment.get('Location', 'Местоположение: Н/Д')}**\n"
-    
-    return section
+    return md_templates.render_feed_apartment(apartment, quarter_name)
 
 def update_quarter_file(file_path, quarter_name, apartments_data):
     """Обновление файла квартала"""
@@ -123,80 +103,13 @@ def update_quarter_file(file_path, quarter_name, apartments_data):
         houses[house][floor_num].append(apt)
     
     # Генерация содержимого
-    content = f"# 🏘️ Квартал — {quarter_name}\n\n"
-    content += f"## 📍 Общая информация\n"
-    content += f"**Квартал:** {quarter_name}\n"
-    content += f"**Город:** Минск\n"
-    content += f"**Район:** Мир\n"
-    content += f"**Количество домов:** {len(houses)}\n"
-    content += f"**Количество объектов:** {len(apartments_data)}\n"
-    
     types = set(apt.get('type', 'Квартира') for apt in apartments_data)
-    content += f"**Типы недвижимости:** {', '.join(sorted(types))}\n"
-    content += "\n\n\n---\n\n"
-    
-    # Для каждого дома
-    for house_num in sorted(houses.keys()):
-        house_data = houses[house_num]
-        house_apartments = [apt for floor_apts in house_data.values() for apt in floor_apts]
-        
-        if house_apartments:
-            first_apt = house_apartments[0]
-            house_name = first_apt.get('NameHouse', 'Н/Д')
-            
-            content += f"## 🏠 Дом {house_num}\n\n"
-            content += f"**Название дома:** {house_name}\n\n"
-            content += f"### 📊 Статистика дома\n"
-            content += f"**Количество апартаментов:** {len(house_apartments)}\n"
-            
-            # Диапазон площадей
-            areas = []
-            for apt in house_apartments:
-                area = apt.get('Square', '').replace('Площадь: ', '').replace(' м²', '')
-                try:
-                    areas.append(float(area))
-                except:
-                    pass
-            
-            if areas:
-                content += f"**Диапазон площадей:** {min(areas):.1f} - {max(areas):.1f} м²\n"
-            
-            # Средние цены
-            prices_metr = []
-            prices_full = []
-            for apt in house_apartments:
-                price_m = apt.get('Price_metr')
-                price_f = apt.get('Price_full')
-                if price_m and price_m != '—' and isinstance(price_m, (int, float)):
-                    prices_metr.append(price_m)
-                if price_f and price_f != '—' and isinstance(price_f, (int, float)):
-                    prices_full.append(price_f)
-            
-            if prices_metr:
-                content += f"**Средняя цена за м²:** {int(sum(prices_metr) / len(prices_metr))} евро\n"
-            if prices_full:
-                content += f"**Средняя стоимость:** {int(sum(prices_full) / len(prices_full))} евро\n"
-
-            content += "\n\n\n---\n\n"
-            
-            # Для каждого этажа
-            for floor_num in sorted(house_data.keys()):
-                if floor_num == 0:
-                    continue
-                
-                content += f"## 🏢 Этаж {floor_num}\n\n"
-                
-                # Сортировка по количеству комнат
-                floor_apartments = sorted(house_data[floor_num], 
-                                         key=lambda x: (x.get('UsrNumberRooms', 0), 
-                                                       x.get('Apartment', '')))
-                
-                for apt in floor_apartments:
-                    content += generate_apartment_section(apt)
-                    content += "\n\n\n---\n\n"
+    content = md_templates.render_feed_quarter(
+        quarter_name, houses, len(apartments_data), sorted(types), generate_apartment_section,
+        separator="\n\n\n---\n\n"
+    )
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    artifacts.write_text(file_path, content)
     
     return len(apartments_data)
 
@@ -274,23 +187,24 @@ def main(notify=False, force=False):
     changes = {}
     total_updated = 0
     
-    for quarter_name, apartments in quarters_data.items():
-        if quarter_name in quarter_mappings:
-            file_name = quarter_mappings[quarter_name]
-            file_path = os.path.join(quarters_dir, file_name)
+    with artifacts.batch():
+        for quarter_name, apartments in quarters_data.items():
+            if quarter_name in quarter_mappings:
+                file_name = quarter_mappings[quarter_name]
+                file_path = os.path.join(quarters_dir, file_name)
             
-            old_apartments = parse_existing_apartments(file_path)
-            count = update_quarter_file(file_path, quarter_name, apartments)
+                old_apartments = parse_existing_apartments(file_path)
+                count = update_quarter_file(file_path, quarter_name, apartments)
             
-            if len(old_apartments) != count:
-                changes[quarter_name] = {
-                    'old': len(old_apartments),
-                    'new': count,
-                    'diff': count - len(old_apartments)
-                }
+                if len(old_apartments) != count:
+                    changes[quarter_name] = {
+                        'old': len(old_apartments),
+                        'new': count,
+                        'diff': count - len(old_apartments)
+                    }
             
-            total_updated += count
-            logger.info(f"Обновлен {file_name}: {count} квартир")
+                total_updated += count
+                logger.info(f"Обновлен {file_name}: {count} квартир")
     
     # Сохранение хэша
     save_hash(current_hash)
@@ -13,6 +13,12 @@ from datetime import datetime
 from collections import defaultdict, Counter
 import urllib.request
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import artifacts
+import md_templates
+import validation
+from render_pool import RenderTask, render_quarters
+
 # Настройка логгирования
 logging.basicConfig(
     level=logging.INFO,
@@ -107,32 +113,8 @@ def determine_quarter(apartment):
     return None
 
 def validate_apartment_data(apartment):
-    """Валидация данных квартиры"""
-    warnings = []
-    
-    # Проверка обязательных полей
-    required_fields = ['Apartment', 'NumberHouse', 'Floor']
-    for field in required_fields:
-        if not apartment.get(field):
-            warnings.append(f"Отсутствует поле {field}")
-    
-    # Проверка этажа
-    floor_str = apartment.get('Floor', '')
-    if floor_str and 'Этаж: ' in floor_str:
-        try:
-            floor_num = int(floor_str.replace('Этаж: ', ''))
-            if floor_num < 1 or floor_num > 30:
-                warnings.append(f"Подозрительный этаж: {floor_num}")
-        except:
-            warnings.append(f"Некорректный формат этажа: {floor_str}")
-    
-    # Проверка цен
-    price_m = apartment.get('Price_metr')
-    if price_m and price_m != '—' and isinstance(price_m, (int, float)):
-        if price_m < 500 or price_m > 10000:
-            warnings.append(f"Подозрительная цена за м²: {price_m}")
-    
-    return warnings
+    """Валидация данных квартиры (правила validation.RECORD_RULES)"""
+    return validation.check_record(apartment)
 
 def generate_apartment_section(apartment):
     """Генерация секции для квартиры"""
@@ -143,33 +125,10 @@ def generate_apartment_section(apartment):
         # Пытаемся определить квартал
         quarter_name = determine_quarter(apartment) or ''
     
-    apt_name = apartment.get('Apartment', 'Квартира')
-    
-    section = f"### 🏠 {apt_name}\n"
-    section += f"**Квартал:** {quarter_name}\n"
-    section += f"**Дом:** {apartment.get('NumberHouse', 'Н/Д')}\n"
-    section += f"**Название дома:** {apartment.get('NameHouse', 'Н/Д')}\n"
-    section += f"**{apartment.get('Floor', 'Этаж: Н/Д')}**\n"
-    section += f"**{apartment.get('FloorTotal', 'Этажность дома: Н/Д')}**\n"
-    section += f"**Количество комнат:** {apartment.get('UsrNumberRooms', 'Н/Д')}\n"
-    section += f"**{apartment.get('Square', 'Площадь: Н/Д')}**\n"
-    
-    price_metr = apartment.get('Price_metr')
-    if price_metr and price_metr != '—':
-        section += f"**Цена за м²:** {price_metr:,} евро\n" if isinstance(price_metr, (int, float)) else f"**Цена за м²:** {price_metr} евро\n"
-    
-    price_full = apartment.get('Price_full')
-    if price_full and price_full != '—':
-        section += f"**Общая стоимость:** {price_full:,} евро\n" if isinstance(price_full, (int, float)) else f"**Общая стоимость:** {price_full} евро\n"
-    
-    section += f"**{apartment.get('Status', 'Статус: Н/Д')}**\n"
-    section += f"**Адрес:** {apartment.get('Address', 'Н/Д')}\n"
-    section += f"**{apartment.get('Location', 'Местоположение: Н/Д')}**\n"
-    
-    return section
+    return md_templates.render_feed_apartment(apartment, quarter_name)
 
-def update_quarter_file(file_path, quarter_name, apartments_data):
-    """Обновление файла квартала"""
+def build_quarter_content(quarter_name, apartments_data):
+    """Содержимое файла квартала и число уникальных квартир"""
     houses = defaultdict(lambda: defaultdict(list))
     
     # Проверка и группировка квартир
@@ -200,83 +159,27 @@ def update_quarter_file(file_path, quarter_name, apartments_data):
         houses[house][floor_num].append(apt)
     
     # Генерация содержимого
-    content = f"# 🏘️ Квартал — {quarter_name}\n\n"
-    content += f"## 📍 Общая информация\n"
-    content += f"**Квартал:** {quarter_name}\n"
-    content += f"**Город:** Минск\n"
-    content += f"**Район:** Мир\n"
-    content += f"**Количество домов:** {len(houses)}\n"
-    content += f"**Количество объектов:** {len(apartments_seen)}\n"
-    
     types = set(apt.get('type', 'Квартира') for apt in apartments_data)
-    content += f"**Типы недвижимости:** {', '.join(sorted(types))}\n"
-    content += f"**Обновлено:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-    content += "\n/n/n\n---\n\n"
+    content = md_templates.render_feed_quarter(
+        quarter_name, houses, len(apartments_seen), sorted(types), generate_apartment_section,
+        separator="\n/n/n\n---\n\n",
+        header_extra=f"**Обновлено:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
+    )
     
-    # Для каждого дома
-    for house_num in sorted(houses.keys()):
-        house_data = houses[house_num]
-        house_apartments = [apt for floor_apts in house_data.values() for apt in floor_apts]
-        
-        if house_apartments:
-            first_apt = house_apartments[0]
-            house_name = first_apt.get('NameHouse', 'Н/Д')
-            
-            content += f"## 🏠 Дом {house_num}\n\n"
-            content += f"**Название дома:** {house_name}\n\n"
-            content += f"### 📊 Статистика дома\n"
-            content += f"**Количество апартаментов:** {len(house_apartments)}\n"
-            
-            # Диапазон площадей
-            areas = []
-            for apt in house_apartments:
-                area = apt.get('Square', '').replace('Площадь: ', '').replace(' м²', '')
-                try:
-                    areas.append(float(area))
-                except:
-                    pass
-            
-            if areas:
-                content += f"**Диапазон площадей:** {min(areas):.1f} - {max(areas):.1f} м²\n"
-            
-            # Средние цены
-            prices_metr = []
-            prices_full = []
-            for apt in house_apartments:
-                price_m = apt.get('Price_metr')
-                price_f = apt.get('Price_full')
-                if price_m and price_m != '—' and isinstance(price_m, (int, float)):
-                    prices_metr.append(price_m)
-                if price_f and price_f != '—' and isinstance(price_f, (int, float)):
-                    prices_full.append(price_f)
-            
-            if prices_metr:
-                content += f"**Средняя цена за м²:** {int(sum(prices_metr) / len(prices_metr))} евро\n"
-            if prices_full:
-                content += f"**Средняя стоимость:** {int(sum(prices_full) / len(prices_full))} евро\n"
-            
-            content += "\n/n/n\n---\n\n"
-            
-            # Для каждого этажа
-            for floor_num in sorted(house_data.keys()):
-                if floor_num == 0:
-                    continue
-                
-                content += f"## 🏢 Этаж {floor_num}\n\n"
-                
-                # Сортировка по количеству комнат
-                floor_apartments = sorted(house_data[floor_num], 
-                                         key=lambda x: (x.get('UsrNumberRooms', 0), 
-                                                       x.get('Apartment', '')))
-                
-                for apt in floor_apartments:
-                    content += generate_apartment_section(apt)
-                    content += "\n/n/n\n---\n\n"
+    return content, len(apartments_seen)
+
+def render_quarter(payload):
+    """Рендеринг квартала в воркере пула: payload = (quarter_name, apartments_data)"""
+    quarter_name, apartments_data = payload
+    return build_quarter_content(quarter_name, apartments_data)
+
+def update_quarter_file(file_path, quarter_name, apartments_data):
+    """Обновление файла квартала"""
+    content, count = build_quarter_content(quarter_name, apartments_data)
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    artifacts.write_text(file_path, content)
     
-    return len(apartments_seen)
+    return count
 
 def main():
     """Основная функция"""
@@ -347,15 +250,20 @@ def main():
     changes = {}
     
     print("\n📝 Обновление файлов...")
+    tasks = []
     for quarter_name, apartments in quarters_data.items():
         if quarter_name in QUARTER_MAPPINGS:
-            file_name = QUARTER_MAPPINGS[quarter_name]
-            file_path = os.path.join(quarters_dir, file_name)
-            
-            count = update_quarter_file(file_path, quarter_name, apartments)
-            total_updated += count
-            
-            print(f"  ✅ {file_name}: {count} квартир")
+            file_path = os.path.join(quarters_dir, QUARTER_MAPPINGS[quarter_name])
+            tasks.append(RenderTask(quarter_name, file_path, (quarter_name, apartments), weight=len(apartments)))
+    
+    # Кварталы независимы — рендерим параллельно в пуле процессов
+    for result in render_quarters(tasks, render_quarter):
+        file_name = os.path.basename(result['path'])
+        if result['error']:
+            print(f"  ❌ {file_name}: {result['error']}")
+            continue
+        total_updated += result['info']
+        print(f"  ✅ {file_name}: {result['info']} квартир")
     
     print("\n" + "="*70)
     print(f"✅ Обновление завершено! Обработано {total_updated} уникальных квартир")
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Компактные записи квартир вместо словарей с ~15 строковыми ключами
+
+Нормализованная квартира создаётся на каждый объект фида (PropertyMonitor.split_data_by_quarters,
+BirDataParser.parse_data) и живёт до конца рендеринга. Словарь на 14–16 ключей занимает
+~650 байт плюс собственные копии одинаковых строк (статус, адрес, дом — отдельный объект
+на каждую запись после json.loads / декодирования). Здесь:
+    - классы с __slots__ (без __dict__): только ссылки на значения
+    - категориальные поля (квартал, дом, статус, адрес, тип...) интернируются —
+      одна строка на все записи с тем же значением
+    - числа хранятся как есть (float/int от parsing), без строковых представлений
+
+Формат JSON не меняется: to_dict() отдаёт ключи в прежнем порядке, from_dict() читает
+существующие файлы кварталов. Для старого кода, который обращается к записи как к
+словарю (apt['area'], apt.get('status')), поддержан доступ по ключу; в горячих циклах
+используются атрибуты (apt.area).
+
+    Apartment        запись quarters/*.json (sync-with-monitoring.py)
+    ParsedApartment  структурированная запись BirDataParser (bir_data_parser*.py)
+
+Использование:
+    from records import Apartment
+    apt = Apartment.from_dict(row)        # строка apartments[] файла квартала
+    apt.total_price, apt['status']
+    json.dumps(records.as_dicts(apartments))
+
+    python3 records.py --benchmark --scale 10    # память и доступ к полям против словарей
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def intern(value: Any) -> Any:
+    """Строка — интернированная копия (одна на все записи), остальное — как есть"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Общая часть записей: доступ по ключу, сериализация в прежний формат, pickle"""
+
+    __slots__ = ()
+
+    # Поля в порядке ключей JSON (и позиционных аргументов __init__)
+    FIELDS: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._getter = attrgetter(*cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Record':
+        """Запись из словаря прежнего формата; лишние ключи игнорируются, недостающие — по умолчанию"""
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь в прежнем формате (тот же порядок ключей)"""
+        return dict(zip(self.FIELDS, self._getter(self)))
+
+    def replace(self, **changes) -> 'Record':
+        """Копия записи с изменёнными полями"""
+        values = dict(zip(self.FIELDS, self._getter(self)))
+        values.update(changes)
+        return type(self)(**values)
+
+    # Доступ как к словарю — для кода, который ещё работает со словарями
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._field_set else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._field_set
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def items(self) -> Iterable[Tuple[str, Any]]:
+        return zip(self.FIELDS, self._getter(self))
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._getter(self) == other._getter(other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Позиционные значения вместо словаря слотов: меньше pickle для пула рендеринга
+        return type(self), self._getter(self)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={value!r}" for name, value in self.items())
+        return f"{type(self).__name__}({fields})"
+
+
+class Apartment(Record):
+    """Квартира в файле квартала quarters/*.json (PropertyMonitor)"""
+
+    __slots__ = ('id', 'apartment', 'type', 'quarter', 'status', 'address', 'location',
+                 'house_number', 'house_name', 'floor', 'floor_total', 'area',
+                 'price_per_sqm', 'total_price')
+
+    FIELDS = __slots__
+
+    def __init__(self, id='', apartment='', type='', quarter='', status='', address='', location='',
+                 house_number='', house_name='', floor='', floor_total='', area=0,
+                 price_per_sqm=0, total_price=0):
+        self.id = id
+        self.apartment = apartment
+        self.type = intern(type)
+        self.quarter = intern(quarter)
+        self.status = intern(status)
+        self.address = intern(address)
+        self.location = intern(location)
+        self.house_number = intern(house_number)
+        self.house_name = intern(house_name)
+        self.floor = intern(floor)
+        self.floor_total = intern(floor_total)
+        self.area = area
+        self.price_per_sqm = price_per_sqm
+        self.total_price = total_price
+
+
+class ParsedApartment(Record):
+    """Структурированная запись BirDataParser (этажи — int, площадь и цены — float)"""
+
+    __slots__ = ('id', 'apartment', 'type', 'quarter', 'house_number', 'house_name', 'floor',
+                 'floor_total', 'square', 'status', 'address', 'location', 'price_metr',
+                 'price_full', 'installment_price_metr', 'installment_price_full')
+
+    FIELDS = __slots__
+
+    def __init__(self, id='', apartment='', type='', quarter='', house_number='', house_name='',
+                 floor=0, floor_total=0, square=0.0, status='', address='', location='',
+                 price_metr=0.0, price_full=0.0, installment_price_metr=0.0,
+                 installment_price_full=0.0):
+        self.id = id
+        self.apartment = apartment
+        self.type = intern(type)
+        self.quarter = intern(quarter)
+        self.house_number = intern(house_number)
+        self.house_name = intern(house_name)
+        self.floor = floor
+        self.floor_total = floor_total
+        self.square = square
+        self.status = intern(status)
+        self.address = intern(address)
+        self.location = intern(location)
+        self.price_metr = price_metr
+        self.price_full = price_full
+        self.installment_price_metr = installment_price_metr
+        self.installment_price_full = installment_price_full
+
+
+def as_dict(item: Any) -> Any:
+    """Запись → словарь прежнего формата; словари (properties из готового JSON) — как есть"""
+    return item.to_dict() if isinstance(item, Record) else item
+
+
+def as_dicts(items: Iterable[Any]) -> List[Any]:
+    return [as_dict(item) for item in items]
+
+
+# ===== БЕНЧМАРК =====
+
+def _feed(scale: int) -> Dict:
+    """Синтетический фид после json.loads (как в проде: своя копия строки на каждое значение)"""
+    import json
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent / 'benchmarks'))
+    from synthetic_feed import generate_feed
+    return json.loads(json.dumps(generate_feed(scale), ensure_ascii=False))
+
+
+def _legacy_parse(parser) -> List[Dict]:
+    """Прежняя сборка structured_item словарём (как была в BirDataParser.parse_data)"""
+    rows = []
+    for item_id, item in parser.data.items():
+        quarter = parser.extract_quarter_name(item.get('Quarter', ''))
+        house_number = parser.extract_house_number(item.get('NumberHouse', ''))
+        house_name = parser.decode_unicode(item.get('NameHouse', ''))
+        address = parser.decode_unicode(item.get('Address', ''))
+        if quarter == "Неизвестный квартал":
+            quarter = parser.determine_quarter_by_address(address, house_name, house_number)
+        rows.append({
+            'id': item_id,
+            'apartment': parser.decode_unicode(item.get('Apartment', '')),
+            'type': parser.decode_unicode(item.get('type', '')),
+            'quarter': quarter,
+            'house_number': house_number,
+            'house_name': house_name,
+            'floor': parser.extract_floor_number(item.get('Floor', '')),
+            'floor_total': parser.extract_floor_number(item.get('FloorTotal', '')),
+            'square': parser.extract_square(item.get('Square', '')),
+            'status': parser.decode_unicode(item.get('Status', '')),
+            'address': address,
+            'location': parser.decode_unicode(item.get('Location', '')),
+            'price_metr': parser.safe_float(item.get('Price_metr', 0)),
+            'price_full': parser.safe_float(item.get('Price_full', 0)),
+            'installment_price_metr': parser.safe_float(item.get('Installment_price_metr', 0)),
+            'installment_price_full': parser.safe_float(item.get('Installment_price_full', 0)),
+        })
+    return rows
+
+
+def _retained(build) -> Tuple[Any, int]:
+    """Результат build() и объём памяти, который он удерживает"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def _best(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(scale: int = 1, repeat: int = 5) -> Dict:
+    """Байт на запись и скорость статистики по полям: словари против слотовых записей"""
+    import io
+    import contextlib
+    from bir_data_parser import BirDataParser
+
+    parser = BirDataParser()
+    parser.data = _feed(scale)
+
+    def parse_records() -> List[ParsedApartment]:
+        parser.quarters.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.parse_data()
+        return [apt for houses in parser.quarters.values() for apts in houses.values() for apt in apts]
+
+    # Кеши parsing прогреты заранее: их числа — общие для обоих вариантов
+    parse_records()
+    legacy, legacy_bytes = _retained(lambda: _legacy_parse(parser))
+    current, current_bytes = _retained(parse_records)
+    # Тот же порядок обхода (по кварталам и домам), что у записей parse_data
+    legacy_by_id = {row['id']: row for row in legacy}
+    legacy = [legacy_by_id[apt.id] for apt in current]
+    if [apt.to_dict() for apt in current] != legacy:
+        raise AssertionError("ParsedApartment.to_dict() отличается от прежнего словаря")
+
+    # Статистика дома/квартала: отбор положительных цен и площадей (render_parsed_house_stats)
+    def dict_stats():
+        return ([apt['price_metr'] for apt in legacy if apt['price_metr'] > 0],
+                [apt['square'] for apt in legacy if apt['square'] > 0],
+                [apt['price_full'] for apt in legacy if apt['price_full'] > 0])
+
+    def record_stats():
+        return ([apt.price_metr for apt in current if apt.price_metr > 0],
+                [apt.square for apt in current if apt.square > 0],
+                [apt.price_full for apt in current if apt.price_full > 0])
+
+    count = len(current)
+    return {
+        'records': count,
+        'dict_bytes_per_record': round(legacy_bytes / count),
+        'record_bytes_per_record': round(current_bytes / count),
+        'memory_ratio': round(legacy_bytes / current_bytes, 2),
+        'dict_stats_sec': round(_best(dict_stats, repeat), 5),
+        'record_stats_sec': round(_best(record_stats, repeat), 5),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Компактные записи квартир')
+    parser.add_argument('--benchmark', action='store_true', help='Память и доступ к полям против словарей')
+    parser.add_argument('--scale', type=int, default=1, help='Масштаб синтетического фида (по умолчанию: 1)')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов (берётся лучший)')
+    args = parser.parse_args(argv)
+
+    if not args.benchmark:
+        for cls in (Apartment, ParsedApartment):
+            print(f"{cls.__name__:16} {len(cls.FIELDS)} полей: {', '.join(cls.FIELDS)}")
+        return 0
+
+    r = benchmark(args.scale, args.repeat)
+    speedup = r['dict_stats_sec'] / r['record_stats_sec'] if r['record_stats_sec'] else 0
+    print(f"📏 Записи BirDataParser, синтетический фид ×{args.scale}: {r['records']:,} квартир (to_dict совпадает)")
+    print(f"   память на запись: словарь {r['dict_bytes_per_record']:,} Б | "
+          f"ParsedApartment {r['record_bytes_per_record']:,} Б | ×{r['memory_ratio']}")
+    print(f"   статистика по полям: словарь {r['dict_stats_sec']}с | атрибуты {r['record_stats_sec']}с | ×{speedup:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Параллельный рендеринг кварталов в пуле процессов
+
+Кварталы независимы, а сборка Markdown — чистая работа CPU, поэтому полная
+перегенерация (например, после смены шаблона) раскладывается по процессам:
+    - входные данные кварталов один раз сериализуются в файл pickle-срезов;
+      воркеры открывают его через mmap и читают только срез своей задачи
+      (по каналу пула передаются ключ и смещение, а не данные)
+    - воркер рендерит, пишет файл атомарно (artifacts, без перезаписи
+      неизменившихся) и возвращает sha256 и размер содержимого; fsync
+      каталогов делает родитель — один раз на каталог
+    - задачи раздаются от самых тяжёлых к лёгким, число процессов — по ядрам
+      (MM_RENDER_WORKERS переопределяет, 1 — без пула)
+    - на малых объёмах (меньше PARALLEL_MIN_WEIGHT квартир) запуск пула
+      дороже самого рендеринга — рендерим в текущем процессе
+
+Функция рендеринга получает payload задачи и возвращает текст или
+(текст, доп. результат). Пул использует fork, где он есть, поэтому подходят
+и связанные методы (PropertyMonitor.generate_quarter_markdown и т.п.).
+
+Использование:
+    tasks = [RenderTask('12 Западная Европа', 'quarters/12.md', quarter_data, weight=len(apts))]
+    for result in render_quarters(tasks, monitor.generate_quarter_markdown):
+        print(result['path'], result['sha256'])
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import artifacts
+import tracing
+
+RENDER_WORKERS_ENV = 'MM_RENDER_WORKERS'
+
+# Меньше этого числа квартир суммарно пул не запускается
+PARALLEL_MIN_WEIGHT = 5000
+
+
+class RenderTask:
+    """Задача рендеринга: ключ (квартал), путь результата, входные данные, вес для балансировки"""
+
+    def __init__(self, key: str, path: str, payload: Any, weight: int = 1):
+        self.key = key
+        self.path = str(path)
+        self.payload = payload
+        self.weight = weight
+
+
+def default_workers() -> int:
+    """Число процессов: MM_RENDER_WORKERS или доступные ядра"""
+    configured = os.environ.get(RENDER_WORKERS_ENV, '').strip()
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            pass
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+class SharedSlices:
+    """Входные данные задач в одном файле: pickle-срез на задачу, индекс key → (offset, length)"""
+
+    def __init__(self, payloads: Dict[str, Any], directory: Optional[str] = None):
+        self.index: Dict[str, Tuple[int, int]] = {}
+        fd, self.path = tempfile.mkstemp(prefix='mm_render_', suffix='.slices', dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            for key, payload in payloads.items():
+                data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+                self.index[key] = (f.tell(), len(data))
+                f.write(data)
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Состояние воркера (заполняется в _init_worker)
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(slices_path: str, render: Callable, env: Dict[str, str]):
+    os.environ.update(env)
+    tracing.detach()
+    f = open(slices_path, 'rb')
+    _worker['file'] = f
+    _worker['map'] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker['render'] = render
+
+
+def _write_result(task_key: str, path: str, render: Callable, payload: Any,
+                  sync_dir: bool = True) -> Dict:
+    """Отрендерить payload, записать файл (если содержимое изменилось), вернуть хеш/размер"""
+    start = time.perf_counter()
+    with tracing.span('render_quarter', quarter=task_key, pid=os.getpid()):
+        rendered = render(payload)
+        content, info = rendered if isinstance(rendered, tuple) else (rendered, None)
+        data = content.encode('utf-8')
+        written = artifacts.write_bytes(path, data, sync_dir=sync_dir)
+    return {
+        'key': task_key,
+        'path': path,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'bytes': len(data),
+        'written': written,
+        'info': info,
+        'seconds': round(time.perf_counter() - start, 4),
+        'error': None
+    }
+
+
+def _render_slice(task_key: str, path: str, offset: int, length: int) -> Dict:
+    payload = pickle.loads(_worker['map'][offset:offset + length])
+    return _write_result(task_key, path, _worker['render'], payload, sync_dir=False)
+
+
+def _failed(task: RenderTask, error: BaseException) -> Dict:
+    return {'key': task.key, 'path': task.path, 'sha256': None, 'bytes': 0, 'written': False, 'info': None,
+            'seconds': 0.0, 'error': f"{type(error).__name__}: {error}"}
+
+
+def _mp_context():
+    # fork: воркеры наследуют функцию рендеринга без pickle (подходят методы с лямбдами внутри)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def render_quarters(tasks: List[RenderTask], render: Callable[[Any], Any],
+                    workers: Optional[int] = None) -> List[Dict]:
+    """
+    Отрендерить задачи (в пуле процессов, если это окупается)
+
+    Args:
+        tasks: Задачи рендеринга
+        render: render(payload) -> str или (str, info)
+        workers: Число процессов (None — default_workers(), пул только от PARALLEL_MIN_WEIGHT квартир)
+
+    Returns:
+        Результаты в порядке tasks: key, path, sha256, bytes, written, info, seconds, error
+    """
+    if not tasks:
+        return []
+
+    explicit = workers is not None
+    workers = min(workers if explicit else default_workers(), len(tasks))
+    total_weight = sum(task.weight for task in tasks)
+    parallel = workers > 1 and (explicit or total_weight >= PARALLEL_MIN_WEIGHT)
+
+    results: Dict[str, Dict] = {}
+    if not parallel:
+        with artifacts.batch():
+            for task in tasks:
+                try:
+                    results[task.key] = _write_result(task.key, task.path, render, task.payload)
+                except Exception as e:
+                    results[task.key] = _failed(task, e)
+        return [results[task.key] for task in tasks]
+
+    env = {}
+    active = tracing.current_span()
+    if active is not None and tracing.enabled():
+        env[tracing.TRACEPARENT_ENV] = active.traceparent
+
+    with SharedSlices({task.key: task.payload for task in tasks}) as slices:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                                 initializer=_init_worker, initargs=(slices.path, render, env)) as pool:
+            futures = {}
+            # Сначала тяжёлые кварталы — иначе самый большой может достаться последним
+            for task in sorted(tasks, key=lambda t: t.weight, reverse=True):
+                offset, length = slices.index[task.key]
+                futures[pool.submit(_render_slice, task.key, task.path, offset, length)] = task
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    results[task.key] = future.result()
+                except Exception as e:
+                    results[task.key] = _failed(task, e)
+
+    # Воркеры не синхронизируют каталоги — один fsync на каталог здесь
+    artifacts.sync_dirs(os.path.dirname(os.path.abspath(r['path'])) for r in results.values() if r['written'])
+    return [results[task.key] for task in tasks]
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Сериализация JSON-артефактов: orjson, если установлен, иначе stdlib json
+
+Почти все модули гоняют через json.dump(..., indent=2, ensure_ascii=False)
+файлы кварталов, снимки фида (current_data_file, previous_data.json), кеши,
+pricing_index.json. Здесь единая точка:
+    - dumps() отдаёт bytes в UTF-8; indent=2 — как прежде по всему проекту,
+      indent=None — компактно (для файлов, которые читает только код)
+    - loads()/load() принимают bytes/str/путь
+    - записи records.* сериализуются в прежний формат (to_dict)
+
+Вывод orjson совпадает с json.dumps(indent=2, ensure_ascii=False) побайтно
+для строк, целых, списков, словарей и float без экспоненты. Отличия: float
+в экспоненциальной записи пишутся короче (1e16 вместо 1e+16, 1.5e-7 вместо
+1.5e-07) — значение при чтении то же. Случаи, которые orjson не поддерживает
+или пишет иначе по смыслу, уходят в stdlib: indent кроме 2, ensure_ascii=True,
+целые больше 64 бит, NaN/Infinity (orjson записал бы null) и при чтении.
+
+MM_JSON_BACKEND=json принудительно включает stdlib (сверка, отладка).
+
+Использование:
+    import serialization
+    data = serialization.load('data/current.json')
+    raw = serialization.dumps(data)                  # indent=2
+    raw = serialization.dumps(state, indent=None)    # компактно
+    artifacts.write_json(path, data, indent=None)    # запись идёт через этот модуль
+
+    python3 benchmarks/json_artifacts.py             # время и размер по типам артефактов
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+BACKEND_ENV = 'MM_JSON_BACKEND'
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PathLike = Union[str, Path]
+
+
+def backend() -> str:
+    """Активный бэкенд: 'orjson' или 'json'"""
+    if orjson is None or os.environ.get(BACKEND_ENV, '').strip().lower() == 'json':
+        return 'json'
+    return 'orjson'
+
+
+def _default(obj: Any) -> Any:
+    # Записи records.* — словарь прежнего формата
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _chain(default: Optional[Callable]) -> Callable:
+    if default is None:
+        return _default
+
+    def chained(obj):
+        try:
+            return default(obj)
+        except TypeError:
+            return _default(obj)
+    return chained
+
+
+def _has_non_finite(data: Any) -> bool:
+    """Есть ли во вложенных dict/list/tuple (и записях records.*) float NaN или ±Infinity"""
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, float):
+            if not math.isfinite(item):
+                return True
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, 'to_dict'):
+            stack.append(item.to_dict())
+    return False
+
+
+def dumps_stdlib(data: Any, indent: Optional[int] = 2, sort_keys: bool = False,
+                 ensure_ascii: bool = False, default: Optional[Callable] = None) -> bytes:
+    """json.dumps → bytes (компактный вывод — без пробелов, как у orjson)"""
+    separators = None if indent is not None else (',', ':')
+    return json.dumps(data, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+                      separators=separators, default=_chain(default)).encode('utf-8')
+
+
+def dumps(data: Any, indent: Optional[int] = 2, sort_keys: bool = False,
+          ensure_ascii: bool = False, default: Optional[Callable] = None) -> bytes:
+    """
+    Сериализовать в JSON (UTF-8 bytes)
+
+    Args:
+        data: Данные
+        indent: 2 — читаемый вывод (как прежде), None — компактный
+        sort_keys: Сортировать ключи словарей
+        ensure_ascii: \\uXXXX вместо не-ASCII (только stdlib)
+        default: Обработчик несериализуемых объектов (как в json.dumps)
+    """
+    if backend() == 'orjson' and indent in (None, 2) and not ensure_ascii:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent is not None:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            raw = orjson.dumps(data, default=_chain(default), option=option)
+        except TypeError:
+            # Целые больше 64 бит, неподдерживаемые типы — как в stdlib (или её ошибка)
+            pass
+        else:
+            # orjson пишет NaN/Infinity как null; без null в выводе их нет — обход не нужен
+            if b'null' not in raw or not _has_non_finite(data):
+                return raw
+    return dumps_stdlib(data, indent=indent, sort_keys=sort_keys, ensure_ascii=ensure_ascii, default=default)
+
+
+def dumps_text(data: Any, **kwargs) -> str:
+    """dumps() → str"""
+    return dumps(data, **kwargs).decode('utf-8')
+
+
+def loads(raw: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Разобрать JSON из bytes/str; ошибка — json.JSONDecodeError (как у stdlib)"""
+    if backend() == 'orjson':
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity, целые больше 64 бит и т.п. — stdlib разбирает или даёт свою ошибку
+            pass
+    if not isinstance(raw, str):
+        raw = bytes(raw).decode('utf-8')
+    return json.loads(raw)
+
+
+def load(path: PathLike) -> Any:
+    """Прочитать JSON-файл (FileNotFoundError/JSONDecodeError — как при json.load)"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Бинарный снимок базы знаний (knowledge-base.snap) с ленивым чтением через mmap
+
+PropertyMonitor каждый запуск разбирал quarters/knowledge-base.json целиком
+(отформатированный JSON с полным фидом) только затем, чтобы посчитать хеш и
+сравнить с новым. Снимок устроен так, что лишнего не читается:
+    - хеш версии (PropertyMonitor.calculate_hash) лежит в заголовке —
+      сравнение версий читает только заголовок
+    - записи фида (document['data']: id → объект) разложены по секциям
+      (квартал), каждая сжата отдельно — чтение одного квартала
+      распаковывает только его секцию
+    - остальные поля документа (version, source, updated_at) — в заголовке
+    - порядок записей сохраняется: load() возвращает тот же документ
+
+Формат (все числа little-endian):
+    MAGIC (6 байт) | версия формата uint16 | длина заголовка uint32 | заголовок (JSON) | секции
+
+Сжатие — zlib (stdlib); поле codec в заголовке оставляет место для других.
+
+Человекочитаемый JSON выгружается по запросу:
+    python3 snapshot.py export quarters/knowledge-base.snap -o knowledge-base.json
+
+Включение в мониторе: MM_SNAPSHOT_FORMAT=binary (по умолчанию — json, как прежде).
+
+Использование:
+    import snapshot
+    snapshot.write_snapshot(path, document, digest=hash_value, section_of=lambda key, record: ...)
+    snapshot.read_digest(path)                       # только заголовок
+    with snapshot.SnapshotReader(path) as reader:
+        reader.section('12-Западная-Европа')         # одна секция
+        reader.load()                                # весь документ
+
+    python3 snapshot.py info quarters/knowledge-base.snap
+    python3 snapshot.py --benchmark --scale 10       # против knowledge-base.json
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import artifacts
+import serialization
+
+MAGIC = b'MMSNAP'
+FORMAT_VERSION = 1
+CODEC = 'zlib'
+COMPRESS_LEVEL = 6
+
+# Поле документа с записями (id → объект), которое раскладывается по секциям
+DATA_KEY = 'data'
+
+PathLike = Union[str, Path]
+
+_PREFIX = struct.Struct('<6sHI')
+
+
+class SnapshotError(ValueError):
+    """Файл не является снимком или повреждён"""
+
+
+def _compress(data: Any) -> bytes:
+    return zlib.compress(serialization.dumps(data, indent=None), COMPRESS_LEVEL)
+
+
+def encode_snapshot(document: Dict[str, Any], digest: Optional[str] = None,
+                    section_of: Optional[Callable[[str, Any], str]] = None) -> bytes:
+    """
+    Собрать снимок в байты
+
+    Args:
+        document: Документ; document['data'] (словарь id → запись) раскладывается по секциям
+        digest: Хеш версии для заголовка (сравнение без чтения данных)
+        section_of: Имя секции для (id, запись); None — одна секция на все записи
+    """
+    records = document.get(DATA_KEY) if isinstance(document, dict) else None
+    header: Dict[str, Any] = {'codec': CODEC, 'digest': digest, 'sections': []}
+    blobs: List[bytes] = []
+
+    if isinstance(records, dict):
+        keys = list(document)
+        header['meta'] = {key: value for key, value in document.items() if key != DATA_KEY}
+        header['position'] = keys.index(DATA_KEY)
+
+        # Записи по секциям в порядке первого появления; order — номер секции каждой записи
+        grouped: Dict[str, Dict[str, Any]] = {}
+        index: Dict[str, int] = {}
+        order = array('I')
+        for key, record in records.items():
+            name = section_of(key, record) if section_of else ''
+            if name not in index:
+                index[name] = len(grouped)
+                grouped[name] = {}
+            grouped[name][key] = record
+            order.append(index[name])
+        sections = list(grouped.items())
+        if len(index) < 65536:
+            order = array('H', order)
+        blobs.append(zlib.compress(order.tobytes(), COMPRESS_LEVEL))
+        header['order'] = {'typecode': order.typecode, 'count': len(order)}
+    else:
+        # Документ без словаря записей — одной секцией целиком
+        header['meta'] = None
+        sections = [('', document)]
+
+    offset = sum(len(blob) for blob in blobs)
+    if blobs:
+        header['order'].update(offset=0, length=offset)
+    for name, payload in sections:
+        blob = _compress(payload)
+        header['sections'].append({'name': name, 'offset': offset, 'length': len(blob),
+                                   'count': len(payload) if isinstance(payload, dict) else None})
+        blobs.append(blob)
+        offset += len(blob)
+
+    head = serialization.dumps(header, indent=None)
+    return b''.join([_PREFIX.pack(MAGIC, FORMAT_VERSION, len(head)), head] + blobs)
+
+
+def write_snapshot(path: PathLike, document: Dict[str, Any], digest: Optional[str] = None,
+                   section_of: Optional[Callable[[str, Any], str]] = None, **kwargs) -> bool:
+    """Атомарно записать снимок (см. encode_snapshot, artifacts.write_bytes)"""
+    return artifacts.write_bytes(path, encode_snapshot(document, digest, section_of), **kwargs)
+
+
+def _read_header(f) -> Dict[str, Any]:
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise SnapshotError('файл короче заголовка')
+    magic, version, length = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise SnapshotError('не снимок (нет сигнатуры MMSNAP)')
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f'версия формата {version} не поддерживается')
+    header = serialization.loads(f.read(length))
+    header['body'] = _PREFIX.size + length
+    return header
+
+
+def read_digest(path: PathLike) -> Optional[str]:
+    """Хеш версии из заголовка (данные не читаются); None — файла нет или он не снимок"""
+    try:
+        with open(path, 'rb') as f:
+            return _read_header(f).get('digest')
+    except (OSError, ValueError):
+        return None
+
+
+def is_snapshot(path: PathLike) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SnapshotReader:
+    """Ленивое чтение снимка: заголовок — сразу, секции — из mmap по запросу"""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self.header = _read_header(self._file)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self._sections = {entry['name']: entry for entry in self.header['sections']}
+
+    @property
+    def digest(self) -> Optional[str]:
+        return self.header.get('digest')
+
+    @property
+    def meta(self) -> Optional[Dict[str, Any]]:
+        """Поля документа кроме записей (None — документ хранится одной секцией)"""
+        return self.header.get('meta')
+
+    @property
+    def sections(self) -> List[str]:
+        return list(self._sections)
+
+    def count(self, name: str) -> Optional[int]:
+        return self._sections[name]['count']
+
+    def _blob(self, offset: int, length: int) -> bytes:
+        start = self.header['body'] + offset
+        with memoryview(self._map)[start:start + length] as view:
+            return zlib.decompress(view)
+
+    def section(self, name: str) -> Any:
+        """Записи одной секции (id → запись); KeyError — такой секции нет"""
+        entry = self._sections[name]
+        return serialization.loads(self._blob(entry['offset'], entry['length']))
+
+    def iter_sections(self) -> Iterator:
+        for name in self._sections:
+            yield name, self.section(name)
+
+    def records(self) -> Dict[str, Any]:
+        """Все записи в исходном порядке"""
+        order_info = self.header['order']
+        order = array(order_info['typecode'])
+        order.frombytes(self._blob(order_info['offset'], order_info['length']))
+        iterators = [iter(self.section(entry['name']).items()) for entry in self.header['sections']]
+        return dict(next(iterators[index]) for index in order)
+
+    def load(self) -> Any:
+        """Документ целиком — тот же, что был записан"""
+        meta = self.meta
+        if meta is None:
+            return self.section('')
+        items = list(meta.items())
+        items.insert(self.header['position'], (DATA_KEY, self.records()))
+        return dict(items)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'SnapshotReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load(path: PathLike) -> Any:
+    """Документ из снимка или JSON-файла (по сигнатуре)"""
+    if not is_snapshot(path):
+        return serialization.load(path)
+    with SnapshotReader(path) as reader:
+        return reader.load()
+
+
+def export_json(path: PathLike, output: PathLike, indent: Optional[int] = 2) -> bool:
+    """Выгрузить снимок в JSON (как прежний knowledge-base.json)"""
+    return artifacts.write_json(output, load(path), indent=indent)
+
+
+# ===== БЕНЧМАРК =====
+
+def benchmark(scale: int = 1, repeat: int = 5) -> Dict:
+    """Проверка «изменилось ли» и чтение одного квартала: knowledge-base.json против снимка"""
+    import importlib.util
+    import json
+    import os
+    import tempfile
+    sys.path.insert(0, str(Path(__file__).resolve().parent / 'benchmarks'))
+    from synthetic_feed import generate_feed
+
+    spec = importlib.util.spec_from_file_location('sync_with_monitoring', Path(__file__).resolve().parent / 'sync-with-monitoring.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monitor = module.PropertyMonitor.__new__(module.PropertyMonitor)
+
+    feed = json.loads(json.dumps(generate_feed(scale), ensure_ascii=False))
+    document = {'version': '1.0', 'source': 'synthetic', 'updated_at': '2025-01-01T00:00:00', 'data': feed}
+    digest = monitor.calculate_hash(document)
+
+    work_dir = Path(tempfile.mkdtemp(prefix='mm_snapshot_'))
+    os.environ.setdefault(artifacts.FSYNC_ENV, '0')
+    json_path, snap_path = work_dir / 'knowledge-base.json', work_dir / 'knowledge-base.snap'
+    try:
+        artifacts.write_json(json_path, document)
+        write_snapshot(snap_path, document, digest, monitor.snapshot_section)
+        with SnapshotReader(snap_path) as reader:
+            if reader.load() != document or list(reader.load()['data']) != list(feed):
+                raise AssertionError('снимок восстанавливается не в исходный документ')
+            quarter = max(reader.sections, key=reader.count)
+
+        def json_digest():
+            return monitor.calculate_hash(serialization.load(json_path))
+
+        def json_quarter():
+            data = serialization.load(json_path)['data']
+            return {key: record for key, record in data.items() if monitor.snapshot_section(key, record) == quarter}
+
+        def snap_quarter():
+            with SnapshotReader(snap_path) as reader:
+                return reader.section(quarter)
+
+        if json_digest() != read_digest(snap_path) or json_quarter() != snap_quarter():
+            raise AssertionError('хеш или квартал снимка отличается от JSON')
+
+        timings = {
+            'json_digest': _best(json_digest, repeat),
+            'snapshot_digest': _best(lambda: read_digest(snap_path), repeat),
+            'json_load': _best(lambda: serialization.load(json_path), repeat),
+            'snapshot_load': _best(lambda: load(snap_path), repeat),
+            'json_quarter': _best(json_quarter, repeat),
+            'snapshot_quarter': _best(snap_quarter, repeat),
+        }
+        return {
+            'records': len(feed),
+            'quarter': quarter,
+            'json_bytes': json_path.stat().st_size,
+            'snapshot_bytes': snap_path.stat().st_size,
+            'ms': {name: round(seconds * 1000, 3) for name, seconds in timings.items()},
+        }
+    finally:
+        for path in (json_path, snap_path):
+            if path.exists():
+                path.unlink()
+        work_dir.rmdir()
+
+
+def _best(func, repeat: int) -> float:
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Бинарный снимок базы знаний')
+    parser.add_argument('command', nargs='?', choices=['info', 'export'], help='info — заголовок, export — в JSON')
+    parser.add_argument('path', nargs='?', default='quarters/knowledge-base.snap', help='Файл снимка')
+    parser.add_argument('-o', '--output', help='export: файл JSON (по умолчанию — рядом, .json)')
+    parser.add_argument('--compact', action='store_true', help='export: без отступов')
+    parser.add_argument('--benchmark', action='store_true', help='Замерить против knowledge-base.json')
+    parser.add_argument('--scale', type=int, default=1, help='Масштаб синтетического фида (по умолчанию: 1)')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов (берётся лучший)')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        r = benchmark(args.scale, args.repeat)
+        ms = r['ms']
+        print(f"📏 Снимок базы знаний, синтетический фид ×{args.scale}: {r['records']:,} объектов "
+              f"(load() совпадает с JSON)")
+        print(f"   размер: JSON {r['json_bytes'] / 1024:,.0f} КБ | снимок {r['snapshot_bytes'] / 1024:,.0f} КБ")
+        print(f"   хеш версии:      JSON {ms['json_digest']:8.2f} мс | снимок {ms['snapshot_digest']:8.3f} мс")
+        print(f"   весь документ:   JSON {ms['json_load']:8.2f} мс | снимок {ms['snapshot_load']:8.2f} мс")
+        print(f"   один квартал:    JSON {ms['json_quarter']:8.2f} мс | снимок {ms['snapshot_quarter']:8.2f} мс ({r['quarter']})")
+        return 0
+
+    if args.command is None:
+        parser.print_help()
+        return 2
+    path = Path(args.path)
+    if not path.exists():
+        print(f"❌ Файл не найден: {path}")
+        return 1
+    try:
+        if args.command == 'info':
+            with SnapshotReader(path) as reader:
+                print(f"📦 {path} ({path.stat().st_size:,} байт, {reader.header['codec']})")
+                print(f"   хеш: {reader.digest}")
+                for key, value in (reader.meta or {}).items():
+                    print(f"   {key}: {value}")
+                for name in reader.sections:
+                    print(f"   • {name or '—'}: {reader.count(name)} записей")
+        else:
+            output = Path(args.output) if args.output else path.with_suffix('.json')
+            export_json(path, output, indent=None if args.compact else 2)
+            print(f"💾 JSON: {output}")
+    except SnapshotError as e:
+        print(f"❌ {path}: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,26 +8,43 @@ import os
 import sys
 import re
 import json
-import requests
 import hashlib
 import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 # from deepdiff import DeepDiff  # Опционально
-import schedule
+
+import artifacts
+import md_templates
+import metrics
+import parsing
+import records
+import serialization
+import tracing
+
+# requests, schedule и пул рендеринга импортируются там, где нужны: запуск без
+# изменений (cron раз в час) не должен платить за их загрузку
+
+PIPELINE = 'monitor'
+
+# Формат снимка базы знаний: json (knowledge-base.json) или binary (knowledge-base.snap, snapshot.py)
+SNAPSHOT_FORMAT_ENV = 'MM_SNAPSHOT_FORMAT'
 
 
 class PropertyMonitor:
     """Класс для мониторинга изменений в данных недвижимости"""
     
-    def __init__(self, source_url: str = "https://bir.by/ai/json_ai.php"):
+    def __init__(self, source_url: str = "https://bir.by/ai/json_ai.php", profile: bool = False):
         self.source_url = source_url
         self.data_dir = Path('./quarters')
         self.history_file = self.data_dir / 'version-history.json'
-        self.current_data_file = self.data_dir / 'knowledge-base.json'
+        self.snapshot_format = os.environ.get(SNAPSHOT_FORMAT_ENV, 'json').strip().lower()
+        snapshot_name = 'knowledge-base.snap' if self.snapshot_format == 'binary' else 'knowledge-base.json'
+        self.current_data_file = self.data_dir / snapshot_name
         self.quarters_dir = self.data_dir / 'by-quarters'
         self.quarter_hashes_file = self.data_dir / '.quarter_hashes.json'
+        self.validation_report_file = self.data_dir / 'validation-report.json'
         self.data_dir.mkdir(exist_ok=True)
         self.quarters_dir.mkdir(exist_ok=True)
 
@@ -36,30 +53,35 @@ class PropertyMonitor:
 
         # Список измененных файлов (для передачи в ElevenLabs sync)
         self.changed_md_files = []
+
+        # sha256 сгенерированных MD файлов (имя → хеш)
+        self.md_hashes: Dict[str, str] = {}
+
+        # cProfile для CPU-стадий (--profile)
+        self.profiler = tracing.StageProfiler(enabled=profile)
+
+        # Инкрементальная валидация: в run_monitoring состояние живёт между проверками
+        self.validator = None
     
     def load_version_history(self) -> List[Dict]:
         """Загрузить историю версий из файла"""
         if self.history_file.exists():
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return serialization.load(self.history_file)
         return []
     
     def save_version_history(self):
         """Сохранить историю версий в файл"""
-        with open(self.history_file, 'w', encoding='utf-8') as f:
-            json.dump(self.version_history, f, ensure_ascii=False, indent=2)
+        artifacts.write_json(self.history_file, self.version_history)
 
     def load_quarter_hashes(self) -> Dict[str, str]:
         """Загрузить хеши кварталов из файла"""
         if self.quarter_hashes_file.exists():
-            with open(self.quarter_hashes_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return serialization.load(self.quarter_hashes_file)
         return {}
 
     def save_quarter_hashes(self, hashes: Dict[str, str]):
-        """Сохранить хеши кварталов в файл"""
-        with open(self.quarter_hashes_file, 'w', encoding='utf-8') as f:
-            json.dump(hashes, f, ensure_ascii=False, indent=2)
+        """Сохранить хеши кварталов в файл (служебный — компактно)"""
+        artifacts.write_json(self.quarter_hashes_file, hashes, indent=None)
 
     def generate_quarter_markdown(self, quarter_data: Dict) -> str:
         """
@@ -75,28 +97,21 @@ class PropertyMonitor:
         apartments = quarter_data.get('apartments', [])
         stats = quarter_data.get('statistics', {})
 
-        # Заголовок
-        md = f"# 🏘️ Квартал — {quarter_name}\n\n"
-        md += f"## 📍 Общая информация\n\n"
-        md += f"**Квартал:** {quarter_name}\n"
-        md += f"**Город:** Минск\n"
-        md += f"**Район:** Мир\n"
-        md += f"**Количество объектов:** {len(apartments)}\n"
-        md += f"**Тип недвижимости:** Квартира\n\n"
-
-        # Статистика
-        md += f"## 📊 Статистика\n\n"
-        md += f"**Диапазон площадей:** {stats.get('min_area', 0):.1f} - {stats.get('max_area', 0):.1f} м²\n"
-        md += f"**Средняя цена за м²:** {int(stats.get('avg_price_per_m2', 0))} евро\n"
-        md += f"**Общая стоимость:** {int(stats.get('min_total_price', 0)):,} - {int(stats.get('max_total_price', 0)):,} евро\n\n"
+        # Заголовок и статистика квартала
+        parts = [md_templates.MONITOR_QUARTER_HEAD.render(
+            quarter=quarter_name,
+            count=len(apartments),
+            min_area=stats.get('min_area', 0),
+            max_area=stats.get('max_area', 0),
+            avg_price_m2=int(stats.get('avg_price_per_m2', 0)),
+            min_total=int(stats.get('min_total_price', 0)),
+            max_total=int(stats.get('max_total_price', 0))
+        )]
 
         # Группировка по домам
         houses = {}
         for apt in apartments:
-            house_num = apt.get('house_number', 'Unknown')
-            if house_num not in houses:
-                houses[house_num] = []
-            houses[house_num].append(apt)
+            houses.setdefault(apt.get('house_number', 'Unknown'), []).append(apt)
 
         # Документирование каждого дома
         for house_num in sorted(houses.keys()):
@@ -104,65 +119,65 @@ class PropertyMonitor:
             if not house_apartments:
                 continue
 
-            first_apt = house_apartments[0]
-            house_name = first_apt.get('house_name', 'N/A')
-
-            md += f"## 🏠 Дом {house_num}\n\n"
-            md += f"**Название дома:** {house_name}\n\n"
-            md += f"### 📊 Статистика дома\n"
-            md += f"**Количество апартаментов:** {len(house_apartments)}\n"
+            house_name = house_apartments[0].get('house_name', 'N/A')
+            parts.append(md_templates.HOUSE_TITLE.render(house=house_num))
+            parts.append(md_templates.HOUSE_NAME.render(house_name=house_name))
+            parts.append(md_templates.HOUSE_STATS.render(count=len(house_apartments)))
 
             # Диапазон площадей дома
             areas = [apt['area'] for apt in house_apartments if 'area' in apt]
             if areas:
-                md += f"**Диапазон площадей:** {min(areas):.1f} - {max(areas):.1f} м²\n"
+                parts.append(md_templates.AREA_RANGE.render(min_area=min(areas), max_area=max(areas)))
 
             # Средние цены дома
             prices = [apt['price_per_m2'] for apt in house_apartments if 'price_per_m2' in apt and apt['price_per_m2'] > 0]
             if prices:
-                md += f"**Средняя цена за м²:** {int(sum(prices) / len(prices))} евро\n"
+                parts.append(md_templates.AVG_PRICE_M2.render(price=int(sum(prices) / len(prices))))
 
             total_prices = [apt['total_price'] for apt in house_apartments if 'total_price' in apt and apt['total_price'] > 0]
             if total_prices:
-                md += f"**Средняя стоимость:** {int(sum(total_prices) / len(total_prices)):,} евро\n"
+                parts.append(md_templates.AVG_COST.render(cost=md_templates.money(int(sum(total_prices) / len(total_prices)))))
 
-            md += "\n\n"
+            parts.append("\n\n")
 
             # Группировка по этажам
             floors = {}
             for apt in house_apartments:
-                floor = apt.get('floor', 0)
-                if floor not in floors:
-                    floors[floor] = []
-                floors[floor].append(apt)
+                floors.setdefault(apt.get('floor', 0), []).append(apt)
 
             # Документирование каждого этажа
             for floor_num in sorted(floors.keys()):
                 if floor_num == 0:
                     continue
 
-                md += f"## 🏢 Этаж {floor_num}\n\n"
+                parts.append(md_templates.FLOOR_TITLE.render(floor=floor_num))
 
                 floor_apartments = sorted(floors[floor_num],
                                          key=lambda x: (x.get('rooms', 0), x.get('apartment', '')))
 
                 for apt in floor_apartments:
-                    md += f"### 🏠 Квартира {apt.get('apartment', 'N/A')}\n\n"
-                    md += f"**Квартал:** {quarter_name}\n"
-                    md += f"**Дом:** {house_num}\n"
-                    md += f"**Название дома:** {house_name}\n"
-                    md += f"**Этаж:** {floor_num}\n"
-                    md += f"**Этажность дома:** {apt.get('total_floors', 'N/A')}\n"
-                    md += f"**Количество комнат:** {apt.get('rooms', 'N/A')}\n"
-                    md += f"**Площадь:** {apt.get('area', 'N/A')} м²\n"
-                    md += f"**Цена за м²:** {apt.get('price_per_m2', 'N/A')} евро\n"
-                    md += f"**Общая стоимость:** {apt.get('total_price', 'N/A'):,} евро\n" if isinstance(apt.get('total_price'), (int, float)) else f"**Общая стоимость:** {apt.get('total_price', 'N/A')}\n"
-                    md += f"**Статус:** {apt.get('status', 'N/A')}\n"
-                    md += f"**Адрес:** {apt.get('address', 'N/A')}\n"
-                    md += f"**Местоположение:** {apt.get('location', 'N/A')}\n"
-                    md += "\n\n---\n\n"
-
-        return md
+                    total_price = apt.get('total_price', 'N/A')
+                    if isinstance(apt.get('total_price'), (int, float)):
+                        total_line = md_templates.MONITOR_TOTAL_PRICE.render(price=md_templates.money(total_price))
+                    else:
+                        total_line = md_templates.MONITOR_TOTAL_TEXT.render(price=total_price)
+                    parts.append(md_templates.MONITOR_APARTMENT.render(
+                        apartment=apt.get('apartment', 'N/A'),
+                        quarter=quarter_name,
+                        house=house_num,
+                        house_name=house_name,
+                        floor=floor_num,
+                        total_floors=apt.get('total_floors', 'N/A'),
+                        rooms=apt.get('rooms', 'N/A'),
+                        area=apt.get('area', 'N/A'),
+                        price_m2=apt.get('price_per_m2', 'N/A'),
+                        total_line=total_line,
+                        status=apt.get('status', 'N/A'),
+                        address=apt.get('address', 'N/A'),
+                        location=apt.get('location', 'N/A')
+                    ))
+
+        return ''.join(parts)
 
     def convert_quarters_json_to_md(self) -> List[str]:
         """
@@ -177,29 +192,34 @@ class PropertyMonitor:
             print(f"❌ Директория не найдена: {self.quarters_dir}")
             return md_files
 
+        # Кварталы независимы — рендерим в пуле процессов (render_pool)
+        from render_pool import RenderTask, render_quarters
+
+        tasks = []
         for json_file in self.quarters_dir.glob('*.json'):
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                # Генерируем markdown из JSON
-                md_content = self.generate_quarter_markdown(data)
-
-                # Создаем имя MD файла из имени квартала
-                quarter_name = data.get('quarter', json_file.stem)
-                # Транслитерация и очистка имени файла
-                md_name = self._transliterate_quarter_name(quarter_name)
-                md_path = self.data_dir / f"{md_name}.md"
-
-                # Сохраняем MD файл
-                with open(md_path, 'w', encoding='utf-8') as f:
-                    f.write(md_content)
-
-                md_files.append(f"{md_name}.md")
-                print(f"  📝 Сгенерирован: {md_name}.md")
-
+                data = serialization.load(json_file)
             except Exception as e:
                 print(f"  ❌ Ошибка конвертации {json_file.name}: {e}")
+                continue
+
+            # Создаем имя MD файла из имени квартала (транслитерация и очистка)
+            quarter_name = data.get('quarter', json_file.stem)
+            md_name = self._transliterate_quarter_name(quarter_name)
+            tasks.append(RenderTask(json_file.name, self.data_dir / f"{md_name}.md", data,
+                                    weight=len(data.get('apartments', []))))
+
+        for result in render_quarters(tasks, self.generate_quarter_markdown):
+            md_name = Path(result['path']).name
+            if result['error']:
+                print(f"  ❌ Ошибка конвертации {result['key']}: {result['error']}")
+                continue
+            self.md_hashes[md_name] = result['sha256']
+            md_files.append(md_name)
+            if result['written']:
+                print(f"  📝 Сгенерирован: {md_name}")
+            else:
+                print(f"  ⏭️  Без изменений: {md_name}")
 
         return md_files
 
@@ -247,11 +267,16 @@ class PropertyMonitor:
 
     def fetch_current_data(self) -> Optional[Dict]:
         """Получить текущие данные с сайта"""
+        import requests
+        metrics.instrument_requests()
+
         try:
             print(f"📥 Получение данных с {self.source_url}...")
             response = requests.get(self.source_url, timeout=30)
             response.raise_for_status()
-            return response.json()
+            data = serialization.loads(response.content)
+            metrics.record_feed(response.content, len(data))
+            return data
         except requests.exceptions.RequestException as e:
             print(f"❌ Ошибка при получении данных: {e}")
             return None
@@ -260,16 +285,40 @@ class PropertyMonitor:
             return None
     
     def calculate_hash(self, data: Dict) -> str:
-        """Вычислить хеш данных для определения изменений"""
+        """Вычислить хеш данных для определения изменений (без метки времени updated_at)"""
+        if isinstance(data, dict) and 'updated_at' in data:
+            data = {key: value for key, value in data.items() if key != 'updated_at'}
         json_str = json.dumps(data, sort_keys=True, ensure_ascii=False)
         return hashlib.sha256(json_str.encode()).hexdigest()
     
     def load_current_knowledge_base(self) -> Optional[Dict]:
         """Загрузить текущую базу знаний"""
         if self.current_data_file.exists():
-            with open(self.current_data_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            import snapshot
+            return snapshot.load(self.current_data_file)
         return None
+
+    def stored_knowledge_base_hash(self) -> Optional[str]:
+        """Хеш сохранённой базы знаний без чтения данных (только бинарный снимок, иначе None)"""
+        if self.snapshot_format != 'binary':
+            return None
+        import snapshot
+        return snapshot.read_digest(self.current_data_file)
+
+    def save_current_knowledge_base(self, data: Dict, data_hash: str):
+        """Сохранить базу знаний: JSON или бинарный снимок (секции — кварталы)"""
+        if self.snapshot_format == 'binary':
+            import snapshot
+            snapshot.write_snapshot(self.current_data_file, data, digest=data_hash,
+                                    section_of=self.snapshot_section)
+        else:
+            artifacts.write_json(self.current_data_file, data)
+
+    def snapshot_section(self, apt_id: str, apt_data: Any) -> str:
+        """Секция снимка для объекта фида — имя квартала, как у файлов by-quarters"""
+        if not isinstance(apt_data, dict):
+            return ''
+        return self.extract_quarter_name(self.determine_quarter(apt_data))
     
     def detect_changes(self, old_data: Dict, new_data: Dict) -> Dict:
         """Определить конкретные изменения между версиями"""
@@ -324,19 +373,7 @@ class PropertyMonitor:
     
     def extract_number(self, value: Any) -> float:
         """Извлечь число из значения"""
-        if isinstance(value, (int, float)):
-            return float(value)
-        if isinstance(value, str):
-            # Удаляем все нечисловые символы кроме точки и запятой
-            numbers = re.findall(r'[\d.,]+', value)
-            if numbers:
-                # Берем первое найденное число
-                num_str = numbers[0].replace(',', '.')
-                try:
-                    return float(num_str)
-                except ValueError:
-                    return 0
-        return 0
+        return parsing.first_number(value)
     
     def extract_quarter_name(self, quarter_str: str) -> str:
         """Извлечь название квартала из строки"""
@@ -353,6 +390,60 @@ class PropertyMonitor:
         clean_name = ''.join(c for c in clean_name if c.isalnum() or c in '-_')
         return clean_name or 'unknown-quarter'
     
+    def determine_quarter(self, apt_data: Dict) -> str:
+        """Строка квартала объекта фида: поле Quarter, иначе по Location/NumberHouse"""
+        # Пытаемся получить квартал из поля Quarter
+        quarter_str = apt_data.get('Quarter', '')
+        if quarter_str:
+            return quarter_str
+
+        # Если Quarter отсутствует, пытаемся определить по Location или NumberHouse
+        location = apt_data.get('Location', '')
+        number_house = apt_data.get('NumberHouse', '')
+
+        # Проверяем специальные случаи для квартала 02 Эмиратс
+        # Дома: Эмиратс Волна, Жемчужина 2, Марина 1, Диадема
+        house_name = apt_data.get('NameHouse', '').lower()
+        number_house_lower = number_house.lower()
+        location_lower = location.lower()
+
+        # СНАЧАЛА проверяем квартал 18 для Сидней Люкс 18.4 и Рио-де-Жанейро 18.7
+        if 'сидней люкс 18.4' in number_house_lower or 'сидней люкс 18.4' in house_name.lower():
+            return 'Квартал — 18 Чемпионов'
+        if 'рио-де-жанейро 18.7' in number_house_lower or 'рио-де-жанейро 18.7' in house_name.lower():
+            return 'Квартал — 18 Чемпионов'
+
+        # Квартал 02 Эмиратс включает:
+        # - Эмиратс Волна (любые)
+        # - Жемчужина 2
+        # - Марина 1
+        # - Диадема (любые)
+        is_emirates = False
+
+        if 'эмиратс' in location_lower or 'эмиратс' in number_house_lower:
+            is_emirates = True
+        elif 'жемчужина 2' in number_house_lower:
+            is_emirates = True
+        elif 'марина 1' in number_house_lower:
+            is_emirates = True
+        elif 'диадема' in number_house_lower.lower() or house_name == 'диадема':
+            is_emirates = True  # Диадема всегда относится к квартал 02
+
+        if is_emirates:
+            return 'Квартал — 02 Эмиратс'
+
+        # Пытаемся извлечь из Location (например: "Минск Мир, Дом 21.6")
+        match = re.search(r'Дом\s+(\d+)', location)
+        if match:
+            quarter_num = match.group(1).split('.')[0]
+            return f'Квартал — {quarter_num}'
+
+        # Проверяем NumberHouse на наличие номера квартала
+        match = re.search(r'^(\d+)', number_house)
+        if match:
+            return f'Квартал — {match.group(1)}'
+        return 'Квартал — Неизвестный'
+
     def split_data_by_quarters(self, data: Dict) -> Dict[str, List]:
         """Разделить данные по кварталам"""
         quarters_data = {}
@@ -368,62 +459,8 @@ class PropertyMonitor:
             # Если это сырые данные с bir.by
             for apt_id, apt_data in data.items():
                 if isinstance(apt_data, dict):
-                    # Пытаемся получить квартал из поля Quarter
-                    quarter_str = apt_data.get('Quarter', '')
-                    
-                    # Если Quarter отсутствует, пытаемся определить по Location или NumberHouse
-                    if not quarter_str:
-                        location = apt_data.get('Location', '')
-                        number_house = apt_data.get('NumberHouse', '')
-                        
-                        # Проверяем специальные случаи для квартала 02 Эмиратс
-                        # Дома: Эмиратс Волна, Жемчужина 2, Марина 1, Диадема
-                        house_name = apt_data.get('NameHouse', '').lower()
-                        number_house_lower = number_house.lower()
-                        location_lower = location.lower()
-                        
-                        # СНАЧАЛА проверяем квартал 18 для Сидней Люкс 18.4 и Рио-де-Жанейро 18.7
-                        if 'сидней люкс 18.4' in number_house_lower or 'сидней люкс 18.4' in house_name.lower():
-                            quarter_str = 'Квартал — 18 Чемпионов'
-                        elif 'рио-де-жанейро 18.7' in number_house_lower or 'рио-де-жанейро 18.7' in house_name.lower():
-                            quarter_str = 'Квартал — 18 Чемпионов'
-                        else:
-                            # Квартал 02 Эмиратс включает:
-                            # - Эмиратс Волна (любые)
-                            # - Жемчужина 2
-                            # - Марина 1
-                            # - Диадема (любые)
-                            is_emirates = False
-                            
-                            if 'эмиратс' in location_lower or 'эмиратс' in number_house_lower:
-                                is_emirates = True
-                            elif 'жемчужина 2' in number_house_lower:
-                                is_emirates = True
-                            elif 'марина 1' in number_house_lower:
-                                is_emirates = True
-                            elif 'диадема' in number_house_lower.lower() or house_name == 'диадема':
-                                is_emirates = True  # Диадема всегда относится к квартал 02
-                            
-                            if is_emirates:
-                                quarter_str = 'Квартал — 02 Эмиратс'
-                            else:
-                                # Пытаемся извлечь из Location (например: "Минск Мир, Дом 21.6")
-                                import re
-                                match = re.search(r'Дом\s+(\d+)', location)
-                                if match:
-                                    quarter_num = match.group(1).split('.')[0]
-                                    quarter_str = f'Квартал — {quarter_num}'
-                                else:
-                                    # Проверяем NumberHouse на наличие номера квартала
-                                    match = re.search(r'^(\d+)', number_house)
-                                    if match:
-                                        quarter_num = match.group(1)
-                                        quarter_str = f'Квартал — {quarter_num}'
-                                    else:
-                                        quarter_str = 'Квартал — Неизвестный'
-                    
-                    if quarter_str:
-                        quarter_name = self.extract_quarter_name(quarter_str)
+                    quarter_str = self.determine_quarter(apt_data)
+                    quarter_name = self.extract_quarter_name(quarter_str)
                     
                     if quarter_name not in quarters_data:
                         quarters_data[quarter_name] = []
@@ -450,23 +487,23 @@ class PropertyMonitor:
                         else:
                             floor_total = 'Этажность дома: не указано'
                     
-                    # Форматируем данные квартиры
-                    formatted_apt = {
-                        'id': apt_id,
-                        'apartment': apt_data.get('Apartment', ''),
-                        'type': apt_type,
-                        'quarter': quarter_str,
-                        'status': apt_data.get('Status', ''),
-                        'address': apt_data.get('Address', ''),
-                        'location': apt_data.get('Location', ''),
-                        'house_number': apt_data.get('NumberHouse', ''),
-                        'house_name': apt_data.get('NameHouse', ''),
-                        'floor': apt_data.get('Floor', ''),
-                        'floor_total': floor_total,
-                        'area': self.extract_number(apt_data.get('Square', 0)),
-                        'price_per_sqm': self.extract_number(apt_data.get('Price_metr', 0)),
-                        'total_price': self.extract_number(apt_data.get('Price_full', 0))
-                    }
+                    # Форматируем данные квартиры (слотовая запись, в JSON — прежний словарь)
+                    formatted_apt = records.Apartment(
+                        id=apt_id,
+                        apartment=apt_data.get('Apartment', ''),
+                        type=apt_type,
+                        quarter=quarter_str,
+                        status=apt_data.get('Status', ''),
+                        address=apt_data.get('Address', ''),
+                        location=apt_data.get('Location', ''),
+                        house_number=apt_data.get('NumberHouse', ''),
+                        house_name=apt_data.get('NameHouse', ''),
+                        floor=apt_data.get('Floor', ''),
+                        floor_total=floor_total,
+                        area=self.extract_number(apt_data.get('Square', 0)),
+                        price_per_sqm=self.extract_number(apt_data.get('Price_metr', 0)),
+                        total_price=self.extract_number(apt_data.get('Price_full', 0))
+                    )
                     quarters_data[quarter_name].append(formatted_apt)
         
         return quarters_data
@@ -481,6 +518,9 @@ class PropertyMonitor:
         new_hashes = {}
 
         for quarter_name, apartments in quarters_data.items():
+            # Записи → словари прежнего формата (properties из готового JSON уже словари)
+            apartments = records.as_dicts(apartments)
+
             # Формируем структуру файла квартала
             quarter_data = {
                 'version': '1.0',
@@ -517,9 +557,9 @@ class PropertyMonitor:
                 continue
 
             # Квартал изменился или новый, сохраняем
-            file_path = self.quarters_dir / f"{quarter_name}.json"
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(quarter_data, f, ensure_ascii=False, indent=2)
+            with tracing.span('monitor.save_quarter', quarter=quarter_name, apartments=len(apartments)):
+                file_path = self.quarters_dir / f"{quarter_name}.json"
+                artifacts.write_json(file_path, quarter_data)
 
             saved_files.append(str(file_path))
             changed_files.append(quarter_name)
@@ -595,6 +635,32 @@ class PropertyMonitor:
             'data': raw_data
         }
     
+    def validate_feed(self, feed: Dict, previous: Optional[Dict] = None,
+                      since: Optional[str] = None, snapshot: Optional[str] = None):
+        """
+        Проверить фид правилами validation.FEED_RULES, отчёт — в quarters/validation-report.json
+
+        previous/since — предыдущий снимок и его хеш версии: если этот процесс уже
+        проверял его (цикл run_monitoring), перепроверяются только изменившиеся записи
+        """
+        import validation
+
+        if self.validator is None:
+            self.validator = validation.IncrementalValidator(validation.FEED_RULES)
+        changed = validation.record_delta(previous, feed) if previous is not None else None
+        report = self.validator.run(feed, changed=changed, since=since, snapshot=snapshot)
+        report.record_metrics(PIPELINE)
+        artifacts.write_json(self.validation_report_file, {
+            'timestamp': datetime.now().isoformat(),
+            **report.to_dict(limit=50)
+        })
+        counts = report.counts()
+        summary = ', '.join(f"{name}: {count}" for name, count in counts.items()) or 'проблем нет'
+        icon = '✅' if report.ok else '⚠️'
+        checked = '' if self.validator.mode == 'full' else f", перепроверено {self.validator.checked}"
+        print(f"\n{icon} Валидация ({report.stats['total']} записей{checked}): {summary}")
+        return report
+
     def check_and_update(self) -> bool:
         """Проверить изменения и обновить базу знаний при необходимости"""
         print(f"\n{'='*60}")
@@ -602,21 +668,36 @@ class PropertyMonitor:
         print(f"{'='*60}")
         
         # Получаем новые данные
-        new_raw_data = self.fetch_current_data()
+        with metrics.stage(PIPELINE, 'fetch'):
+            new_raw_data = self.fetch_current_data()
         if not new_raw_data:
             print("⚠️ Не удалось получить данные")
             return False
         
         # Обрабатываем данные
-        new_data = self.process_data(new_raw_data)
-        new_hash = self.calculate_hash(new_data)
+        with metrics.stage(PIPELINE, 'parse'), self.profiler.stage('parse'):
+            new_data = self.process_data(new_raw_data)
+            new_hash = self.calculate_hash(new_data)
+
+        # Быстрый путь: хеш последней версии уже посчитан — базу знаний не читаем
+        latest = self.version_history[-1] if self.version_history else {}
+        if latest.get('hash') == new_hash and self.current_data_file.exists():
+            print("✅ Изменений не обнаружено")
+            return False
         
+        # Бинарный снимок хранит хеш в заголовке — сравнение без разбора данных
+        current_hash = self.stored_knowledge_base_hash()
+        if current_hash is not None and current_hash == new_hash:
+            print("✅ Изменений не обнаружено")
+            return False
+
         # Загружаем текущую базу знаний
         current_data = self.load_current_knowledge_base()
         
         # Проверяем, есть ли изменения
         if current_data:
-            current_hash = self.calculate_hash(current_data)
+            if current_hash is None:
+                current_hash = self.calculate_hash(current_data)
             
             if current_hash == new_hash:
                 print("✅ Изменений не обнаружено")
@@ -640,18 +721,26 @@ class PropertyMonitor:
             }
         
         # Сохраняем новую версию
-        with open(self.current_data_file, 'w', encoding='utf-8') as f:
-            json.dump(new_data, f, ensure_ascii=False, indent=2)
+        self.save_current_knowledge_base(new_data, new_hash)
         print(f"💾 База знаний обновлена: {self.current_data_file}")
+
+        # Валидация фида: все правила за один проход, не блокирует обновление
+        with metrics.stage(PIPELINE, 'validate'), self.profiler.stage('validate'):
+            previous_feed = current_data.get('data', current_data) if current_data else None
+            self.validate_feed(new_data.get('data', new_data), previous=previous_feed,
+                               since=current_hash, snapshot=new_hash)
         
         # Разделяем данные по кварталам
         print("\n📂 Сохранение данных по кварталам:")
-        quarters_data = self.split_data_by_quarters(new_data.get('data', new_data))
-        self.save_quarters_data(quarters_data)
+        with metrics.stage(PIPELINE, 'split'), self.profiler.stage('split'), artifacts.batch():
+            quarters_data = self.split_data_by_quarters(new_data.get('data', new_data))
+            self.save_quarters_data(quarters_data)
 
         # Генерируем MD файлы из JSON для ElevenLabs
         print("\n📄 Генерирование MD файлов из JSON:")
-        md_files = self.convert_quarters_json_to_md()
+        with metrics.stage(PIPELINE, 'render'), self.profiler.stage('render'):
+            md_files = self.convert_quarters_json_to_md()
+        metrics.DOCS_CHANGED.set(len(md_files), pipeline=PIPELINE, action='rendered')
         if md_files:
             self.changed_md_files.extend(md_files)
             print(f"✅ Сгенерировано MD файлов: {len(md_files)}")
@@ -679,6 +768,18 @@ class PropertyMonitor:
 
         return True
     
+    def run_check(self) -> bool:
+        """check_and_update() с замером и записью метрик (metrics/monitor.prom)"""
+        success = False
+        try:
+            with metrics.stage(PIPELINE, 'total'):
+                has_changes = self.check_and_update()
+            success = True
+            return has_changes
+        finally:
+            metrics.finish_run(PIPELINE, success=success)
+            self.profiler.report()
+
     def sync_with_elevenlabs(self):
         """Синхронизировать обновленные данные с ElevenLabs"""
         from dotenv import load_dotenv
@@ -718,11 +819,13 @@ class PropertyMonitor:
         print(f"📍 Источник данных: {self.source_url}")
         print(f"📂 Директория данных: {self.data_dir}")
         
+        import schedule
+
         # Выполняем первую проверку
-        self.check_and_update()
-        
+        self.run_check()
+
         # Настраиваем расписание
-        schedule.every(interval_minutes).minutes.do(self.check_and_update)
+        schedule.every(interval_minutes).minutes.do(self.run_check)
         
         print(f"\n⏰ Следующая проверка через {interval_minutes} минут")
         print("Нажмите Ctrl+C для остановки мониторинга\n")
@@ -754,8 +857,7 @@ def sync_to_elevenlabs(changed_files: List[str] = None):
         # Если есть список измененных файлов, передаем его
         if changed_files:
             changed_files_path = Path('./quarters/.changed_files.txt')
-            with open(changed_files_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(changed_files))
+            artifacts.write_text(changed_files_path, '\n'.join(changed_files))
 
             cmd.append('--changed-files')
             cmd.append(str(changed_files_path))
@@ -774,7 +876,8 @@ def sync_to_elevenlabs(changed_files: List[str] = None):
             stdout=sys.stdout,
             stderr=sys.stderr,
             text=True,
-            timeout=timeout_seconds
+            timeout=timeout_seconds,
+            env=tracing.child_env()
         )
 
         if result.returncode == 0:
@@ -792,7 +895,7 @@ def sync_to_elevenlabs(changed_files: List[str] = None):
         return False
 
 
-def main():
+def main(argv: Optional[List[str]] = None) -> int:
     import argparse
 
     parser = argparse.ArgumentParser(description='Мониторинг изменений данных недвижимости')
@@ -827,11 +930,26 @@ def main():
         action='store_true',
         help='Автоматически загружать обновления в ElevenLabs'
     )
+    parser.add_argument(
+        '--trace',
+        nargs='?',
+        const=tracing.DEFAULT_TRACE_FILE,
+        metavar='stdout|PATH',
+        help=f'Записывать трейсы (по умолчанию: {tracing.DEFAULT_TRACE_FILE}; также через MM_TRACE)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Профилировать CPU-стадии (parse/split/render) через cProfile → profiles/'
+    )
+
+    args = parser.parse_args(argv)
 
-    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
 
     # Создаем монитор
-    monitor = PropertyMonitor(source_url=args.url)
+    monitor = PropertyMonitor(source_url=args.url, profile=args.profile)
 
     if args.info:
         # Показываем информацию о версии
@@ -842,14 +960,16 @@ def main():
         # Запускаем мониторинг
         monitor.run_monitoring(interval_minutes=args.interval)
     else:
-        # Выполняем одну проверку
-        has_changes = monitor.check_and_update()
+        # Выполняем одну проверку (общий трейс: проверка + загрузка в подпроцессе)
+        with tracing.span('monitor.check'):
+            has_changes = monitor.run_check()
 
-        # Если есть изменения и включена загрузка в ElevenLabs
-        if has_changes and args.upload_to_elevenlabs:
-            # Передаем список измененных файлов для инкрементальной загрузки
-            sync_to_elevenlabs(changed_files=monitor.changed_md_files)
+            # Если есть изменения и включена загрузка в ElevenLabs
+            if has_changes and args.upload_to_elevenlabs:
+                # Передаем список измененных файлов для инкрементальной загрузки
+                sync_to_elevenlabs(changed_files=monitor.changed_md_files)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
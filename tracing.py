@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Лёгкая трассировка конвейера (совместима с OpenTelemetry по модели данных)
+
+- span(name, **attributes): вложенные интервалы с trace_id / span_id / parent_span_id
+- этапы конвейера (metrics.stage / StageTimer) открывают спаны автоматически
+- instrument_requests(): дочерний спан на каждый HTTP-запрос requests
+  (клиенты ElevenLabs, загрузка фида bir.by)
+- экспорт включается переменной MM_TRACE:
+      MM_TRACE=stdout                  — JSON в stdout
+      MM_TRACE=traces/traces.jsonl     — дописывать в файл (по строке на трассу)
+  формат строки — OTLP JSON (resourceSpans → scopeSpans → spans)
+- дочерние процессы (sync-with-monitoring → elevenlabs_sync_v2) продолжают
+  ту же трассу через MM_TRACEPARENT (формат W3C traceparent)
+- без MM_TRACE спаны не создаются (накладные расходы — одна проверка)
+
+Просмотр:
+    python3 tracing.py traces/traces.jsonl                  # Дерево последней трассы с таймлайном
+    python3 tracing.py traces/traces.jsonl --list           # Список трасс
+    python3 tracing.py traces/traces.jsonl --chrome out.json
+        # Chrome trace format: открыть в https://ui.perfetto.dev или speedscope (flame graph)
+
+Профилирование CPU этапов:
+    profiler = StageProfiler('profiles')
+    with profiler.stage('render'):
+        ...
+    profiler.report()
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SERVICE_NAME = 'mm-rag-sync'
+TRACEPARENT_ENV = 'MM_TRACEPARENT'
+DEFAULT_TRACE_FILE = 'traces/traces.jsonl'
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('mm_current_span', default=None)
+
+
+def _export_target() -> Optional[str]:
+    target = os.environ.get('MM_TRACE', '').strip()
+    if target.lower() in ('', '0', 'off', 'false', 'no'):
+        return None
+    if target.lower() in ('1', 'on', 'true', 'yes', 'file'):
+        return DEFAULT_TRACE_FILE
+    return target
+
+
+def enabled() -> bool:
+    return _export_target() is not None
+
+
+def enable(target: str = DEFAULT_TRACE_FILE):
+    """Включить трассировку в этом процессе (и в дочерних — через окружение)"""
+    os.environ['MM_TRACE'] = target
+
+
+def _random_id(bytes_count: int) -> str:
+    return f"{random.getrandbits(bytes_count * 8):0{bytes_count * 2}x}"
+
+
+def _parse_traceparent(value: str):
+    parts = (value or '').strip().split('-')
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+class Span:
+    """Интервал трассы"""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _random_id(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = 'OK'
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.status = 'ERROR'
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict:
+        status = {'code': 2, 'message': self.error or ''} if self.status == 'ERROR' else {'code': 1}
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id or '',
+            'name': self.name,
+            'kind': 3 if self.attributes.get('http.method') else 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()]
+                          + [_otlp_attribute('thread.name', self.thread)],
+            'status': status
+        }
+
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class _Collector:
+    """Готовые спаны по трассам; трасса выгружается, когда закрывается её корневой спан"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.finished: Dict[str, List[Span]] = {}
+        self.roots: List[Span] = []
+
+    def push_root(self, span: Span):
+        with self.lock:
+            self.roots.append(span)
+
+    def active_root(self) -> Optional[Span]:
+        with self.lock:
+            return self.roots[-1] if self.roots else None
+
+    def finish(self, span: Span, is_root: bool):
+        with self.lock:
+            self.finished.setdefault(span.trace_id, []).append(span)
+            if not is_root:
+                return
+            if span in self.roots:
+                self.roots.remove(span)
+            spans = self.finished.pop(span.trace_id, [])
+        export(spans)
+
+
+_collector = _Collector()
+
+
+def detach():
+    """В дочернем процессе после fork: забыть спаны родителя, новые спаны — корни с MM_TRACEPARENT"""
+    global _collector
+    _collector = _Collector()
+    _current_span.set(None)
+
+
+def export(spans: List[Span]):
+    target = _export_target()
+    if not target or not spans:
+        return
+    document = {
+        'resourceSpans': [{
+            'resource': {'attributes': [
+                _otlp_attribute('service.name', SERVICE_NAME),
+                _otlp_attribute('process.command', Path(sys.argv[0]).name if sys.argv else ''),
+                _otlp_attribute('process.pid', os.getpid())
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': 'mm.tracing'},
+                'spans': [span.to_otlp() for span in sorted(spans, key=lambda s: s.start_ns)]
+            }]
+        }]
+    }
+    line = json.dumps(document, ensure_ascii=False)
+    if target == 'stdout':
+        print(line, flush=True)
+        return
+    try:
+        path = Path(target)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        print(f"⚠️  Не удалось записать трассу в {target}: {e}", file=sys.stderr)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Открыть спан; без MM_TRACE — ничего не делает"""
+    if not enabled():
+        yield None
+        return
+
+    parent: Optional[Span] = _current_span.get()
+    is_root = False
+    if parent is None:
+        # Потоки пула не наследуют контекст — привязываем к активному корню процесса
+        parent = _collector.active_root()
+    if parent is not None:
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+    else:
+        trace_id, parent_span_id = _parse_traceparent(os.environ.get(TRACEPARENT_ENV, ''))
+        current = Span(name, trace_id or _random_id(16), parent_span_id, attributes)
+        is_root = True
+        _collector.push_root(current)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _collector.finish(current, is_root)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get() or _collector.active_root()
+
+
+def child_env(env: Dict = None) -> Dict:
+    """Окружение для дочернего процесса: продолжить текущую трассу"""
+    env = dict(os.environ if env is None else env)
+    active = current_span()
+    if active is not None and enabled():
+        env[TRACEPARENT_ENV] = active.traceparent
+    return env
+
+
+_instrumented = False
+
+
+def instrument_requests():
+    """Дочерний спан на каждый HTTP-запрос requests"""
+    global _instrumented
+    if _instrumented:
+        return
+    try:
+        import requests
+    except ImportError:
+        return
+
+    from metrics import normalize_endpoint
+    original = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        if not enabled():
+            return original(self, method, url, *args, **kwargs)
+        host, endpoint = normalize_endpoint(str(url))
+        method = str(method).upper()
+        with span(f"HTTP {method} {endpoint}", **{'http.method': method, 'http.host': host,
+                                                   'http.route': endpoint}) as http_span:
+            response = original(self, method, url, *args, **kwargs)
+            http_span.set_attribute('http.status_code', response.status_code)
+            http_span.set_attribute('http.response_bytes', len(response.content or b''))
+            if response.status_code >= 500:
+                http_span.status = 'ERROR'
+            return response
+
+    requests.Session.request = request
+    _instrumented = True
+
+
+class StageProfiler:
+    """cProfile для CPU-этапов: отдельный .prof на этап и сводка самых дорогих функций"""
+
+    def __init__(self, directory: str = 'profiles', enabled: bool = True, top: int = 15):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.top = top
+        self.files: List[Path] = []
+
+    def stage(self, name: str):
+        return self._profile(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _profile(self, name: str):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{name}.prof"
+            profiler.dump_stats(str(path))
+            self.files.append(path)
+
+    def report(self):
+        if not self.files:
+            return
+        import pstats
+        for path in self.files:
+            print(f"\n🔬 Профиль: {path}")
+            pstats.Stats(str(path)).sort_stats('cumulative').print_stats(self.top)
+        print("   Просмотр: python3 -m pstats <файл> или snakeviz <файл>")
+
+
+# ===== ПРОСМОТР =====
+
+def load_traces(path: str) -> Dict[str, List[Dict]]:
+    """Спаны из файла трасс, сгруппированные по trace_id (трасса может состоять из нескольких строк)"""
+    traces: Dict[str, List[Dict]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                document = json.loads(line)
+            except ValueError:
+                continue
+            for resource in document.get('resourceSpans', []):
+                command = next((a['value'].get('stringValue') for a in resource.get('resource', {}).get('attributes', [])
+                                if a['key'] == 'process.command'), '')
+                for scope in resource.get('scopeSpans', []):
+                    for item in scope.get('spans', []):
+                        item = dict(item, process=command)
+                        traces.setdefault(item['traceId'], []).append(item)
+    return traces
+
+
+def _attributes(item: Dict) -> Dict:
+    result = {}
+    for attribute in item.get('attributes', []):
+        value = attribute['value']
+        result[attribute['key']] = next(iter(value.values())) if value else None
+    return result
+
+
+def print_tree(spans: List[Dict], width: int = 40, min_ms: float = 0.0):
+    """Дерево спанов с таймлайном: смещение, длительность, полоса на общей шкале"""
+    if not spans:
+        return
+    start = min(int(s['startTimeUnixNano']) for s in spans)
+    end = max(int(s['endTimeUnixNano']) for s in spans)
+    total = max(end - start, 1)
+    by_parent: Dict[str, List[Dict]] = {}
+    ids = {s['spanId'] for s in spans}
+    for s in spans:
+        parent = s.get('parentSpanId') if s.get('parentSpanId') in ids else ''
+        by_parent.setdefault(parent, []).append(s)
+
+    def walk(parent_id: str, depth: int):
+        for s in sorted(by_parent.get(parent_id, []), key=lambda x: int(x['startTimeUnixNano'])):
+            s_start = int(s['startTimeUnixNano']) - start
+            duration = int(s['endTimeUnixNano']) - int(s['startTimeUnixNano'])
+            if duration / 1e6 < min_ms and depth > 0:
+                continue
+            left = int(s_start / total * width)
+            bar_len = max(1, int(duration / total * width))
+            bar = ' ' * left + '█' * min(bar_len, width - left)
+            error = ' ❌' if s.get('status', {}).get('code') == 2 else ''
+            print(f"{bar:<{width}} |{s_start / 1e6:>9.1f}мс {duration / 1e6:>9.1f}мс  {'  ' * depth}{s['name']}{error}")
+            walk(s['spanId'], depth + 1)
+
+    print(f"Трасса {spans[0]['traceId']} — {total / 1e9:.2f}с, спанов: {len(spans)}")
+    walk('', 0)
+
+
+def to_chrome_trace(spans: List[Dict]) -> Dict:
+    """Chrome trace event format (Perfetto / chrome://tracing / speedscope)"""
+    events = []
+    threads: Dict[str, int] = {}
+    for s in spans:
+        attrs = _attributes(s)
+        thread = f"{s.get('process', '')}:{attrs.get('thread.name', 'main')}"
+        tid = threads.setdefault(thread, len(threads) + 1)
+        start = int(s['startTimeUnixNano'])
+        events.append({
+            'name': s['name'],
+            'cat': 'http' if 'http.method' in attrs else 'stage',
+            'ph': 'X',
+            'ts': start / 1000,
+            'dur': (int(s['endTimeUnixNano']) - start) / 1000,
+            'pid': 1,
+            'tid': tid,
+            'args': attrs
+        })
+    for thread, tid in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Просмотр трасс конвейера синхронизации')
+    parser.add_argument('file', nargs='?', default=DEFAULT_TRACE_FILE, help=f'Файл трасс (по умолчанию: {DEFAULT_TRACE_FILE})')
+    parser.add_argument('--trace', help='ID трассы (по умолчанию — последняя)')
+    parser.add_argument('--list', action='store_true', help='Список трасс')
+    parser.add_argument('--chrome', metavar='OUT', help='Сохранить в Chrome trace format (flame / timeline)')
+    parser.add_argument('--min-ms', type=float, default=0.0, help='Скрыть вложенные спаны короче N мс')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ Файл не найден: {args.file} (включите трассировку: MM_TRACE={DEFAULT_TRACE_FILE})")
+        return 1
+
+    traces = load_traces(args.file)
+    if not traces:
+        print("ℹ️  Трасс нет")
+        return 1
+
+    ordered = sorted(traces.items(), key=lambda item: min(int(s['startTimeUnixNano']) for s in item[1]))
+    if args.list:
+        for trace_id, spans in ordered:
+            start = min(int(s['startTimeUnixNano']) for s in spans)
+            end = max(int(s['endTimeUnixNano']) for s in spans)
+            roots = [s['name'] for s in spans if not s.get('parentSpanId')]
+            print(f"{trace_id}  {datetime.fromtimestamp(start / 1e9):%Y-%m-%d %H:%M:%S}  "
+                  f"{(end - start) / 1e9:8.2f}с  {len(spans):5} спанов  {', '.join(roots)}")
+        return 0
+
+    trace_id = args.trace or ordered[-1][0]
+    spans = traces.get(trace_id)
+    if not spans:
+        print(f"❌ Трасса не найдена: {trace_id}")
+        return 1
+
+    if args.chrome:
+        with open(args.chrome, 'w', encoding='utf-8') as f:
+            json.dump(to_chrome_trace(spans), f, ensure_ascii=False)
+        print(f"💾 {args.chrome}: откройте в https://ui.perfetto.dev или https://www.speedscope.app")
+        return 0
+
+    print_tree(spans, min_ms=args.min_ms)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
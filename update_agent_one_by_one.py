@@ -1,58 +1,18 @@
 #!/usr/bin/env python3
 """
-Добавление документов к агенту по одному
+Добавление документов к агенту
+
+Раньше каждый документ добавлялся отдельным PATCH с паузами 2–10 сек.
+Теперь недостающие ID вычисляются диффом и уходят одним PATCH
+(см. elevenlabs_agent_kb.AgentKnowledgeBaseManager).
 """
-import os
-import requests
-import time
 from dotenv import load_dotenv
 
-load_dotenv()
-
-def get_current_agent_kb(api_key, agent_id):
-    """Получить текущие KB IDs агента"""
-    url = f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}'
-    response = requests.get(url, headers={'xi-api-key': api_key}, timeout=30)
-
-    if response.status_code == 200:
-        agent_data = response.json()
-        kb_config = agent_data.get('conversation_config', {}).get('knowledge_base', {})
-
-        # Может быть {'ids': [...]} или просто [...]
-        if isinstance(kb_config, dict):
-            return kb_config.get('ids', [])
-        elif isinstance(kb_config, list):
-            return kb_config
-        return []
-    return []
-
-def update_agent_kb(api_key, agent_id, kb_ids):
-    """Обновить KB IDs агента"""
-    url = f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}'
-
-    # Получаем полную конфигурацию
-    response = requests.get(url, headers={'xi-api-key': api_key}, timeout=30)
-    if response.status_code != 200:
-        return False, f"Ошибка GET: {response.status_code}"
+from elevenlabs_agent_kb import AGENT_KB_LIMIT, AgentKnowledgeBaseManager
 
-    agent_data = response.json()
-
-    # Обновляем только KB
-    agent_data['conversation_config']['knowledge_base'] = {'ids': kb_ids}
-
-    # Отправляем PATCH
-    headers = {'xi-api-key': api_key, 'Content-Type': 'application/json'}
-    patch_response = requests.patch(url, headers=headers, json=agent_data, timeout=30)
-
-    if patch_response.status_code == 200:
-        return True, "OK"
-    else:
-        return False, f"HTTP {patch_response.status_code}: {patch_response.text[:150]}"
+load_dotenv()
 
 def main():
-    api_key = os.getenv('ELEVENLABS_API_KEY')
-    agent_id = os.getenv('ELEVENLABS_AGENT_ID')
-
     # Новые 18 кварталов
     new_quarters = [
         ('19-Yuzhnaya-Evropa', 'qXtJqqEp0ZkcmJX4gc6v'),
@@ -84,76 +44,45 @@ def main():
     all_docs = new_quarters + general_files
 
     print("=" * 60)
-    print("🔄 Добавление документов по одному")
+    print("🔄 Добавление документов к агенту")
     print("=" * 60)
 
-    # Получаем текущий список
+    manager = AgentKnowledgeBaseManager()
+
+    # Получаем текущий список (свежий, без кэша)
     print("\n📋 Получение текущих документов агента...")
-    current_ids = get_current_agent_kb(api_key, agent_id)
+    current_ids = manager.current_ids(refresh=True)
+    if current_ids is None:
+        return False
     print(f"   Текущих документов: {len(current_ids)}")
 
-    # Начинаем с текущего списка
-    updated_ids = current_ids.copy()
-
-    success_count = 0
-    failed = []
-
-    print(f"\n📤 Добавление {len(all_docs)} документов...\n")
-
     for i, (name, doc_id) in enumerate(all_docs, 1):
-        # Проверяем, нет ли уже
-        if doc_id in updated_ids:
-            print(f"⏭️  {i}/{len(all_docs)} - {name} (уже добавлен)")
-            success_count += 1
-            continue
-
-        # Добавляем новый ID
-        updated_ids.append(doc_id)
-
-        print(f"📤 {i}/{len(all_docs)} - Добавление: {name}")
-
-        try:
-            success, message = update_agent_kb(api_key, agent_id, updated_ids)
+        marker = "⏭️ " if doc_id in current_ids else "📤"
+        status = "уже добавлен" if doc_id in current_ids else "будет добавлен"
+        print(f"{marker} {i}/{len(all_docs)} - {name} ({status})")
 
-            if success:
-                print(f"   ✅ Успешно (всего в агенте: {len(updated_ids)})")
-                success_count += 1
-                time.sleep(2)  # Пауза между запросами
-            else:
-                print(f"   ❌ Ошибка: {message}")
-                # Откатываем изменение
-                updated_ids.remove(doc_id)
-                failed.append((name, doc_id, message))
-
-                # Если timeout - увеличиваем паузу
-                if 'timeout' in message.lower():
-                    print("   ⏸️  Пауза 10 сек из-за timeout...")
-                    time.sleep(10)
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"   ❌ Exception: {error_msg[:100]}")
-            updated_ids.remove(doc_id)
-            failed.append((name, doc_id, error_msg))
-
-            if 'timeout' in error_msg.lower():
-                print("   ⏸️  Пауза 10 сек из-за timeout...")
-                time.sleep(10)
+    print(f"\n📤 Добавление {len(all_docs)} документов одним запросом...\n")
+    success = manager.apply(add=[doc_id for _, doc_id in all_docs])
 
     print("\n" + "=" * 60)
     print("📊 Результаты:")
     print("=" * 60)
-    print(f"✅ Успешно добавлено: {success_count}/{len(all_docs)}")
-    print(f"📝 Всего документов в агенте: {len(updated_ids)}")
-
-    if failed:
-        print(f"\n❌ Не удалось добавить: {len(failed)}")
-        for name, doc_id, msg in failed:
-            print(f"   - {name}: {msg[:80]}")
-
+    if success:
+        # Кэш менеджера — список агента после PATCH (verify перечитывает агента);
+        # apply обрезает список до лимита AGENT_KB_LIMIT, поэтому считаем по факту
+        agent_ids = set(manager.cache.get('ids', []))
+        missing = [name for name, doc_id in all_docs if doc_id not in agent_ids]
+        print(f"✅ В агенте: {len(all_docs) - len(missing)}/{len(all_docs)}")
+        if missing:
+            print(f"⚠️ Не добавлено (лимит {AGENT_KB_LIMIT} документов): {', '.join(missing)}")
+        print(f"📝 Всего документов в агенте: {len(agent_ids)}")
+        success = not missing
+    else:
+        print("❌ Не удалось обновить агента")
+    print(f"📡 Запросов к API: {manager.requests_made}")
     print("=" * 60)
 
-    return success_count == len(all_docs)
+    return success
 
 
 if __name__ == "__main__":
@@ -1,17 +1,17 @@
 #!/usr/bin/env python3
 """
 Обновление агента ElevenLabs - добавление новых кварталов пакетами
+
+Отправляет только conversation_config.knowledge_base одним PATCH
+(см. elevenlabs_agent_kb.AgentKnowledgeBaseManager), а не всю конфигурацию агента.
 """
-import os
-import requests
-import time
 from dotenv import load_dotenv
 
+from elevenlabs_agent_kb import AgentKnowledgeBaseManager
+
 load_dotenv()
 
 def main():
-    api_key = os.getenv('ELEVENLABS_API_KEY')
-    agent_id = os.getenv('ELEVENLABS_AGENT_ID')
 
     # ID новых кварталов с правильной кодировкой (uploaded at 1763642xxx)
     new_quarter_ids = [
@@ -50,61 +50,25 @@ def main():
     print(f"📄 Общих файлов: {len(general_ids)}")
     print(f"📝 Всего документов: {len(all_ids)}")
 
-    # Получаем текущую конфигурацию агента
-    print("\n🔍 Получение текущей конфигурации агента...")
-    agent_url = f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}'
-    headers = {'xi-api-key': api_key}
-
-    response = requests.get(agent_url, headers=headers)
-    if response.status_code != 200:
-        print(f"❌ Ошибка при получении агента: {response.status_code}")
-        print(f"   Ответ: {response.text[:200]}")
-        return
+    manager = AgentKnowledgeBaseManager()
 
-    agent_data = response.json()
-    print("✅ Конфигурация получена")
-
-    # Обновляем knowledge base ids
+    # Устанавливаем ровно этот список: дифф считается от свежей конфигурации агента
     print("\n🔧 Обновление knowledge base...")
-    agent_data['conversation_config']['knowledge_base'] = {'ids': all_ids}
-
-    # Отправляем обновление
-    print("📤 Отправка обновления агенту...")
-    update_url = f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}'
-    update_headers = {
-        'xi-api-key': api_key,
-        'Content-Type': 'application/json'
-    }
-
-    try:
-        update_response = requests.patch(
-            update_url,
-            headers=update_headers,
-            json=agent_data,
-            timeout=60  # 60 секунд таймаут
-        )
-
-        if update_response.status_code == 200:
-            print("\n" + "=" * 60)
-            print("✅ УСПЕХ! Агент обновлен")
-            print("=" * 60)
-            print(f"✅ Добавлено кварталов: {len(new_quarter_ids)}")
-            print(f"✅ Добавлено общих файлов: {len(general_ids)}")
-            print(f"✅ Всего документов в агенте: {len(all_ids)}")
-            print("=" * 60)
-            return True
-        else:
-            print(f"\n❌ Ошибка обновления: HTTP {update_response.status_code}")
-            print(f"   Ответ: {update_response.text[:500]}")
-            return False
-
-    except requests.exceptions.Timeout:
-        print("\n⚠️ Таймаут запроса (60 сек)")
-        print("   Попробуйте проверить агента вручную - изменения могли быть применены")
-        return False
-    except Exception as e:
-        print(f"\n❌ Ошибка: {str(e)}")
-        return False
+    success = manager.apply(target=all_ids, refresh=True)
+
+    if success:
+        print("\n" + "=" * 60)
+        print("✅ УСПЕХ! Агент обновлен")
+        print("=" * 60)
+        print(f"✅ Добавлено кварталов: {len(new_quarter_ids)}")
+        print(f"✅ Добавлено общих файлов: {len(general_ids)}")
+        print(f"✅ Всего документов в агенте: {len(all_ids)}")
+        print(f"📡 Запросов к API: {manager.requests_made}")
+        print("=" * 60)
+        return True
+
+    print("\n❌ Ошибка обновления агента")
+    return False
 
 
 if __name__ == "__main__":
@@ -1,20 +1,45 @@
 #!/usr/bin/env python3
 """
 Генерация авто-блоков в RAG-файлах (price navigation) на основе pricing_index.json
+
+Топ-N дешёвых квартир по кварталам строится одним проходом по budget_categories
+(ограниченная куча на квартал), блоки рендерятся из готовой структуры. В файл
+подставляются только блоки, текст которых изменился; файл без изменений не
+перезаписывается. Список изменившихся документов — для повторной загрузки
+только их (elevenlabs_auto_sync.py --changed-files); список дополняется, пока
+синхронизация не загрузит документы и не уберёт их из него.
+
+Использование:
+    python3 update_price_navigation.py
+    python3 update_price_navigation.py --changed-files elevenlabs_rag/.changed_files.txt
+    python3 elevenlabs_auto_sync.py --dir elevenlabs_rag --changed-files elevenlabs_rag/.changed_files.txt
 """
 
-import json
+import argparse
+import heapq
 import re
+import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+
+import artifacts
+import serialization
 
 ROOT = Path(__file__).resolve().parent
 RAG_DIR = ROOT / "elevenlabs_rag"
+CHANGED_FILES = RAG_DIR / ".changed_files.txt"
+
+# Цена для сортировки квартир без цены — в конец
+MISSING_PRICE = 10**18
+
+# Кварталы с топом квартир: 01-budget-apartments.md (7, 21, 30) и 10-budget-apartments.md
+BUDGET_TOP_QUARTERS = ["7-Sredizemnomorskiy.md", "21-Zapadnyy.md", "30-Severnaya-Amerika.md"]
+AFFORDABLE_TOP_QUARTERS = ["19-Yuzhnaya-Evropa.md", "26-Afrika.md", "25-Aziya.md", "23-Evraziya.md"]
 
 
 def load_index(index_path: Path) -> Dict[str, Any]:
-    with open(index_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return serialization.load(index_path)
 
 
 def format_euro(value: float) -> str:
@@ -28,15 +53,39 @@ def render_quarter_min_line(quarter_md: str, index: Dict[str, Any]) -> str:
     return f"- {quarter_md}: от {format_euro(qmin['min_price'])}"
 
 
-def top_n_apartments_for_quarter(index: Dict[str, Any], quarter_md: str, n: int = 3) -> List[Dict[str, Any]]:
-    # Найдем все квартиры данного квартала через budget_categories
-    result: List[Dict[str, Any]] = []
+def quarter_top_apartments(index: Dict[str, Any], n: int = 3,
+                           quarters: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Квартал → n самых дешёвых квартир из budget_categories (один проход)
+
+    Порядок — как у стабильной сортировки по цене: при равной цене раньше та,
+    что раньше встретилась в budget_categories. quarters — только эти кварталы.
+    """
+    # Куча на квартал: n лучших по (цена, порядок), на вершине — худшая из них
+    heaps: Dict[Any, List[Tuple[Any, int, Dict[str, Any]]]] = {}
+    wanted = None if quarters is None else set(quarters)
+    seq = 0
     for cat in index.get("budget_categories", {}).values():
         for apt in cat.get("apartments", []):
-            if apt.get("quarter") == quarter_md:
-                result.append(apt)
-    result.sort(key=lambda x: x.get("price", 10**18))
-    return result[:n]
+            seq += 1
+            quarter = apt.get("quarter")
+            if wanted is not None and quarter not in wanted:
+                continue
+            heap = heaps.get(quarter)
+            if heap is None:
+                heap = heaps[quarter] = []
+            price = apt.get("price", MISSING_PRICE)
+            if len(heap) < n:
+                heapq.heappush(heap, (-price, -seq, apt))
+            elif price < -heap[0][0]:
+                # При равной цене остаётся встреченная раньше
+                heapq.heapreplace(heap, (-price, -seq, apt))
+    return {quarter: [apt for _, _, apt in sorted(heap, reverse=True)] for quarter, heap in heaps.items()}
+
+
+def top_n_apartments_for_quarter(index: Dict[str, Any], quarter_md: str, n: int = 3) -> List[Dict[str, Any]]:
+    """n самых дешёвых квартир одного квартала (для нескольких кварталов — quarter_top_apartments)"""
+    return quarter_top_apartments(index, n, [quarter_md]).get(quarter_md, [])
 
 
 def render_apartment_line(apt: Dict[str, Any]) -> str:
@@ -47,21 +96,51 @@ def render_apartment_line(apt: Dict[str, Any]) -> str:
     return f"- №{number}: {area} м², {price_str}"
 
 
-def replace_auto_block(content: str, section: str, new_block: str) -> str:
+@lru_cache(maxsize=None)
+def auto_block_pattern(section: str) -> "re.Pattern":
     start = f"<!-- AUTO:START section={section} -->"
     end = f"<!-- AUTO:END section={section} -->"
-    pattern = re.compile(re.escape(start) + r"[\s\S]*?" + re.escape(end), re.MULTILINE)
-    replacement = start + "\n" + new_block.strip() + "\n" + end
+    return re.compile(re.escape(start) + r"[\s\S]*?" + re.escape(end), re.MULTILINE)
+
+
+def render_auto_block(section: str, new_block: str) -> str:
+    """Блок с маркерами, как он записывается в файл"""
+    return f"<!-- AUTO:START section={section} -->\n{new_block.strip()}\n<!-- AUTO:END section={section} -->"
+
+
+def replace_auto_block(content: str, section: str, new_block: str) -> str:
+    pattern = auto_block_pattern(section)
+    replacement = render_auto_block(section, new_block)
     if pattern.search(content):
-        return pattern.sub(replacement, content)
+        return pattern.sub(lambda _: replacement, content)
     else:
         # Если маркеров нет — добавим в конец файла
         return content.rstrip() + "\n\n" + replacement + "\n"
 
 
-def update_00_price_navigation(index: Dict[str, Any], path: Path):
-    content = path.read_text(encoding="utf-8")
-    # Секции: ultra, budget, affordable, table-min
+def patch_auto_blocks(content: str, blocks: Dict[str, str]) -> Tuple[str, List[str]]:
+    """Подставить блоки section → текст; только отличающиеся от текущих. (текст, изменённые секции)"""
+    changed: List[str] = []
+    for section, block in blocks.items():
+        current = auto_block_pattern(section).findall(content)
+        if current and all(text == render_auto_block(section, block) for text in current):
+            continue
+        content = replace_auto_block(content, section, block)
+        changed.append(section)
+    return content, changed
+
+
+def patch_document(path: Path, blocks: Dict[str, str]) -> List[str]:
+    """Обновить авто-блоки файла; файл перезаписывается, только если блоки изменились"""
+    content, changed = patch_auto_blocks(path.read_text(encoding="utf-8"), blocks)
+    if changed:
+        artifacts.write_text(path, content)
+    return changed
+
+
+def price_navigation_blocks(index: Dict[str, Any]) -> Dict[str, str]:
+    """Авто-блоки 00-price-navigation.md: ultra, budget-mins, table-min"""
+    mins = index.get("quarters_min_prices", {})
     # 1) ultra: только 21 квартал (если есть данные)
     ultra_lines: List[str] = []
     ultra_q = "21-Zapadnyy.md"
@@ -69,70 +148,89 @@ def update_00_price_navigation(index: Dict[str, Any], path: Path):
     if "—" not in ultra_line:
         ultra_lines.append(ultra_line)
     ultra_block = "\n".join(ultra_lines) if ultra_lines else "(нет актуальных предложений)"
-    content = replace_auto_block(content, "ultra", ultra_block)
 
     # 2) budget priority: 7, 21, 30
     budget_quarters = ["7-Sredizemnomorskiy.md", "21-Zapadnyy.md", "30-Severnaya-Amerika.md", "19-Yuzhnaya-Evropa.md", "26-Afrika.md"]
-    budget_block = "\n".join(render_quarter_min_line(q, index) for q in budget_quarters if index.get("quarters_min_prices", {}).get(q))
-    content = replace_auto_block(content, "budget-mins", budget_block or "(нет актуальных предложений)")
+    budget_block = "\n".join(render_quarter_min_line(q, index) for q in budget_quarters if mins.get(q))
 
     # 3) table-min: таблица кварталов с мин. ценой (поддерживаем существующий список)
-    table_lines: List[str] = []
-    for quarter_md, meta in sorted(index.get("quarters_min_prices", {}).items()):
-        table_lines.append(f"| {quarter_md} | от {format_euro(meta['min_price'])} |")
-    content = replace_auto_block(content, "table-min", "\n".join(table_lines) or "(нет данных)")
+    table_lines = [f"| {quarter_md} | от {format_euro(meta['min_price'])} |" for quarter_md, meta in sorted(mins.items())]
+    return {
+        "ultra": ultra_block,
+        "budget-mins": budget_block or "(нет актуальных предложений)",
+        "table-min": "\n".join(table_lines) or "(нет данных)",
+    }
 
-    path.write_text(content, encoding="utf-8")
 
-
-def update_01_budget_apartments(index: Dict[str, Any], path: Path):
-    content = path.read_text(encoding="utf-8")
-    # Сформируем блоки для 7, 21, 30
+def top_apartments_block(index: Dict[str, Any], tops: Dict[str, List[Dict[str, Any]]], quarters: List[str]) -> str:
+    """Заголовок с минимумом и топ квартир по каждому кварталу из списка"""
     blocks = []
-    for q in ["7-Sredizemnomorskiy.md", "21-Zapadnyy.md", "30-Severnaya-Amerika.md"]:
-        apts = top_n_apartments_for_quarter(index, q, 3)
+    for q in quarters:
+        apts = tops.get(q)
         if not apts:
             continue
         mins = index.get("quarters_min_prices", {}).get(q, {}).get("min_price")
         header = f"### {q.replace('.md', '')} — от {format_euro(mins)}" if mins else f"### {q.replace('.md', '')}"
         lines = [render_apartment_line(a) for a in apts]
         blocks.append("\n".join([header] + lines))
-    block_text = "\n\n".join(blocks) if blocks else "(нет актуальных предложений)"
-    content = replace_auto_block(content, "budget-top", block_text)
-    path.write_text(content, encoding="utf-8")
+    return "\n\n".join(blocks) if blocks else "(нет актуальных предложений)"
+
+
+def update_00_price_navigation(index: Dict[str, Any], path: Path) -> List[str]:
+    return patch_document(path, price_navigation_blocks(index))
+
 
+def update_01_budget_apartments(index: Dict[str, Any], path: Path,
+                                tops: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[str]:
+    # Блоки для 7, 21, 30
+    tops = quarter_top_apartments(index, 3, BUDGET_TOP_QUARTERS) if tops is None else tops
+    return patch_document(path, {"budget-top": top_apartments_block(index, tops, BUDGET_TOP_QUARTERS)})
 
-def update_10_budget_apartments(index: Dict[str, Any], path: Path):
+
+def update_10_budget_apartments(index: Dict[str, Any], path: Path,
+                                tops: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[str]:
     # Аналогично, но можно расширить список кварталов
-    content = path.read_text(encoding="utf-8")
-    quarters = ["19-Yuzhnaya-Evropa.md", "26-Afrika.md", "25-Aziya.md", "23-Evraziya.md"]
-    blocks = []
-    for q in quarters:
-        apts = top_n_apartments_for_quarter(index, q, 3)
-        if not apts:
-            continue
-        mins = index.get("quarters_min_prices", {}).get(q, {}).get("min_price")
-        header = f"### {q.replace('.md', '')} — от {format_euro(mins)}" if mins else f"### {q.replace('.md', '')}"
-        lines = [render_apartment_line(a) for a in apts]
-        blocks.append("\n".join([header] + lines))
-    block_text = "\n\n".join(blocks) if blocks else "(нет актуальных предложений)"
-    content = replace_auto_block(content, "affordable-top", block_text)
-    path.write_text(content, encoding="utf-8")
+    tops = quarter_top_apartments(index, 3, AFFORDABLE_TOP_QUARTERS) if tops is None else tops
+    return patch_document(path, {"affordable-top": top_apartments_block(index, tops, AFFORDABLE_TOP_QUARTERS)})
+
 
+def update_navigation(index: Dict[str, Any], rag_dir: Path = RAG_DIR) -> Dict[str, List[str]]:
+    """Обновить авто-блоки всех RAG-файлов; документ → изменённые секции (только изменившиеся)"""
+    tops = quarter_top_apartments(index, 3, BUDGET_TOP_QUARTERS + AFFORDABLE_TOP_QUARTERS)
+    updates = {
+        "00-price-navigation.md": update_00_price_navigation(index, rag_dir / "00-price-navigation.md"),
+        "01-budget-apartments.md": update_01_budget_apartments(index, rag_dir / "01-budget-apartments.md", tops),
+        "10-budget-apartments.md": update_10_budget_apartments(index, rag_dir / "10-budget-apartments.md", tops),
+    }
+    return {name: sections for name, sections in updates.items() if sections}
 
-def main():
-    index_path = ROOT / "pricing_index.json"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Авто-блоки навигации по ценам в RAG-файлах")
+    parser.add_argument("--index", default=str(ROOT / "pricing_index.json"), help="Файл индекса цен")
+    parser.add_argument("--changed-files", help="Записать сюда изменившиеся документы (для elevenlabs_auto_sync.py)")
+    args = parser.parse_args(argv)
+
+    index_path = Path(args.index)
     if not index_path.exists():
-        raise SystemExit("pricing_index.json не найден. Сначала выполните build_pricing_index.py")
+        print("❌ pricing_index.json не найден. Сначала выполните build_pricing_index.py")
+        return 1
     index = load_index(index_path)
 
-    update_00_price_navigation(index, RAG_DIR / "00-price-navigation.md")
-    update_01_budget_apartments(index, RAG_DIR / "01-budget-apartments.md")
-    update_10_budget_apartments(index, RAG_DIR / "10-budget-apartments.md")
-    print("✅ Обновлены авто-блоки в RAG-файлах")
+    changed = update_navigation(index)
+    if args.changed_files:
+        # Список копится между запусками: elevenlabs_auto_sync.py очищает его после успешной загрузки
+        changed_path = Path(args.changed_files)
+        pending = changed_path.read_text(encoding="utf-8").split() if changed_path.exists() else []
+        if changed:
+            artifacts.write_text(changed_path, "\n".join(dict.fromkeys(pending + list(changed))))
+    if not changed:
+        print("✅ Авто-блоки в RAG-файлах без изменений")
+        return 0
+    for name, sections in changed.items():
+        print(f"✅ Обновлён {name}: {', '.join(sections)}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
-
-
+    sys.exit(main())
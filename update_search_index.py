@@ -9,6 +9,11 @@ import re
 import glob
 from pathlib import Path
 
+# Служебные файлы quarters/, не входящие в индекс (и сам индекс)
+SKIP_FILES = ("README.md", "search_index.md", "00-obschie-svedeniya.md",
+              "03-finansovye-uslugi.md", "04-baza-znaniy-dlya-konsultaciy.md",
+              "05-sroki-sdachi-domov.md")
+
 def extract_apartment_info(content):
     """Извлекает информацию о квартирах из текста"""
     apartments = []
@@ -147,9 +152,7 @@ def main():
     
     # Сканируем все файлы квартир
     for file_path in quarters_dir.glob("*.md"):
-        if file_path.name in ["README.md", "search_index.md", "00-obschie-svedeniya.md", 
-                             "03-finansovye-uslugi.md", "04-baza-znaniy-dlya-konsultaciy.md", 
-                             "05-sroki-sdachi-domov.md"]:
+        if file_path.name in SKIP_FILES:
             continue
             
         print(f"Обрабатываю файл: {file_path.name}")
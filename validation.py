@@ -0,0 +1,965 @@
+#!/usr/bin/env python3
+"""
+Декларативная валидация данных bir.by: все проверки за один проход
+
+Раньше каждая проверка (quarters/validate_data.py, DataValidator из
+validate_synchronization.py, validate_references.py, validate_apartment_data
+в quarters/update_quarters_robust.py) заново сканировала фид и MD-файлы.
+Здесь правила регистрируются декораторами:
+    - @record_rule  — проверка одной нормализованной записи (Record)
+    - @group_rule   — записи собираются по ключу группы за тот же проход,
+                      проверка вызывается один раз после него (дубликаты,
+                      сверка с MD-файлами, целостность ссылок)
+ValidationEngine нормализует каждую запись один раз и прогоняет её через все
+правила; MD-файлы quarters/ и elevenlabs_rag/ читаются один раз и только если
+их требует хотя бы одно правило. Новая проверка — это новое правило, а не
+новый проход.
+
+Наборы правил:
+    FEED_RULES   — только по фиду (без файлов), встроены в почасовую синхронизацию
+    RECORD_RULES — проверки одной квартиры (update_quarters_robust)
+    SYNC_RULES   — фид + сверка с MD-файлами (validate_synchronization)
+
+IncrementalValidator перепроверяет только изменившиеся записи и затронутые
+ими группы (дубликаты в доме, счётчики по кварталам), отчёт тот же, что у
+полного прогона (verify_incremental, --verify).
+
+Использование:
+    report = ValidationEngine(FEED_RULES).run(api_data)
+    report.print_summary()
+
+    python3 validation.py                          # Фид bir.by, все правила
+    python3 validation.py --feed feed.json --rules feed --json report.json
+    python3 validation.py --list                   # Зарегистрированные правила
+    python3 validation.py --feed new.json --state quarters/.validation-state.json   # Инкрементально
+    python3 validation.py --feed new.json --previous old.json --verify             # Полный == инкрементальный
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import kb_index
+import serialization
+
+ROOT = Path(__file__).resolve().parent
+QUARTERS_DIR = ROOT / "quarters"
+RAG_DIR = ROOT / "elevenlabs_rag"
+FEED_URL = "https://bir.by/ai/json_ai.php"
+
+ERROR = 'error'
+WARNING = 'warning'
+INFO = 'info'
+
+VALID_STATUSES = (
+    'Статус: Сдано',
+    'Статус: Строится',
+    'Статус: Строящаяся квартира',
+    'Статус: Строящиеся Бизнес-апартаменты',
+)
+# Статусы проданных/забронированных объектов — не ошибка
+ACCEPTED_STATUS_MARKERS = ('Продано', 'Забронировано')
+REQUIRED_FIELDS = ('Apartment', 'NumberHouse', 'NameHouse', 'Floor', 'Square', 'UsrNumberRooms')
+PRICE_M2_RANGE = (500, 10000)
+FLOOR_RANGE = (1, 30)
+WATCHED_HOUSES = ('Хельсинки', 'Хе́льсинки')
+
+_APARTMENT_NUMBER = re.compile(r'№(\d+)')
+_LEADING_NUMBER = re.compile(r'^(\d+)')
+_HOUSE_PREFIX = re.compile(r'(\d+)\.')
+_ANY_DIGITS = re.compile(r'(\d+)')
+_HOUSE_18 = re.compile(r'^18\.\d')
+
+
+def decode_unicode(text: Any) -> str:
+    """Строка фида: \\uXXXX-последовательности декодируются, не-строки приводятся к str"""
+    if not text:
+        return ""
+    if not isinstance(text, str):
+        return str(text)
+    if text.startswith('\\u'):
+        try:
+            return text.encode('utf-8').decode('unicode_escape')
+        except UnicodeDecodeError:
+            return text
+    return text
+
+
+def house_quarter(house_number: str) -> Optional[int]:
+    """Номер квартала по номеру дома (Волна 7с/8с — 2 квартал, "12.5" — 12)"""
+    if not house_number:
+        return None
+    if 'Волна 7с' in house_number or 'Волна 8с' in house_number:
+        return 2
+    match = _HOUSE_PREFIX.search(house_number)
+    if match:
+        return int(match.group(1))
+    match = _ANY_DIGITS.search(house_number)
+    if match and int(match.group(1)) < 50:
+        # Дома с номерами меньше 50 обычно имеют явный квартал
+        return int(match.group(1))
+    return None
+
+
+class Record:
+    """Запись фида, нормализованная один раз для всех правил"""
+
+    __slots__ = ('key', 'raw', 'apartment', 'number', 'quarter', 'quarter_number', 'house_number',
+                 'house_name', 'address', 'floor_raw', 'status', 'type', 'is_parking')
+
+    def __init__(self, key: str, raw: Dict):
+        get = raw.get
+        self.key = str(key)
+        self.raw = raw
+        self.apartment = decode_unicode(get('Apartment'))
+        match = _APARTMENT_NUMBER.search(self.apartment)
+        self.number = match.group(1) if match else None
+
+        quarter = decode_unicode(get('Quarter'))
+        self.quarter = quarter.replace('Квартал — ', '').strip() if 'Квартал — ' in quarter else ''
+        match = _LEADING_NUMBER.match(self.quarter)
+        self.quarter_number = int(match.group(1)) if match else None
+
+        self.house_number = decode_unicode(get('NumberHouse'))
+        self.house_name = decode_unicode(get('NameHouse'))
+        self.address = decode_unicode(get('Address'))
+        self.floor_raw = decode_unicode(get('Floor'))
+        self.status = decode_unicode(get('Status'))
+        self.type = decode_unicode(get('type'))
+        self.is_parking = 'машиноместо' in self.type.lower() or 'машиноместо' in self.apartment.lower()
+
+    @property
+    def name(self) -> str:
+        return self.apartment or f'Unknown_{self.key}'
+
+    @property
+    def expected_quarter(self) -> Optional[int]:
+        return self.quarter_number or house_quarter(self.house_number)
+
+
+class MarkdownIndex:
+    """
+    Номера квартир из MD-файлов кварталов и RAG — запросы к инвертированному
+    индексу kb_index (перечитываются только изменившиеся файлы). Для каталогов
+    по умолчанию индекс хранится в .kb_index.json, для остальных — в памяти
+    """
+
+    def __init__(self, quarters_dir: Path = QUARTERS_DIR, rag_dir: Path = RAG_DIR, index_path=None):
+        self.quarters_dir = Path(quarters_dir)
+        self.rag_dir = Path(rag_dir)
+        if index_path is None and (self.quarters_dir.resolve(), self.rag_dir.resolve()) == (QUARTERS_DIR, RAG_DIR):
+            index_path = kb_index.INDEX_FILE
+        self._kb = kb_index.KBIndex((self.quarters_dir, self.rag_dir), path=index_path)
+        self._updated = False
+        self._quarters: Optional[Dict[int, List[str]]] = None
+        self._references: Optional[Set[str]] = None
+        self._rag: Optional[Set[str]] = None
+
+    @property
+    def kb(self) -> kb_index.KBIndex:
+        """Инвертированный индекс, синхронизированный с файлами (один раз за экземпляр)"""
+        if not self._updated:
+            self._kb.update()
+            self._updated = True
+        return self._kb
+
+    @property
+    def apartments_by_quarter(self) -> Dict[int, List[str]]:
+        """Квартал (номер из имени файла) → номера квартир из заголовков ### 🏠 (файлы без квартир не входят)"""
+        if self._quarters is None:
+            self._quarters = defaultdict(list)
+            units = self.kb.keys_by_file('unit')
+            for key in self.kb.source_files(self.quarters_dir):
+                match = _LEADING_NUMBER.match(key.rsplit('/', 1)[-1])
+                if match and units.get(key):
+                    self._quarters[int(match.group(1))].extend(units[key])
+        return self._quarters
+
+    @property
+    def references(self) -> Set[str]:
+        """Все номера вида №123 во всех quarters/*.md"""
+        if self._references is None:
+            self._references = self.kb.keys('apt', self.quarters_dir)
+        return self._references
+
+    @property
+    def rag_references(self) -> Set[str]:
+        """Все номера вида №123 в elevenlabs_rag/*.md"""
+        if self._rag is None:
+            self._rag = self.kb.keys('apt', self.rag_dir)
+        return self._rag
+
+    def quarter_of(self) -> Dict[str, int]:
+        """Номер квартиры → первый квартал, где она найдена"""
+        located: Dict[str, int] = {}
+        for quarter, numbers in self.apartments_by_quarter.items():
+            for number in numbers:
+                located.setdefault(number, quarter)
+        return located
+
+
+class ValidationContext:
+    """Общие для правил данные: индекс MD-файлов (ленивый) и статистика отчёта"""
+
+    def __init__(self, index: Optional[MarkdownIndex] = None):
+        self.index = index or MarkdownIndex()
+        self.stats: Dict[str, Any] = {}
+        self._quarter_of: Optional[Dict[str, int]] = None
+
+    @property
+    def quarter_of(self) -> Dict[str, int]:
+        if self._quarter_of is None:
+            self._quarter_of = self.index.quarter_of()
+        return self._quarter_of
+
+
+class Issue:
+    """Найденная проблема: правило, важность, сообщение, запись"""
+
+    __slots__ = ('rule', 'severity', 'message', 'record', 'details')
+
+    def __init__(self, rule: str, severity: str, message: str, record: Optional[str] = None,
+                 details: Optional[Dict] = None):
+        self.rule = rule
+        self.severity = severity
+        self.message = message
+        self.record = record
+        self.details = details or {}
+
+    def to_dict(self) -> Dict:
+        return {'rule': self.rule, 'severity': self.severity, 'message': self.message,
+                'record': self.record, **({'details': self.details} if self.details else {})}
+
+
+class RuleSpec:
+    """Зарегистрированное правило"""
+
+    def __init__(self, name: str, kind: str, check: Callable, severity: str, description: str,
+                 key: Optional[Callable[[Record], Any]] = None, requires: Sequence[str] = (),
+                 per_group: bool = False):
+        self.name = name
+        self.kind = kind
+        self.check = check
+        self.severity = severity
+        self.description = description
+        self.key = key
+        self.requires = tuple(requires)
+        self.per_group = per_group
+
+
+RULES: Dict[str, RuleSpec] = {}
+
+
+def _register(spec: RuleSpec):
+    if spec.name in RULES:
+        raise ValueError(f"Правило {spec.name} уже зарегистрировано")
+    RULES[spec.name] = spec
+
+
+def record_rule(name: str, severity: str = WARNING, description: str = '', requires: Sequence[str] = ()):
+    """
+    Правило по записи: check(record[, context]) выдаёт сообщения (str или (str, details))
+
+    requires=('markdown',) — правилу нужен индекс MD-файлов, check получает context
+    """
+    def decorator(check):
+        _register(RuleSpec(name, 'record', check, severity, description or name, requires=requires))
+        return check
+    return decorator
+
+
+def group_rule(name: str, severity: str = WARNING, description: str = '',
+               key: Optional[Callable[[Record], Any]] = None, requires: Sequence[str] = (),
+               per_group: bool = False):
+    """
+    Правило по группам: key(record) → ключ группы (None — запись не нужна),
+    check(groups, context) вызывается после прохода и выдаёт сообщения.
+    Без key — правило только по MD-файлам (groups пуст).
+
+    per_group=True — сообщения группы зависят только от её записей (и check
+    не пишет в context.stats): инкрементальный прогон пересчитывает только
+    затронутые группы
+    """
+    def decorator(check):
+        _register(RuleSpec(name, 'group', check, severity, description or name, key=key, requires=requires,
+                           per_group=per_group))
+        return check
+    return decorator
+
+
+class ValidationReport:
+    """Объединённый отчёт всех правил"""
+
+    def __init__(self, rules: List[RuleSpec]):
+        self.rules = rules
+        self.issues: List[Issue] = []
+        self.stats: Dict[str, Any] = {}
+
+    def add(self, spec: RuleSpec, result: Union[str, Tuple[str, Dict]], record: Optional[Record] = None):
+        message, details = (result, None) if isinstance(result, str) else result
+        self.issues.append(Issue(spec.name, spec.severity, message, record.key if record else None, details))
+
+    def by_rule(self, name: str) -> List[Issue]:
+        return [issue for issue in self.issues if issue.rule == name]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(Counter(issue.rule for issue in self.issues))
+
+    @property
+    def errors(self) -> List[Issue]:
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    @property
+    def warnings(self) -> List[Issue]:
+        return [issue for issue in self.issues if issue.severity == WARNING]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self, limit: Optional[int] = None) -> Dict:
+        """JSON-отчёт; limit — не больше стольких проблем на правило"""
+        grouped: Dict[str, List[Dict]] = defaultdict(list)
+        for issue in self.issues:
+            if limit is None or len(grouped[issue.rule]) < limit:
+                grouped[issue.rule].append(issue.to_dict())
+        return {
+            'ok': self.ok,
+            'rules': [spec.name for spec in self.rules],
+            'counts': self.counts(),
+            'errors': len(self.errors),
+            'warnings': len(self.warnings),
+            'stats': self.stats,
+            'issues': dict(grouped),
+        }
+
+    def print_summary(self, limit: int = 5):
+        icons = {ERROR: '❌', WARNING: '⚠️', INFO: 'ℹ️'}
+        counts = self.counts()
+        for spec in self.rules:
+            count = counts.get(spec.name, 0)
+            if not count:
+                continue
+            print(f"\n{icons[spec.severity]} {spec.description}: {count}")
+            for issue in self.by_rule(spec.name)[:limit]:
+                print(f"   - {issue.message}")
+            if count > limit:
+                print(f"   ... и еще {count - limit}")
+        if self.ok:
+            print(f"\n✅ Ошибок нет (предупреждений: {len(self.warnings)})")
+        else:
+            print(f"\n❌ Ошибок: {len(self.errors)}, предупреждений: {len(self.warnings)}")
+
+    def record_metrics(self, pipeline: str):
+        """mm_validation_issues{pipeline, rule, severity} для /metrics"""
+        import metrics
+        counts = self.counts()
+        for spec in self.rules:
+            metrics.VALIDATION_ISSUES.set(counts.get(spec.name, 0), pipeline=pipeline,
+                                          rule=spec.name, severity=spec.severity)
+
+
+def iter_items(data: Union[Dict, Iterable]) -> Iterator[Tuple[str, Dict]]:
+    """(ключ, запись) из словаря фида json_ai.php или из списка записей"""
+    if isinstance(data, dict):
+        for key, item in data.items():
+            if isinstance(item, dict):
+                yield key, item
+        return
+    for position, item in enumerate(data):
+        if isinstance(item, tuple):
+            yield item
+        elif isinstance(item, dict):
+            yield str(position), item
+
+
+def apply_record_rules(specs: Iterable[RuleSpec], record: Record,
+                       context: ValidationContext) -> Iterator[Tuple[RuleSpec, Any]]:
+    """(правило, сообщение) всех правил по записи"""
+    for spec in specs:
+        results = spec.check(record, context) if spec.requires else spec.check(record)
+        for result in results:
+            yield spec, result
+
+
+class ValidationEngine:
+    """Один потоковый проход по записям через все выбранные правила"""
+
+    def __init__(self, rules: Optional[Iterable[str]] = None, context: Optional[ValidationContext] = None):
+        names = list(RULES) if rules is None else list(rules)
+        unknown = [name for name in names if name not in RULES]
+        if unknown:
+            raise ValueError(f"Неизвестные правила: {', '.join(unknown)}")
+        self.rules = [RULES[name] for name in names]
+        self.context = context or ValidationContext()
+
+    def run(self, data: Union[Dict, Iterable] = ()) -> ValidationReport:
+        report = ValidationReport(self.rules)
+        self.context.stats = report.stats
+        record_rules = [spec for spec in self.rules if spec.kind == 'record']
+        group_rules = [spec for spec in self.rules if spec.kind == 'group']
+        keyed = [spec for spec in group_rules if spec.key is not None]
+        groups: Dict[str, Dict[Any, List[Record]]] = {spec.name: defaultdict(list) for spec in group_rules}
+
+        total = 0
+        by_quarter: Counter = Counter()
+        by_status: Counter = Counter()
+        for key, raw in iter_items(data):
+            record = Record(key, raw)
+            total += 1
+            if record.quarter:
+                by_quarter[record.quarter] += 1
+            by_status[record.status] += 1
+
+            for spec, result in apply_record_rules(record_rules, record, self.context):
+                report.add(spec, result, record)
+            for spec in keyed:
+                group_key = spec.key(record)
+                if group_key is not None:
+                    groups[spec.name][group_key].append(record)
+
+        report.stats.update({'total': total, 'by_quarter': dict(sorted(by_quarter.items())),
+                             'by_status': dict(sorted(by_status.items()))})
+        for spec in group_rules:
+            for result in spec.check(groups[spec.name], self.context):
+                report.add(spec, result)
+        return report
+
+
+def check_record(raw: Dict, rules: Iterable[str] = None) -> List[str]:
+    """Сообщения правил по одной записи (для построчной проверки при генерации)"""
+    specs = [RULES[name] for name in (RECORD_RULES if rules is None else rules)]
+    if any(spec.kind != 'record' or spec.requires for spec in specs):
+        raise ValueError("check_record: только правила по записи без MD-файлов")
+    record = Record('', raw)
+    messages = []
+    for spec in specs:
+        for result in spec.check(record):
+            messages.append(result if isinstance(result, str) else result[0])
+    return messages
+
+
+# ===== ИНКРЕМЕНТАЛЬНАЯ ВАЛИДАЦИЯ =====
+
+STATE_VERSION = 1
+
+
+def record_hash(raw: Dict) -> str:
+    """Отпечаток записи фида (порядок полей в json_ai.php стабилен)"""
+    return hashlib.blake2b(json.dumps(raw, ensure_ascii=False, default=str).encode('utf-8'),
+                           digest_size=12).hexdigest()
+
+
+def record_delta(previous: Union[Dict, Iterable], current: Union[Dict, Iterable]) -> Set[str]:
+    """Ключи записей, добавленных, удалённых или изменённых между двумя снимками фида"""
+    old = dict(iter_items(previous))
+    new = dict(iter_items(current))
+    changed = {key for key, raw in new.items() if old.get(key) != raw}
+    changed.update(key for key in old if key not in new)
+    return changed
+
+
+def input_fingerprint(rules: Iterable[RuleSpec], index: MarkdownIndex) -> str:
+    """
+    Отпечаток всего, от чего зависят результаты кроме самих записей: код
+    правил (validation.py) и MD-файлы, которые читают выбранные правила
+    (имя, размер, mtime)
+    """
+    requires = {need for spec in rules for need in spec.requires}
+    directories = []
+    if 'markdown' in requires:
+        directories.append(index.quarters_dir)
+    if 'rag' in requires:
+        directories.append(index.rag_dir)
+
+    digest = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16)
+    for directory in directories:
+        for path in sorted(directory.glob('*.md')):
+            stat = path.stat()
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _group_token(group_key: Any) -> str:
+    # Ключ группы в состоянии (JSON): кортеж (квартал, дом) → строка
+    return json.dumps(group_key, ensure_ascii=False, default=str)
+
+
+class IncrementalValidator:
+    """
+    Валидация только изменившихся записей с тем же отчётом, что у полного прогона
+
+    Состояние (в памяти и, если задан state_path, в JSON-файле между запусками):
+        records  ключ → [хеш, проблемы правил по записи, квартал, статус,
+                 {правило: ключ группы}] — правила по записи зависят только
+                 от записи, их результат переиспользуется как есть
+        groups   per_group-правила (дубликаты в доме): ключ группы → сообщения;
+                 пересчитываются только группы, куда входят изменённые,
+                 добавленные или удалённые записи
+        rules    остальные групповые правила (сверка с MD): сообщения и
+                 статистика, пересчёт, если изменился хоть один член их групп
+    Статистика (total, по кварталам, по статусам) собирается из состояния
+    без нормализации записей. Нормализованные записи остаются в памяти
+    экземпляра: в долгоживущем процессе (run_monitoring, web-монитор)
+    неизменённые члены затронутых групп не нормализуются заново; после
+    загрузки состояния с диска — только они. Если изменились набор правил, validation.py или
+    MD-файлы, которые читают правила, — полный прогон с новым состоянием.
+
+    Использование:
+        validator = IncrementalValidator(FEED_RULES, state_path='quarters/.validation-state.json')
+        report = validator.run(feed, changed=record_delta(previous_feed, feed),
+                               since=previous_version, snapshot=version)
+    """
+
+    def __init__(self, rules: Optional[Iterable[str]] = None, context: Optional[ValidationContext] = None,
+                 state_path: Optional[Union[str, Path]] = None):
+        self.engine = ValidationEngine(rules, context)
+        self.context = self.engine.context
+        self.state_path = Path(state_path) if state_path else None
+        self.state: Optional[Dict] = None
+        self.records: Dict[str, Record] = {}
+        self.mode: Optional[str] = None
+        self.checked = 0
+
+    def _load_state(self) -> Optional[Dict]:
+        if self.state is None and self.state_path and self.state_path.exists():
+            try:
+                self.state = serialization.load(self.state_path)
+            except (OSError, ValueError):
+                self.state = None
+        return self.state
+
+    def save(self):
+        """Сохранить состояние (если задан state_path)"""
+        if self.state_path and self.state is not None:
+            import artifacts
+            artifacts.write_json(self.state_path, self.state, indent=None)
+
+    def _dirty_keys(self, items: Dict[str, Dict], known: Dict[str, List],
+                    changed: Optional[Iterable[str]], trusted: bool) -> Set[str]:
+        if changed is not None and trusted:
+            dirty = {str(key) for key in changed}
+            if all(key in known for key in items if key not in dirty):
+                return {key for key in dirty if key in items}
+        return {key for key, raw in items.items() if key not in known or known[key][0] != record_hash(raw)}
+
+    def run(self, data: Union[Dict, Iterable] = (), changed: Optional[Iterable[str]] = None,
+            since: Optional[str] = None, snapshot: Optional[str] = None) -> ValidationReport:
+        """
+        Прогнать правила по data
+
+        Args:
+            changed: Ключи изменившихся записей (record_delta от предыдущего
+                снимка); None — изменения определяются по хешам записей
+            since: Версия предыдущего снимка — дельте доверяем, только если
+                состояние сохранено именно по нему (иначе сверка по хешам)
+            snapshot: Версия data, запоминается в состоянии для следующего since
+        """
+        items = dict(iter_items(data))
+        rules = self.engine.rules
+        names = [spec.name for spec in rules]
+        fingerprint = input_fingerprint(rules, self.context.index)
+
+        state = self._load_state()
+        if not state or state.get('version') != STATE_VERSION or state.get('rules') != names \
+                or state.get('inputs') != fingerprint:
+            state = {'version': STATE_VERSION, 'rules': names, 'inputs': fingerprint,
+                     'records': {}, 'groups': {}, 'rule_results': {}}
+            self.mode = 'full'
+            self.records = {}
+            dirty = set(items)
+        else:
+            self.mode = 'incremental'
+            trusted = since is not None and state.get('snapshot') == since
+            dirty = self._dirty_keys(items, state['records'], changed, trusted)
+        state['snapshot'] = snapshot
+        self.state = state
+        known = state['records']
+
+        record_rules = [spec for spec in rules if spec.kind == 'record']
+        group_rules = [spec for spec in rules if spec.kind == 'group']
+        keyed = [spec for spec in group_rules if spec.key is not None]
+        touched: Dict[str, Set[str]] = {spec.name: set() for spec in group_rules}
+
+        def touch(entry):
+            for name, token in entry[4].items():
+                touched[name].add(token)
+
+        records = self.records
+        for key in [key for key in known if key not in items]:
+            touch(known.pop(key))
+            records.pop(key, None)
+
+        for key in dirty:
+            if key in known:
+                touch(known[key])
+            record = records[key] = Record(key, items[key])
+            issues = []
+            for spec, result in apply_record_rules(record_rules, record, self.context):
+                message, details = (result, None) if isinstance(result, str) else result
+                issues.append([spec.name, message, details or {}])
+            tokens = {}
+            for spec in keyed:
+                group_key = spec.key(record)
+                if group_key is not None:
+                    tokens[spec.name] = _group_token(group_key)
+            entry = known[key] = [record_hash(items[key]), issues, record.quarter, record.status, tokens]
+            touch(entry)
+        self.checked = len(dirty)
+
+        # Отчёт в порядке полного прогона: записи в порядке фида, затем группы
+        report = ValidationReport(rules)
+        self.context.stats = report.stats
+        severity = {spec.name: spec.severity for spec in rules}
+        members: Dict[str, Dict[str, List[str]]] = {spec.name: {} for spec in keyed}
+        by_quarter: Counter = Counter()
+        by_status: Counter = Counter()
+        for key in items:
+            _, issues, quarter, status, tokens = known[key]
+            if quarter:
+                by_quarter[quarter] += 1
+            by_status[status] += 1
+            for name, message, details in issues:
+                report.issues.append(Issue(name, severity[name], message, key, details))
+            for name, token in tokens.items():
+                members[name].setdefault(token, []).append(key)
+        report.stats.update({'total': len(items), 'by_quarter': dict(sorted(by_quarter.items())),
+                             'by_status': dict(sorted(by_status.items()))})
+
+        def record_of(key: str) -> Record:
+            if key not in records:
+                records[key] = Record(key, items[key])
+            return records[key]
+
+        for spec in group_rules:
+            if spec.per_group:
+                cached = state['groups'].get(spec.name, {})
+                results = {}
+                for token, keys in members[spec.name].items():
+                    if token in touched[spec.name] or token not in cached:
+                        group = [record_of(key) for key in keys]
+                        cached[token] = [[message, details or {}] for message, details in
+                                         (((r, None) if isinstance(r, str) else r)
+                                          for r in spec.check({spec.key(group[0]): group}, self.context))]
+                    results[token] = cached[token]
+                state['groups'][spec.name] = results
+                for token in members[spec.name]:
+                    for message, details in results[token]:
+                        report.issues.append(Issue(spec.name, spec.severity, message, None, details))
+                continue
+
+            cached = state['rule_results'].get(spec.name)
+            if cached is None or touched[spec.name]:
+                groups: Dict[Any, List[Record]] = defaultdict(list)
+                for keys in members.get(spec.name, {}).values():
+                    for key in keys:
+                        record = record_of(key)
+                        groups[spec.key(record)].append(record)
+                before = dict(report.stats)
+                results = list(spec.check(groups, self.context))
+                stats = {name: value for name, value in report.stats.items()
+                         if name not in before or before[name] != value}
+                cached = state['rule_results'][spec.name] = {
+                    'issues': [[message, details or {}] for message, details in
+                               (((r, None) if isinstance(r, str) else r) for r in results)],
+                    'stats': stats,
+                }
+            report.stats.update(cached['stats'])
+            for message, details in cached['issues']:
+                report.issues.append(Issue(spec.name, spec.severity, message, None, details))
+
+        self.save()
+        return report
+
+
+def report_differences(expected: ValidationReport, actual: ValidationReport) -> List[str]:
+    """Расхождения двух отчётов (пусто — отчёты совпадают, включая порядок проблем)"""
+    differences = []
+    left, right = expected.to_dict(), actual.to_dict()
+    for field in ('ok', 'rules', 'counts', 'errors', 'warnings', 'stats'):
+        if left[field] != right[field]:
+            differences.append(f"{field}: {left[field]!r} != {right[field]!r}")
+    for rule in sorted(set(left['issues']) | set(right['issues'])):
+        a, b = left['issues'].get(rule, []), right['issues'].get(rule, [])
+        if a != b:
+            position = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+            differences.append(f"{rule}: проблем {len(a)} / {len(b)}, первое расхождение #{position}")
+    return differences
+
+
+def verify_incremental(previous: Union[Dict, Iterable], current: Union[Dict, Iterable],
+                       rules: Optional[Iterable[str]] = None,
+                       index: Optional[MarkdownIndex] = None) -> Dict[str, List[str]]:
+    """
+    Проверка эквивалентности: полный прогон по current против инкрементального
+    (состояние по previous, сохранённое в JSON и прочитанное заново) — с дельтой
+    record_delta и с дельтой по хешам. Возвращает расхождения по вариантам
+    """
+    import tempfile
+    rules = list(RULES) if rules is None else list(rules)
+    index = index or MarkdownIndex()
+    expected = ValidationEngine(rules, ValidationContext(index)).run(current)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='mm_validation_') as tmp:
+        for variant in ('delta', 'hashes'):
+            state_path = Path(tmp) / f'{variant}.json'
+            IncrementalValidator(rules, ValidationContext(index), state_path).run(previous, snapshot='previous')
+            validator = IncrementalValidator(rules, ValidationContext(index), state_path)
+            changed = record_delta(previous, current) if variant == 'delta' else None
+            actual = validator.run(current, changed=changed, since='previous', snapshot='current')
+            differences = report_differences(expected, actual)
+            if validator.mode != 'incremental':
+                differences.insert(0, f"прогон не инкрементальный ({validator.mode})")
+            results[variant] = differences
+    return results
+
+
+# ===== ПРАВИЛА ПО ЗАПИСИ =====
+
+@record_rule('missing_quarter', ERROR, 'Квартиры без указания квартала')
+def _missing_quarter(record: Record):
+    if not record.quarter:
+        yield f"{record.name} (Дом: {record.house_name}, Адрес: {record.address})"
+
+
+@record_rule('invalid_status', WARNING, 'Квартиры с неизвестными статусами')
+def _invalid_status(record: Record):
+    status = record.status
+    if status and not any(valid in status for valid in VALID_STATUSES):
+        if not any(marker in status for marker in ACCEPTED_STATUS_MARKERS):
+            yield f"{record.name}: '{status}'", {'status': status}
+
+
+@record_rule('missing_fields', WARNING, 'Отсутствующие данные')
+def _missing_fields(record: Record):
+    for field in REQUIRED_FIELDS:
+        value = record.raw.get(field)
+        if not value or value == 'Н/Д':
+            yield f"Отсутствует поле {field}", {'field': field}
+
+
+@record_rule('price_bounds', WARNING, 'Подозрительные цены')
+def _price_bounds(record: Record):
+    price = record.raw.get('Price_metr')
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        low, high = PRICE_M2_RANGE
+        if price < low or price > high:
+            yield f"Подозрительная цена за м²: {price}", {'price_metr': price}
+
+
+@record_rule('floor_sanity', WARNING, 'Некорректные этажи')
+def _floor_sanity(record: Record):
+    floor = record.floor_raw
+    if not floor or 'Этаж: ' not in floor:
+        return
+    try:
+        number = int(floor.replace('Этаж: ', ''))
+    except ValueError:
+        yield f"Некорректный формат этажа: {floor}"
+        return
+    low, high = FLOOR_RANGE
+    if number < low or number > high:
+        yield f"Подозрительный этаж: {number}", {'floor': number}
+
+
+@record_rule('parking_present', WARNING, 'Машиноместа в фиде (должны быть исключены)')
+def _parking_present(record: Record):
+    if record.is_parking:
+        yield record.name
+
+
+@record_rule('watched_houses', INFO, 'Контрольные дома')
+def _watched_houses(record: Record):
+    if any(house in record.house_name for house in WATCHED_HOUSES):
+        yield f"{record.name} | Квартал: {record.quarter or 'НЕ УКАЗАН'} | Статус: {record.status}"
+
+
+@record_rule('quarter_assignment', ERROR, 'Неправильное распределение по кварталам', requires=('markdown',))
+def _quarter_assignment(record: Record, context: ValidationContext):
+    if record.is_parking or not record.number:
+        return
+    expected = record.expected_quarter
+    found = context.quarter_of.get(record.number)
+    if expected and found and found != expected:
+        # Волна 7с/8с всегда во 2 квартале
+        if 'Волна' not in record.house_number or expected != 2:
+            yield (f"{record.apartment} должен быть в квартале {expected}, но находится в {found}",
+                   {'expected': expected, 'found': found})
+
+
+# ===== ПРАВИЛА ПО ГРУППАМ =====
+
+def _residential_number(record: Record) -> Optional[str]:
+    return 'api' if record.number and not record.is_parking else None
+
+
+@group_rule('duplicates', ERROR, 'Дубликаты квартир', per_group=True,
+            key=lambda record: (record.quarter, record.house_number) if record.quarter else None)
+def _duplicates(groups, context):
+    for (quarter, house), records in groups.items():
+        for name, count in Counter(record.name for record in records).items():
+            if count > 1:
+                yield (f"{name} в квартале {quarter}, дом {house} (повторяется {count} раз)",
+                       {'apartment': name, 'quarter': quarter, 'house': house, 'count': count})
+
+
+@group_rule('md_missing', ERROR, 'Отсутствуют в markdown', key=_residential_number, requires=('markdown',))
+def _md_missing(groups, context):
+    api_numbers = {record.number for record in groups.get('api', [])}
+    markdown_numbers = set(context.quarter_of)
+    missing = api_numbers - markdown_numbers
+    context.stats.update({'api_residential': len(api_numbers), 'markdown_total': len(markdown_numbers),
+                          'quarters_count': len(context.index.apartments_by_quarter),
+                          'missing_count': len(missing)})
+    for number in sorted(missing):
+        yield f"№{number}", {'number': number}
+
+
+@group_rule('md_extra', WARNING, 'Лишние в markdown', key=_residential_number, requires=('markdown',))
+def _md_extra(groups, context):
+    api_numbers = {record.number for record in groups.get('api', [])}
+    extra = set(context.quarter_of) - api_numbers
+    context.stats['extra_count'] = len(extra)
+    for number in sorted(extra):
+        yield f"№{number}", {'number': number}
+
+
+@group_rule('md_duplicates', ERROR, 'Дубликаты в markdown', requires=('markdown',))
+def _md_duplicates(groups, context):
+    seen: Set[str] = set()
+    for quarter, numbers in context.index.apartments_by_quarter.items():
+        for number in numbers:
+            if number in seen:
+                yield f"Квартира №{number} (квартал {quarter})", {'number': number, 'quarter': quarter}
+            seen.add(number)
+
+
+@group_rule('special_cases', INFO, 'Особые случаи', requires=('markdown',),
+            key=lambda record: 'diadema' if ('диадема' in record.house_name.lower() or 'diadema' in record.house_name.lower())
+            else ('house_18' if _HOUSE_18.match(record.house_number) else None))
+def _special_cases(groups, context):
+    checks = (('diadema', 2, "Диадема: {placed}/{total} объектов во 2 квартале"),
+              ('house_18', 18, "Дома 18.x: {placed}/{total} объектов в 18 квартале"))
+    for group, quarter, template in checks:
+        records = groups.get(group, [])
+        if not records:
+            continue
+        placed = sum(1 for record in records if record.number and context.quarter_of.get(record.number) == quarter)
+        context.stats[f'{group}_in_quarter'] = f"{placed}/{len(records)}"
+        yield template.format(placed=placed, total=len(records))
+
+
+@group_rule('reference_integrity', ERROR, 'Номера из RAG-файлов отсутствуют в quarters', requires=('markdown', 'rag'))
+def _reference_integrity(groups, context):
+    known = context.index.references
+    for number in sorted(context.index.rag_references - known):
+        yield f"№{number}", {'number': number}
+
+
+FEED_RULES = ('missing_quarter', 'invalid_status', 'missing_fields', 'price_bounds', 'floor_sanity',
+              'duplicates', 'parking_present')
+RECORD_RULES = ('missing_fields', 'floor_sanity', 'price_bounds')
+SYNC_RULES = ('parking_present', 'md_duplicates', 'quarter_assignment', 'md_missing', 'md_extra', 'special_cases')
+RULE_SETS = {'feed': FEED_RULES, 'record': RECORD_RULES, 'sync': SYNC_RULES}
+
+
+def fetch_feed(url: str = FEED_URL) -> Dict:
+    import requests
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Валидация данных bir.by за один проход')
+    parser.add_argument('--feed', help='JSON-файл фида (по умолчанию — загрузка с bir.by)')
+    parser.add_argument('--url', default=FEED_URL, help='URL фида')
+    parser.add_argument('--rules', default='all',
+                        help=f"Правила через запятую или набор: all, {', '.join(RULE_SETS)}")
+    parser.add_argument('--quarters', default=str(QUARTERS_DIR), help='Каталог MD-файлов кварталов')
+    parser.add_argument('--rag', default=str(RAG_DIR), help='Каталог RAG-файлов')
+    parser.add_argument('--json', help='Сохранить отчёт в JSON')
+    parser.add_argument('--limit', type=int, default=5, help='Сколько проблем показывать на правило')
+    parser.add_argument('--list', action='store_true', help='Показать зарегистрированные правила')
+    parser.add_argument('--state', help='Инкрементальный режим: файл состояния между запусками')
+    parser.add_argument('--previous', help='JSON-файл предыдущего снимка фида (дельта записей)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Сверить инкрементальный прогон (от --previous) с полным, код 1 при расхождении')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for spec in RULES.values():
+            requires = f" [{', '.join(spec.requires)}]" if spec.requires else ''
+            print(f"{spec.name:20} {spec.kind:6} {spec.severity:7} {spec.description}{requires}")
+        return 0
+
+    if args.rules == 'all':
+        rules = list(RULES)
+    elif args.rules in RULE_SETS:
+        rules = list(RULE_SETS[args.rules])
+    else:
+        rules = [name.strip() for name in args.rules.split(',') if name.strip()]
+
+    unknown = [name for name in rules if name not in RULES]
+    if unknown:
+        print(f"❌ Неизвестные правила: {', '.join(unknown)}")
+        return 2
+    if args.verify and not args.previous:
+        print("❌ --verify требует --previous")
+        return 2
+
+    if args.feed:
+        data = serialization.load(args.feed)
+    else:
+        print(f"📥 Загрузка фида: {args.url}")
+        data = fetch_feed(args.url)
+    previous = None
+    if args.previous:
+        previous = serialization.load(args.previous)
+    index = MarkdownIndex(args.quarters, args.rag)
+
+    if args.verify:
+        changed = record_delta(previous, data)
+        print(f"🔁 Сверка полного и инкрементального прогона ({len(changed)} изменённых записей)")
+        failed = False
+        for variant, differences in verify_incremental(previous, data, rules, index).items():
+            if differences:
+                failed = True
+                print(f"❌ {variant}: отчёты расходятся")
+                for difference in differences[:10]:
+                    print(f"   - {difference}")
+            else:
+                print(f"✅ {variant}: отчёт совпадает с полным прогоном")
+        return 1 if failed else 0
+
+    if args.state:
+        validator = IncrementalValidator(rules, ValidationContext(index), args.state)
+        if previous is not None:
+            # Состояние, сохранённое по --previous, помечено его отпечатком
+            report = validator.run(data, changed=record_delta(previous, data),
+                                   since=record_hash(previous), snapshot=record_hash(data))
+        else:
+            report = validator.run(data, snapshot=record_hash(data))
+        print(f"🔍 Проверено записей: {validator.checked} из {report.stats['total']} "
+              f"({'инкрементально' if validator.mode == 'incremental' else 'полный прогон'}), "
+              f"правил: {len(rules)}")
+    else:
+        report = ValidationEngine(rules, ValidationContext(index)).run(data)
+        print(f"🔍 Проверено записей: {report.stats['total']}, правил: {len(rules)}")
+    report.print_summary(limit=args.limit)
+
+    if args.json:
+        import artifacts
+        artifacts.write_json(args.json, report.to_dict())
+        print(f"📝 Отчёт: {args.json}")
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
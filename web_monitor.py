@@ -1,17 +1,93 @@
 #!/usr/bin/env python3
 """
 Веб-интерфейс для мониторинга системы автообновления BIR.BY
+
+Долгие операции (принудительное обновление, проверка изменений) выполняются
+фоновыми задачами (background_jobs.JobManager): запрос сразу возвращает
+202 и ID задачи, ход выполнения — через /api/jobs/<id> или поток SSE
+/api/jobs/<id>/events. /api/status, /api/quarters и /api/health отдаются
+из памяти и не ждут обновления, поэтому healthcheck и другие пользователи
+дашборда не блокируются.
 """
 
 import os
 import json
+import threading
+import time
 from datetime import datetime
-from pathlib import Path
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Response, render_template_string, jsonify, request, stream_with_context
+from background_jobs import JobManager
 from data_updater import DataUpdater
+from log_service import LOG_FILE, LogReader
+import metrics
 
 app = Flask(__name__)
 updater = DataUpdater()
+jobs = JobManager(max_workers=2)
+log_reader = LogReader(LOG_FILE)
+started_at = time.time()
+
+
+class MonitorState:
+    """
+    Снимок статуса и статистики кварталов в памяти.
+
+    Перечитывается с диска только после завершения задачи или если файлы
+    кэша изменились (обновление из cron/демона) — проверка по mtime.
+    """
+
+    def __init__(self, updater: DataUpdater):
+        self.updater = updater
+        self.lock = threading.Lock()
+        self.status = {}
+        self.quarters = {'quarters': {}}
+        self.mtimes = None
+        self.refresh()
+
+    def _current_mtimes(self):
+        mtimes = []
+        for path in (self.updater.last_update_file, self.updater.stats_file, self.updater.last_hash_file):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def refresh(self):
+        mtimes = self._current_mtimes()
+        status = self.updater.get_status()
+        quarters = {'quarters': {}}
+        if self.updater.stats_file.exists():
+            try:
+                with open(self.updater.stats_file, 'r', encoding='utf-8') as f:
+                    quarters = json.load(f)
+            except (OSError, ValueError):
+                pass
+        with self.lock:
+            self.status = status
+            self.quarters = quarters
+            self.mtimes = mtimes
+
+    def _refresh_if_changed(self):
+        if self._current_mtimes() != self.mtimes:
+            self.refresh()
+
+    def get_status(self):
+        self._refresh_if_changed()
+        with self.lock:
+            status = dict(self.status)
+        active = jobs.active()
+        status['active_job'] = active.to_dict() if active else None
+        return status
+
+    def get_quarters(self):
+        self._refresh_if_changed()
+        with self.lock:
+            return self.quarters
+
+
+state = MonitorState(updater)
+jobs.on_finish(lambda job: state.refresh())
 
 # HTML шаблон для веб-интерфейса
 TEMPLATE = """
@@ -68,6 +144,7 @@ TEMPLATE = """
             <button class="btn btn-success" onclick="forceUpdate()">Принудительное обновление</button>
             <button class="btn btn-warning" onclick="checkChanges()">Проверить изменения</button>
             <button class="btn" onclick="refreshStatus()">Обновить статус</button>
+            <div id="job-progress" style="margin-top: 15px;"></div>
         </div>
 
         <div class="card">
@@ -171,17 +248,36 @@ TEMPLATE = """
             }
         }
 
+        // Логи: последние строки один раз, дальше только новые строки через SSE
+        const MAX_LOG_LINES = 200;
+        let logLines = [];
+        let logStream = null;
+
+        function renderLogs() {
+            const container = document.getElementById('logs-container');
+            const escaped = logLines.map(line => line.replace(/&/g, '&amp;').replace(/</g, '&lt;'));
+            container.innerHTML = `
+                <div class="log-container">
+                    ${escaped.length ? escaped.join('<br>') : 'Логи не найдены'}
+                </div>
+            `;
+        }
+
         async function loadLogs() {
+            if (logStream && logStream.readyState !== EventSource.CLOSED) return;
             try {
-                const response = await fetch('/api/logs');
+                const response = await fetch('/api/logs?tail=50');
                 const data = await response.json();
-                const container = document.getElementById('logs-container');
-                
-                container.innerHTML = `
-                    <div class="log-container">
-                        ${data.logs ? data.logs.split('\\n').slice(-50).join('<br>') : 'Логи не найдены'}
-                    </div>
-                `;
+                logLines = data.lines || [];
+                renderLogs();
+
+                const params = new URLSearchParams({ since: data.offset || 0, file_id: data.file_id || '' });
+                logStream = new EventSource(`/api/logs/stream?${params}`);
+                logStream.addEventListener('log', (e) => {
+                    const chunk = JSON.parse(e.data);
+                    logLines = (chunk.rotated ? [] : logLines).concat(chunk.lines).slice(-MAX_LOG_LINES);
+                    renderLogs();
+                });
             } catch (error) {
                 console.error('Ошибка загрузки логов:', error);
             }
@@ -217,14 +313,31 @@ TEMPLATE = """
             }
         }
 
+        // Ход фоновой задачи через server-sent events
+        function followJob(jobId, onDone) {
+            const box = document.getElementById('job-progress');
+            const source = new EventSource(`/api/jobs/${jobId}/events`);
+            source.addEventListener('progress', (e) => {
+                const event = JSON.parse(e.data);
+                const percent = event.percent !== null ? ` (${event.percent}%)` : '';
+                box.innerHTML = `<div class="timestamp">Задача ${jobId}</div><div>${event.message}${percent}</div>`;
+            });
+            source.addEventListener('done', (e) => {
+                source.close();
+                const job = JSON.parse(e.data);
+                box.innerHTML = `<div class="${job.status === 'succeeded' ? 'status-success' : 'status-error'}">` +
+                    `${job.status === 'succeeded' ? '✅ Готово' : '❌ ' + (job.error || 'Ошибка')}</div>`;
+                onDone(job);
+            });
+        }
+
         async function forceUpdate() {
             if (!confirm('Запустить принудительное обновление данных?')) return;
-            
+
             try {
                 const response = await fetch('/api/force-update', { method: 'POST' });
                 const result = await response.json();
-                alert(result.message);
-                setTimeout(fetchStatus, 2000);
+                followJob(result.job_id, () => refreshAll());
             } catch (error) {
                 alert('Ошибка обновления: ' + error.message);
             }
@@ -232,9 +345,13 @@ TEMPLATE = """
 
         async function checkChanges() {
             try {
-                const response = await fetch('/api/check-changes');
+                const response = await fetch('/api/check-changes', { method: 'POST' });
                 const result = await response.json();
-                alert(`Изменения ${result.changes_detected ? 'обнаружены' : 'не обнаружены'}\\n\\nОбъектов: ${result.data_count}`);
+                followJob(result.job_id, (job) => {
+                    if (job.status !== 'succeeded') return;
+                    const info = job.result || {};
+                    alert(`Изменения ${info.changes_detected ? 'обнаружены' : 'не обнаружены'}\\n\\nОбъектов: ${info.data_count}`);
+                });
             } catch (error) {
                 alert('Ошибка проверки: ' + error.message);
             }
@@ -277,62 +394,165 @@ def index():
     """Главная страница"""
     return render_template_string(TEMPLATE, current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
+@app.route('/api/health')
+def api_health():
+    """API: Проверка живости (для healthcheck, без обращения к диску)"""
+    active = jobs.active()
+    return jsonify({
+        'ok': True,
+        'uptime_seconds': round(time.time() - started_at, 1),
+        'active_job': active.id if active else None
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Метрики Prometheus: процесс веб-интерфейса + файлы metrics/*.prom от запусков из cron"""
+    return Response(metrics.collect(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/status')
 def api_status():
-    """API: Получить статус системы"""
+    """API: Получить статус системы (из памяти)"""
     try:
-        status = updater.get_status()
-        return jsonify(status)
+        return jsonify(state.get_status())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/quarters')
 def api_quarters():
-    """API: Получить статистику кварталов"""
+    """API: Получить статистику кварталов (из памяти)"""
     try:
-        stats_file = Path('cache/update_stats.json')
-        if stats_file.exists():
-            with open(stats_file, 'r', encoding='utf-8') as f:
-                stats = json.load(f)
-            return jsonify(stats)
-        else:
-            return jsonify({'quarters': {}})
+        return jsonify(state.get_quarters())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/logs')
 def api_logs():
-    """API: Получить логи"""
+    """
+    API: Получить логи (без чтения файла целиком)
+
+    ?tail=N (по умолчанию 200) — последние N строк
+    ?since=offset[&file_id=...] — строки, дописанные после смещения
+    ?line=N[&count=M] — M строк начиная с номера N
+    """
     try:
-        log_file = Path('data_updater.log')
-        if log_file.exists():
-            logs = log_file.read_text(encoding='utf-8')
-            return jsonify({'logs': logs})
+        if 'since' in request.args:
+            chunk = log_reader.read_since(request.args.get('since', 0, type=int),
+                                          request.args.get('file_id') or None)
+        elif 'line' in request.args:
+            chunk = log_reader.read_lines(request.args.get('line', 0, type=int),
+                                          min(request.args.get('count', 200, type=int), 5000))
+        else:
+            chunk = log_reader.tail(min(request.args.get('tail', 200, type=int), 5000))
+
+        if chunk['file_id'] is None:
+            chunk['logs'] = 'Логи не найдены'
         else:
-            return jsonify({'logs': 'Логи не найдены'})
+            chunk['logs'] = '\n'.join(chunk['lines'])
+        return jsonify(chunk)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/logs/stream')
+def api_logs_stream():
+    """API: Новые строки лога (server-sent events), ?since=offset — с какого смещения"""
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id and ':' in last_event_id:
+        fid, _, offset = last_event_id.rpartition(':')
+        since = int(offset) if offset.isdigit() else None
+    else:
+        fid = request.args.get('file_id') or None
+        since = request.args.get('since', type=int)
+    if since is None:
+        start = log_reader.tail(0)
+        since, fid = start['offset'], start['file_id']
+
+    def generate():
+        for chunk in log_reader.follow(since, fid):
+            if chunk is None:
+                yield ": keep-alive\n\n"
+                continue
+            data = {'lines': chunk['lines'], 'rotated': chunk['rotated']}
+            yield (f"id: {chunk['file_id']}:{chunk['offset']}\nevent: log\n"
+                   f"data: {json.dumps(data, ensure_ascii=False)}\n\n")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/logs/segments')
+def api_logs_segments():
+    """API: Текущий лог и сжатые сегменты ротации"""
+    return jsonify({'segments': log_reader.segments()})
+
+def job_accepted(job, message):
+    """Ответ 202 с ID задачи и ссылками для опроса"""
+    return jsonify({
+        'success': True,
+        'message': message,
+        'job_id': job.id,
+        'job': job.to_dict(),
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events'
+    }), 202
+
+def run_force_update(job):
+    return updater.update_data(force=True, progress=job.progress)
+
+def run_check_changes(job):
+    job.progress('fetch', 'Загрузка данных с сервера', 10)
+    changes_detected, change_info = updater.check_for_changes()
+    if not change_info:
+        raise RuntimeError('Не удалось загрузить данные')
+    return change_info
+
 @app.route('/api/force-update', methods=['POST'])
 def api_force_update():
-    """API: Принудительное обновление"""
-    try:
-        success = updater.update_data(force=True)
-        return jsonify({
-            'success': success,
-            'message': 'Обновление завершено успешно!' if success else 'Ошибка обновления'
-        })
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 500
+    """API: Принудительное обновление (фоновая задача)"""
+    active = jobs.active('force_update')
+    job = jobs.submit('force_update', run_force_update)
+    message = 'Обновление уже выполняется' if active is job else 'Обновление запущено'
+    return job_accepted(job, message)
 
-@app.route('/api/check-changes')
+@app.route('/api/check-changes', methods=['GET', 'POST'])
 def api_check_changes():
-    """API: Проверить изменения"""
-    try:
-        changes_detected, change_info = updater.check_for_changes()
-        return jsonify(change_info)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    """API: Проверить изменения (фоновая задача)"""
+    job = jobs.submit('check_changes', run_check_changes)
+    return job_accepted(job, 'Проверка изменений запущена')
+
+@app.route('/api/jobs')
+def api_jobs():
+    """API: Последние задачи"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'jobs': jobs.list(limit=limit)})
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API: Статус задачи (для опроса)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(job.to_dict(with_events=request.args.get('events') == '1'))
+
+@app.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """API: Ход выполнения задачи (server-sent events)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+
+    # Переподключение EventSource присылает Last-Event-ID — продолжаем со следующего события
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('since'))
+    since = int(last_event_id) + 1 if last_event_id and last_event_id.lstrip('-').isdigit() else 0
+
+    def generate():
+        for event in jobs.stream(job_id, since=since):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        yield f"event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/config', methods=['GET', 'POST'])
 def api_config():
@@ -345,6 +565,7 @@ def api_config():
             new_config = request.json
             updater.config.update(new_config)
             updater._save_config()
+            state.refresh()
             return jsonify({'success': True, 'message': 'Конфигурация сохранена'})
         except Exception as e:
             return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 500
@@ -352,7 +573,7 @@ def api_config():
 if __name__ == '__main__':
     print("🌐 Запуск веб-интерфейса мониторинга BIR.BY Auto-Updater")
     print("📡 Доступен по адресу: http://localhost:5000")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
 
 
 